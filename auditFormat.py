@@ -0,0 +1,553 @@
+import mmap
+import os
+import struct
+import zlib
+from datetime import datetime
+
+from auditHistory import AuditEntry, parse_line
+from auditLog import AuditLogger
+from metrics import instrumented
+from storage import from_epoch_micros, to_epoch_micros
+from validation import format_phone, phone_key
+
+# The binary audit log used when no other path is given
+DEFAULT_BINARY_LOG_PATH = 'phonebook.alog'
+
+# File header identifying a binary audit log
+FILE_MAGIC = b'PBAUDIT1'
+
+# Header of every block of records
+BLOCK_MAGIC = b'PBA2'
+
+# Header of the blocks written before the phone filter was sized by the number of records
+LEGACY_BLOCK_MAGIC = b'PBAB'
+
+# Records per block when converting a text log
+CONVERT_BLOCK_RECORDS = 1024
+
+# Bits per distinct phone key in a block's phone filter, and the bits each key sets.
+# Together they give a false positive rate under 1%, however many records a block holds.
+FILTER_BITS_PER_KEY = 10
+FILTER_HASHES = 7
+
+# Operation codes stored in each record
+OPERATION_CODES = {'Add': 1, 'View': 2, 'Search': 3, 'Update': 4, 'Delete': 5, 'Merge': 6}
+OPERATION_NAMES = {code: operation for operation, code in OPERATION_CODES.items()}
+
+NO_PHONE = -1  # Phone key of a record without a contact, or converted from a text log
+
+# Magic, payload length, record count, earliest and latest timestamp, phone filter length in
+# bytes and number of hashes, payload CRC-32. The phone filter follows, then the payload.
+_BLOCK_HEADER = struct.Struct('<4sIIqqIBI')
+# The header of a legacy block, with a fixed 256-bit phone filter set by two hashes
+_LEGACY_BLOCK_HEADER = struct.Struct('<4sIIqq32sI')
+# Operation code, timestamp, phone key, then the byte lengths of the first and last name
+_RECORD = struct.Struct('<BqqHH')
+_NO_NAME = 0xFFFF  # Name length marking a record without a contact
+_MASK64 = 2 ** 64 - 1
+
+
+def _filter_positions(key, bits, hashes):
+    """Returns the bits a phone key sets in a phone filter of the given size, by double hashing."""
+    mixed = (key + 0x9E3779B97F4A7C15) & _MASK64  # The splitmix64 finalizer
+    mixed = ((mixed ^ (mixed >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    mixed = ((mixed ^ (mixed >> 27)) * 0x94D049BB133111EB) & _MASK64
+    mixed ^= mixed >> 31
+    first, second = mixed >> 32, (mixed & 0xFFFFFFFF) | 1
+    return [(first + step * second) % bits for step in range(hashes)]
+
+
+def _legacy_filter_bits(key):
+    """Returns the two bits a phone key sets in the phone filter of a legacy block."""
+    hashed = (key * 0x9E3779B97F4A7C15) & _MASK64
+    return (1 << (hashed >> 56)) | (1 << ((hashed >> 48) & 0xFF))
+
+
+def _phone_filter(keys):
+    """Returns a phone filter of the given distinct phone keys, sized by their number."""
+    phone_filter = bytearray((len(keys) * FILTER_BITS_PER_KEY + 63) // 64 * 8)
+    bits = len(phone_filter) * 8
+    for key in keys:
+        for position in _filter_positions(key, bits, FILTER_HASHES):
+            phone_filter[position >> 3] |= 1 << (position & 7)
+    return bytes(phone_filter)
+
+
+def _may_contain(buffer, phone_filter, key):
+    """
+    Checks whether a block's phone filter may hold a phone key.
+
+    Parameters:
+    -----------
+    buffer : mmap or bytes
+        The mapped log.
+    phone_filter : tuple
+        (offset, length, hashes) of the block's phone filter in the buffer, or for a legacy
+        block (None, filter, None) with the filter as an integer.
+    key : int
+        The phone key.
+
+    Returns:
+    --------
+    bool
+        False if no record of the block has the phone key, True if one may have it.
+    """
+    offset, length, hashes = phone_filter
+    if offset is None:
+        key_bits = _legacy_filter_bits(key)
+        return length & key_bits == key_bits
+    if not length:
+        return False  # No record of the block has a phone key
+    for position in _filter_positions(key, length * 8, hashes):
+        if not buffer[offset + (position >> 3)] & (1 << (position & 7)):
+            return False
+    return True
+
+
+def _format_line(micros, operation, first_name, last_name):
+    """Formats a record as a line of the text audit log."""
+    timestamp = from_epoch_micros(micros).strftime('%Y-%m-%d %H:%M:%S')
+    if first_name is None:
+        return f'[{timestamp}] {operation} performed'
+    return f'[{timestamp}] {operation} performed on {first_name} {last_name}'
+
+
+def encode_record(operation, micros, phone, first_name=None, last_name=None):
+    """
+    Encodes one audit record.
+
+    Parameters:
+    -----------
+    operation : str
+        The operation, one of OPERATION_CODES.
+    micros : int
+        When the operation happened, in microseconds since 1970-01-01 local time.
+    phone : int
+        The contact's phone key (see validation.phone_key), or NO_PHONE.
+    first_name : str, optional
+        The contact's first name (default is None, for an operation without a contact).
+    last_name : str, optional
+        The contact's last name.
+
+    Returns:
+    --------
+    bytes
+        The fixed-layout record followed by the UTF-8 names.
+    """
+    if first_name is None:
+        return _RECORD.pack(OPERATION_CODES[operation], micros, phone, _NO_NAME, _NO_NAME)
+    # backslashreplace keeps names with a lone surrogate, e.g. from JSON input, loggable
+    first = str(first_name).encode('utf-8', 'backslashreplace')[:_NO_NAME - 1]
+    last = str(last_name).encode('utf-8', 'backslashreplace')[:_NO_NAME - 1]
+    return _RECORD.pack(OPERATION_CODES[operation], micros, phone, len(first), len(last)) + first + last
+
+
+def encode_block(records):
+    """
+    Encodes a block of records produced by encode_record.
+
+    The block header holds the earliest and latest timestamp in the block, and is followed
+    by a Bloom filter of its phone keys sized by their number, so readers can skip blocks
+    without decoding them.
+
+    Parameters:
+    -----------
+    records : list of bytes
+        The encoded records, at least one.
+
+    Returns:
+    --------
+    bytes
+        The block header, the phone filter and the records.
+    """
+    payload = b''.join(records)
+    earliest = latest = None
+    keys = set()
+    for record in records:
+        _, micros, phone, _, _ = _RECORD.unpack_from(record)
+        earliest = micros if earliest is None else min(earliest, micros)
+        latest = micros if latest is None else max(latest, micros)
+        if phone != NO_PHONE:
+            keys.add(phone)
+    phone_filter = _phone_filter(keys)
+    header = _BLOCK_HEADER.pack(BLOCK_MAGIC, len(payload), len(records), earliest, latest,
+                                len(phone_filter), FILTER_HASHES, zlib.crc32(payload))
+    return header + phone_filter + payload
+
+
+class BinaryAuditLogger(AuditLogger):
+    """
+    An AuditLogger that writes structured binary records instead of text lines.
+
+    Each record holds an operation code, a timestamp in microseconds, the contact's
+    phone key (Contact.phone_key) and its name. Every batch the writer thread collects becomes one block,
+    whose header lets time-range and per-contact queries skip it without decoding it.
+    Only the operations in OPERATION_CODES can be logged.
+    """
+
+    FILE_HEADER = FILE_MAGIC
+
+    def __init__(self, path=DEFAULT_BINARY_LOG_PATH, **options):
+        """
+        Initializes a binary logger.
+
+        Parameters:
+        -----------
+        path : str, optional
+            The log file (default is DEFAULT_BINARY_LOG_PATH).
+        **options
+            The batching, fsync and rotation options of AuditLogger.
+        """
+        super().__init__(path, **options)
+
+    # Not instrumented itself: AuditLogger.log records the call, which would otherwise be counted twice
+    def log(self, operation, contact=None):
+        """
+        Queues a record of an operation with an optional contact.
+
+        Raises:
+        -------
+        ValueError
+            If the operation has no operation code.
+        """
+        if operation not in OPERATION_CODES:
+            raise ValueError(f"Operation {operation} cannot be written to a binary audit log.")
+        super().log(operation, contact)
+
+    # Recorded by AuditLogger.log_many, as log is
+    def log_many(self, operation, contacts):
+        """
+        Queues a record of the same operation for each of several contacts.
+
+        Raises:
+        -------
+        ValueError
+            If the operation has no operation code.
+        """
+        if operation not in OPERATION_CODES:
+            raise ValueError(f"Operation {operation} cannot be written to a binary audit log.")
+        super().log_many(operation, contacts)
+
+    def _format(self, record):
+        """Encodes one queued record."""
+        created, operation, names = record
+        micros = to_epoch_micros(datetime.fromtimestamp(created))
+        if names is None:
+            return encode_record(operation, micros, NO_PHONE)
+        first_name, last_name, key = names
+        return encode_record(operation, micros, key, first_name, last_name)
+
+    def _encode(self, lines):
+        """Encodes a batch of records as one block."""
+        return encode_block(lines)
+
+    def _open(self):
+        """
+        Opens the log file for appending, positioned at its end.
+
+        Readers stop at a block torn by a crash, so anything appended after it would be
+        unreachable. Like the write-ahead log of PersistentPhoneBook, the file is first
+        truncated to the end of its last complete block.
+
+        Raises:
+        -------
+        ValueError
+            If the file is not a binary audit log.
+        """
+        log_file = super()._open()
+        size = log_file.tell()
+        if size == 0:
+            return log_file
+        with open(self.path, 'rb') as reader, mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if size < len(FILE_MAGIC) and FILE_MAGIC.startswith(buffer[:size]):
+                end = 0  # Torn inside the file header, which the next write adds again
+            else:
+                blocks = BinaryAuditHistory(self.path)._blocks(buffer)
+                end = blocks[-1][0] + blocks[-1][1] if blocks else len(FILE_MAGIC)
+        if end < size:
+            log_file.truncate(end)
+            log_file.seek(end)
+        return log_file
+
+    @instrumented('audit.history')
+    def history(self, limit=None, operation=None, name=None, start=None, end=None, page_size=50, phone=None):
+        """
+        Lazily yields pages of logged entries, newest first, optionally filtered.
+
+        See BinaryAuditHistory.pages for the parameters.
+
+        Returns:
+        --------
+        generator
+            Lists of up to page_size AuditEntry tuples.
+        """
+        self.flush()
+        return BinaryAuditHistory(self.path).pages(limit, operation, name, start, end, page_size, phone)
+
+    @instrumented('audit.lines')
+    def lines(self):
+        """
+        Returns every logged entry as a text line, oldest first.
+
+        Returns:
+        --------
+        list
+            The log lines, each ending with a newline.
+        """
+        self.flush()
+        return [entry.line + '\n' for entry in BinaryAuditHistory(self.path).entries()]
+
+
+class BinaryAuditHistory:
+    """
+    Reads a binary audit log written by BinaryAuditLogger or convert_text_log.
+
+    The log is memory-mapped. Walking it only reads the block headers; a block's records
+    are decoded only if its time range and phone filter can match the query. Blocks
+    written with the earlier fixed-size phone filter are read as well.
+
+    Attributes:
+    -----------
+    path : str
+        The log file.
+    """
+
+    def __init__(self, path):
+        """
+        Initializes a reader for a binary log file.
+
+        Parameters:
+        -----------
+        path : str
+            The binary audit log.
+        """
+        self.path = path
+
+    def _blocks(self, buffer):
+        """
+        Returns (offset, length, count, earliest, latest, phone filter, checksum) for each
+        complete block, where offset and length locate the records and the phone filter is
+        as taken by _may_contain.
+        """
+        if buffer[:len(FILE_MAGIC)] != FILE_MAGIC:
+            raise ValueError(f"{self.path} is not a binary audit log.")
+        blocks = []
+        offset = len(FILE_MAGIC)
+        while offset + _BLOCK_HEADER.size <= len(buffer):
+            magic = buffer[offset:offset + len(BLOCK_MAGIC)]
+            if magic == BLOCK_MAGIC:
+                _, length, count, earliest, latest, filter_length, hashes, checksum = \
+                    _BLOCK_HEADER.unpack_from(buffer, offset)
+                filter_start = offset + _BLOCK_HEADER.size
+                phone_filter = (filter_start, filter_length, hashes)
+                start = filter_start + filter_length
+            elif magic == LEGACY_BLOCK_MAGIC and offset + _LEGACY_BLOCK_HEADER.size <= len(buffer):
+                _, length, count, earliest, latest, legacy_filter, checksum = \
+                    _LEGACY_BLOCK_HEADER.unpack_from(buffer, offset)
+                phone_filter = (None, int.from_bytes(legacy_filter, 'little'), None)
+                start = offset + _LEGACY_BLOCK_HEADER.size
+            else:
+                break  # A block torn by a crash ends the log
+            if start + length > len(buffer):
+                break
+            blocks.append((start, length, count, earliest, latest, phone_filter, checksum))
+            offset = start + length
+        return blocks
+
+    def _records(self, buffer, start, length, checksum):
+        """Decodes the records of one block as (code, micros, phone, first name, last name) tuples."""
+        payload = buffer[start:start + length]
+        if zlib.crc32(payload) != checksum:
+            raise ValueError(f"{self.path} has a corrupt block at offset {start - _BLOCK_HEADER.size}.")
+        records = []
+        offset = 0
+        while offset < length:
+            code, micros, phone, first_length, last_length = _RECORD.unpack_from(payload, offset)
+            offset += _RECORD.size
+            if first_length == _NO_NAME:
+                first_name = last_name = None
+            else:
+                first_name = payload[offset:offset + first_length].decode('utf-8', 'replace')
+                offset += first_length
+                last_name = payload[offset:offset + last_length].decode('utf-8', 'replace')
+                offset += last_length
+            records.append((code, micros, phone, first_name, last_name))
+        return records
+
+    def _entry(self, record):
+        """Builds the AuditEntry for a decoded record."""
+        code, micros, phone, first_name, last_name = record
+        operation = OPERATION_NAMES.get(code, str(code))
+        name = None if first_name is None else f'{first_name} {last_name}'
+        phone_text = None if phone == NO_PHONE else format_phone(phone)
+        return AuditEntry(from_epoch_micros(micros), operation, name,
+                          _format_line(micros, operation, first_name, last_name), phone_text)
+
+    def entries(self):
+        """
+        Lazily yields every entry, oldest first.
+
+        Returns:
+        --------
+        generator
+            The AuditEntry tuples in the order they were logged.
+        """
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, 'rb') as log_file, \
+                mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for start, length, _, _, _, _, checksum in self._blocks(buffer):
+                for record in self._records(buffer, start, length, checksum):
+                    yield self._entry(record)
+
+    def pages(self, limit=None, operation=None, name=None, start=None, end=None, page_size=50, phone=None):
+        """
+        Lazily yields pages of log entries, newest first, that match every given filter.
+
+        Parameters:
+        -----------
+        limit : int, optional
+            The most entries to return in total (default is None, no limit).
+        operation : str, optional
+            Only return entries of this operation, e.g. 'Add' (default is all operations).
+        name : str, optional
+            Only return entries whose contact name contains this text, ignoring case.
+        start : datetime, optional
+            Only return entries logged at or after this time.
+        end : datetime, optional
+            Only return entries logged at or before this time.
+        page_size : int, optional
+            The number of entries per page (default is 50).
+        phone : str, optional
+            Only return entries about the contact with this phone number.
+
+        Returns:
+        --------
+        generator
+            Lists of up to page_size AuditEntry tuples.
+        """
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0 or limit == 0:
+            return
+
+        low = None if start is None else to_epoch_micros(start)
+        # Entries are shown to the second, so an end time includes its whole second
+        high = None if end is None else to_epoch_micros(end.replace(microsecond=999999))
+        code = None if operation is None else OPERATION_CODES.get(operation, 0)
+        key = None if phone is None else phone_key(phone)  # Raises ValueError for an invalid number
+        needle = None if name is None else name.casefold()
+
+        with open(self.path, 'rb') as log_file, \
+                mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            page = []
+            returned = 0
+            for block_start, length, _, earliest, latest, phone_filter, checksum in reversed(self._blocks(buffer)):
+                if (low is not None and latest < low) or (high is not None and earliest > high):
+                    continue
+                if key is not None and not _may_contain(buffer, phone_filter, key):
+                    continue
+                for record in reversed(self._records(buffer, block_start, length, checksum)):
+                    record_code, micros, record_phone, first_name, last_name = record
+                    if code is not None and record_code != code:
+                        continue
+                    if (low is not None and micros < low) or (high is not None and micros > high):
+                        continue
+                    if key is not None and record_phone != key:
+                        continue
+                    if needle is not None and (first_name is None or
+                                               needle not in f'{first_name} {last_name}'.casefold()):
+                        continue
+
+                    page.append(self._entry(record))
+                    returned += 1
+                    if returned == limit:
+                        yield page
+                        return
+                    if len(page) == page_size:
+                        yield page
+                        page = []
+            if page:
+                yield page
+
+
+def convert_text_log(text_path, binary_path):
+    """
+    Converts a text audit log into a binary audit log.
+
+    Text lines do not record phone numbers, so the converted records have no phone key
+    and are not found by per-contact queries. Lines that are not in the audit log layout,
+    or whose operation has no operation code, are skipped.
+
+    Parameters:
+    -----------
+    text_path : str
+        The text log to read.
+    binary_path : str
+        The binary log to write. An existing file is replaced.
+
+    Returns:
+    --------
+    int
+        The number of records written.
+    """
+    written = 0
+    with open(text_path, 'r', encoding='utf-8') as text_file, open(binary_path, 'wb') as binary_file:
+        binary_file.write(FILE_MAGIC)
+        records = []
+        for line in text_file:
+            entry = parse_line(line)
+            if entry is None or entry.operation not in OPERATION_CODES:
+                continue
+            first_name = last_name = None
+            if entry.name is not None:
+                first_name, _, last_name = entry.name.partition(' ')
+            records.append(encode_record(entry.operation, to_epoch_micros(entry.time), NO_PHONE,
+                                         first_name, last_name))
+            if len(records) == CONVERT_BLOCK_RECORDS:
+                binary_file.write(encode_block(records))
+                written += len(records)
+                records = []
+        if records:
+            binary_file.write(encode_block(records))
+            written += len(records)
+    return written
+
+
+def export_text_log(binary_path, text_path):
+    """
+    Writes a binary audit log out in the text audit log layout.
+
+    Parameters:
+    -----------
+    binary_path : str
+        The binary log to read.
+    text_path : str
+        The text log to write. An existing file is replaced.
+
+    Returns:
+    --------
+    int
+        The number of lines written.
+    """
+    written = 0
+    with open(text_path, 'w', encoding='utf-8') as text_file:
+        for entry in BinaryAuditHistory(binary_path).entries():
+            text_file.write(entry.line + '\n')
+            written += 1
+    return written
+
+
+# Convert between the text and binary audit log layouts from the command line
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert audit logs between the text and binary layouts.")
+    parser.add_argument('command', choices=['convert', 'export'],
+                        help="'convert' turns a text log into a binary one, 'export' does the reverse.")
+    parser.add_argument('source', help="The log to read.")
+    parser.add_argument('destination', help="The log to write.")
+    arguments = parser.parse_args()
+    if arguments.command == 'convert':
+        count = convert_text_log(arguments.source, arguments.destination)
+    else:
+        count = export_text_log(arguments.source, arguments.destination)
+    print(f"Wrote {count} entries to {arguments.destination}.")
@@ -0,0 +1,313 @@
+import mmap
+import os
+import re
+import struct
+import zlib
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:  # Windows
+    import msvcrt
+
+# Log lines covered by one entry of the offset index
+BLOCK_LINES = 1024
+
+# Bytes of the log scanned at a time while extending the index
+SCAN_BYTES = 1024 * 1024
+
+# File header identifying an offset index
+INDEX_MAGIC = b'PBLOGIX1'
+
+_HEADER = struct.Struct('<8sIQ')  # Magic, CRC-32 and length of the log's first line
+_BLOCK = struct.Struct('<QqqQ')  # End offset, earliest and latest timestamp, operation mask
+_NO_TIME = (2 ** 63 - 1, -1)  # (earliest, latest) of a block without any timestamped line
+
+# Matches one log line written by AuditLogger
+_LINE = re.compile(rb'\[(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d)\] (\S+) performed(?: on (.*))?')
+
+# One parsed log entry; name is None for operations without a contact, and phone is only
+# known for entries read from a binary audit log
+AuditEntry = namedtuple('AuditEntry', ['time', 'operation', 'name', 'line', 'phone'], defaults=(None,))
+
+
+def parse_line(line):
+    """
+    Parses one line of a text audit log.
+
+    Parameters:
+    -----------
+    line : str
+        The line, with or without its trailing newline.
+
+    Returns:
+    --------
+    AuditEntry or None
+        The parsed entry, or None if the line is not in the audit log layout.
+    """
+    line = line.rstrip('\n')
+    match = _LINE.fullmatch(line.encode('utf-8'))
+    if match is None:
+        return None
+    groups = match.groups()
+    name = None if groups[7] is None else groups[7].decode('utf-8')
+    return AuditEntry(datetime(*map(int, groups[:6])), groups[6].decode('utf-8'), name, line)
+
+
+def _time_key(moment):
+    """Returns a datetime as the integer YYYYMMDDHHMMSS, which sorts like the time itself."""
+    return int(moment.strftime('%Y%m%d%H%M%S'))
+
+
+def _operation_bit(operation):
+    """Returns the bit standing for an operation name in a block's operation mask."""
+    return 1 << (zlib.crc32(operation) & 63)
+
+
+@contextmanager
+def _exclusive_lock(file):
+    """Holds an exclusive lock on an open file, which other processes respect, while the block runs."""
+    if msvcrt is None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+    else:
+        # msvcrt locks a byte range from the current position; the first byte stands for the file
+        file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            except OSError:
+                pass  # LK_LOCK gives up after about ten seconds; keep waiting
+    try:
+        yield
+    finally:
+        file.flush()  # Other readers must see everything written under the lock
+        if msvcrt is None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _stamp_key(stamp):
+    """Returns the time key of a 'YYYY-MM-DD HH:MM:SS' timestamp given as bytes, or None."""
+    digits = stamp.translate(None, b'-: ')
+    return int(digits) if digits.isdigit() else None
+
+
+class AuditHistory:
+    """
+    Reads the audit log written by AuditLogger, newest entries first, one page at a time.
+
+    The log is memory-mapped and read backwards, so only the lines that end up on a page
+    are ever decoded. A sidecar offset index (the log path plus '.idx') splits the log
+    into blocks of BLOCK_LINES lines and records, for each block, where it ends, the
+    earliest and latest timestamp in it, and a bit mask of the operations it contains.
+    Filtered reads skip every block that cannot match. The index is extended with the
+    lines appended since the last read, and rebuilt if the log was rotated or replaced.
+    Readers hold an exclusive lock on the index while extending it, so concurrent readers,
+    in other threads or processes, never index the same lines twice.
+
+    Attributes:
+    -----------
+    path : str
+        The log file.
+    index_path : str
+        The sidecar offset index.
+    """
+
+    def __init__(self, path):
+        """
+        Initializes a reader for a log file.
+
+        Parameters:
+        -----------
+        path : str
+            The log file written by AuditLogger.
+        """
+        self.path = path
+        self.index_path = path + '.idx'
+        self._blocks = []  # (start, end, earliest, latest, operation mask) per indexed block
+        self._signature = None  # The _HEADER the index was built for
+
+    def _log_signature(self, buffer):
+        """Returns the index header matching the first line of the mapped log."""
+        first_end = buffer.find(b'\n')
+        first_line = buffer[:first_end] if first_end != -1 else b''
+        return _HEADER.pack(INDEX_MAGIC, zlib.crc32(first_line), len(first_line))
+
+    def _load_index(self, index_file, signature, size):
+        """
+        Reads the index blocks written since the last read, by this reader or another one.
+
+        The index is started over if it belongs to a different log, and blocks past the
+        end of the log or a torn trailing record are dropped.
+
+        Parameters:
+        -----------
+        index_file : file object
+            The sidecar index, opened for appending and locked by the caller.
+        signature : bytes
+            The index header matching the log's first line.
+        size : int
+            The length of the log.
+        """
+        if signature != self._signature or (self._blocks and self._blocks[-1][1] > size):
+            self._blocks = []
+            self._signature = signature
+            index_file.seek(0)
+            if index_file.read(_HEADER.size) != signature:
+                index_file.truncate(0)
+                index_file.write(signature)
+                return
+
+        known = _HEADER.size + len(self._blocks) * _BLOCK.size
+        index_file.seek(known)
+        data = index_file.read()
+        start = self._blocks[-1][1] if self._blocks else 0
+        count = len(data) // _BLOCK.size
+        for end, earliest, latest, mask in _BLOCK.iter_unpack(data[:count * _BLOCK.size]):
+            if end > size:
+                break
+            self._blocks.append((start, end, earliest, latest, mask))
+            start = end
+
+        if known + len(data) != _HEADER.size + len(self._blocks) * _BLOCK.size:
+            index_file.truncate(_HEADER.size + len(self._blocks) * _BLOCK.size)
+
+    def _refresh(self, buffer):
+        """Brings the index up to date with the mapped log, returning where the unindexed tail starts."""
+        with open(self.index_path, 'a+b') as index_file, _exclusive_lock(index_file):
+            self._load_index(index_file, self._log_signature(buffer), len(buffer))
+            return self._extend_index(index_file, buffer)
+
+    def _extend_index(self, index_file, buffer):
+        """Appends the complete blocks of the unindexed tail, returning where the remaining lines start."""
+        start = self._blocks[-1][1] if self._blocks else 0
+        complete = buffer.rfind(b'\n', start) + 1  # End of the last complete line
+        new_blocks = []
+        block_start = position = start
+        lines, (earliest, latest), mask = 0, _NO_TIME, 0
+        operation_bits = {}
+        stamp_keys = {}  # Records logged in the same second share a timestamp
+
+        while position < complete:
+            chunk_end = buffer.rfind(b'\n', position, min(complete, position + SCAN_BYTES)) + 1
+            if chunk_end <= position:
+                chunk_end = buffer.find(b'\n', position) + 1  # A single line longer than SCAN_BYTES
+            for line in buffer[position:chunk_end].split(b'\n')[:-1]:
+                position += len(line) + 1
+                # Lines look like '[YYYY-MM-DD HH:MM:SS] Operation performed ...'
+                if line[:1] == b'[' and line[20:22] == b'] ':
+                    stamp = line[1:20]
+                    key = stamp_keys.get(stamp)
+                    if key is None:
+                        if len(stamp_keys) > 4096:
+                            stamp_keys.clear()
+                        key = stamp_keys[stamp] = _stamp_key(stamp)
+                    if key is not None:
+                        if key < earliest:
+                            earliest = key
+                        if key > latest:
+                            latest = key
+                        operation = line[22:line.find(b' ', 22)]
+                        bit = operation_bits.get(operation)
+                        if bit is None:
+                            bit = operation_bits[operation] = _operation_bit(operation)
+                        mask |= bit
+                lines += 1
+                if lines == BLOCK_LINES:
+                    new_blocks.append((block_start, position, earliest, latest, mask))
+                    block_start = position
+                    lines, (earliest, latest), mask = 0, _NO_TIME, 0
+
+        if new_blocks:
+            index_file.write(b''.join(_BLOCK.pack(end, earliest, latest, mask)
+                                      for _, end, earliest, latest, mask in new_blocks))
+            self._blocks.extend(new_blocks)
+        return block_start
+
+    def pages(self, limit=None, operation=None, name=None, start=None, end=None, page_size=50):
+        """
+        Lazily yields pages of log entries, newest first, that match every given filter.
+
+        The log is mapped when the first page is requested and unmapped once the
+        generator is exhausted or closed, so callers can stop after any page.
+
+        Parameters:
+        -----------
+        limit : int, optional
+            The most entries to return in total (default is None, no limit).
+        operation : str, optional
+            Only return entries of this operation, e.g. 'Add' (default is all operations).
+        name : str, optional
+            Only return entries whose contact name contains this text, ignoring case
+            (default is all entries).
+        start : datetime, optional
+            Only return entries logged at or after this time.
+        end : datetime, optional
+            Only return entries logged at or before this time.
+        page_size : int, optional
+            The number of entries per page (default is 50).
+
+        Returns:
+        --------
+        generator
+            Lists of up to page_size AuditEntry tuples.
+        """
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0 or limit == 0:
+            return
+
+        low = None if start is None else _time_key(start)
+        high = None if end is None else _time_key(end)
+        operation_bytes = None if operation is None else operation.encode('utf-8')
+        bit = None if operation is None else _operation_bit(operation_bytes)
+        needle = None if name is None else name.casefold()
+        filtered = low is not None or high is not None or operation is not None or name is not None
+
+        with open(self.path, 'rb') as log_file, \
+                mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            tail_start = self._refresh(buffer)
+            ranges = [(tail_start, buffer.rfind(b'\n', tail_start) + 1)]
+            for block_start, block_end, earliest, latest, mask in reversed(self._blocks):
+                if bit is not None and not mask & bit:
+                    continue
+                if (low is not None and latest < low) or (high is not None and earliest > high):
+                    continue
+                ranges.append((block_start, block_end))
+
+            page = []
+            returned = 0
+            for range_start, range_end in ranges:
+                for line in reversed(buffer[range_start:range_end].split(b'\n')[:-1]):
+                    match = _LINE.match(line)
+                    if match is None:
+                        if filtered:
+                            continue
+                        entry = AuditEntry(None, None, None, line.decode('utf-8', 'replace'))
+                    else:
+                        groups = match.groups()
+                        if operation_bytes is not None and groups[6] != operation_bytes:
+                            continue
+                        key = int(b''.join(groups[:6]))
+                        if (low is not None and key < low) or (high is not None and key > high):
+                            continue
+                        contact_name = None if groups[7] is None else groups[7].decode('utf-8', 'replace')
+                        if needle is not None and (contact_name is None or needle not in contact_name.casefold()):
+                            continue
+                        entry = AuditEntry(datetime(*map(int, groups[:6])), groups[6].decode('utf-8'),
+                                           contact_name, line.decode('utf-8', 'replace'))
+
+                    page.append(entry)
+                    returned += 1
+                    if returned == limit:
+                        yield page
+                        return
+                    if len(page) == page_size:
+                        yield page
+                        page = []
+            if page:
+                yield page
@@ -0,0 +1,343 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from auditHistory import AuditHistory
+from metrics import instrumented
+
+# The audit log file used when no other path is given
+DEFAULT_LOG_PATH = 'phonebook.log'
+
+
+class AuditLogger:
+    """
+    Writes audit records to a log file from a background thread, in batches.
+
+    Logging a record only puts it on a queue, so callers never wait for the disk. The
+    writer thread collects records until the batch is full or the flush interval has
+    passed, then writes the whole batch with a single write call. The log file is rotated
+    once it grows past a size limit, and pending records are flushed at interpreter exit.
+
+    A batch that cannot be written is dropped and the writer keeps running; the error is
+    raised by the next flush() or close(). Should the writer thread stop anyway, logging
+    raises instead of queuing records that would never be written.
+
+    Attributes:
+    -----------
+    path : str
+        The log file.
+    """
+
+    # Bytes written at the start of every new log file
+    FILE_HEADER = b''
+
+    def __init__(self, path=DEFAULT_LOG_PATH, batch_size=1000, flush_interval=1.0, fsync=False,
+                 max_bytes=None, backup_count=5):
+        """
+        Initializes a logger. The writer thread starts with the first record.
+
+        Parameters:
+        -----------
+        path : str, optional
+            The log file (default is DEFAULT_LOG_PATH).
+        batch_size : int, optional
+            Write as soon as this many records are waiting (default is 1000).
+        flush_interval : float, optional
+            Write waiting records at least this often, in seconds (default is 1.0).
+        fsync : bool, optional
+            Whether to fsync the file after every batch so it survives a power loss
+            (default is False).
+        max_bytes : int, optional
+            Rotate the file before it would grow past this size (default is None, never rotate).
+        backup_count : int, optional
+            The number of rotated files to keep as path.1, path.2, ... (default is 5).
+        """
+        self.path = path
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._fsync = fsync
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+        self._error = None  # The last write error, until flush() or close() raises it
+        self._timestamp_cache = (None, '')  # (whole second, formatted) of the last record
+
+    def _start(self):
+        """Starts the writer thread if it is not running yet."""
+        with self._start_lock:
+            if self._closed:
+                raise ValueError("The audit logger is closed.")
+            if self._thread is not None and not self._thread.is_alive():
+                raise RuntimeError("The audit log writer thread has stopped.") from self._error
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    @instrumented('audit.log')
+    def log(self, operation, contact=None):
+        """
+        Queues a record of an operation with an optional contact.
+
+        Parameters:
+        -----------
+        operation : str
+            The operation being logged (e.g., 'Add', 'Update', 'Delete').
+        contact : Contact, optional
+            The contact the operation was performed on (default is None).
+
+        Raises:
+        -------
+        ValueError
+            If the logger is closed.
+        RuntimeError
+            If the writer thread has stopped on an unexpected error.
+        """
+        if self._thread is None or self._closed or not self._thread.is_alive():
+            self._start()
+        names = None if contact is None else (contact.first_name, contact.last_name, contact.phone_key)
+        self._queue.put((time.time(), operation, names))
+
+    @instrumented('audit.log_many', size=None)
+    def log_many(self, operation, contacts):
+        """
+        Queues a record of the same operation for each of several contacts.
+
+        Parameters:
+        -----------
+        operation : str
+            The operation being logged (e.g., 'Add').
+        contacts : iterable of Contact
+            The contacts the operation was performed on.
+
+        Raises:
+        -------
+        ValueError
+            If the logger is closed.
+        RuntimeError
+            If the writer thread has stopped on an unexpected error.
+        """
+        if self._thread is None or self._closed or not self._thread.is_alive():
+            self._start()
+        now = time.time()
+        records = [(now, operation, (contact.first_name, contact.last_name, contact.phone_key))
+                   for contact in contacts]
+        if records:
+            self._queue.put(records)
+
+    def flush(self):
+        """
+        Blocks until every record queued so far has been written to the file.
+
+        Raises:
+        -------
+        Exception
+            The error a batch could not be written with since the last flush() or close(),
+            usually an OSError.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            done = threading.Event()
+            self._queue.put(done)
+            # Stop waiting if the writer thread ended without getting to the event
+            while not done.wait(0.5) and self._thread.is_alive():
+                pass
+        self._raise_error()
+
+    def close(self):
+        """
+        Writes the remaining records and stops the writer thread. Safe to call more than once.
+
+        Raises:
+        -------
+        Exception
+            The error a batch could not be written with since the last flush() or close(),
+            usually an OSError.
+        """
+        with self._start_lock:
+            if self._closed:
+                return
+            self._closed = True
+        atexit.unregister(self.close)  # So that a closed logger is not kept alive until exit
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        """Raises the last write error of the writer thread, if any, and forgets it."""
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    @instrumented('audit.history')
+    def history(self, limit=None, operation=None, name=None, start=None, end=None, page_size=50, phone=None):
+        """
+        Lazily yields pages of logged entries, newest first, optionally filtered.
+
+        See AuditHistory.pages for the parameters. Records still waiting in the queue are
+        written first.
+
+        Returns:
+        --------
+        generator
+            Lists of up to page_size AuditEntry tuples.
+
+        Raises:
+        -------
+        ValueError
+            If a phone filter is given, since text log lines do not record phone numbers.
+        """
+        if phone is not None:
+            raise ValueError("The text audit log does not record phone numbers; use BinaryAuditLogger.")
+        self.flush()
+        return AuditHistory(self.path).pages(limit, operation, name, start, end, page_size)
+
+    @instrumented('audit.lines')
+    def lines(self):
+        """
+        Returns every logged entry as a text line, oldest first.
+
+        Returns:
+        --------
+        list
+            The log lines, each ending with a newline.
+        """
+        self.flush()
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'r') as log_file:
+            return log_file.readlines()
+
+    def _format(self, record):
+        """Formats one record as a log line in the same layout as the original text log."""
+        created, operation, names = record
+        second = int(created)
+        if second != self._timestamp_cache[0]:
+            self._timestamp_cache = (second, datetime.fromtimestamp(second).strftime('%Y-%m-%d %H:%M:%S'))
+        timestamp = self._timestamp_cache[1]
+
+        if names is None:
+            return f'[{timestamp}] {operation} performed\n'
+        return f'[{timestamp}] {operation} performed on {names[0]} {names[1]}\n'
+
+    def _run(self):
+        """The writer thread: collects records into batches and writes them."""
+        log_file = None  # Opened by the first write
+        records = []
+        waiters = []
+        deadline = None
+        running = True
+
+        def take(item):
+            # Adds one queued item, a record, a list of records or a flush event, to the batch
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+            elif isinstance(item, list):
+                records.extend(item)
+            else:
+                records.append(item)
+
+        try:
+            while running:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = False  # The flush interval has passed
+
+                if item is None:
+                    running = False
+                    # Keep what was queued while close() was being called
+                    while not self._queue.empty():
+                        item = self._queue.get_nowait()
+                        if item is not None:
+                            take(item)
+                elif item is not False:
+                    take(item)
+
+                if records and deadline is None:
+                    deadline = time.monotonic() + self._flush_interval
+                if not running or waiters or len(records) >= self._batch_size or \
+                        (deadline is not None and time.monotonic() >= deadline):
+                    if records:
+                        try:
+                            data = self._encode([self._format(record) for record in records])
+                            log_file = self._write(log_file, data)
+                        except Exception as error:
+                            # The batch is lost; report it to the next flush() or close()
+                            self._error = error
+                            if log_file is not None:
+                                log_file.close()
+                            log_file = None
+                        records = []
+                    deadline = None
+                    for waiter in waiters:
+                        waiter.set()
+                    waiters = []
+        except BaseException as error:
+            self._error = error  # Raised by the next flush() or close(); logging now raises too
+            raise
+        finally:
+            # Never leave a flush() waiting, even if the thread ends on an unexpected error
+            for waiter in waiters:
+                waiter.set()
+            if log_file is not None:
+                log_file.close()
+
+    def _encode(self, lines):
+        """Encodes a batch of formatted records as the bytes to append to the file."""
+        # A lone surrogate, e.g. from JSON input, cannot be encoded and would lose the batch
+        return ''.join(lines).encode('utf-8', 'backslashreplace')
+
+    @instrumented('audit.write', size=None)
+    def _write(self, log_file, data):
+        """
+        Writes one batch, rotating the file first if it would grow too large.
+
+        Parameters:
+        -----------
+        log_file : file object or None
+            The open log file, or None to open it.
+        data : bytes
+            The batch.
+
+        Returns:
+        --------
+        file object
+            The open log file.
+        """
+        if log_file is None:
+            log_file = self._open()
+        if self._max_bytes is not None and log_file.tell() > 0 and log_file.tell() + len(data) > self._max_bytes:
+            log_file.close()
+            self._rotate()
+            log_file = self._open()
+
+        if log_file.tell() == 0:
+            data = self.FILE_HEADER + data
+        log_file.write(data)
+        log_file.flush()
+        if self._fsync:
+            os.fsync(log_file.fileno())
+        return log_file
+
+    def _open(self):
+        """Opens the log file for appending, positioned at its end."""
+        return open(self.path, 'ab')
+
+    def _rotate(self):
+        """Renames path to path.1, path.1 to path.2 and so on, dropping the oldest backup."""
+        if self._backup_count <= 0:
+            os.remove(self.path)
+            return
+        for number in range(self._backup_count - 1, 0, -1):
+            source = f'{self.path}.{number}'
+            if os.path.exists(source):
+                os.replace(source, f'{self.path}.{number + 1}')
+        os.replace(self.path, f'{self.path}.1')
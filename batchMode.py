@@ -0,0 +1,333 @@
+import csv
+import json
+import sys
+import time
+from datetime import datetime
+
+from contact import Contact
+from validation import validate_email
+
+# Operations a batch can contain
+OPERATIONS = ('add', 'update', 'delete', 'search')
+
+# Consecutive operations of the same kind applied to the phone book in one call
+DEFAULT_RUN_SIZE = 10_000
+
+
+def read_operations(stream, format='jsonl'):
+    """
+    Reads batch operations from a text stream.
+
+    In JSON Lines format every non-blank line is one JSON object. In CSV format the header
+    names the fields and every row is one operation; empty cells count as missing values.
+    Each operation has an "op" field (add, update, delete or search) plus its arguments:
+
+    - add: first_name, last_name, phone and optionally email and address
+    - update: phone, and any of first_name, last_name, new_phone, email and address
+    - delete: phone
+    - search: by (name, phone or timeframe, default name) and query, or start and end
+      (YYYY-MM-DD) for a timeframe search
+
+    Parameters:
+    -----------
+    stream : file object
+        The text stream to read from.
+    format : str, optional
+        'jsonl' or 'csv' (default is 'jsonl').
+
+    Returns:
+    --------
+    generator
+        (line_number, operation) pairs, where operation is a dict. A line that cannot be
+        parsed gives a dict with only an "error" field.
+    """
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {field: value for field, value in row.items() if value not in ('', None)}
+        return
+    if format != 'jsonl':
+        raise ValueError(f"Unknown batch format '{format}'. Use 'jsonl' or 'csv'.")
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            operation = json.loads(line)
+        except json.JSONDecodeError as error:
+            operation = {'error': f"Invalid JSON: {error.msg}"}
+        if not isinstance(operation, dict):
+            operation = {'error': "Each line must be a JSON object"}
+        yield line_number, operation
+
+
+def contact_record(contact):
+    """
+    Returns a contact as a JSON-serializable dict.
+
+    Parameters:
+    -----------
+    contact : Contact
+        The contact to convert.
+
+    Returns:
+    --------
+    dict
+        The contact's fields, with time_added in ISO 8601 format.
+    """
+    return {'first_name': contact.first_name, 'last_name': contact.last_name, 'phone': contact.phone,
+            'email': contact.email, 'address': contact.address, 'time_added': contact.time_added.isoformat()}
+
+
+class BatchReport:
+    """
+    A summary of a batch run.
+
+    Attributes:
+    -----------
+    applied : int
+        The number of operations that succeeded.
+    failed : int
+        The number of operations that were rejected.
+    seconds : float
+        The time taken to apply the operations.
+    """
+
+    def __init__(self):
+        """Initializes an empty report."""
+        self.applied = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+    def summary(self):
+        """
+        Returns a one-line summary of the run, including its throughput.
+
+        Returns:
+        --------
+        str
+            The number of applied and failed operations, and operations per second.
+        """
+        total = self.applied + self.failed
+        rate = total / self.seconds if self.seconds > 0 else float('inf')
+        return (f"Applied {self.applied} operations, {self.failed} failed, "
+                f"in {self.seconds:.2f} s ({rate:,.0f} operations per second).")
+
+
+class BatchRunner:
+    """
+    Applies a stream of operations to a phone book through its bulk methods.
+
+    Consecutive operations of the same kind are grouped into runs of up to run_size, and
+    each run is applied with one add_many, update_many or delete_many call and logged with
+    one log_many call. Runs are applied in stream order, so every operation sees the
+    effect of all operations before it. One JSON result line per operation is written to
+    the output as soon as its run has been applied.
+    """
+
+    def __init__(self, phone_book, output=None, run_size=DEFAULT_RUN_SIZE):
+        """
+        Initializes a runner.
+
+        Parameters:
+        -----------
+        phone_book : PhoneBook
+            The phone book to apply the operations to.
+        output : file object, optional
+            Where the result lines are written (default is sys.stdout).
+        run_size : int, optional
+            The most operations applied in one bulk call (default is DEFAULT_RUN_SIZE).
+        """
+        self.phone_book = phone_book
+        self.output = output if output is not None else sys.stdout
+        self.run_size = run_size
+        self.report = BatchReport()
+
+    def run(self, operations):
+        """
+        Applies every operation and reports the results.
+
+        Parameters:
+        -----------
+        operations : iterable of tuple
+            (line_number, operation) pairs, as produced by read_operations.
+
+        Returns:
+        --------
+        BatchReport
+            The number of applied and failed operations and the time taken.
+        """
+        started = time.perf_counter()
+        run, kind = [], None
+        for line_number, operation in operations:
+            op = operation.get('op')
+            if op != kind or len(run) >= self.run_size:
+                self._apply(kind, run)
+                run, kind = [], op
+            run.append((line_number, operation))
+        self._apply(kind, run)
+        self.output.flush()
+        self.report.seconds = time.perf_counter() - started
+        return self.report
+
+    def _emit(self, line_number, op, error=None, **extra):
+        """Writes the result line of one operation and counts it."""
+        result = {'line': line_number, 'op': op, 'ok': error is None}
+        if error is not None:
+            result['error'] = str(error).rstrip('.')
+            self.report.failed += 1
+        else:
+            self.report.applied += 1
+        result.update(extra)
+        self.output.write(json.dumps(result) + '\n')
+
+    def _apply(self, kind, run):
+        """Applies one run of operations of the same kind."""
+        if not run:
+            return
+        if kind == 'add':
+            self._add(run)
+        elif kind == 'update':
+            self._update(run)
+        elif kind == 'delete':
+            self._delete(run)
+        elif kind == 'search':
+            self._search(run)
+        else:
+            for line_number, operation in run:
+                error = operation.get('error') or f"Unknown operation '{kind}'; use one of {', '.join(OPERATIONS)}"
+                self._emit(line_number, kind, error)
+
+    def _add(self, run):
+        """Builds the contacts of a run of adds, rejecting invalid and duplicate ones, and adds the rest."""
+        results = []  # (line_number, contact or None, error)
+        keys = set()
+        for line_number, operation in run:
+            missing = [field for field in ('first_name', 'last_name', 'phone') if not operation.get(field)]
+            if missing:
+                results.append((line_number, None, f"Missing {', '.join(missing)}"))
+                continue
+            # JSON values may be numbers or other types; the phone book indexes text only
+            email, address = _text(operation.get('email')), _text(operation.get('address'))
+            if email is not None and not validate_email(email):
+                results.append((line_number, None, f"Invalid email format: {email}"))
+                continue
+            try:
+                contact = Contact(str(operation['first_name']), str(operation['last_name']), str(operation['phone']),
+                                  email, address)
+            except ValueError as error:
+                results.append((line_number, None, error))
+                continue
+            if contact.phone_key in keys:
+                results.append((line_number, None, f"Phone number {contact.phone} is already in use"))
+                continue
+            keys.add(contact.phone_key)
+            results.append((line_number, contact, None))
+
+        in_use = self.phone_book.phones_in_use(keys)
+        contacts = []
+        for position, (line_number, contact, error) in enumerate(results):
+            if contact is not None and contact.phone_key in in_use:
+                results[position] = (line_number, None, f"Phone number {contact.phone} is already in use")
+            elif contact is not None:
+                contacts.append(contact)
+
+        self.phone_book.add_many(contacts)
+        self.phone_book.log_many("Add", contacts)
+        for line_number, contact, error in results:
+            self._emit(line_number, 'add', error)
+
+    def _update(self, run):
+        """Applies a run of updates with one update_many call, rejecting those with an invalid email."""
+        changes = []
+        invalid = {}  # Position in the run -> error of an update that is not applied
+        for position, (_, operation) in enumerate(run):
+            fields = {field: _text(operation.get(field)) for field in ('first_name', 'last_name', 'email', 'address')}
+            fields['phone'] = _text(operation.get('new_phone'))
+            if fields['email'] is not None and not validate_email(fields['email']):
+                invalid[position] = ValueError(f"Invalid email format: {fields['email']}")
+                continue
+            changes.append((operation.get('phone'), fields))
+
+        applied = iter(self.phone_book.update_many(changes))
+        results = [invalid[position] if position in invalid else next(applied) for position in range(len(run))]
+        updated = [result for result in results if isinstance(result, Contact)]
+        self.phone_book.log_many("Update", updated)
+        for (line_number, operation), result in zip(run, results):
+            if result is None:
+                self._emit(line_number, 'update', f"No contact has phone number {operation.get('phone')}")
+            elif isinstance(result, ValueError):
+                self._emit(line_number, 'update', result)
+            else:
+                self._emit(line_number, 'update')
+
+    def _delete(self, run):
+        """Applies a run of deletes with one delete_many call."""
+        results = self.phone_book.delete_many([operation.get('phone') for _, operation in run])
+        self.phone_book.log_many("Delete", [contact for contact in results if contact is not None])
+        for (line_number, operation), contact in zip(run, results):
+            error = None if contact is not None else f"No contact has phone number {operation.get('phone')}"
+            self._emit(line_number, 'delete', error)
+
+    def _search(self, run):
+        """Runs each search of a run and logs every found contact with one log_many call."""
+        found = []
+        for line_number, operation in run:
+            by = operation.get('by', 'name')
+            if by == 'name':
+                results = self.phone_book.search_by_name(str(operation.get('query', '')))
+            elif by == 'phone':
+                results = self.phone_book.search_by_phone(str(operation.get('query', '')))
+            elif by == 'timeframe':
+                try:
+                    start, end = (datetime.strptime(operation[bound], "%Y-%m-%d") if operation.get(bound) else None
+                                  for bound in ('start', 'end'))
+                except (TypeError, ValueError):
+                    self._emit(line_number, 'search', "Invalid date format; use YYYY-MM-DD")
+                    continue
+                results = list(self.phone_book.search_by_timeframe(start, end))
+            else:
+                self._emit(line_number, 'search', f"Unknown search '{by}'; use name, phone or timeframe")
+                continue
+            found.extend(results)
+            self._emit(line_number, 'search', results=[contact_record(contact) for contact in results])
+        self.phone_book.log_many("Search", found)
+
+
+def _text(value):
+    """Returns an optional field value as text, or None for a missing or empty value."""
+    return str(value) if value else None
+
+
+def run_batch(phone_book, source, format=None, output=None, run_size=DEFAULT_RUN_SIZE):
+    """
+    Applies the operations in a file or stream to a phone book.
+
+    Parameters:
+    -----------
+    phone_book : PhoneBook
+        The phone book to apply the operations to.
+    source : str or file object
+        A file path, '-' for standard input, or an open text stream.
+    format : str, optional
+        'jsonl' or 'csv' (default is 'csv' for paths ending in .csv, otherwise 'jsonl').
+    output : file object, optional
+        Where the result lines are written (default is sys.stdout).
+    run_size : int, optional
+        The most operations applied in one bulk call (default is DEFAULT_RUN_SIZE).
+
+    Returns:
+    --------
+    BatchReport
+        The number of applied and failed operations and the time taken.
+    """
+    if format is None:
+        format = 'csv' if isinstance(source, str) and source.lower().endswith('.csv') else 'jsonl'
+    runner = BatchRunner(phone_book, output, run_size)
+
+    if source == '-':
+        return runner.run(read_operations(sys.stdin, format))
+    if not isinstance(source, str):
+        return runner.run(read_operations(source, format))
+    with open(source, 'r', encoding='utf-8', newline='') as stream:
+        return runner.run(read_operations(stream, format))
@@ -0,0 +1,121 @@
+"""
+Measures duplicate detection and merging on a large phone book with known duplicates.
+
+Contacts come from the deterministic generator in benchmarks/synthetic.py. A share of
+them is then copied under a new phone number, added a month later, with the kind of
+differences duplicates have in practice: two adjacent letters of a name swapped, the
+email dropped, or the address spelled out ("St" as "Street"). find_duplicates is timed on
+the whole set, and the injected copies it reports show its recall. The other pairs it
+reports are not necessarily wrong: the generator itself produces contacts with the same
+name and email. Finally the closest pairs are merged in a phone book, which is timed too.
+
+Run from the repository root:
+
+    python benchmarks/duplicates.py --count 1M
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auditLog import AuditLogger
+from contact import Contact
+from dedup import MAX_BLOCK, MERGE_THRESHOLD, SUGGEST_THRESHOLD, WINDOW, find_duplicates, group_duplicates, \
+    merge_duplicates
+from phoneBook import PhoneBook
+from suite import parse_size
+from synthetic import generate, phone_number
+
+
+def swap_letters(text, chooser):
+    """Swaps two adjacent letters of a text, the most common typing mistake."""
+    if len(text) < 3:
+        return text
+    position = chooser.randrange(len(text) - 1)
+    return text[:position] + text[position + 1] + text[position] + text[position + 2:]
+
+
+def with_duplicates(count, share, seed):
+    """
+    Generates contacts and appends altered copies of some of them.
+
+    Parameters:
+    -----------
+    count : int
+        The number of generated contacts.
+    share : float
+        The number of copies, as a share of count.
+    seed : int
+        The generator seed.
+
+    Returns:
+    --------
+    tuple
+        The list of every contact, and a dict from the phone key of each copy to the
+        phone key of the contact it copies.
+    """
+    contacts = list(generate(count, seed))
+    chooser = random.Random(seed)
+    copies = {}
+    for number in range(int(count * share)):
+        original = contacts[chooser.randrange(count)]
+        first_name, last_name = original.first_name, original.last_name
+        change = chooser.random()
+        if change < 0.3:
+            first_name = swap_letters(first_name, chooser)
+        elif change < 0.6:
+            last_name = swap_letters(last_name, chooser)
+        email = original.email if chooser.random() < 0.7 else None
+        address = original.address
+        if address and chooser.random() < 0.4:
+            address = address.replace(' St', ' Street').replace(' Ave', ' Avenue')
+        copy = Contact(first_name, last_name, phone_number(count + number), email, address,
+                       original.time_added + timedelta(days=30))
+        contacts.append(copy)
+        copies[copy.phone_key] = original.phone_key
+    return contacts, copies
+
+
+def main():
+    """Prints how long finding and merging the duplicates takes, and how many were found."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', default='200k', help="Number of contacts, e.g. 200k or 1M (default 200k).")
+    parser.add_argument('--share', type=float, default=0.01,
+                        help="Duplicates injected, as a share of the contacts (default 0.01).")
+    parser.add_argument('--max-block', type=int, default=MAX_BLOCK,
+                        help=f"Largest block compared pair by pair (default {MAX_BLOCK}).")
+    parser.add_argument('--window', type=int, default=WINDOW,
+                        help=f"Neighbours compared in larger blocks (default {WINDOW}).")
+    parser.add_argument('--seed', type=int, default=0, help="Generator seed (default 0).")
+    args = parser.parse_args()
+
+    contacts, copies = with_duplicates(parse_size(args.count), args.share, args.seed)
+    print(f"{len(contacts):,} contacts, {len(copies):,} of them injected duplicates")
+
+    started = time.perf_counter()
+    pairs = find_duplicates(contacts, SUGGEST_THRESHOLD, args.max_block, args.window)
+    elapsed = time.perf_counter() - started
+    found = sum(copies.get(pair.second.phone_key) == pair.first.phone_key for pair in pairs)
+    closest = [pair for pair in pairs if pair.score >= MERGE_THRESHOLD]
+    print(f"find_duplicates     {elapsed:>8.2f} s  {len(pairs):,} pairs, {len(closest):,} scoring at least "
+          f"{MERGE_THRESHOLD}")
+    print(f"injected found      {found / max(len(copies), 1):>8.1%}")
+
+    log_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'duplicates.log')
+    phone_book = PhoneBook(audit_logger=AuditLogger(log_path), cache_size=0)
+    phone_book.add_many(contacts)
+    started = time.perf_counter()
+    removed = merge_duplicates(phone_book, group_duplicates(closest))
+    elapsed = time.perf_counter() - started
+    print(f"merge_duplicates    {elapsed:>8.2f} s  {len(removed):,} contacts merged, {len(phone_book):,} left")
+    phone_book.close()
+    if os.path.exists(log_path):
+        os.remove(log_path)
+
+
+if __name__ == '__main__':
+    main()
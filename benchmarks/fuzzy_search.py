@@ -0,0 +1,93 @@
+"""
+Measures fuzzy name search latency against the exact substring search.
+
+Builds an in-memory phone book of synthetic contacts whose names are drawn from large
+vocabularies with a long-tailed distribution, then times name searches that contain one
+typo, at each edit distance.
+
+Run from the repository root:
+
+    python benchmarks/fuzzy_search.py --count 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contact import Contact
+from phoneBook import PhoneBook
+from storage import MAX_FUZZY_DISTANCE
+
+SYLLABLES = ['an', 'ber', 'cal', 'dor', 'el', 'fen', 'gar', 'hol', 'is', 'jo', 'ka', 'li', 'mar',
+             'no', 'or', 'pe', 'qui', 'ros', 'sa', 'ton', 'ul', 'vi', 'wen', 'xa', 'yor', 'zel']
+
+
+def vocabulary(chooser, size, syllables):
+    """Returns up to size distinct names made of a random number of syllables, in sorted order."""
+    return sorted({''.join(chooser.choice(SYLLABLES) for _ in range(chooser.randint(*syllables))).capitalize()
+                   for _ in range(size)})
+
+
+def generate(count, chooser):
+    """Returns count contacts whose names follow a long-tailed distribution."""
+    first_names = vocabulary(chooser, 6_000, (1, 3))
+    last_names = vocabulary(chooser, 120_000, (2, 4))
+    contacts = []
+    for number in range(count):
+        first_name = first_names[int(chooser.paretovariate(1.2)) % len(first_names)]
+        last_name = (last_names[int(chooser.paretovariate(0.8)) % len(last_names)] if chooser.random() < 0.5
+                     else chooser.choice(last_names))
+        contacts.append(Contact(first_name, last_name, f'{2000000000 + number:010d}'))
+    return contacts
+
+
+def typo(chooser, word):
+    """Returns the word with one character replaced."""
+    position = chooser.randrange(len(word))
+    return word[:position] + chooser.choice('aeiouxyz') + word[position + 1:]
+
+
+def time_queries(search, queries):
+    """Returns (mean, median, 99th percentile) latency in milliseconds and the mean number of results."""
+    latencies, found = [], 0
+    for query in queries:
+        started = time.perf_counter()
+        found += len(search(query))
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return (sum(latencies) / len(latencies), latencies[len(latencies) // 2],
+            latencies[int(len(latencies) * 0.99)], found / len(queries))
+
+
+def main():
+    """Prints the latency of each kind of name search."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=1_000_000, help="Number of contacts (default 1,000,000).")
+    parser.add_argument('--queries', type=int, default=500, help="Queries per kind of search (default 500).")
+    args = parser.parse_args()
+
+    chooser = random.Random(42)
+    contacts = generate(args.count, chooser)
+    phone_book = PhoneBook(cache_size=0)  # Time the searches themselves, not cache hits
+    started = time.perf_counter()
+    phone_book.add_many(contacts)
+    print(f"Indexed {args.count:,} contacts in {time.perf_counter() - started:.1f} s")
+
+    # Misspell names of actual contacts, so that most queries have an intended match
+    queries = [typo(chooser, chooser.choice(contacts).last_name.lower()) for _ in range(args.queries)]
+    searches = [("exact substring", phone_book.search_by_name)]
+    searches += [(f"fuzzy, distance {distance}",
+                  lambda query, distance=distance: phone_book.search_by_name_fuzzy(query, distance))
+                 for distance in range(1, MAX_FUZZY_DISTANCE + 1)]
+    for label, search in searches:
+        mean, median, p99, results = time_queries(search, queries)
+        print(f"{label:>18}: mean {mean:.2f} ms, median {median:.2f} ms, p99 {p99:.2f} ms, "
+              f"{results:,.0f} results on average")
+    phone_book.close()
+
+
+if __name__ == '__main__':
+    main()
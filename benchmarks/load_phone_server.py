@@ -0,0 +1,206 @@
+"""
+Generates load against the phone book HTTP server with thousands of concurrent clients.
+
+Starts a server in a separate process (or targets a running one with --address), seeds
+it with contacts, then opens --clients keep-alive connections at once. Each client sends
+--requests requests, --pipeline at a time without waiting for the responses in between:
+mostly lookups by phone number, plus phone number searches, updates and adds. Prints the
+throughput, latency percentiles and any failed requests.
+
+Run from the repository root:
+
+    python benchmarks/load_phone_server.py --clients 2000 --requests 50 --pipeline 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'William', 'Elizabeth']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez']
+
+
+def phone(number):
+    """Returns the phone number of the number-th seeded contact, as URL-safe digits."""
+    return f'{2000000000 + number:010d}'
+
+
+def raise_file_limit():
+    """Raises the open file limit as far as allowed, since every client holds a socket."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def encode(method, path, body=None):
+    """Returns one HTTP/1.1 request as bytes."""
+    payload = b'' if body is None else json.dumps(body).encode('utf-8')
+    head = f"{method} {path} HTTP/1.1\r\nHost: phonebook\r\nContent-Length: {len(payload)}\r\n"
+    if payload:
+        head += "Content-Type: application/json\r\n"
+    return head.encode('latin-1') + b'\r\n' + payload
+
+
+async def read_response(reader):
+    """Reads one response and returns (status, body bytes), handling chunked bodies."""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ')[1])
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding') == 'chunked':
+        parts = []
+        while True:
+            size = int((await reader.readuntil(b'\r\n'))[:-2], 16)
+            parts.append(await reader.readexactly(size + 2))
+            if size == 0:
+                return status, b''.join(part[:-2] for part in parts)
+    return status, await reader.readexactly(int(headers.get('content-length', 0)))
+
+
+async def request(address, method, path, body=None):
+    """Sends a single request on a new connection and returns (status, decoded JSON body)."""
+    reader, writer = await asyncio.open_connection(*address)
+    writer.write(encode(method, path, body))
+    status, payload = await read_response(reader)
+    writer.close()
+    return status, json.loads(payload)
+
+
+async def seed(address, count):
+    """Adds count contacts, a thousand per request, unless a previous run already did."""
+    status, _ = await request(address, 'GET', f'/contacts/{phone(count - 1)}')
+    if status == 200:
+        return
+    for start in range(0, count, 1000):
+        contacts = [{'first_name': FIRST_NAMES[number % 10], 'last_name': LAST_NAMES[number // 10 % 10],
+                     'phone': phone(number), 'email': f'user{number}@example.com'}
+                    for number in range(start, min(count, start + 1000))]
+        status, body = await request(address, 'POST', '/contacts', contacts)
+        if status != 201:
+            raise RuntimeError(f"Seeding failed: {status} {body}")
+
+
+async def client(address, number, seeded, requests, pipeline, latencies, failures):
+    """Sends requests on one keep-alive connection, pipeline at a time."""
+    chooser = random.Random(number)
+    try:
+        reader, writer = await asyncio.open_connection(*address)
+    except OSError as error:
+        failures.append(f"connect: {error}")
+        return
+    try:
+        sent = 0
+        while sent < requests:
+            batch = []
+            for _ in range(min(pipeline, requests - sent)):
+                roll = chooser.random()
+                if roll < 0.7:
+                    batch.append(encode('GET', f'/contacts/{phone(chooser.randrange(seeded))}'))
+                elif roll < 0.85:
+                    batch.append(encode('GET', f'/contacts?phone={phone(chooser.randrange(seeded))[:8]}'))
+                elif roll < 0.95:
+                    batch.append(encode('PATCH', f'/contacts/{phone(chooser.randrange(seeded))}',
+                                        {'address': f'{chooser.randrange(1000)} Main St'}))
+                else:
+                    new = seeded + number * requests + sent + len(batch)
+                    batch.append(encode('POST', '/contacts', {'first_name': 'Load', 'last_name': 'Test',
+                                                               'phone': phone(new)}))
+            started = time.perf_counter()
+            writer.write(b''.join(batch))
+            for _ in batch:
+                status, _ = await read_response(reader)
+                latencies.append(time.perf_counter() - started)
+                if status >= 400:
+                    failures.append(f"HTTP {status}")
+            sent += len(batch)
+    except (OSError, asyncio.IncompleteReadError) as error:
+        failures.append(f"connection: {error!r}")
+    finally:
+        writer.close()
+
+
+async def run(address, clients, requests, pipeline, seeded):
+    """Runs every client at once and prints the results."""
+    print(f"Seeding {seeded:,} contacts...")
+    await seed(address, seeded)
+
+    latencies, failures = [], []
+    print(f"Running {clients:,} clients x {requests} requests, pipeline depth {pipeline}...")
+    started = time.perf_counter()
+    await asyncio.gather(*(client(address, number, seeded, requests, pipeline, latencies, failures)
+                           for number in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000 if latencies else 0.0
+
+    print(f"{len(latencies):,} responses in {elapsed:.2f} s ({len(latencies) / elapsed:,.0f} requests per second)")
+    print(f"Latency ms: p50 {percentile(0.5):.1f}, p90 {percentile(0.9):.1f}, "
+          f"p99 {percentile(0.99):.1f}, max {percentile(1.0):.1f}")
+    print(f"Failures: {len(failures)}" + (f" (first: {failures[0]})" if failures else ""))
+    return not failures
+
+
+def start_server():
+    """Starts `main.py --serve` on a free port and waits until it accepts connections."""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'main.py'), '--serve', f'127.0.0.1:{port}'],
+                               cwd=ROOT, stdin=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, ('127.0.0.1', port)
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("The server did not start")
+
+
+def main():
+    """Parses the options, runs the load and exits non-zero if any request failed."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=2000, help="Concurrent connections (default 2000).")
+    parser.add_argument('--requests', type=int, default=50, help="Requests per connection (default 50).")
+    parser.add_argument('--pipeline', type=int, default=4, help="Requests sent before reading responses (default 4).")
+    parser.add_argument('--contacts', type=int, default=20_000, help="Contacts to seed (default 20,000).")
+    parser.add_argument('--address', metavar='HOST:PORT', help="Target a running server instead of starting one.")
+    args = parser.parse_args()
+
+    limit = raise_file_limit()  # Raised before starting the server, which inherits it
+    if args.clients + 100 > limit:
+        parser.error(f"--clients is limited to {limit - 100} by the open file limit")
+
+    process = None
+    if args.address:
+        host, _, port = args.address.rpartition(':')
+        address = (host or '127.0.0.1', int(port))
+    else:
+        process, address = start_server()
+    try:
+        ok = asyncio.run(run(address, args.clients, args.requests, args.pipeline, args.contacts))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Measures the memory used per contact by each way of storing contacts.
+
+Run from the repository root:
+
+    python benchmarks/memory_per_contact.py --count 1000000
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contact import Contact
+from phoneBook import PhoneBook
+from storage import ColumnarBackend, MemoryBackend
+
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'William', 'Elizabeth']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez']
+
+
+class DictContact(Contact):
+    """A Contact with a per-instance __dict__, laid out like contacts were before __slots__."""
+
+
+def generate(count, contact_class=Contact):
+    """Yields count distinct contacts with realistic field values."""
+    start = datetime(2020, 1, 1)
+    for number in range(count):
+        first_name = FIRST_NAMES[number % len(FIRST_NAMES)]
+        last_name = LAST_NAMES[number // len(FIRST_NAMES) % len(LAST_NAMES)]
+        digits = f'{2000000000 + number:010d}'
+        yield contact_class(first_name, last_name, f'({digits[:3]}) {digits[3:6]}-{digits[6:]}',
+                            f'{first_name.lower()}.{number}@example.com', f'{number} Main St',
+                            start + timedelta(seconds=number))
+
+
+def measure(build):
+    """Returns the bytes still allocated by the object that build() returns."""
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main():
+    """Prints the bytes per contact for each layout."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=1_000_000, help="Number of contacts (default 1,000,000).")
+    count = parser.parse_args().count
+
+    layouts = [
+        ("Contact objects with __dict__ (before)", lambda: list(generate(count, DictContact))),
+        ("Contact objects with __slots__", lambda: list(generate(count))),
+        ("PhoneBook, MemoryBackend (all indexes)", lambda: _phone_book(MemoryBackend(), count)),
+        ("PhoneBook, ColumnarBackend", lambda: _phone_book(ColumnarBackend(), count)),
+    ]
+    print(f"{'Layout':<42}{'Bytes per contact':>18}")
+    for name, build in layouts:
+        print(f"{name:<42}{measure(build) / count:>18.1f}")
+
+
+def _phone_book(backend, count):
+    """Builds a phone book on the given backend holding count contacts."""
+    phone_book = PhoneBook(backend)
+    batch = []
+    for contact in generate(count):
+        batch.append(contact)
+        if len(batch) == 100_000:
+            phone_book.add_many(batch)
+            batch = []
+    phone_book.add_many(batch)
+    return phone_book
+
+
+if __name__ == "__main__":
+    main()
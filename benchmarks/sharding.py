@@ -0,0 +1,147 @@
+"""
+Measures how a ShardedPhoneBook scales with the number of shards.
+
+For each shard count, a sharded phone book is filled from the deterministic generator in
+benchmarks/synthetic.py and the same workload is timed: the bulk load, name searches that
+every shard answers (a first page and the whole result), a full sort and group_by, and
+phone lookups from several client threads at once, each routed to a single shard. The
+speedup over one shard is printed next to each time. A plain PhoneBook is timed too, to
+show what the inter-process calls cost.
+
+Near-linear scaling needs at least as many free cores as shards. Fan-out queries scale
+best with the columnar backend, whose searches scan every row, and with results small
+enough that copying them between processes does not dominate.
+
+Run from the repository root:
+
+    python benchmarks/sharding.py --count 1000000 --shards 1,2,4,8 --backend columnar
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auditLog import AuditLogger
+from phoneBook import PhoneBook
+from shardedPhoneBook import PARTITIONS, ShardedPhoneBook
+from suite import BACKENDS, parse_size
+from synthetic import generate
+
+
+def timed(function, arguments):
+    """Calls function once per argument tuple and returns the mean duration in milliseconds."""
+    started = time.perf_counter()
+    for args in arguments:
+        function(*args)
+    return (time.perf_counter() - started) / len(arguments) * 1000
+
+
+def lookups_per_second(phone_book, phones, threads):
+    """Looks every phone number up, split across client threads, and returns the lookups per second."""
+    parts = [phones[start::threads] for start in range(threads)]
+    workers = [threading.Thread(target=lambda part=part: [phone_book.get_by_phone(phone) for phone in part])
+               for part in parts]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return len(phones) / (time.perf_counter() - started)
+
+
+def run(phone_book, count, seed, queries, threads):
+    """
+    Fills a phone book and times the workload on it.
+
+    Parameters:
+    -----------
+    phone_book : PhoneBook or ShardedPhoneBook
+        An empty phone book.
+    count : int
+        The number of contacts.
+    seed : int
+        The generator seed.
+    queries : int
+        The number of calls per query type; full scans are called less often.
+    threads : int
+        The number of client threads for the lookups.
+
+    Returns:
+    --------
+    dict
+        Workload name -> mean milliseconds per call, or lookups per second for 'lookups/s'.
+    """
+    contacts = list(generate(count, seed))
+    results = {}
+    started = time.perf_counter()
+    phone_book.add_many(contacts)
+    results['add_many'] = (time.perf_counter() - started) * 1000
+
+    chooser = random.Random(seed)
+    samples = [contacts[chooser.randrange(count)] for _ in range(queries)]
+    del contacts
+    full_scans = [()] * max(1, queries // 20)
+    results['search_by_name_page'] = timed(lambda query: phone_book.search_by_name(query, limit=20),
+                                           [(contact.last_name[:4],) for contact in samples])
+    results['search_by_name'] = timed(phone_book.search_by_name, [(contact.last_name,) for contact in samples[:50]])
+    results['sort_page'] = timed(lambda: phone_book.sort('last_name', limit=20), [()] * queries)
+    results['sort'] = timed(phone_book.sort, full_scans)
+    results['group_by'] = timed(phone_book.group_by, full_scans)
+    results['lookups/s'] = lookups_per_second(phone_book, [contact.phone for contact in samples * 20], threads)
+    return results
+
+
+def main():
+    """Prints the workload timings for a plain phone book and each shard count."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', default='200k', help="Number of contacts, e.g. 200k or 1M (default 200k).")
+    parser.add_argument('--shards', default='1,2,4', help="Comma-separated shard counts (default 1,2,4).")
+    parser.add_argument('--backend', choices=['memory', 'columnar'], default='memory',
+                        help="Storage backend of each shard (default memory).")
+    parser.add_argument('--partition', choices=PARTITIONS, default='hash', help="How contacts are assigned "
+                                                                                "to shards (default hash).")
+    parser.add_argument('--queries', type=int, default=200, help="Calls per query type (default 200).")
+    parser.add_argument('--threads', type=int, default=8, help="Client threads for the lookups (default 8).")
+    parser.add_argument('--seed', type=int, default=0, help="Generator seed (default 0).")
+    args = parser.parse_args()
+
+    count = parse_size(args.count)
+    backend = BACKENDS[args.backend]
+    log_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sharding.log')
+    print(f"{count:,} contacts, {args.backend} backend, {os.cpu_count()} CPUs")
+
+    runs = []
+    phone_book = PhoneBook(backend(), AuditLogger(log_path), cache_size=0)
+    runs.append(("PhoneBook", run(phone_book, count, args.seed, args.queries, args.threads)))
+    phone_book.close()
+    for shards in [int(value) for value in args.shards.split(',')]:
+        # Caching is off so that repeated queries are answered by the shards every time
+        phone_book = ShardedPhoneBook(shards, args.partition, backend, AuditLogger(log_path), cache_size=0)
+        try:
+            runs.append((f"{shards} shard{'s' if shards > 1 else ''}",
+                         run(phone_book, count, args.seed, args.queries, args.threads)))
+        finally:
+            phone_book.close()
+    if os.path.exists(log_path):
+        os.remove(log_path)
+
+    # Speedups are relative to the first sharded run, so they show the scaling itself
+    baseline = runs[1][1] if len(runs) > 1 else runs[0][1]
+    print(f"\n{'':<20}" + ''.join(f"{label:>20}" for label, _ in runs))
+    for name in runs[0][1]:
+        cells = []
+        for _, results in runs:
+            value = results[name]
+            if name == 'lookups/s':
+                cells.append(f"{value:>11,.0f} ({value / baseline[name]:.1f}x)")
+            else:
+                cells.append(f"{value:>9.2f} ms ({baseline[name] / value:.1f}x)")
+        print(f"{name:<20}" + ''.join(f"{cell:>20}" for cell in cells))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Tracks how long the application takes to import, using python -X importtime.
+
+Each run imports main in a fresh interpreter with -X importtime and reads the per-module
+timings it prints. The median over the runs is reported for the whole import and for the
+modules that take longest, including everything they import in turn. Heavy dependencies
+such as pandas are expected to be absent: they are loaded only when first needed.
+
+The results are written as JSON. --compare reads two result files and flags a slower
+total, or a module that became slow, exiting non-zero if either happened.
+
+Run from the repository root:
+
+    python benchmarks/startup.py --output startup.json
+    python benchmarks/startup.py --compare baseline.json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from suite import metadata
+
+# Modules whose presence at startup is reported, as they should only be loaded on demand
+HEAVY_MODULES = ['pandas', 'numpy', 'asyncio', 'cProfile']
+
+
+def import_times(module):
+    """
+    Imports a module in a fresh interpreter and returns what -X importtime reported.
+
+    Parameters:
+    -----------
+    module : str
+        The module to import, e.g. 'main'.
+
+    Returns:
+    --------
+    dict
+        Imported module name -> cumulative import time in microseconds, including the
+        modules it imported.
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+    times = {}
+    for line in process.stderr.splitlines():
+        # Lines look like "import time:       635 |     439084 | pandas", nested names indented
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(module, runs, top):
+    """
+    Imports a module several times and summarizes the timings.
+
+    Parameters:
+    -----------
+    module : str
+        The module to import.
+    runs : int
+        The number of fresh interpreters to import it in.
+    top : int
+        The number of slowest modules to report.
+
+    Returns:
+    --------
+    dict
+        The median total import time in milliseconds, the median time of the slowest
+        modules, the number of modules imported and which heavy modules were loaded.
+    """
+    samples = [import_times(module) for _ in range(runs)]
+    medians = {name: statistics.median(sample.get(name, 0) for sample in samples) / 1000
+               for name in samples[0]}
+    total = medians.pop(module)
+    slowest = sorted(medians.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {'module': module, 'runs': runs, 'total_ms': total,
+            'min_total_ms': min(sample[module] for sample in samples) / 1000,
+            'modules_imported': len(samples[0]),
+            'heavy_modules': [name for name in HEAVY_MODULES if name in samples[0]],
+            'slowest_ms': dict(slowest)}
+
+
+def compare(baseline, current, threshold, min_delta_ms):
+    """
+    Prints how the import time changed between two runs.
+
+    Parameters:
+    -----------
+    baseline : dict
+        The earlier run, as written by this script.
+    current : dict
+        The later run.
+    threshold : float
+        The relative slowdown that counts as a regression, e.g. 0.2 for 20%.
+    min_delta_ms : float
+        Slowdowns smaller than this many milliseconds are ignored as noise.
+
+    Returns:
+    --------
+    int
+        The number of regressions.
+    """
+    old, new = baseline['result'], current['result']
+    change = (new['total_ms'] - old['total_ms']) / old['total_ms'] if old['total_ms'] else 0.0
+    regressions = int(change > threshold and new['total_ms'] - old['total_ms'] > min_delta_ms)
+    print(f"import {new['module']}: {old['total_ms']:.1f} ms -> {new['total_ms']:.1f} ms  {change:+.1%}  "
+          f"{'REGRESSION' if regressions else ''}")
+    print(f"modules imported: {old['modules_imported']} -> {new['modules_imported']}")
+    for name in new['heavy_modules']:
+        if name not in old['heavy_modules']:
+            print(f"  {name} is now loaded at startup  REGRESSION")
+            regressions += 1
+    for name, milliseconds in new['slowest_ms'].items():
+        before = old['slowest_ms'].get(name)
+        if before is None:
+            print(f"  {name:<40} {'new':>10} -> {milliseconds:>8.1f} ms")
+        elif milliseconds - before > min_delta_ms and before and (milliseconds - before) / before > threshold:
+            print(f"  {name:<40} {before:>10.1f} -> {milliseconds:>8.1f} ms")
+    print(f"\n{regressions} regression(s)")
+    return regressions
+
+
+def main():
+    """Measures the import time, or compares two result files."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', default='main', help="The module to import (default main).")
+    parser.add_argument('--runs', type=int, default=10, help="Fresh interpreters to import it in (default 10).")
+    parser.add_argument('--top', type=int, default=15, help="Slowest modules to report (default 15).")
+    parser.add_argument('--output', default='-', help="Where to write the JSON results (default stdout).")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help="Compare two result files instead of measuring.")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Relative slowdown flagged as a regression (default 0.2).")
+    parser.add_argument('--min-delta-ms', type=float, default=5.0,
+                        help="Ignore slowdowns smaller than this, in milliseconds (default 5).")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as baseline_file, open(args.compare[1]) as current_file:
+            baseline, current = json.load(baseline_file), json.load(current_file)
+        sys.exit(1 if compare(baseline, current, args.threshold, args.min_delta_ms) else 0)
+
+    meta = metadata(None, args.runs)
+    del meta['seed'], meta['repeat']  # Benchmark suite settings that do not apply here
+    output = {'meta': meta, 'result': measure(args.module, args.runs, args.top)}
+    text = json.dumps(output, indent=2)
+    if args.output == '-':
+        print(text)
+    else:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
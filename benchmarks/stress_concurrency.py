@@ -0,0 +1,197 @@
+"""
+Stress-tests ConcurrentPhoneBook with concurrent reader and writer threads.
+
+Writers add, rename and delete contacts while readers search. Every write and every read
+is recorded with the version it saw; afterwards the writes are replayed one at a time on
+a fresh PhoneBook and every read is checked against the state at its version, which is
+exactly what a serial execution would have returned. A second phase has writers rename
+contacts so that first and last name are always equal, while readers check that no
+returned contact ever mixes an old and a new name.
+
+Run from the repository root:
+
+    python benchmarks/stress_concurrency.py --readers 8 --writers 4 --seconds 5
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from concurrentPhoneBook import ConcurrentPhoneBook
+from contact import Contact
+from phoneBook import PhoneBook
+from storage import ColumnarBackend, MemoryBackend, SQLiteBackend
+
+NAMES = ['Ada', 'Alan', 'Grace', 'Linus', 'Barbara', 'Edsger', 'Donald', 'Margaret']
+PHONES = 500  # Size of the phone number pool writers draw from
+ADDED = datetime(2024, 1, 1)  # Fixed so that replayed contacts compare equal
+WRITE_PAUSE = 0.0005  # Seconds each writer waits between writes, so readers get a turn
+
+
+def phone(number):
+    """Returns the formatted phone number for a number in the pool."""
+    return f'(555) 100-{number:04d}'
+
+
+def apply(phone_book, operation):
+    """Applies one recorded write operation to a phone book."""
+    kind, number, name = operation
+    try:
+        if kind == 'add':
+            phone_book.add(Contact(name, name, phone(number), time_added=ADDED))
+        elif kind == 'update':
+            phone_book.update(phone(number), first_name=name, last_name=name)
+        else:
+            phone_book.delete(phone(number))
+    except ValueError:
+        pass  # The phone number was in use; a serial run rejects it the same way
+
+
+def query(phone_book, kind, text):
+    """Runs one read and returns its result in a comparable form."""
+    if kind == 'name':
+        found = phone_book.search_by_name(text)
+    elif kind == 'phone':
+        found = phone_book.search_by_phone(text)
+    else:
+        contact = phone_book.get_by_phone(phone(int(text)))
+        found = [] if contact is None else [contact]
+    return sorted((contact.first_name, contact.last_name, contact.phone_key) for contact in found)
+
+
+def linearizability(make_backend, readers, writers, seconds):
+    """
+    Runs the recorded workload and returns (writes, reads, final reads, mismatches), where
+    final reads are those taken after the last write.
+    """
+    shared = ConcurrentPhoneBook(PhoneBook(make_backend()))
+    writes = {}  # version -> operation
+    reads = defaultdict(list)  # version -> [(kind, text, result)]
+    stop_writing = threading.Event()
+    stop = threading.Event()
+
+    def write(seed):
+        chooser = random.Random(seed)
+        while not stop_writing.is_set():
+            operation = (chooser.choice(['add', 'add', 'update', 'delete']), chooser.randrange(PHONES),
+                         chooser.choice(NAMES))
+            with shared.writing() as (phone_book, version):
+                apply(phone_book, operation)
+                writes[version] = operation
+            time.sleep(WRITE_PAUSE)
+
+    def read(seed):
+        chooser = random.Random(seed)
+        recorded = []
+        while not stop.is_set():
+            kind = chooser.choice(['name', 'phone', 'get'])
+            text = {'name': lambda: chooser.choice(NAMES)[:3].lower(),
+                    'phone': lambda: f'{chooser.randrange(100):02d}',
+                    'get': lambda: str(chooser.randrange(PHONES))}[kind]()
+            with shared.reading() as (phone_book, version):
+                recorded.append((version, kind, text, query(phone_book, kind, text)))
+        for version, kind, text, result in recorded:
+            reads[version].append((kind, text, result))
+
+    writer_threads = [threading.Thread(target=write, args=(seed,)) for seed in range(writers)]
+    reader_threads = [threading.Thread(target=read, args=(1000 + seed,)) for seed in range(readers)]
+    for thread in writer_threads + reader_threads:
+        thread.start()
+    time.sleep(seconds)
+    # Keep reading for a moment after the last write, so that reads of the final state are checked too
+    stop_writing.set()
+    for thread in writer_threads:
+        thread.join()
+    time.sleep(min(seconds / 10, 0.1))
+    stop.set()
+    for thread in reader_threads:
+        thread.join()
+    last = shared.version  # Read before close, which counts as a write itself
+    shared.close()
+
+    # Replay the writes in version order, up to and including the last one, and check each
+    # read against the serial state
+    serial = PhoneBook(make_backend())
+    mismatches = 0
+    for version in range(last + 1):
+        if version:
+            apply(serial, writes[version])
+        for kind, text, result in reads.get(version, ()):
+            if query(serial, kind, text) != result:
+                mismatches += 1
+    serial.close()
+    return len(writes), sum(map(len, reads.values())), len(reads.get(last, ())), mismatches
+
+
+def torn_reads(make_backend, readers, writers, seconds):
+    """Renames contacts concurrently and returns (reads, contacts checked, torn contacts)."""
+    shared = ConcurrentPhoneBook(PhoneBook(make_backend()))
+    shared.add_many(Contact('Ada', 'Ada', phone(number), time_added=ADDED) for number in range(PHONES))
+    stop = threading.Event()
+    counts = defaultdict(int)
+    counts_lock = threading.Lock()
+
+    def write(seed):
+        chooser = random.Random(seed)
+        while not stop.is_set():
+            name = chooser.choice(NAMES)
+            shared.update(phone(chooser.randrange(PHONES)), first_name=name, last_name=name)
+            time.sleep(WRITE_PAUSE)
+
+    def read(seed):
+        chooser = random.Random(seed)
+        reads = checked = torn = 0
+        while not stop.is_set():
+            if chooser.random() < 0.5:
+                found = shared.search_by_name(chooser.choice(NAMES)[:2])
+            else:
+                found = [contact for group in shared.group_by('last_name').values() for contact in group]
+            reads += 1
+            checked += len(found)
+            torn += sum(contact.first_name != contact.last_name for contact in found)
+        with counts_lock:
+            counts['reads'] += reads
+            counts['checked'] += checked
+            counts['torn'] += torn
+
+    threads = [threading.Thread(target=write, args=(seed,)) for seed in range(writers)]
+    threads += [threading.Thread(target=read, args=(1000 + seed,)) for seed in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    shared.close()
+    return counts['reads'], counts['checked'], counts['torn']
+
+
+def main():
+    """Runs both checks against each storage backend and exits non-zero on any violation."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--readers', type=int, default=8, help="Reader threads (default 8).")
+    parser.add_argument('--writers', type=int, default=4, help="Writer threads (default 4).")
+    parser.add_argument('--seconds', type=float, default=2.0, help="Duration of each run (default 2).")
+    args = parser.parse_args()
+
+    backends = [('memory', MemoryBackend), ('columnar', ColumnarBackend), ('sqlite', SQLiteBackend)]
+    failed = False
+    for label, make_backend in backends:
+        writes, reads, final_reads, mismatches = linearizability(make_backend, args.readers, args.writers,
+                                                                 args.seconds)
+        print(f"{label:>8}: {writes:,} writes, {reads:,} reads ({final_reads:,} after the last write) checked "
+              f"against serial replay, {mismatches} mismatches")
+        reads, checked, torn = torn_reads(make_backend, args.readers, args.writers, args.seconds)
+        print(f"{label:>8}: {reads:,} snapshot reads of {checked:,} contacts, {torn} torn")
+        failed = failed or mismatches or torn
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
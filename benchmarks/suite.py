@@ -0,0 +1,267 @@
+"""
+Times every PhoneBook operation on synthetic phone books of increasing size.
+
+For each size and storage backend, a phone book is filled from the deterministic
+generator in benchmarks/synthetic.py, then every operation is timed: add, get_by_phone,
+each search_* method, a first page of sort, sort, group_by, update and delete, plus the
+audit log (log and get_history) and the CSV import path used by main.add_contact. The
+query cache is disabled so that repeated runs measure the operations themselves.
+
+The results are written as JSON. --compare reads two result files and flags every
+operation whose median time grew by more than --threshold, exiting non-zero if any did.
+
+Run from the repository root:
+
+    python benchmarks/suite.py --sizes 10k,100k,1M --output results.json
+    python benchmarks/suite.py --compare baseline.json results.json
+
+Sizes of 10M contacts need tens of gigabytes of memory with the in-memory backend.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from auditLog import AuditLogger
+from csvImport import import_file
+from phoneBook import PhoneBook
+from storage import ColumnarBackend, MemoryBackend, SQLiteBackend
+from synthetic import generate, write_csv
+
+BACKENDS = {'memory': MemoryBackend, 'columnar': ColumnarBackend, 'sqlite': SQLiteBackend}
+SUFFIXES = {'k': 1_000, 'm': 1_000_000}
+
+
+def parse_size(text):
+    """Parses a size such as 10000, 10k or 1M."""
+    text = text.strip().lower()
+    if text[-1:] in SUFFIXES:
+        return int(float(text[:-1]) * SUFFIXES[text[-1]])
+    return int(text)
+
+
+def summarize(seconds):
+    """Returns the statistics of a list of per-call durations, in milliseconds."""
+    ordered = sorted(seconds)
+    count = len(ordered)
+    return {'calls': count,
+            'total_ms': sum(ordered) * 1000,
+            'mean_ms': sum(ordered) / count * 1000,
+            'median_ms': ordered[count // 2] * 1000,
+            'p95_ms': ordered[min(count - 1, int(count * 0.95))] * 1000,
+            'min_ms': ordered[0] * 1000,
+            'max_ms': ordered[-1] * 1000}
+
+
+def timed(function, arguments):
+    """Calls function once per argument tuple and returns the statistics of the calls."""
+    durations = []
+    for args in arguments:
+        started = time.perf_counter()
+        function(*args)
+        durations.append(time.perf_counter() - started)
+    return summarize(durations)
+
+
+def consume(iterable):
+    """Reads a lazily produced result to the end, so that producing it is what gets timed."""
+    for _ in iterable:
+        pass
+
+
+def run_size(make_backend, size, repeat, seed, directory):
+    """
+    Builds one phone book and times every operation on it.
+
+    Parameters:
+    -----------
+    make_backend : callable
+        Returns a new storage backend.
+    size : int
+        The number of contacts.
+    repeat : int
+        The base number of calls per operation; cheap operations are called more often,
+        and full scans less.
+    seed : int
+        The generator seed.
+    directory : str
+        A scratch directory for the audit log and the CSV file.
+
+    Returns:
+    --------
+    dict
+        Operation name -> statistics.
+    """
+    chooser = random.Random(seed)
+    results = {}
+    log_path = os.path.join(directory, 'phonebook.log')
+    phone_book = PhoneBook(make_backend(), AuditLogger(log_path), cache_size=0)
+
+    # The last repeat contacts are kept back for the add benchmark
+    contacts = list(generate(size + repeat, seed))
+    contacts, extra = contacts[:size], contacts[size:]
+    gc.collect()
+    started = time.perf_counter()
+    phone_book.add_many(contacts)
+    results['add_many'] = summarize([time.perf_counter() - started])
+    results['add_many']['contacts_per_s'] = size / results['add_many']['total_ms'] * 1000
+
+    # Queries drawn from the stored contacts, so that most of them find something
+    samples = [contacts[chooser.randrange(size)] for _ in range(repeat)]
+    del contacts
+
+    results['add'] = timed(phone_book.add, [(contact,) for contact in extra])
+    results['get_by_phone'] = timed(phone_book.get_by_phone, [(contact.phone,) for contact in samples * 10])
+    results['search_by_name'] = timed(phone_book.search_by_name,
+                                      [(contact.last_name[:chooser.randint(3, 6)],) for contact in samples])
+    results['search_by_name_page'] = timed(lambda query: phone_book.search_by_name(query, limit=20),
+                                           [(contact.last_name[:3],) for contact in samples])
+    results['search_by_name_fuzzy'] = timed(phone_book.search_by_name_fuzzy,
+                                            [(contact.last_name[:-1] + 'x', 1) for contact in samples])
+    results['search_by_phone'] = timed(phone_book.search_by_phone,
+                                       [(contact.phone[-7:],) for contact in samples])
+    results['search_by_timeframe'] = timed(
+        lambda start: consume(phone_book.search_by_timeframe(start, start + timedelta(days=30))),
+        [(contact.time_added,) for contact in samples])
+    results['sort_page'] = timed(lambda: phone_book.sort('last_name', limit=20), [()] * repeat)
+    full_scans = [()] * max(1, repeat // 20)
+    results['sort'] = timed(phone_book.sort, full_scans)
+    results['group_by'] = timed(phone_book.group_by, full_scans)
+
+    names = [(contact.phone, f'{contact.first_name}x') for contact in samples]
+    results['update'] = timed(lambda phone, name: phone_book.update(phone, first_name=name), names)
+    results['delete'] = timed(phone_book.delete, [(contact.phone,) for contact in samples + extra])
+
+    results['log'] = timed(phone_book.log, [('Search', contact) for contact in samples * 10])
+    phone_book.audit_logger.flush()
+    results['get_history'] = timed(phone_book.get_history, full_scans)
+    phone_book.close()
+    os.remove(log_path)
+
+    # The import path of main.add_contact, into an empty phone book
+    csv_path = os.path.join(directory, 'contacts.csv')
+    write_csv(csv_path, size, seed)
+    phone_book = PhoneBook(make_backend(), AuditLogger(log_path), cache_size=0)
+    started = time.perf_counter()
+    report = import_file(phone_book, csv_path)
+    results['csv_import'] = summarize([time.perf_counter() - started])
+    results['csv_import']['contacts_per_s'] = report.added / results['csv_import']['total_ms'] * 1000
+    phone_book.close()
+    os.remove(csv_path)
+    os.remove(log_path)
+    return results
+
+
+def metadata(seed, repeat):
+    """Describes the machine and code a run was made with."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'started': datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(), 'cpus': os.cpu_count(),
+            'seed': seed, 'repeat': repeat}
+
+
+def compare(baseline, current, threshold, min_delta_ms):
+    """
+    Prints how the median time of each operation changed between two runs.
+
+    Parameters:
+    -----------
+    baseline : dict
+        The earlier run, as written by this script.
+    current : dict
+        The later run.
+    threshold : float
+        The relative slowdown that counts as a regression, e.g. 0.2 for 20%.
+    min_delta_ms : float
+        Slowdowns smaller than this many milliseconds are ignored as noise.
+
+    Returns:
+    --------
+    int
+        The number of regressions.
+    """
+    regressions = 0
+    old_runs = {(run['backend'], run['size']): run['operations'] for run in baseline['runs']}
+    for run in current['runs']:
+        old_operations = old_runs.get((run['backend'], run['size']))
+        if old_operations is None:
+            continue
+        print(f"\n{run['backend']}, {run['size']:,} contacts (median ms)")
+        for name, stats in run['operations'].items():
+            if name not in old_operations:
+                continue
+            old, new = old_operations[name]['median_ms'], stats['median_ms']
+            change = (new - old) / old if old else 0.0
+            regressed = change > threshold and new - old > min_delta_ms
+            regressions += regressed
+            flag = "REGRESSION" if regressed else ("faster" if change < -threshold else "")
+            print(f"  {name:<22} {old:>12.3f} -> {new:>12.3f}  {change:>+8.1%}  {flag}")
+    print(f"\n{regressions} regression(s) over {threshold:.0%}")
+    return regressions
+
+
+def main():
+    """Runs the suite, or compares two result files."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10k,100k', help="Comma-separated sizes, e.g. 10k,100k,1M,10M "
+                                                            "(default 10k,100k).")
+    parser.add_argument('--backends', default='memory', help="Comma-separated backends: memory, columnar, "
+                                                             "sqlite (default memory).")
+    parser.add_argument('--repeat', type=int, default=200, help="Base number of calls per operation (default 200).")
+    parser.add_argument('--seed', type=int, default=0, help="Generator seed (default 0).")
+    parser.add_argument('--output', default='-', help="Where to write the JSON results (default stdout).")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help="Compare two result files instead of running the suite.")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Relative median slowdown flagged as a regression (default 0.2).")
+    parser.add_argument('--min-delta-ms', type=float, default=0.01,
+                        help="Ignore slowdowns smaller than this, in milliseconds (default 0.01).")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as baseline_file, open(args.compare[1]) as current_file:
+            baseline, current = json.load(baseline_file), json.load(current_file)
+        sys.exit(1 if compare(baseline, current, args.threshold, args.min_delta_ms) else 0)
+
+    backends = [name.strip() for name in args.backends.split(',')]
+    for name in backends:
+        if name not in BACKENDS:
+            parser.error(f"Unknown backend '{name}'; use {', '.join(BACKENDS)}")
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+
+    output = {'meta': metadata(args.seed, args.repeat), 'runs': []}
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in backends:
+            for size in sizes:
+                print(f"Running {backend} with {size:,} contacts...", file=sys.stderr)
+                started = time.perf_counter()
+                operations = run_size(BACKENDS[backend], size, args.repeat, args.seed, directory)
+                output['runs'].append({'backend': backend, 'size': size, 'seconds': time.perf_counter() - started,
+                                       'operations': operations})
+                gc.collect()
+
+    text = json.dumps(output, indent=2)
+    if args.output == '-':
+        print(text)
+    else:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
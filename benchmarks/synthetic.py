@@ -0,0 +1,158 @@
+"""
+Deterministic generator of realistic synthetic contacts for benchmarks.
+
+The same (count, seed) always produces the same contacts, in the same order, on every
+machine and Python version: names follow a long-tailed distribution, every phone number
+is valid and distinct, most contacts have an email and an address, and time_added values
+are spread over several years in roughly increasing order, as if the contacts had been
+added over time.
+
+Run from the repository root to write a CSV file in the import format:
+
+    python benchmarks/synthetic.py --count 100000 contacts.csv
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contact import Contact
+
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'William',
+               'Elizabeth', 'David', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah',
+               'Charles', 'Karen', 'Christopher', 'Lisa', 'Daniel', 'Nancy', 'Matthew', 'Betty', 'Anthony',
+               'Margaret', 'Mark', 'Sandra', 'Donald', 'Ashley', 'Steven', 'Kimberly', 'Paul', 'Emily',
+               'Andrew', 'Donna', 'Joshua', 'Michelle', 'Kenneth', 'Carol', 'Kevin', 'Amanda', 'Brian',
+               'Dorothy', 'George', 'Melissa', 'Timothy', 'Deborah', 'Ronald', 'Stephanie', 'Jason',
+               'Rebecca', 'Edward', 'Sharon', 'Jeffrey', 'Laura', 'Ryan', 'Cynthia', 'Jacob', 'Kathleen',
+               'Gary', 'Amy', 'Nicholas', 'Angela', 'Eric', 'Shirley', 'Jonathan', 'Anna', 'Stephen',
+               'Brenda', 'Larry', 'Pamela', 'Justin', 'Emma', 'Scott', 'Nicole', 'Brandon', 'Helen',
+               'Benjamin', 'Samantha', 'Samuel', 'Katherine', 'Gregory', 'Christine', 'Alexander', 'Debra',
+               'Frank', 'Rachel', 'Patrick', 'Carolyn', 'Raymond', 'Janet', 'Jack', 'Catherine', 'Dennis',
+               'Maria', 'Jerry', 'Heather', 'Mary Ann', 'Jean Luc']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+              'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore',
+              'Jackson', 'Martin', 'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark',
+              'Ramirez', 'Lewis', 'Robinson', 'Walker', 'Young', 'Allen', 'King', 'Wright', 'Scott', 'Torres',
+              'Nguyen', 'Hill', 'Flores', 'Green', 'Adams', 'Nelson', 'Baker', 'Hall', 'Rivera', 'Campbell',
+              'Mitchell', 'Carter', 'Roberts', 'Van der Berg', "O'Connor"]
+# Syllables combined into rarer surnames, so that the name vocabulary keeps growing with the book
+SYLLABLES = ['an', 'ber', 'cal', 'dor', 'el', 'fen', 'gar', 'hol', 'is', 'jo', 'ka', 'li', 'mar', 'no', 'or',
+             'pe', 'qui', 'ros', 'sa', 'ton', 'ul', 'vi', 'wen', 'xa', 'yor', 'zel']
+STREETS = ['Main', 'Oak', 'Pine', 'Maple', 'Cedar', 'Elm', 'Washington', 'Lake', 'Hill', 'Park', 'Sunset',
+           'River', 'Church', 'Highland', 'Mill', 'Spring', 'Chestnut', 'Walnut', 'Jefferson', 'Lincoln']
+STREET_SUFFIXES = ['St', 'Ave', 'Rd', 'Blvd', 'Ln', 'Dr', 'Ct', 'Way']
+DOMAINS = ['example.com', 'mail.example.org', 'example.net', 'corp.example.com']
+# Area codes in use; every generated number uses one of them
+AREA_CODES = [201, 202, 203, 205, 206, 207, 208, 209, 210, 212, 213, 214, 215, 216, 217, 218, 219, 224, 225,
+              228, 229, 231, 234, 239, 240, 248, 251, 252, 253, 254, 256, 260, 262, 267, 269, 270, 272, 276,
+              281, 301, 302, 303, 304, 305, 307, 308, 309, 310, 312, 313, 314, 315, 316, 317, 318, 319, 320,
+              321, 323, 325, 330, 331, 334, 336, 337, 339, 346, 347, 351, 352, 360, 361, 385, 386, 401, 402,
+              404, 405, 406, 407, 408, 409, 410, 412, 413, 414, 415, 417, 419, 423, 424, 425, 430, 432, 434,
+              435, 440, 442, 443, 458, 469, 470, 475, 478, 479, 480, 484, 501, 502, 503, 504, 505, 507, 508,
+              509, 510, 512, 513, 515, 516, 517, 518, 520, 530, 531, 534, 539, 540, 541, 551, 559, 561, 562]
+# Cumulative Zipf-like weights: a name's popularity falls with its rank in the lists above
+_FIRST_WEIGHTS = list(accumulate(1 / (rank + 1) ** 0.8 for rank in range(len(FIRST_NAMES))))
+_LAST_WEIGHTS = list(accumulate(1 / (rank + 1) ** 0.8 for rank in range(len(LAST_NAMES))))
+# Multiplier coprime with 10**7 that scatters the local seven digits of consecutive contacts
+_LOCAL_STRIDE = 4_567_891
+
+START = datetime(2019, 1, 1)  # time_added of the earliest contact
+SPAN = timedelta(days=5 * 365)  # time_added values are spread over this period
+CSV_COLUMNS = ['First Name', 'Last Name', 'Phone', 'Email', 'Address']
+
+
+def phone_number(number):
+    """Returns the distinct, valid phone number of the number-th contact, formatted (###) ###-####."""
+    area = AREA_CODES[number % len(AREA_CODES)]
+    local = (number // len(AREA_CODES) * _LOCAL_STRIDE) % 10 ** 7
+    return f'({area}) {local // 10000:03d}-{local % 10000:04d}'
+
+
+def _rare_surname(chooser):
+    """Returns a made-up surname of two to four syllables."""
+    return ''.join(chooser.choice(SYLLABLES) for _ in range(chooser.randint(2, 4))).capitalize()
+
+
+def records(count, seed=0):
+    """
+    Lazily yields the field values of count synthetic contacts.
+
+    Parameters:
+    -----------
+    count : int
+        The number of contacts. Up to len(AREA_CODES) * 10**7 distinct phone numbers exist.
+    seed : int, optional
+        Selects a different, equally deterministic set of contacts (default is 0).
+
+    Returns:
+    --------
+    generator
+        (first_name, last_name, phone, email, address, time_added) tuples, with
+        time_added in roughly increasing order.
+    """
+    chooser = random.Random(seed)
+    span = SPAN.total_seconds()
+    for number in range(count):
+        # A few very common names, and a long tail of rare surnames
+        first_name = chooser.choices(FIRST_NAMES, cum_weights=_FIRST_WEIGHTS)[0]
+        if chooser.random() < 0.75:
+            last_name = chooser.choices(LAST_NAMES, cum_weights=_LAST_WEIGHTS)[0]
+        else:
+            last_name = _rare_surname(chooser)
+        email = None
+        if chooser.random() < 0.85:
+            user = f"{first_name}.{last_name}".lower().replace(' ', '').replace("'", '')
+            email = f"{user}{number % 1000}@{chooser.choice(DOMAINS)}"
+        address = None
+        if chooser.random() < 0.7:
+            address = f"{chooser.randint(1, 9999)} {chooser.choice(STREETS)} {chooser.choice(STREET_SUFFIXES)}"
+        # Spread over the span in order, with up to a week of jitter
+        seconds = span * number / max(count, 1) + chooser.uniform(0, 7 * 86400)
+        time_added = START + timedelta(seconds=int(seconds))
+        yield first_name, last_name, phone_number(number), email, address, time_added
+
+
+def generate(count, seed=0):
+    """Lazily yields count synthetic Contact objects. See records."""
+    for first_name, last_name, phone, email, address, time_added in records(count, seed):
+        yield Contact(first_name, last_name, phone, email, address, time_added)
+
+
+def write_csv(path, count, seed=0):
+    """
+    Writes count synthetic contacts to a CSV file in the format main.py imports.
+
+    Parameters:
+    -----------
+    path : str
+        The file to write.
+    count : int
+        The number of contacts.
+    seed : int, optional
+        Selects a different set of contacts (default is 0).
+    """
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_COLUMNS)
+        for first_name, last_name, phone, email, address, _ in records(count, seed):
+            writer.writerow([first_name, last_name, phone, email or '', address or ''])
+
+
+def main():
+    """Writes a CSV file of synthetic contacts."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path', help="The CSV file to write.")
+    parser.add_argument('--count', type=int, default=100_000, help="Number of contacts (default 100,000).")
+    parser.add_argument('--seed', type=int, default=0, help="Selects a different set of contacts (default 0).")
+    args = parser.parse_args()
+    write_csv(args.path, args.count, args.seed)
+
+
+if __name__ == '__main__':
+    main()
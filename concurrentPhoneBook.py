@@ -0,0 +1,383 @@
+import threading
+from contextlib import contextmanager
+
+from pagination import top_k
+
+
+class ReadWriteLock:
+    """
+    A lock that lets any number of readers in at once, or a single writer.
+
+    Writers are preferred: once a writer is waiting, new readers wait until it is done,
+    so a steady stream of readers cannot starve the writers. The lock is not reentrant.
+    """
+
+    def __init__(self):
+        """Initializes an unlocked lock."""
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    def acquire_read(self, blocking=True):
+        """
+        Joins the readers once no writer holds or is waiting for the lock.
+
+        Parameters:
+        -----------
+        blocking : bool, optional
+            Whether to wait for the writers (default is True). If False, returns at once.
+
+        Returns:
+        --------
+        bool
+            True if the lock was acquired, False if it was not available without waiting.
+        """
+        with self._condition:
+            while self._writing or self._waiting_writers:
+                if not blocking:
+                    return False
+                self._condition.wait()
+            self._readers += 1
+            return True
+
+    def release_read(self):
+        """Leaves the readers, waking a waiting writer if this was the last one."""
+        with self._condition:
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        """Blocks until there are no readers and no other writer, then takes the lock."""
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+
+    def release_write(self):
+        """Releases the lock, waking the waiting readers and writers."""
+        with self._condition:
+            self._writing = False
+            self._condition.notify_all()
+
+    @contextmanager
+    def read_locked(self):
+        """A context manager holding the lock as a reader."""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        """A context manager holding the lock as the writer."""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class ConcurrentPhoneBook:
+    """
+    A thread-safe front for a PhoneBook (or PersistentPhoneBook) shared by worker threads.
+
+    Searches, sort and group_by take a shared read lock, so any number of them run at the
+    same time; add, update and delete take the exclusive write lock, so writes are applied
+    one at a time and never while a read is in progress. Every call is therefore atomic.
+
+    Reads return snapshots: lazy results are collected while the lock is held, and each
+    contact is a detached copy (see Contact.snapshot), so later writes never change what
+    a reader already has. Change contacts through this object's update methods; updating
+    a returned copy has no effect on the phone book.
+
+    Every write increments version. reading() and writing() give direct access to the
+    wrapped phone book for a group of calls that must see, or make, one consistent state.
+
+    Attributes:
+    -----------
+    version : int
+        The number of write operations applied so far.
+    """
+
+    def __init__(self, phone_book):
+        """
+        Wraps a phone book for use from several threads.
+
+        Parameters:
+        -----------
+        phone_book : PhoneBook
+            The phone book to share. It must not be used directly while wrapped.
+        """
+        self._phone_book = phone_book
+        self._lock = ReadWriteLock()
+        self._views = set()  # Attributes with a registered sorted view
+        self._held = threading.local()  # Which lock, if any, the current thread already holds
+        self.version = 0
+
+    @property
+    def audit_logger(self):
+        """AuditLogger: The audit logger of the wrapped phone book, which is thread-safe itself."""
+        return self._phone_book.audit_logger
+
+    @contextmanager
+    def reading(self):
+        """
+        Holds the read lock across several calls on the wrapped phone book.
+
+        Returns:
+        --------
+        context manager
+            Yields (phone_book, version): the wrapped phone book, which must only be read
+            inside the block, and the version it is at.
+        """
+        with self._reading():
+            yield self._phone_book, self.version
+
+    @contextmanager
+    def writing(self):
+        """
+        Holds the write lock across several calls on the wrapped phone book.
+
+        Returns:
+        --------
+        context manager
+            Yields (phone_book, version): the wrapped phone book and the version the
+            changes made inside the block are recorded as.
+        """
+        with self._writing():
+            yield self._phone_book, self.version
+
+    @contextmanager
+    def _reading(self):
+        """Holds the read lock, unless the current thread already holds a lock."""
+        if getattr(self._held, 'mode', None) is not None:
+            yield
+            return
+        with self._lock.read_locked():
+            self._held.mode = 'read'
+            try:
+                yield
+            finally:
+                self._held.mode = None
+
+    @contextmanager
+    def _writing(self):
+        """Holds the write lock as one new version, unless the current thread already holds it."""
+        mode = getattr(self._held, 'mode', None)
+        if mode == 'read':
+            raise RuntimeError("Cannot write while holding the read lock")
+        if mode == 'write':
+            self.version += 1
+            yield
+            return
+        with self._lock.write_locked():
+            self._held.mode = 'write'
+            self.version += 1
+            try:
+                yield
+            finally:
+                self._held.mode = None
+
+    def try_read(self, function, *args):
+        """
+        Calls a function under the read lock if the lock can be taken without waiting.
+
+        Calls the function makes on this object reuse the lock instead of taking it again.
+        This lets an event loop run quick reads inline and hand them to a worker thread
+        only when a writer holds or is waiting for the lock.
+
+        Parameters:
+        -----------
+        function : callable
+            The function to call with args. It must only read from the phone book.
+
+        Returns:
+        --------
+        tuple
+            (True, the function's result) if it was called, otherwise (False, None).
+        """
+        if getattr(self._held, 'mode', None) is not None:
+            return True, function(*args)
+        if not self._lock.acquire_read(blocking=False):
+            return False, None
+        self._held.mode = 'read'
+        try:
+            return True, function(*args)
+        finally:
+            self._held.mode = None
+            self._lock.release_read()
+
+    def _read(self, method, *args):
+        """Calls a query method under the read lock and returns snapshots of the contacts found."""
+        with self._reading():
+            return [contact.snapshot() for contact in method(*args)]
+
+    def _write(self, method, *args):
+        """Calls a mutating method under the write lock as one new version."""
+        with self._writing():
+            return method(*args)
+
+    def _register(self, by):
+        """
+        Registers a sorted view under the write lock the first time an attribute is used, since that builds it.
+
+        Returns:
+        --------
+        bool
+            True if the attribute has a view, False if the current thread holds the read lock
+            and cannot take the write lock to build one.
+        """
+        if by not in self._views:
+            if getattr(self._held, 'mode', None) == 'read':
+                return False
+            self._write(self._phone_book.register_view, by)
+            self._views.add(by)
+        return True
+
+    def _unindexed(self, by):
+        """Returns the contacts in the order they were added and the key to sort them by, missing values last."""
+        def key(contact):
+            value = getattr(contact, by)
+            return value is None, value
+        return self._phone_book.contacts, key
+
+    @property
+    def contacts(self):
+        """list: Snapshots of the stored contacts, in the order they were added."""
+        with self._reading():
+            return [contact.snapshot() for contact in self._phone_book.contacts]
+
+    def __len__(self):
+        """Returns the number of contacts in the phone book."""
+        with self._reading():
+            return len(self._phone_book)
+
+    def get_by_phone(self, phone):
+        """Returns a snapshot of the contact with the given phone number, or None. See PhoneBook.get_by_phone."""
+        with self._reading():
+            contact = self._phone_book.get_by_phone(phone)
+            return contact.snapshot() if contact is not None else None
+
+    def has_phone(self, phone):
+        """Checks whether a phone number is already in use. See PhoneBook.has_phone."""
+        with self._reading():
+            return self._phone_book.has_phone(phone)
+
+    def phones_in_use(self, phones):
+        """Returns the subset of the given phone numbers that are already in use. See PhoneBook.phones_in_use."""
+        with self._reading():
+            return self._phone_book.phones_in_use(phones)
+
+    def search_by_name(self, query, limit=None, offset=0):
+        """Returns snapshots of the contacts whose name contains the query. See PhoneBook.search_by_name."""
+        return self._read(self._phone_book.search_by_name, query, limit, offset)
+
+    def search_by_name_fuzzy(self, query, max_distance=1, limit=None, offset=0):
+        """Returns snapshots of the contacts whose name is close to the query. See PhoneBook.search_by_name_fuzzy."""
+        return self._read(self._phone_book.search_by_name_fuzzy, query, max_distance, limit, offset)
+
+    def search_by_phone(self, query, limit=None, offset=0):
+        """Returns snapshots of the contacts whose phone number contains the query. See PhoneBook.search_by_phone."""
+        return self._read(self._phone_book.search_by_phone, query, limit, offset)
+
+    def search_by_timeframe(self, start_date=None, end_date=None, limit=None, offset=0):
+        """Returns an iterator over snapshots of the contacts added in a time frame. See PhoneBook.search_by_timeframe."""
+        return iter(self._read(self._phone_book.search_by_timeframe, start_date, end_date, limit, offset))
+
+    def sort(self, by='last_name', limit=None, offset=0):
+        """
+        Returns snapshots of the contacts sorted by an attribute. See PhoneBook.sort.
+
+        Inside reading() or try_read the view of an attribute used for the first time cannot
+        be built, so the contacts are sorted without it, in the same order.
+        """
+        if self._register(by):
+            return self._read(self._phone_book.sort, by, limit, offset)
+        contacts, key = self._unindexed(by)
+        if limit is None:
+            contacts = sorted(contacts, key=key)[offset:]
+        else:
+            contacts = top_k(contacts, offset + limit, key)[offset:]
+        return [contact.snapshot() for contact in contacts]
+
+    def group_by(self, by='last_name'):
+        """
+        Returns snapshots of the contacts grouped by an attribute. See PhoneBook.group_by.
+
+        Like sort, groups without a view inside reading() or try_read if the attribute has none yet.
+        """
+        if not self._register(by):
+            contacts, _ = self._unindexed(by)
+            groups = {}
+            for contact in contacts:
+                groups.setdefault(getattr(contact, by), []).append(contact.snapshot())
+            return groups
+        with self._reading():
+            return {key: [contact.snapshot() for contact in contacts]
+                    for key, contacts in self._phone_book.group_by(by).items()}
+
+    def register_view(self, by):
+        """
+        Starts maintaining a sorted view and a group map for an attribute. See PhoneBook.register_view.
+
+        Raises:
+        -------
+        RuntimeError
+            If the current thread holds the read lock, as building the view needs the write lock.
+        """
+        if not self._register(by):
+            raise RuntimeError("Cannot register a view while holding the read lock")
+
+    def add(self, contact):
+        """Adds a new contact. See PhoneBook.add."""
+        self._write(self._phone_book.add, contact)
+
+    def add_many(self, contacts):
+        """Adds a batch of new contacts, all or none. See PhoneBook.add_many."""
+        self._write(self._phone_book.add_many, list(contacts))
+
+    def update(self, phone, first_name=None, last_name=None, email=None, address=None):
+        """Updates a contact's information by phone number. See PhoneBook.update."""
+        self._write(self._phone_book.update, phone, first_name, last_name, email, address)
+
+    def update_many(self, changes):
+        """Applies several updates as one write. See PhoneBook.update_many."""
+        results = self._write(self._phone_book.update_many, list(changes))
+        return [result.snapshot() if hasattr(result, 'snapshot') else result for result in results]
+
+    def delete(self, phone):
+        """Deletes a contact by phone number. See PhoneBook.delete."""
+        self._write(self._phone_book.delete, phone)
+
+    def delete_many(self, phones):
+        """Deletes several contacts as one write. See PhoneBook.delete_many."""
+        return self._write(self._phone_book.delete_many, list(phones))
+
+    def log(self, operation, contact=None):
+        """Logs an operation. See PhoneBook.log."""
+        self._phone_book.log(operation, contact)
+
+    def log_many(self, operation, contacts):
+        """Logs the same operation for several contacts. See PhoneBook.log_many."""
+        self._phone_book.log_many(operation, contacts)
+
+    def get_history(self):
+        """Retrieves the log history. See PhoneBook.get_history."""
+        return self._phone_book.get_history()
+
+    def history(self, *args, **kwargs):
+        """Lazily yields pages of log entries. See PhoneBook.history."""
+        return self._phone_book.history(*args, **kwargs)
+
+    def cache_stats(self):
+        """Returns the query cache counters. See PhoneBook.cache_stats."""
+        return self._phone_book.cache_stats()
+
+    def close(self):
+        """Waits for running operations to finish and closes the wrapped phone book."""
+        self._write(self._phone_book.close)
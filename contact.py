@@ -1,5 +1,8 @@
+from contextlib import nullcontext
 from datetime import datetime
 
+from validation import phone_key
+
 class Contact:
     """
     A class to represent a contact entry in the phone book.
@@ -11,7 +14,9 @@ class Contact:
     last_name : str
         The last name of the contact.
     phone : str
-        The phone number of the contact.
+        The phone number of the contact, as it is displayed.
+    phone_key : int
+        The phone number normalized by validation.phone_key, which identifies the contact.
     email : str, optional
         The email address of the contact (default is None).
     address : str, optional
@@ -20,7 +25,11 @@ class Contact:
         The timestamp when the contact was created.
     """
 
-    def __init__(self, first_name, last_name, phone, email=None, address=None):
+    # Fixed attribute slots instead of a per-instance __dict__, which saves memory at
+    # millions of contacts
+    __slots__ = ('first_name', 'last_name', 'phone', 'phone_key', 'email', 'address', 'time_added', '_owner')
+
+    def __init__(self, first_name, last_name, phone, email=None, address=None, time_added=None):
         """
         Initializes a new Contact object with the provided information.
 
@@ -31,18 +40,28 @@ class Contact:
         last_name : str
             The last name of the contact.
         phone : str
-            The phone number of the contact.
+            The phone number of the contact, in any format accepted by validation.phone_key.
         email : str, optional
             The email address of the contact (default is None).
         address : str, optional
             The address of the contact (default is None).
+        time_added : datetime, optional
+            When the contact was created (default is now). Used when loading saved contacts.
+
+        Raises:
+        -------
+        ValueError
+            If the phone number cannot be normalized.
         """
         self.first_name = first_name
         self.last_name = last_name
         self.phone = phone
+        self.phone_key = phone_key(phone)
         self.email = email
         self.address = address
-        self.time_added = datetime.now()  # Store the timestamp when the contact is created
+        # Store the timestamp when the contact is created
+        self.time_added = time_added if time_added is not None else datetime.now()
+        self._owner = None  # The PhoneBook storing this contact, notified of updates
 
     def update(self, first_name=None, last_name=None, phone=None, email=None, address=None):
         """
@@ -62,15 +81,54 @@ class Contact:
             The new email address of the contact (default is None).
         address : str, optional
             The new address of the contact (default is None).
+
+        Raises:
+        -------
+        ValueError
+            If the new phone number cannot be normalized, or is already used by another
+            contact in the same phone book.
+        """
+        owner = self._owner
+        # The phone book may need the change and its bookkeeping to happen as one step
+        with owner._changing() if owner is not None else nullcontext():
+            new_key = phone_key(phone) if phone else self.phone_key
+            if new_key != self.phone_key and owner is not None and owner.has_phone(new_key):
+                raise ValueError(f"Phone number {phone} is already in use.")
+            old_key = self.phone_key
+            self._assign(first_name, last_name, phone, new_key, email, address)
+
+            if owner is not None:
+                owner._reindex(self, old_key)  # Keep the phone book's indexes in sync
+
+    def snapshot(self):
+        """
+        Returns a detached copy of the contact.
+
+        Later changes to this contact do not affect the copy, and updating the copy does
+        not change any phone book.
+
+        Returns:
+        --------
+        Contact
+            A copy of the contact with the same field values.
         """
+        copy = object.__new__(type(self))
+        copy.first_name, copy.last_name, copy.phone = self.first_name, self.last_name, self.phone
+        copy.phone_key, copy.email, copy.address = self.phone_key, self.email, self.address
+        copy.time_added = self.time_added
+        copy._owner = None
+        return copy
+
+    def _assign(self, first_name, last_name, phone, key, email, address):
+        """Sets the provided fields without any checks or notifying the phone book."""
         if first_name:
             self.first_name = first_name  # Update the first name if provided
         if last_name:
             self.last_name = last_name  # Update the last name if provided
         if phone:
             self.phone = phone  # Update the phone number if provided
+            self.phone_key = key
         if email:
             self.email = email  # Update the email if provided
         if address:
             self.address = address  # Update the address if provided
-
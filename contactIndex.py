@@ -0,0 +1,593 @@
+import re
+from bisect import bisect_left, insort
+
+# Matches every character that is not a digit
+_NON_DIGITS = re.compile(r'\D')
+
+
+def digits_of(text):
+    """
+    Extracts the digits from a string, dropping any formatting characters.
+
+    Parameters:
+    -----------
+    text : str
+        The text to extract digits from, e.g. '(123) 456-7890'.
+
+    Returns:
+    --------
+    str
+        Only the digit characters of the text, in order (e.g. '1234567890').
+    """
+    return _NON_DIGITS.sub('', text)
+
+
+class NGramIndex:
+    """
+    An inverted index from fixed-length n-grams to the items whose text contains them.
+
+    Every text is padded at the end so that each character position starts exactly one
+    gram. A substring query of at least n characters is answered by intersecting the
+    posting sets of its grams. A shorter query is a prefix of some padded gram, so it is
+    answered from the sorted gram vocabulary with a binary search.
+
+    The index only narrows down candidates; callers still confirm each candidate with
+    a plain substring test.
+
+    Attributes:
+    -----------
+    n : int
+        The gram length.
+    """
+
+    PAD = '\0'
+
+    def __init__(self, n=3):
+        """
+        Initializes an empty n-gram index.
+
+        Parameters:
+        -----------
+        n : int
+            The gram length (default is 3).
+        """
+        self.n = n
+        self._postings = {}  # gram -> set of items whose text contains the gram
+        self._vocabulary = []  # sorted list of grams, used for short (prefix) queries
+
+    def _grams(self, texts):
+        """Returns the set of padded grams starting at each position of the texts."""
+        n, padding = self.n, self.PAD * (self.n - 1)
+        return {padded[i:i + n] for padded, length in ((text + padding, len(text)) for text in texts)
+                for i in range(length)}
+
+    def add(self, item, *texts):
+        """
+        Indexes an item under every gram of the given texts.
+
+        Parameters:
+        -----------
+        item : hashable
+            The item to index (e.g. a Contact).
+        *texts : str
+            The texts the item should be found by (e.g. first and last name).
+        """
+        postings = self._postings
+        for gram in self._grams(texts):
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = set()
+                insort(self._vocabulary, gram)
+            posting.add(item)
+
+    def remove(self, item, *texts):
+        """
+        Removes an item from every gram of the given texts.
+
+        The texts must be the same ones the item was added with.
+
+        Parameters:
+        -----------
+        item : hashable
+            The item to remove.
+        *texts : str
+            The texts the item was indexed under.
+        """
+        for gram in self._grams(texts):
+            posting = self._postings.get(gram)
+            if posting is None:
+                continue
+            posting.discard(item)
+            if not posting:
+                del self._postings[gram]
+                del self._vocabulary[bisect_left(self._vocabulary, gram)]
+
+    def candidates(self, query):
+        """
+        Returns the items whose indexed text may contain the query as a substring.
+
+        Parameters:
+        -----------
+        query : str
+            The substring to look for. Must not be empty.
+
+        Returns:
+        --------
+        set
+            A superset of the items whose text contains the query.
+        """
+        if len(query) >= self.n:
+            postings = []
+            for gram in {query[i:i + self.n] for i in range(len(query) - self.n + 1)}:
+                posting = self._postings.get(gram)
+                if posting is None:
+                    return set()
+                postings.append(posting)
+            postings.sort(key=len)
+            return postings[0].intersection(*postings[1:])
+
+        # Short query: union the postings of every gram that starts with it
+        results = set()
+        position = bisect_left(self._vocabulary, query)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(query):
+            results |= self._postings[self._vocabulary[position]]
+            position += 1
+        return results
+
+    def estimate(self, query):
+        """
+        Returns an upper bound on the number of candidates for a query, without building them.
+
+        Parameters:
+        -----------
+        query : str
+            The substring to look for. Must not be empty.
+
+        Returns:
+        --------
+        int
+            The size of the smallest posting of the query's grams, or for a short query
+            the total size of the postings it would union.
+        """
+        if len(query) >= self.n:
+            return min(len(self._postings.get(query[i:i + self.n], ())) for i in range(len(query) - self.n + 1))
+
+        total = 0
+        position = bisect_left(self._vocabulary, query)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(query):
+            total += len(self._postings[self._vocabulary[position]])
+            position += 1
+        return total
+
+
+class SortedIndex:
+    """
+    A list of (key, rank, item) entries kept sorted by key with binary search.
+
+    The rank is the item's unique insertion rank in the phone book. It breaks ties
+    between equal keys in insertion order, which is what sorted() does with a stable sort,
+    and it means two entries never need to compare the items themselves.
+    """
+
+    def __init__(self):
+        """Initializes an empty sorted index."""
+        self._entries = []
+
+    def __len__(self):
+        """Returns the number of indexed items."""
+        return len(self._entries)
+
+    def __iter__(self):
+        """Iterates over the indexed items in key order."""
+        return (item for _, _, item in self._entries)
+
+    def slice(self, start=0, stop=None):
+        """
+        Lazily yields the items at a range of positions in key order.
+
+        Positions are indexes into the sorted list, so skipping to a page costs nothing.
+        The index should not be modified while the returned generator is being consumed.
+
+        Parameters:
+        -----------
+        start : int, optional
+            The position of the first item (default is 0).
+        stop : int, optional
+            The position after the last item (default is the end of the index).
+
+        Returns:
+        --------
+        generator
+            The items from start up to stop, in key order.
+        """
+        entries = self._entries
+        stop = len(entries) if stop is None else min(stop, len(entries))
+        return (entries[position][2] for position in range(start, stop))
+
+    def add(self, key, rank, item):
+        """
+        Inserts an item at its sorted position.
+
+        Parameters:
+        -----------
+        key : comparable
+            The value to sort the item by.
+        rank : int
+            The item's unique insertion rank.
+        item : object
+            The item to store.
+        """
+        insort(self._entries, (key, rank, item))
+
+    def add_many(self, entries):
+        """
+        Inserts a batch of (key, rank, item) entries.
+
+        Small batches are inserted one by one with a binary search. Larger batches are
+        appended and the list is re-sorted, which Python's sort does in near-linear time
+        because the existing entries already form one sorted run.
+
+        Parameters:
+        -----------
+        entries : list of tuple
+            The (key, rank, item) entries to insert.
+        """
+        if len(entries) * 64 < len(self._entries):
+            for entry in entries:
+                insort(self._entries, entry)
+        else:
+            self._entries.extend(entries)
+            self._entries.sort()
+
+    def remove(self, key, rank):
+        """
+        Removes the item that was added with the given key and rank.
+
+        Parameters:
+        -----------
+        key : comparable
+            The key the item was added with.
+        rank : int
+            The rank the item was added with.
+        """
+        position = bisect_left(self._entries, (key, rank))
+        if position < len(self._entries) and self._entries[position][1] == rank:
+            del self._entries[position]
+
+    def range(self, low=None, high=None):
+        """
+        Lazily yields the items whose key lies within an inclusive range.
+
+        The bounds are found with a binary search, so the cost is O(log n + k) for k results.
+        The index should not be modified while the returned generator is being consumed.
+
+        Parameters:
+        -----------
+        low : comparable, optional
+            The smallest key to include (default is no lower bound).
+        high : comparable, optional
+            The largest key to include (default is no upper bound).
+
+        Returns:
+        --------
+        generator
+            The matching items, in key order.
+        """
+        entries = self._entries
+        start = 0 if low is None else bisect_left(entries, (low,))
+        for position in range(start, len(entries)):
+            key, _, item = entries[position]
+            if high is not None and key > high:
+                return
+            yield item
+
+
+class GroupIndex:
+    """
+    A map from a key value to the items sharing it, kept up to date on every change.
+
+    Each group is an insertion-ordered dict used as a set, so removing an item from its
+    group is O(1) and the group still lists items in the order they joined it.
+    """
+
+    def __init__(self):
+        """Initializes an empty group index."""
+        self._groups = {}
+
+    def add(self, key, item):
+        """
+        Adds an item to the group for the given key.
+
+        Parameters:
+        -----------
+        key : hashable
+            The group value (e.g. a last name).
+        item : hashable
+            The item to add.
+        """
+        self._groups.setdefault(key, {})[item] = None
+
+    def remove(self, key, item):
+        """
+        Removes an item from the group for the given key, dropping the group once it is empty.
+
+        Parameters:
+        -----------
+        key : hashable
+            The group value the item was added with.
+        item : hashable
+            The item to remove.
+        """
+        group = self._groups.get(key)
+        if group is None:
+            return
+        group.pop(item, None)
+        if not group:
+            del self._groups[key]
+
+    def get(self, key):
+        """
+        Returns the items in the group for a key, in the order they joined it.
+
+        Parameters:
+        -----------
+        key : hashable
+            The group value.
+
+        Returns:
+        --------
+        iterable
+            A live view of the group's items, empty if there is no such group. The index
+            should not be modified while it is being iterated.
+        """
+        group = self._groups.get(key)
+        return group.keys() if group is not None else ()
+
+    def size(self, key):
+        """Returns the number of items in the group for a key."""
+        group = self._groups.get(key)
+        return len(group) if group is not None else 0
+
+    def groups(self):
+        """
+        Returns the current groups.
+
+        Returns:
+        --------
+        dict
+            A dictionary where keys are the group values and values are lists of items.
+        """
+        return {key: list(group) for key, group in self._groups.items()}
+
+
+def edit_distance(first, second, limit=None):
+    """
+    Returns the optimal string alignment distance between two strings.
+
+    This is the Levenshtein distance (insertions, deletions and substitutions) with the
+    transposition of two adjacent characters also counted as a single edit, which covers
+    the most common typing mistakes.
+
+    Parameters:
+    -----------
+    first : str
+        One string.
+    second : str
+        The other string.
+    limit : int, optional
+        Stop as soon as the distance is known to exceed this (default is no limit).
+
+    Returns:
+    --------
+    int
+        The distance, or limit + 1 if it is larger than limit.
+    """
+    if limit is not None and abs(len(first) - len(second)) > limit:
+        return limit + 1
+    if len(first) < len(second):
+        first, second = second, first
+    if not second:
+        return len(first)
+
+    before_previous = None
+    previous = list(range(len(second) + 1))
+    for row, char in enumerate(first, start=1):
+        current = [row]
+        for column, other in enumerate(second, start=1):
+            cost = previous[column - 1] + (char != other)
+            if previous[column] + 1 < cost:
+                cost = previous[column] + 1
+            if current[column - 1] + 1 < cost:
+                cost = current[column - 1] + 1
+            if (before_previous is not None and column > 1 and char == second[column - 2]
+                    and first[row - 2] == other and before_previous[column - 2] + 1 < cost):
+                cost = before_previous[column - 2] + 1  # Adjacent characters swapped
+            current.append(cost)
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+    distance = previous[-1]
+    return distance if limit is None or distance <= limit else limit + 1
+
+
+class FuzzyIndex:
+    """
+    A deletion index (as in the SymSpell algorithm) for finding the words within a small
+    edit distance of a query without comparing the query against every word.
+
+    Every indexed word is stored under each string obtained by deleting up to
+    max_distance characters from its first prefix_length characters. Two words within
+    distance d of each other share such a deletion with at most d characters removed
+    from each, so a query only looks up its own deletions and then confirms the few
+    candidate words with edit_distance. Limiting the deletions to a prefix bounds the
+    number of entries per word without losing any match.
+
+    Only distinct words are stored, each with a count of how many times it was added,
+    so the index grows with the vocabulary rather than with the number of items.
+
+    Attributes:
+    -----------
+    max_distance : int
+        The largest edit distance a search may ask for.
+    prefix_length : int
+        The number of leading characters of each word that deletions are taken from.
+    """
+
+    def __init__(self, max_distance=2, prefix_length=7):
+        """
+        Initializes an empty fuzzy index.
+
+        Parameters:
+        -----------
+        max_distance : int, optional
+            The largest edit distance a search may ask for (default is 2).
+        prefix_length : int, optional
+            The number of leading characters deletions are taken from (default is 7).
+            Must be larger than max_distance.
+        """
+        if prefix_length <= max_distance:
+            raise ValueError("prefix_length must be larger than max_distance.")
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self._counts = {}  # word -> number of times it was added
+        self._deletes = {}  # deletion -> word, or set of words once several share it
+
+    def __len__(self):
+        """Returns the number of distinct indexed words."""
+        return len(self._counts)
+
+    def _deletions(self, word, distance):
+        """Returns every string obtained by deleting up to distance characters from the word's prefix."""
+        prefix = word[:self.prefix_length]
+        deletions = frontier = {prefix}
+        for _ in range(distance):
+            frontier = {text[:i] + text[i + 1:] for text in frontier for i in range(len(text))}
+            deletions = deletions | frontier
+        return deletions
+
+    def add(self, *words):
+        """
+        Adds one occurrence of each given word.
+
+        Parameters:
+        -----------
+        *words : str
+            The words to add, e.g. the case-folded parts of a contact's name.
+        """
+        for word in words:
+            count = self._counts.get(word, 0)
+            self._counts[word] = count + 1
+            if count:
+                continue
+            deletes = self._deletes
+            for deletion in self._deletions(word, self.max_distance):
+                entry = deletes.get(deletion)
+                if entry is None:
+                    deletes[deletion] = word
+                elif isinstance(entry, str):
+                    deletes[deletion] = {entry, word}
+                else:
+                    entry.add(word)
+
+    def remove(self, *words):
+        """
+        Removes one occurrence of each given word, dropping words no longer in use.
+
+        Parameters:
+        -----------
+        *words : str
+            The words to remove, as they were added.
+        """
+        for word in words:
+            count = self._counts.get(word)
+            if count is None:
+                continue
+            if count > 1:
+                self._counts[word] = count - 1
+                continue
+            del self._counts[word]
+            deletes = self._deletes
+            for deletion in self._deletions(word, self.max_distance):
+                entry = deletes.get(deletion)
+                if entry == word:
+                    del deletes[deletion]
+                elif isinstance(entry, set):
+                    entry.discard(word)
+                    if len(entry) == 1:
+                        deletes[deletion] = entry.pop()
+
+    def search(self, query, max_distance=None):
+        """
+        Finds the indexed words within an edit distance of a query.
+
+        Parameters:
+        -----------
+        query : str
+            The word to look for.
+        max_distance : int, optional
+            The largest edit distance to accept (default is the index's max_distance).
+
+        Returns:
+        --------
+        dict
+            Each matching word mapped to its edit_distance from the query.
+
+        Raises:
+        -------
+        ValueError
+            If max_distance is negative or larger than the index's max_distance.
+        """
+        if max_distance is None:
+            max_distance = self.max_distance
+        if not 0 <= max_distance <= self.max_distance:
+            raise ValueError(f"The maximum edit distance must be between 0 and {self.max_distance}.")
+
+        candidates = set()
+        deletes = self._deletes
+        for deletion in self._deletions(query, max_distance):
+            entry = deletes.get(deletion)
+            if entry is None:
+                continue
+            if isinstance(entry, str):
+                candidates.add(entry)
+            else:
+                candidates |= entry
+
+        matches = {}
+        for word in candidates:
+            distance = edit_distance(query, word, max_distance)
+            if distance <= max_distance:
+                matches[word] = distance
+        return matches
+
+
+def fuzzy_distance(matches, words):
+    """
+    Scores a name against the per-word matches of a fuzzy query.
+
+    Parameters:
+    -----------
+    matches : list of dict
+        For each word of the query, the matching words mapped to their edit distance,
+        as returned by FuzzyIndex.search.
+    words : iterable of str
+        The words of the name being scored.
+
+    Returns:
+    --------
+    int or None
+        The sum, over the query words, of the distance to the closest word of the name,
+        or None if some query word matches none of them.
+    """
+    words = list(words)
+    total = 0
+    for match in matches:
+        best = None
+        for word in words:
+            distance = match.get(word)
+            if distance is not None and (best is None or distance < best):
+                best = distance
+        if best is None:
+            return None
+        total += best
+    return total
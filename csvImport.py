@@ -0,0 +1,533 @@
+import csv
+import io
+import os
+import re
+from itertools import islice
+
+from contact import Contact
+from metrics import instrumented, registry
+from validation import EMAIL_PATTERN, PHONE_INPUT_PATTERN, phone_key
+
+# Columns every contact CSV file must provide
+REQUIRED_COLUMNS = ['First Name', 'Last Name', 'Phone']
+
+# Rows read and inserted per chunk, which bounds the memory used by an import
+DEFAULT_CHUNKSIZE = 100_000
+
+# Files smaller than this are imported by import_file with the csv module, without pandas,
+# whose import alone takes longer than reading such a file
+VECTORIZED_IMPORT_BYTES = 16 * 1024 * 1024
+
+# Files at least this large are imported with worker processes by import_file
+PARALLEL_IMPORT_BYTES = 64 * 1024 * 1024
+
+# Bytes read at a time while looking for the record boundaries of a parallel import
+SCAN_BLOCK_BYTES = 1024 * 1024
+
+# Byte ranges handed out per worker process in a parallel import, so that a slow range
+# does not leave the other workers idle
+RANGES_PER_WORKER = 4
+
+# Reasons reported for rejected rows
+INVALID_PHONE = "Invalid phone number format"
+INVALID_EMAIL = "Invalid email format"
+
+
+class EmptyCSVError(ValueError):
+    """Raised when a CSV file has no header line."""
+
+
+def duplicate_phone(phone):
+    """Returns the reject reason for a phone number that is already in use."""
+    return f"Phone number {phone} is already in use"
+
+
+def _phone_keys(phones):
+    """
+    Normalizes a column of phone numbers like validation.phone_key, with vectorized string operations.
+
+    Parameters:
+    -----------
+    phones : pandas.Series
+        The phone numbers as text.
+
+    Returns:
+    --------
+    pandas.Series
+        The phone keys as ten-digit strings, or NaN where a number cannot be normalized.
+    """
+    digits = phones.str.replace(r'\D', '', regex=True)
+    with_country_code = (digits.str.len() == 11) & digits.str.startswith('1')
+    digits = digits.where(~with_country_code, digits.str[1:])
+    return digits.where(phones.str.match(PHONE_INPUT_PATTERN) & (digits.str.len() == 10))
+
+
+class ImportReport:
+    """
+    A summary of a CSV import.
+
+    Attributes:
+    -----------
+    added : int
+        The number of contacts added to the phone book.
+    rejects : list
+        A list of (line_number, reason) tuples for the rows that were not imported,
+        in file order. Line numbers count the header as line 1.
+    """
+
+    def __init__(self):
+        """Initializes an empty report."""
+        self.added = 0
+        self.rejects = []
+
+    def summary(self):
+        """
+        Returns a one-line summary of the import.
+
+        Returns:
+        --------
+        str
+            The number of added contacts and rejected rows.
+        """
+        return f"Imported {self.added} contacts, rejected {len(self.rejects)} rows."
+
+
+@instrumented(size=lambda report: report.added)
+def import_csv(phone_book, csv_file, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Imports contacts from a CSV file in chunks, validating each chunk with vectorized operations.
+
+    Invalid rows do not stop the import. Each one is skipped and recorded in the report
+    with the first problem found, checked in this order: phone format, duplicate phone
+    number (already stored or earlier in the file), email format. Phone numbers are
+    compared by their normalized key, so the same number written in two formats is a
+    duplicate. Fields past the header's columns are dropped, and rows whose fields are
+    then all empty, such as blank lines, are skipped.
+
+    Parameters:
+    -----------
+    phone_book : PhoneBook
+        The phone book the contacts are added to.
+    csv_file : str
+        The path to a CSV file with First Name, Last Name and Phone columns, and optional
+        Email and Address columns.
+    chunksize : int, optional
+        The number of rows to read and insert at a time (default is DEFAULT_CHUNKSIZE).
+
+    Returns:
+    --------
+    ImportReport
+        The number of added contacts and the rejected rows.
+
+    Raises:
+    -------
+    EmptyCSVError
+        If the file is empty.
+    ValueError
+        If a required column is missing.
+    """
+    # Imported here rather than at module level: it takes longer to load than most imports take to run
+    import pandas as pd
+
+    report = ImportReport()
+    line_offset = 2  # The first data row is on line 2, after the header
+
+    # Read everything as text and keep empty cells as '' so the string checks apply to every row.
+    # Blank lines are kept as empty rows, so that rows can be numbered by their line in the file.
+    # Only the header's columns are read: fields past them are dropped, as import_csv_stream
+    # drops them, instead of shifting the columns of the first row or stopping the import.
+    try:
+        header = pd.read_csv(csv_file, nrows=0).columns
+        reader = pd.read_csv(csv_file, chunksize=chunksize, dtype=str, keep_default_na=False,
+                             skip_blank_lines=False, usecols=range(len(header)))
+    except pd.errors.EmptyDataError:
+        raise EmptyCSVError("No columns to parse from file") from None
+    for chunk in reader:
+        missing = [column for column in REQUIRED_COLUMNS if column not in chunk.columns]
+        if missing:
+            raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+        phones = chunk['Phone']
+        emails = chunk['Email'] if 'Email' in chunk.columns else pd.Series('', index=chunk.index)
+        addresses = chunk['Address'] if 'Address' in chunk.columns else pd.Series('', index=chunk.index)
+
+        # The line each row starts on: a quoted field with line breaks in it makes its row
+        # span several lines, which pushes the rows after it down
+        multiline = [column for column in chunk.columns if '\n' in ''.join(chunk[column].tolist())]
+        breaks = sum((chunk[column].str.count('\n') for column in multiline), pd.Series(0, index=chunk.index))
+        positions = pd.Series(range(len(chunk)), index=chunk.index)
+        lines = line_offset + positions + breaks.cumsum() - breaks
+        blank = (chunk == '').all(axis=1)
+
+        # Validate and normalize whole columns at once
+        keys = _phone_keys(phones)
+        bad_phone = keys.isna()
+        bad_email = (emails != '') & ~emails.str.match(EMAIL_PATTERN)
+        in_use = keys.isin({f'{key:010d}' for key in phone_book.phones_in_use(keys[~bad_phone].astype('int64'))})
+
+        # Of the valid rows, only the first occurrence of each phone key is accepted.
+        # Any row after it with the same key is a duplicate, like a number already stored.
+        valid = ~bad_phone & ~bad_email & ~in_use
+        accepted = valid & ~keys.where(valid).duplicated()
+        accepted_at = pd.Series(positions[accepted].to_numpy(), index=keys[accepted].to_numpy())
+        duplicate = ~bad_phone & (in_use | (keys.map(accepted_at) < positions))
+        rejected = ~accepted & ~blank
+
+        if rejected.any():
+            for position in rejected.to_numpy().nonzero()[0]:
+                if bad_phone.iat[position]:
+                    reason = INVALID_PHONE
+                elif duplicate.iat[position]:
+                    reason = duplicate_phone(phones.iat[position])
+                else:
+                    reason = INVALID_EMAIL
+                report.rejects.append((int(lines.iat[position]), reason))
+
+        contacts = [
+            Contact(first_name, last_name, phone, email or None, address or None)
+            for first_name, last_name, phone, email, address in zip(
+                chunk['First Name'][accepted].tolist(), chunk['Last Name'][accepted].tolist(),
+                phones[accepted].tolist(), emails[accepted].tolist(), addresses[accepted].tolist())
+        ]
+        phone_book.add_many(contacts)
+        phone_book.log_many("Add", contacts)
+        report.added += len(contacts)
+        line_offset += len(chunk) + int(breaks.sum())
+        registry.scanned(len(chunk))
+
+    return report
+
+
+def _split_ranges(csv_file, data_start, parts):
+    """
+    Splits the data section of a file into byte ranges that start and end on record boundaries.
+
+    A quoted field may contain line breaks, so not every line start is the start of a
+    record. The file is scanned from the data start while counting quote characters: a
+    line break ends a record only when an even number of quotes precede it, as in valid
+    CSV every quote either opens or closes a quoted field or comes in an escaped pair.
+
+    Parameters:
+    -----------
+    csv_file : str
+        The path to the file.
+    data_start : int
+        The byte offset of the first data line, just after the header.
+    parts : int
+        The number of ranges to aim for. Fewer are returned for small files.
+
+    Returns:
+    --------
+    list
+        A list of (start, end) byte offsets covering the data section in order.
+    """
+    size = os.path.getsize(csv_file)
+    step = max(1, (size - data_start) // parts)
+    boundaries = [data_start]
+    target = data_start + step  # The next range should start at the first record at or after this offset
+
+    with open(csv_file, 'rb') as file:
+        file.seek(data_start)
+        position = data_start  # The file offset of the current block
+        quoted = 0  # 1 if the current block starts inside a quoted field
+        while target < size:
+            block = file.read(SCAN_BLOCK_BYTES)
+            if not block:
+                break
+            # Look for line breaks from target - 1 on, so that a target which already
+            # sits on a line start stays where it is
+            index = max(0, target - 1 - position)
+            counted, parity = 0, quoted  # Quote parity of block[:counted]
+            while True:
+                index = block.find(b'\n', index)
+                if index < 0:
+                    break
+                parity ^= block.count(b'"', counted, index) & 1
+                counted = index
+                if parity:
+                    index += 1  # A line break inside a quoted field
+                    continue
+                boundary = position + index + 1
+                if boundary < size:
+                    boundaries.append(boundary)
+                target += ((boundary - target) // step + 1) * step
+                index = target - 1 - position
+            quoted ^= block.count(b'"') & 1
+            position += len(block)
+
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def _parse_range(csv_file, start, end, columns):
+    """
+    Parses and validates the rows in one byte range of a CSV file.
+
+    Runs in a worker process. Uniqueness is not checked here because it depends on the
+    rows in other ranges; the parent process checks it while merging.
+
+    Parameters:
+    -----------
+    csv_file : str
+        The path to the CSV file.
+    start : int
+        The byte offset of the first line in the range.
+    end : int
+        The byte offset just past the last line in the range.
+    columns : list of str
+        The column names from the header line.
+
+    Returns:
+    --------
+    tuple
+        The rows, as returned by _parse_rows with line numbers counted from 1 at the start
+        of the range, and the number of lines in the range.
+    """
+    with open(csv_file, 'rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode('utf-8')
+    # Split into lines as the file is read by import_csv_stream; str.splitlines would also
+    # break lines at characters such as \x0b, \x1c or \u2028 inside a field
+    reader = csv.reader(io.StringIO(text, newline=''))
+    return _parse_rows(_numbered(reader), columns), reader.line_num
+
+
+def _numbered(reader):
+    """Yields each record of a csv.reader with the number of the line it starts on."""
+    line_number = reader.line_num + 1
+    for fields in reader:
+        yield line_number, fields
+        line_number = reader.line_num + 1
+
+
+def _parse_rows(records, columns):
+    """
+    Validates parsed CSV records one at a time, without pandas.
+
+    Uniqueness is not checked here; _add_rows checks it.
+
+    Parameters:
+    -----------
+    records : iterable
+        (line_number, fields) pairs, where fields is a list of values as produced by
+        csv.reader and line_number is the line the record starts on (see _numbered).
+    columns : list of str
+        The column names from the header line.
+
+    Returns:
+    --------
+    list
+        One (line_number, first_name, last_name, phone, email, address, key, bad_email)
+        tuple per record, in order, where key is the phone key or None for an invalid
+        number. Missing optional values are '' and fields past the last column are dropped.
+        Records whose fields are then all empty, such as blank lines, are skipped, as
+        import_csv does.
+    """
+    index = {name: position for position, name in enumerate(columns)}
+    first, last, phone_column = index['First Name'], index['Last Name'], index['Phone']
+    email_column, address_column = index.get('Email'), index.get('Address')
+    match_email = re.compile(EMAIL_PATTERN).match
+
+    rows = []
+    for line_number, fields in records:
+        del fields[len(columns):]
+        if not any(fields):
+            continue
+        fields += [''] * (len(columns) - len(fields))
+        phone = fields[phone_column]
+        email = fields[email_column] if email_column is not None else ''
+        address = fields[address_column] if address_column is not None else ''
+        try:
+            key = phone_key(phone)
+        except ValueError:
+            key = None
+        rows.append((line_number, fields[first], fields[last], phone, email, address,
+                     key, email != '' and match_email(email) is None))
+    return rows
+
+
+def _add_rows(phone_book, rows, line_offset, report):
+    """
+    Adds the valid rows parsed by _parse_rows to the phone book and reports the others.
+
+    A row is rejected for the first problem found, in the same order as import_csv:
+    phone format, duplicate phone number (already stored or earlier in the rows), email format.
+
+    Parameters:
+    -----------
+    phone_book : PhoneBook
+        The phone book the contacts are added to.
+    rows : list
+        The rows, in file order.
+    line_offset : int
+        Added to the line number of each row to give its line in the file.
+    report : ImportReport
+        The report to count the added contacts and record the rejected rows in.
+    """
+    in_use = phone_book.phones_in_use({row[6] for row in rows if row[6] is not None})
+    contacts = []
+    batch_keys = set()
+    for line_number, first_name, last_name, phone, email, address, key, bad_email in rows:
+        line_number += line_offset
+        if key is None:
+            report.rejects.append((line_number, INVALID_PHONE))
+        elif key in batch_keys or key in in_use:
+            report.rejects.append((line_number, duplicate_phone(phone)))
+        elif bad_email:
+            report.rejects.append((line_number, INVALID_EMAIL))
+        else:
+            batch_keys.add(key)
+            contacts.append(Contact(first_name, last_name, phone, email or None, address or None))
+
+    phone_book.add_many(contacts)
+    phone_book.log_many("Add", contacts)
+    report.added += len(contacts)
+    registry.scanned(len(rows))
+
+
+@instrumented(size=lambda report: report.added)
+def import_csv_stream(phone_book, csv_file, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Imports contacts from a CSV file in chunks with the csv module, without pandas.
+
+    The file is read one record at a time, so memory use is bounded by the chunk size.
+    The added contacts and the report are the same as those from import_csv, which is
+    faster on large files but has to load pandas first: both drop the fields past the
+    header's columns and skip the rows left empty.
+
+    Parameters:
+    -----------
+    phone_book : PhoneBook
+        The phone book the contacts are added to.
+    csv_file : str
+        The path to a CSV file with First Name, Last Name and Phone columns, and optional
+        Email and Address columns.
+    chunksize : int, optional
+        The number of records to read and insert at a time (default is DEFAULT_CHUNKSIZE).
+
+    Returns:
+    --------
+    ImportReport
+        The number of added contacts and the rejected rows.
+
+    Raises:
+    -------
+    EmptyCSVError
+        If the file is empty.
+    ValueError
+        If a required column is missing.
+    """
+    report = ImportReport()
+
+    # utf-8-sig drops the byte order mark some spreadsheet programs write
+    with open(csv_file, newline='', encoding='utf-8-sig') as file:
+        reader = csv.reader(file)
+        columns = next(reader, None)
+        if not columns:
+            raise EmptyCSVError("No columns to parse from file")
+        missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+        if missing:
+            raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+        # Rows are numbered by the line they start on, as counted by the reader, which
+        # includes blank lines and the line breaks in quoted fields
+        records = _numbered(reader)
+        while True:
+            chunk = list(islice(records, chunksize))
+            if not chunk:
+                break
+            _add_rows(phone_book, _parse_rows(chunk, columns), 0, report)
+
+    return report
+
+
+@instrumented(size=lambda report: report.added)
+def import_csv_parallel(phone_book, csv_file, workers=None):
+    """
+    Imports contacts from a CSV file using several worker processes.
+
+    The file is split into byte ranges aligned to record boundaries, so a quoted field
+    with line breaks in it is never cut in two. Each worker parses and validates its
+    ranges, and the parent merges the results in file order while it checks phone numbers
+    for uniqueness across all ranges. The added contacts and the report are the same as
+    those from import_csv.
+
+    Parameters:
+    -----------
+    phone_book : PhoneBook
+        The phone book the contacts are added to.
+    csv_file : str
+        The path to a CSV file with First Name, Last Name and Phone columns, and optional
+        Email and Address columns.
+    workers : int, optional
+        The number of worker processes (default is the number of CPUs).
+
+    Returns:
+    --------
+    ImportReport
+        The number of added contacts and the rejected rows.
+
+    Raises:
+    -------
+    EmptyCSVError
+        If the file is empty.
+    ValueError
+        If a required column is missing.
+    """
+    # Imported here, as multiprocessing is only needed for the largest files and slows startup
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+
+    with open(csv_file, 'rb') as file:
+        header = file.readline()
+        data_start = file.tell()
+    columns = next(csv.reader([header.decode('utf-8-sig')]), [])
+    if not columns:
+        raise EmptyCSVError("No columns to parse from file")
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    report = ImportReport()
+    line_offset = 1  # Lines before the current range; the header is line 1
+    ranges = _split_ranges(csv_file, data_start, workers * RANGES_PER_WORKER)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() yields the ranges in submission order, which keeps the merge in file order
+        results = executor.map(_parse_range, *zip(*[(csv_file, start, end, columns) for start, end in ranges]))
+        for rows, lines in results:
+            _add_rows(phone_book, rows, line_offset, report)
+            line_offset += lines
+
+    return report
+
+
+def import_file(phone_book, csv_file, workers=None):
+    """
+    Imports contacts from a CSV file, choosing the fastest method for its size.
+
+    Small and medium files are streamed with the csv module, so pandas is only loaded
+    for large files, where its vectorized validation pays for the import. The largest
+    files are split across worker processes.
+
+    Parameters:
+    -----------
+    phone_book : PhoneBook
+        The phone book the contacts are added to.
+    csv_file : str
+        The path to the CSV file.
+    workers : int, optional
+        The number of worker processes for a parallel import (default is the number of CPUs).
+
+    Returns:
+    --------
+    ImportReport
+        The number of added contacts and the rejected rows.
+    """
+    size = os.path.getsize(csv_file)
+    if size >= PARALLEL_IMPORT_BYTES:
+        return import_csv_parallel(phone_book, csv_file, workers)
+    if size >= VECTORIZED_IMPORT_BYTES:
+        return import_csv(phone_book, csv_file)
+    return import_csv_stream(phone_book, csv_file)
@@ -0,0 +1,390 @@
+import re
+import unicodedata
+from collections import namedtuple
+from itertools import combinations
+
+from contactIndex import edit_distance
+from metrics import instrumented, registry
+
+# Pairs scoring at least this are suggested as duplicates
+SUGGEST_THRESHOLD = 0.8
+
+# Pairs scoring at least this are merged without asking
+MERGE_THRESHOLD = 0.95
+
+# Blocks with more contacts than this are too common a key to compare every pair in them:
+# they are sorted by full name instead and each contact is compared with the next WINDOW
+# contacts only (the sorted neighbourhood method), so the work stays linear in the block size
+MAX_BLOCK = 100
+WINDOW = 8
+
+# Weight of each field in a pair's score
+FIRST_NAME_WEIGHT = 0.25
+LAST_NAME_WEIGHT = 0.35
+EMAIL_WEIGHT = 0.25
+ADDRESS_WEIGHT = 0.15
+
+# Similarity of a field missing from either contact: weak evidence either way, so that the
+# same name alone scores below SUGGEST_THRESHOLD
+MISSING_SIMILARITY = 0.4
+
+# Similarity of two emails with the same local part at different domains
+SAME_LOCAL_PART_SIMILARITY = 0.7
+
+# Address words reduced to one spelling before addresses are compared
+ADDRESS_ABBREVIATIONS = {'street': 'st', 'avenue': 'ave', 'av': 'ave', 'road': 'rd', 'boulevard': 'blvd',
+                         'lane': 'ln', 'drive': 'dr', 'court': 'ct', 'place': 'pl', 'square': 'sq',
+                         'terrace': 'ter', 'highway': 'hwy', 'parkway': 'pkwy', 'apartment': 'apt',
+                         'suite': 'ste', 'north': 'n', 'south': 's', 'east': 'e', 'west': 'w'}
+
+# Matches runs of letters and digits in folded text
+_WORD = re.compile(r'[a-z0-9]+')
+
+# One suggested duplicate pair; first is the contact added earlier
+DuplicatePair = namedtuple('DuplicatePair', ['score', 'first', 'second'])
+
+# The normalized fields of one contact, compared instead of the contact itself
+_Profile = namedtuple('_Profile', ['first_name', 'last_name', 'email', 'local_part', 'address', 'numbers'])
+
+# Blocking keys, in the order their blocks are compared. A pair sharing several keys is
+# only scored in the block of the first one.
+_KEY_NAMES = ('email', 'local_part', 'address', 'name')
+
+
+def fold(text):
+    """
+    Normalizes text for comparison: case folded, accents removed, and everything but
+    letters and digits dropped.
+
+    Parameters:
+    -----------
+    text : str
+        The text, e.g. "O'Connor".
+
+    Returns:
+    --------
+    str
+        The folded text, e.g. 'oconnor'.
+    """
+    if text.isascii():
+        return ''.join(_WORD.findall(text.lower()))
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(_WORD.findall(''.join(char for char in decomposed if not unicodedata.combining(char))))
+
+
+def _address_words(address):
+    """Returns the words of an address, folded and with common words abbreviated."""
+    if not address.isascii():
+        address = unicodedata.normalize('NFKD', address)
+    return [ADDRESS_ABBREVIATIONS.get(word, word) for word in _WORD.findall(address.lower())]
+
+
+def _profile(contact):
+    """Returns the normalized fields of a contact."""
+    email = local_part = None
+    if contact.email:
+        local_part, _, domain = contact.email.strip().lower().rpartition('@')
+        local_part = local_part.split('+', 1)[0]  # Tags such as name+shop@ reach the same mailbox
+        if local_part:
+            email = f'{local_part}@{domain}'
+    address = numbers = None
+    if contact.address:
+        words = _address_words(contact.address)
+        if words:
+            address = frozenset(words)
+            numbers = frozenset(word for word in words if word.isdigit())
+    return _Profile(fold(contact.first_name or ''), fold(contact.last_name or ''), email, local_part, address,
+                    numbers)
+
+
+def blocking_keys(contact):
+    """
+    Returns the blocking keys of a contact. Only contacts sharing a key are compared.
+
+    Parameters:
+    -----------
+    contact : Contact
+        The contact.
+
+    Returns:
+    --------
+    dict
+        Key name -> key, for the keys the contact has: 'email' (the normalized address),
+        'local_part' (the part before the @), 'address' (the sorted address words) and
+        'name' (the folded last name followed by the first initial).
+    """
+    profile = _profile(contact)
+    return {name: key for name, key in zip(_KEY_NAMES, _keys(profile)) if key is not None}
+
+
+def _keys(profile):
+    """Returns the blocking keys of a profile, in _KEY_NAMES order, with None for a missing key."""
+    address = ' '.join(sorted(profile.address)) if profile.address else None
+    name = f'{profile.last_name} {profile.first_name[:1]}' if profile.last_name else None
+    return profile.email, profile.local_part, address, name
+
+
+def similarity(first, second):
+    """
+    Returns how similar two folded strings are, from the edit distance between them.
+
+    Parameters:
+    -----------
+    first : str
+        One string.
+    second : str
+        The other string.
+
+    Returns:
+    --------
+    float
+        1.0 for equal strings. Each edit takes off half of its share of the longer string,
+        so a single typo in a short name still counts as a close match, and the result is
+        0.0 once more than a third of the longer string differs.
+    """
+    if first == second:
+        return 1.0
+    longest = max(len(first), len(second))
+    if not first or not second:
+        return 0.0
+    limit = longest // 3
+    distance = edit_distance(first, second, limit)
+    return 0.0 if distance > limit else 1.0 - distance / longest / 2
+
+
+def _name_similarity(first, second):
+    """Returns the weighted similarity of the names of two profiles, allowing them to be swapped."""
+    total = (FIRST_NAME_WEIGHT * similarity(first.first_name, second.first_name)
+             + LAST_NAME_WEIGHT * similarity(first.last_name, second.last_name))
+    if first.first_name == second.last_name or first.last_name == second.first_name:
+        swapped = (FIRST_NAME_WEIGHT * similarity(first.first_name, second.last_name)
+                   + LAST_NAME_WEIGHT * similarity(first.last_name, second.first_name))
+        total = max(total, swapped)
+    return total
+
+
+def _details_similarity(first, second):
+    """Returns the weighted similarity of the emails and addresses of two profiles."""
+    if first.email is None or second.email is None:
+        total = EMAIL_WEIGHT * MISSING_SIMILARITY
+    elif first.email == second.email:
+        total = EMAIL_WEIGHT
+    elif first.local_part == second.local_part:
+        total = EMAIL_WEIGHT * SAME_LOCAL_PART_SIMILARITY
+    else:
+        total = 0.0
+
+    if first.address is None or second.address is None:
+        total += ADDRESS_WEIGHT * MISSING_SIMILARITY
+    elif first.address == second.address:
+        total += ADDRESS_WEIGHT
+    elif first.numbers == second.numbers:
+        # Same house number: the share of words in common (Jaccard similarity)
+        total += ADDRESS_WEIGHT * len(first.address & second.address) / len(first.address | second.address)
+    return total
+
+
+def score(first, second):
+    """
+    Scores how likely two contacts are to be the same person.
+
+    The score is a weighted similarity of the first names, last names (either way round),
+    emails and addresses. A field that only one of the contacts has counts as a weak match.
+    Phone numbers are ignored: the phone book never holds the same one twice.
+
+    Parameters:
+    -----------
+    first : Contact
+        One contact.
+    second : Contact
+        The other contact.
+
+    Returns:
+    --------
+    float
+        The score, from 0.0 (nothing alike) to 1.0 (every field the same).
+    """
+    first, second = _profile(first), _profile(second)
+    return round(_name_similarity(first, second) + _details_similarity(first, second), 6)
+
+
+def _added(contact):
+    """Returns the sort key putting contacts in the order they were added, ties by phone number."""
+    return contact.time_added, contact.phone_key
+
+
+def _block_pairs(block, profiles, max_block, window):
+    """Returns the index pairs to compare in one block, and whether they are all its pairs."""
+    if len(block) <= max_block:
+        return combinations(block, 2), True
+    # Too common a key: compare neighbours in full-name order only
+    block = sorted(block, key=lambda index: (profiles[index].first_name, profiles[index].last_name))
+    return ((block[position], block[other]) for position in range(len(block))
+            for other in range(position + 1, min(position + 1 + window, len(block)))), False
+
+
+@instrumented()
+def find_duplicates(contacts, threshold=SUGGEST_THRESHOLD, max_block=MAX_BLOCK, window=WINDOW):
+    """
+    Finds the pairs of contacts that are likely to be the same person.
+
+    Instead of comparing every pair, contacts are grouped into blocks by each of their
+    blocking keys (see blocking_keys), and only contacts in the same block are scored.
+    A block larger than max_block is sorted by full name and each contact is only compared
+    with its next window neighbours. The work therefore grows with the number of contacts
+    and the size of their blocks, not with the square of the number of contacts.
+
+    Parameters:
+    -----------
+    contacts : iterable of Contact
+        The contacts to search, e.g. PhoneBook.contacts.
+    threshold : float, optional
+        The lowest score reported (default is SUGGEST_THRESHOLD).
+    max_block : int, optional
+        The largest block compared pair by pair (default is MAX_BLOCK).
+    window : int, optional
+        The number of neighbours each contact of a larger block is compared with
+        (default is WINDOW).
+
+    Returns:
+    --------
+    list of DuplicatePair
+        The pairs scoring at least threshold, highest score first, then earliest added.
+        Each pair is reported once, with the contact added earlier first.
+    """
+    contacts = list(contacts)
+    registry.scanned(len(contacts))
+    profiles = [_profile(contact) for contact in contacts]
+    keys = [_keys(profile) for profile in profiles]
+    windowed = set()  # (key position, key) of the blocks whose pairs were not all compared
+
+    pairs = {}  # (index, index) -> score, the lower index first
+    for position in range(len(_KEY_NAMES)):
+        blocks = {}
+        for index, contact_keys in enumerate(keys):
+            key = contact_keys[position]
+            if key is not None:
+                blocks.setdefault(key, []).append(index)
+
+        for key, block in blocks.items():
+            if len(block) < 2:
+                continue
+            candidates, complete = _block_pairs(block, profiles, max_block, window)
+            if not complete:
+                windowed.add((position, key))
+            for first, second in candidates:
+                first_keys, second_keys = keys[first], keys[second]
+                # Already scored in the block of an earlier key both contacts share
+                if any(first_keys[earlier] is not None and first_keys[earlier] == second_keys[earlier]
+                       and (earlier, first_keys[earlier]) not in windowed for earlier in range(position)):
+                    continue
+                first_profile, second_profile = profiles[first], profiles[second]
+                pair_score = _details_similarity(first_profile, second_profile)
+                # Names are compared last, as the edit distance is the slowest part, and only
+                # if the pair can still reach the threshold
+                if pair_score + FIRST_NAME_WEIGHT + LAST_NAME_WEIGHT < threshold:
+                    continue
+                pair_score = round(pair_score + _name_similarity(first_profile, second_profile), 6)
+                if pair_score >= threshold:
+                    # A pair can be met again in a later block if it was not in the window of a larger one
+                    pairs[min(first, second), max(first, second)] = pair_score
+        del blocks
+
+    results = []
+    for (first, second), pair_score in pairs.items():
+        first, second = contacts[first], contacts[second]
+        if _added(second) < _added(first):
+            first, second = second, first
+        results.append(DuplicatePair(pair_score, first, second))
+    results.sort(key=lambda pair: (-pair.score, _added(pair.first)))
+    return results
+
+
+def group_duplicates(pairs, threshold=MERGE_THRESHOLD):
+    """
+    Groups duplicate pairs into sets of contacts that are all the same person.
+
+    Pairs are joined transitively: if A matches B and B matches C, all three form one group.
+
+    Parameters:
+    -----------
+    pairs : iterable of DuplicatePair
+        The pairs, e.g. from find_duplicates.
+    threshold : float, optional
+        Only pairs scoring at least this are grouped (default is MERGE_THRESHOLD).
+
+    Returns:
+    --------
+    list of list of Contact
+        The groups, each sorted by time_added (then phone number), so the contact added
+        first comes first; the groups are in the same order.
+    """
+    parent = {}  # phone key -> phone key of a contact in the same group, the group's root pointing at itself
+    members = {}
+
+    def root(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]  # Path halving keeps the chains short
+            key = parent[key]
+        return key
+
+    for pair in pairs:
+        if pair.score < threshold:
+            continue
+        for contact in (pair.first, pair.second):
+            if contact.phone_key not in parent:
+                parent[contact.phone_key] = contact.phone_key
+                members[contact.phone_key] = contact
+        first, second = root(pair.first.phone_key), root(pair.second.phone_key)
+        if first != second:
+            parent[second] = first
+
+    groups = {}
+    for key, contact in members.items():
+        groups.setdefault(root(key), []).append(contact)
+    groups = [sorted(group, key=_added) for group in groups.values()]
+    return sorted(groups, key=lambda group: _added(group[0]))
+
+
+@instrumented()
+def merge_duplicates(phone_book, groups):
+    """
+    Merges each group of duplicate contacts into the one added first.
+
+    The earliest contact keeps its names, phone number and time_added. An email or address
+    it lacks is taken from the next contact in the group that has one. The other contacts
+    are deleted, and a Merge is logged for each of them in the audit trail.
+
+    Parameters:
+    -----------
+    phone_book : PhoneBook
+        The phone book holding the contacts.
+    groups : iterable of list of Contact
+        Groups of contacts that are the same person, e.g. from group_duplicates, each
+        sorted by time_added.
+
+    Returns:
+    --------
+    list of Contact
+        The contacts merged away, which were deleted from the phone book.
+    """
+    changes = []
+    duplicates = []
+    for group in groups:
+        kept, others = group[0], group[1:]
+        fields = {}
+        for field in ('email', 'address'):
+            if not getattr(kept, field):
+                value = next((getattr(other, field) for other in others if getattr(other, field)), None)
+                if value:
+                    fields[field] = value
+        if fields:
+            changes.append((kept.phone_key, fields))
+        duplicates.extend(others)
+
+    if changes:
+        phone_book.update_many(changes)
+    removed = [contact for contact in phone_book.delete_many([contact.phone_key for contact in duplicates])
+               if contact is not None]
+    phone_book.log_many("Merge", removed)
+    return removed
@@ -1,12 +1,22 @@
+import argparse
 import sys
-# Regular expression library for validating
-import re
-
-# Pandas library for reading CSV files
-import pandas as pd
+from datetime import datetime
 
+from auditFormat import BinaryAuditLogger
+from batchMode import run_batch
+from pagination import pages
 from phoneBook import PhoneBook
+from persistence import PersistentPhoneBook
+from shardedPhoneBook import PARTITIONS, ShardedPhoneBook
+from storage import ColumnarBackend, SQLiteBackend
 from contact import Contact
+from csvImport import EmptyCSVError, import_file
+from dedup import MERGE_THRESHOLD, find_duplicates, group_duplicates, merge_duplicates
+from metrics import registry
+from validation import validate_email, validate_phone
+
+# Number of contacts shown before asking whether to show more
+PAGE_SIZE = 20
 
 def display_menu():
     """
@@ -19,42 +29,10 @@ def display_menu():
     print("4. Update Contact")
     print("5. Delete Contact")
     print("6. View Audit History")
-    print("7. Quit")
-
-
-def validate_phone(phone):
-    """
-    Validates a phone number based on the pattern (###) ###-####.
-
-    Parameters:
-    -----------
-    phone : str
-        The phone number to be validated.
-
-    Returns:
-    --------
-    bool
-        True if the phone number matches the pattern, False otherwise.
-    """
-    pattern = r'^\(\d{3}\) \d{3}-\d{4}$'
-    return re.match(pattern, phone) is not None
+    print("7. Stats")
+    print("8. Find Duplicates")
+    print("9. Quit")
 
-def validate_email(email):
-    """
-    Validates an email address using a basic regex pattern.
-
-    Parameters:
-    -----------
-    email : str
-        The email to be validated.
-
-    Returns:
-    --------
-    bool
-        True if the email matches the pattern, False otherwise.
-    """
-    pattern = r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$'
-    return re.match(pattern, email) is not None
 
 def add_contact(phone_book):
     """
@@ -81,15 +59,15 @@ def add_contact(phone_book):
 
             # Ensure phone number is unique and valid
             while True:
-                phone = input("Phone (###) ###-####: ")
+                phone = input("Phone (e.g. (###) ###-####): ")
 
+                # Any common format is accepted, e.g. ###-###-#### or +1 ### ### ####
                 if not validate_phone(phone):
-                    print("Invalid phone number format. Please enter in the format (###) ###-####.")
+                    print("Invalid phone number. Please enter a ten-digit number such as (###) ###-####.")
                     continue
 
                 # Check if the phone number is already in use
-                existing_contacts = phone_book.search_by_phone(phone)
-                if existing_contacts:
+                if phone_book.has_phone(phone):
                     print("This phone number is already in use. Please enter a different phone number.")
                 else:
                     break  # Phone number is valid and unique
@@ -115,41 +93,18 @@ def add_contact(phone_book):
             csv_file = input("Enter the path to the CSV file: ")
 
             try:
-                # Read the CSV file into a DataFrame
-                df = pd.read_csv(csv_file)
-
-                if 'First Name' in df.columns and 'Last Name' in df.columns and 'Phone' in df.columns:
-                    # Iterate through the DataFrame rows
-                    for index, row in df.iterrows():
-                        # Validate phone number
-                        phone = row['Phone']
-                        if not validate_phone(phone):
-                            print(f"Invalid phone number format exist.")
-                            break
-
-                        # Check if the phone number is already in use
-                        existing_contacts = phone_book.search_by_phone(phone)
-                        if existing_contacts:
-                            print(f"Phone number {phone} is already in use.")
-                            break
-
-                        # Validate email if provided
-                        email = row.get('Email', None)
-                        if email and not validate_email(email):
-                            print(f"Invalid email format exist.")
-                            break
-
-                        # Create the contact and add it to the phone book
-                        contact = Contact(row['First Name'], row['Last Name'], phone, email, row.get('Address', None))
-                        phone_book.add(contact)
-                        phone_book.log("Add", contact)
-                        print(f"Added contact {row['First Name']} {row['Last Name']}.")
+                # Bad rows are reported instead of stopping the import; large files use all CPUs
+                report = import_file(phone_book, csv_file)
+
+                print(report.summary())
+                for line_number, reason in report.rejects:
+                    print(f"Line {line_number}: {reason}.")
 
                 break
 
             except FileNotFoundError:
                 print(f"File {csv_file} not found.")
-            except pd.errors.EmptyDataError:
+            except EmptyCSVError:
                 print("The CSV file is empty.")
             except Exception as e:
                 print(f"An error occurred: {e}")
@@ -159,28 +114,77 @@ def add_contact(phone_book):
 
 
 
+def show_pages(results, show, items="contacts"):
+    """
+    Shows paged results one page at a time, asking before each further page.
+
+    Parameters:
+    -----------
+    results : generator
+        Pages of results, as produced by pagination.pages with PAGE_SIZE.
+    show : callable
+        Displays one page.
+    items : str, optional
+        What the results are, for the prompt (default is "contacts").
+
+    Returns:
+    --------
+    bool
+        True if there was at least one result.
+    """
+    found = False
+    for page in results:
+        found = True
+        show(page)
+        if len(page) < PAGE_SIZE or input(f"Press Enter for more {items}, or q to stop: ").strip().lower() == "q":
+            break
+    results.close()
+    return found
+
+
 def view_contacts(phone_book):
     """
-    Displays all contacts in the phone book, sorted alphabetically by last name.
+    Displays all contacts in the phone book, sorted alphabetically by last name, a page
+    at a time.
 
     Parameters:
     -----------
     phone_book : PhoneBook
         The phone book containing the contacts to display.
     """
-    contacts = phone_book.sort()
+    def show(page):
+        for contact in page:
+            print(f"{contact.first_name} {contact.last_name} \nPhone: {contact.phone} \nEmail: {contact.email} "
+                  f"\nAddress: {contact.address} \nTime Added: {contact.time_added}\n")
 
-    if not contacts:
+    # The sorted contacts are read lazily, a page at a time as they are shown
+    if not show_pages(pages(phone_book.sort, page_size=PAGE_SIZE), show):
         print("No contacts found.")
         return
 
-    for contact in contacts:
-        print(f"{contact.first_name} {contact.last_name} \nPhone: {contact.phone} \nEmail: {contact.email} "
-              f"\nAddress: {contact.address} \nTime Added: {contact.time_added}\n")
-
     phone_book.log("View")
 
 
+def show_search_results(phone_book, results):
+    """
+    Displays search results a page at a time, logging a search for every contact shown.
+
+    Parameters:
+    -----------
+    phone_book : PhoneBook
+        The phone book that was searched.
+    results : generator
+        Pages of the matching contacts.
+    """
+    def show(page):
+        for contact in page:
+            print(f"{contact.first_name} {contact.last_name}, Phone: {contact.phone}")
+        phone_book.log_many("Search", page)
+
+    if not show_pages(results, show):
+        print("No contacts found.")
+
+
 def search_contacts(phone_book):
     """
     Allows searching for contacts by name, phone number, or date range.
@@ -197,40 +201,35 @@ def search_contacts(phone_book):
         print("1. Search by name")
         print("2. Search by phone number")
         print("3. Search by date range")
+        print("4. Search by name, allowing typos")
 
         input_choice = input("Enter your choice: ")
 
         # Search by name if choice is 1
         if input_choice == "1":
             query = input("Enter the name to search: ")
-            results = phone_book.search_by_name(query)
-            if not results:
-                print("No contacts found.")
-            for contact in results:
-                print(f"{contact.first_name} {contact.last_name}, Phone: {contact.phone}")
-                phone_book.log("Search", contact)
+            show_search_results(phone_book, pages(phone_book.search_by_name, query, page_size=PAGE_SIZE))
             break
         # Search by phone number if choice is 2
         elif input_choice == "2":
-            query = input_phone_number()
-            results = phone_book.search_by_phone(query)
-            if not results:
-                print("No contacts found.")
-            for contact in results:
-                print(f"{contact.first_name} {contact.last_name}, Phone: {contact.phone}")
-                phone_book.log("Search", contact)
+            query = input("Enter the phone number (or part of it) to search: ")
+            show_search_results(phone_book, pages(phone_book.search_by_phone, query, page_size=PAGE_SIZE))
             break
 
         # Search by date range if choice is 3
         elif input_choice == "3":
             start_date = input("Enter the start date (YYYY-MM-DD): ")
             end_date = input("Enter the end date (YYYY-MM-DD): ")
-            results = phone_book.search_by_timeframe(start_date, end_date)
-            if not results:
-                print("No contacts found.")
-            for contact in results:
-                print(f"{contact.first_name} {contact.last_name}, Phone: {contact.phone}")
-                phone_book.log("Search", contact)
+            show_search_results(phone_book, pages(phone_book.search_by_timeframe, start_date, end_date,
+                                                  page_size=PAGE_SIZE))
+            break
+
+        # Fuzzy search by name if choice is 4
+        elif input_choice == "4":
+            query = input("Enter the name to search: ")
+            # Closest matches come first
+            show_search_results(phone_book, pages(phone_book.search_by_name_fuzzy, query, max_distance=2,
+                                                  page_size=PAGE_SIZE))
             break
         else:
             print("Invalid choice, please try again.")
@@ -247,7 +246,7 @@ def update_contact(phone_book):
     """
     phone = input("Enter phone number of the contact to update: ")
 
-    contact = phone_book.search_by_phone(phone)
+    contact = phone_book.get_by_phone(phone)
     first_name = input("New First Name (or leave blank to keep current): ")
     last_name = input("New Last Name (or leave blank to keep current): ")
     email = input("New Email (or leave blank to keep current): ")
@@ -267,7 +266,7 @@ def delete_contact(phone_book):
         The phone book containing the contact to delete.
     """
     phone = input("Enter phone number of the contact to delete: ")
-    contact = phone_book.search_by_phone(phone)
+    contact = phone_book.get_by_phone(phone)
     phone_book.delete(phone)
     phone_book.log("Delete", contact)
     print(f"Deleted contact with phone number {phone}.")
@@ -275,25 +274,159 @@ def delete_contact(phone_book):
 
 def view_audit_history(phone_book):
     """
-    Displays the audit history of operations performed on the phone book.
+    Displays the audit history of operations performed on the phone book, newest first,
+    one page at a time and optionally filtered by operation, contact name and date range.
 
     Parameters:
     -----------
     phone_book : PhoneBook
         The phone book whose audit history is to be displayed.
     """
-    history = phone_book.get_history()
-    for log in history:
-        print(log)
+    operation = input("Enter the operation to show (e.g. Add), or press Enter for all: ").strip()
+    name = input("Enter a contact name to filter by, or press Enter for all: ").strip()
+    start_date = input("Enter the start date (YYYY-MM-DD), or press Enter for none: ").strip()
+    end_date = input("Enter the end date (YYYY-MM-DD), or press Enter for none: ").strip()
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
+        # The end date includes the whole day
+        end = datetime.strptime(end_date, "%Y-%m-%d").replace(hour=23, minute=59, second=59) if end_date else None
+    except ValueError:
+        print("Invalid date format. Use YYYY-MM-DD format.")
+        return
+
+    def show(page):
+        for entry in page:
+            print(entry.line)
+
+    history_pages = phone_book.history(operation=operation or None, name=name or None, start=start, end=end,
+                                       page_size=PAGE_SIZE)
+    if not show_pages(history_pages, show, "entries"):
+        print("No log entries found.")
+
+
+def review_duplicates(phone_book):
+    """
+    Finds contacts that are likely the same person, then merges them into the contact added
+    first, either automatically for the closest matches or after asking about each pair.
+
+    Parameters:
+    -----------
+    phone_book : PhoneBook
+        The phone book to search for duplicates.
+    """
+    print("Searching for duplicates...")
+    pairs = find_duplicates(phone_book.contacts)
+    if not pairs:
+        print("No duplicates found.")
+        return
+    closest = [pair for pair in pairs if pair.score >= MERGE_THRESHOLD]
+    print(f"Found {len(pairs)} likely duplicates, {len(closest)} of them scoring at least {MERGE_THRESHOLD}.")
+    print(f"1. Merge the pairs scoring at least {MERGE_THRESHOLD}")
+    print("2. Review every pair")
+    input_choice = input("Enter your choice, or press Enter to go back: ").strip()
+
+    if input_choice == "1":
+        accepted = closest
+    elif input_choice == "2":
+        accepted = []
+        for pair in pairs:
+            print(f"\nScore {pair.score:.2f}")
+            for contact in (pair.first, pair.second):
+                print(f"{contact.first_name} {contact.last_name}, Phone: {contact.phone}, Email: {contact.email}, "
+                      f"Address: {contact.address}, Added: {contact.time_added}")
+            answer = input("Merge the second contact into the first? (y/n, or q to stop): ").strip().lower()
+            if answer == "q":
+                break
+            if answer == "y":
+                accepted.append(pair)
+    elif not input_choice:
+        return
+    else:
+        print("Invalid choice, please try again.")
+        return
+    if not accepted:
+        print("No contacts merged.")
+        return
+
+    removed = merge_duplicates(phone_book, group_duplicates(accepted, threshold=0.0))
+    print(f"Merged {len(removed)} duplicate contacts.")
+
+
+def show_stats():
+    """
+    Prints a table of the operations recorded by the metrics registry: call counts,
+    latency percentiles, result sizes and contacts scanned.
+    """
+    operations = registry.snapshot()
+    if not operations:
+        print("No operations recorded yet." if registry.enabled else "Metrics are disabled.")
+        return
+    print(f"{'Operation':<22} {'Calls':>8} {'Errors':>6} {'p50 ms':>9} {'p99 ms':>9} {'Max ms':>9} "
+          f"{'Results':>10} {'Scanned':>12}")
+    for name, stats in operations.items():
+        print(f"{name:<22} {stats['calls']:>8} {stats['errors']:>6} {stats['p50_ms']:>9.3f} {stats['p99_ms']:>9.3f} "
+              f"{stats['max_ms']:>9.3f} {stats['results']:>10} {stats['scanned']:>12}")
 
 
-def main():
+def view_stats():
     """
-    The main function that runs the phone book application, allowing users to perform operations
-    like adding, viewing, searching, updating, and deleting contacts.
+    Shows the operation statistics and lets the user export them, reset them, or run the
+    sampling profiler and read its report.
+    """
+    while True:
+        show_stats()
+        print("\n1. Export as JSON")
+        print("2. Export as Prometheus text")
+        print(f"3. {'Stop' if registry.profiling else 'Start'} the sampling profiler")
+        print("4. Show a profiler report")
+        print("5. Reset the statistics")
+        input_choice = input("Enter your choice, or press Enter to go back: ").strip()
+
+        if input_choice in ("1", "2"):
+            path = input("Enter the file to write: ").strip()
+            if not path:
+                continue
+            text = registry.to_json() + "\n" if input_choice == "1" else registry.to_prometheus()
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(text)
+            print(f"Statistics written to {path}.")
+        elif input_choice == "3":
+            if registry.profiling:
+                registry.stop_profiling()
+                print("Profiler stopped.")
+            else:
+                every = input("Profile one call in how many? (default 100): ").strip()
+                if every and not every.isdigit():
+                    print("Invalid number, please try again.")
+                    continue
+                registry.start_profiling(int(every) if every else 100)
+                print("Profiler started.")
+        elif input_choice == "4":
+            operations = registry.profiled_operations()
+            if not operations:
+                print("No profiler samples yet; start the profiler first.")
+                continue
+            print("Operations with samples: " + ", ".join(operations))
+            report = registry.profile_report(input("Enter the operation: ").strip())
+            print(report if report is not None else "No samples for that operation.")
+        elif input_choice == "5":
+            registry.reset()
+            print("Statistics reset.")
+        elif not input_choice:
+            return
+        else:
+            print("Invalid choice, please try again.")
+
+
+def run_menu(phone_book):
     """
-    phone_book = PhoneBook()
+    Shows the menu and runs the selected operations until the user quits.
 
+    Parameters:
+    -----------
+    phone_book : PhoneBook
+        The phone book to operate on.
+    """
     while True:
         try:
             display_menu()
@@ -312,6 +445,10 @@ def main():
             elif choice == "6":
                 view_audit_history(phone_book)
             elif choice == "7":
+                view_stats()
+            elif choice == "8":
+                review_duplicates(phone_book)
+            elif choice == "9":
                 sys.exit()
             else:
                 print("Invalid choice, please try again.")
@@ -322,6 +459,101 @@ def main():
         except Exception as e:
             print(f"\nAn error occurred: {e}, please try again.")
 
+
+def parse_arguments(argv=None):
+    """
+    Parses the command line options.
+
+    Parameters:
+    -----------
+    argv : list of str, optional
+        The arguments to parse (default is sys.argv[1:]).
+
+    Returns:
+    --------
+    argparse.Namespace
+        The parsed options. serve, if given, is split into a (host, port) tuple, with an
+        empty host for the default one.
+    """
+    parser = argparse.ArgumentParser(description="Phone Book Application")
+    storage = parser.add_mutually_exclusive_group()
+    storage.add_argument('--data-dir', help="Directory to keep contacts in across restarts "
+                                            "(default is to keep them in memory only).")
+    storage.add_argument('--database', help="SQLite database file to store contacts in.")
+    storage.add_argument('--columnar', action='store_true',
+                         help="Store contacts in compact columns, using less memory but slower searches.")
+    parser.add_argument('--shards', type=int, metavar='N',
+                        help="Partition the contacts across N worker processes, to use several cores.")
+    parser.add_argument('--partition', choices=PARTITIONS, default='hash',
+                        help="How --shards assigns contacts: by a hash of the phone number (the default) "
+                             "or by area code.")
+    parser.add_argument('--binary-audit', action='store_true',
+                        help="Write the audit log as structured binary records to phonebook.alog.")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="Apply the operations in FILE ('-' for standard input) instead of showing the menu.")
+    parser.add_argument('--batch-format', choices=['jsonl', 'csv'],
+                        help="The format of the batch file (default is csv for .csv files, otherwise jsonl).")
+    parser.add_argument('--serve', metavar='[HOST:]PORT',
+                        help="Serve the phone book over HTTP/JSON on PORT instead of showing the menu.")
+    parser.add_argument('--no-metrics', action='store_true',
+                        help="Do not record operation statistics (shown under Stats and served at /metrics).")
+    arguments = parser.parse_args(argv)
+    if arguments.shards is not None:
+        if arguments.shards < 1:
+            parser.error("--shards must be at least 1")
+        if arguments.data_dir or arguments.database:
+            parser.error("--shards keeps contacts in memory; it cannot be used with --data-dir or --database")
+    if arguments.serve is not None:
+        host, _, port = arguments.serve.rpartition(':')
+        if not port.isdigit() or int(port) > 65535:
+            parser.error(f"--serve needs a port number from 0 to 65535, as [HOST:]PORT, not '{arguments.serve}'")
+        if host.startswith('[') and host.endswith(']'):
+            host = host[1:-1]  # An IPv6 address written as [::1]:8080
+        arguments.serve = (host, int(port))
+    return arguments
+
+
+def main(argv=None):
+    """
+    The main function that runs the phone book application, allowing users to perform operations
+    like adding, viewing, searching, updating, and deleting contacts.
+
+    Parameters:
+    -----------
+    argv : list of str, optional
+        The command line arguments (default is sys.argv[1:]).
+    """
+    arguments = parse_arguments(argv)
+    if not arguments.no_metrics:
+        registry.enable()
+    audit_logger = BinaryAuditLogger() if arguments.binary_audit else None
+    if arguments.shards:
+        backend = ColumnarBackend if arguments.columnar else None
+        phone_book = ShardedPhoneBook(arguments.shards, arguments.partition, backend, audit_logger)
+    elif arguments.data_dir:
+        phone_book = PersistentPhoneBook(arguments.data_dir, audit_logger=audit_logger)
+    elif arguments.database:
+        phone_book = PhoneBook(SQLiteBackend(arguments.database), audit_logger)
+    elif arguments.columnar:
+        phone_book = PhoneBook(ColumnarBackend(), audit_logger)
+    else:
+        phone_book = PhoneBook(audit_logger=audit_logger)
+
+    try:
+        if arguments.batch:
+            report = run_batch(phone_book, arguments.batch, arguments.batch_format)
+            # Results go to standard output, so keep the summary apart from them
+            print(report.summary(), file=sys.stderr)
+        elif arguments.serve:
+            # Imported only when serving, as asyncio and its dependencies slow every launch down
+            from phoneServer import DEFAULT_HOST, serve
+            host, port = arguments.serve
+            serve(phone_book, host or DEFAULT_HOST, port)
+        else:
+            run_menu(phone_book)
+    finally:
+        phone_book.close()
+
 # Run the main function
 if __name__ == "__main__":
     main()
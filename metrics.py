@@ -0,0 +1,459 @@
+import functools
+import io
+import json
+import math
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds of the latency histogram buckets, in seconds: from 1 microsecond to about
+# two minutes, each a quarter of a power of two above the previous one, so that a
+# percentile read from the histogram is within 19% of the true value
+BUCKET_BOUNDS = [1e-6 * 2 ** (step / 4) for step in range(108)]
+# Every fourth bound is a power of two; only these are exported to Prometheus
+PROMETHEUS_BUCKETS = range(0, len(BUCKET_BOUNDS), 4)
+
+
+class LatencyHistogram:
+    """
+    Counts durations in logarithmic buckets, to report percentiles in constant memory.
+
+    Attributes:
+    -----------
+    count : int
+        The number of durations recorded.
+    total : float
+        Their sum, in seconds.
+    max : float
+        The longest one, in seconds.
+    """
+
+    def __init__(self):
+        """Initializes an empty histogram."""
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)  # The last bucket counts anything longer
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        """Adds one duration, in seconds."""
+        self.buckets[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        """
+        Estimates a percentile of the recorded durations.
+
+        Parameters:
+        -----------
+        fraction : float
+            The percentile as a fraction, e.g. 0.99.
+
+        Returns:
+        --------
+        float
+            The upper bound of the bucket holding the percentile, at most the longest
+            duration recorded, in seconds; 0.0 if nothing was recorded.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= rank:
+                return min(BUCKET_BOUNDS[index], self.max) if index < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+
+class OperationStats:
+    """
+    What is recorded for one operation.
+
+    Attributes:
+    -----------
+    calls : int
+        The number of completed calls, including failed ones.
+    errors : int
+        The number of calls that raised an exception.
+    latency : LatencyHistogram
+        The duration of every call.
+    results : int
+        The total size of the results (contacts found, added, logged...), over the calls
+        that report one.
+    scanned : int
+        The total number of contacts examined to produce them, over the calls that report one.
+    """
+
+    def __init__(self):
+        """Initializes the statistics of an operation that was never called."""
+        self.calls = 0
+        self.errors = 0
+        self.latency = LatencyHistogram()
+        self.results = 0
+        self.scanned = 0
+
+    def summary(self):
+        """Returns the statistics as a dict, with latencies in milliseconds."""
+        latency = self.latency
+        return {'calls': self.calls, 'errors': self.errors,
+                'p50_ms': latency.percentile(0.5) * 1000, 'p99_ms': latency.percentile(0.99) * 1000,
+                'max_ms': latency.max * 1000,
+                'mean_ms': latency.total / latency.count * 1000 if latency.count else 0.0,
+                'results': self.results, 'scanned': self.scanned}
+
+
+class _ScanCount:
+    """
+    The number of contacts examined by one instrumented call.
+
+    A lazy result can be read after its call has returned and been recorded; what is
+    examined then is added to the operation's statistics directly.
+    """
+
+    __slots__ = ('operation', 'count', 'recorded')
+
+    def __init__(self, operation):
+        """Initializes the count of a call that has examined nothing yet."""
+        self.operation = operation
+        self.count = 0
+        self.recorded = False
+
+
+class MetricsRegistry:
+    """
+    Collects per-operation call counts, latency histograms, result sizes and contacts scanned.
+
+    Recording is off until enable() is called. While off, an instrumented call costs one
+    attribute check on top of the call itself. The registry is safe to use from several
+    threads.
+
+    A sampling profiler can also be started: one call in every N of each operation then
+    runs under cProfile, and the samples are accumulated per operation.
+
+    Attributes:
+    -----------
+    enabled : bool
+        Whether calls are being recorded.
+    """
+
+    def __init__(self):
+        """Initializes a disabled, empty registry."""
+        self.enabled = False
+        self._operations = {}  # operation name -> OperationStats
+        self._lock = threading.Lock()
+        self._local = threading.local()  # Per-thread _ScanCount of the instrumented call in progress
+        self._profile_every = 0  # Profile one call in this many, or 0 for none
+        self._profiles = {}  # operation name -> cProfile.Profile accumulating its samples
+        self._profiling = threading.Lock()  # Held while a sampled call runs; only one profiler can be active
+
+    def enable(self):
+        """Starts recording."""
+        self.enabled = True
+
+    def disable(self):
+        """Stops recording. What was recorded so far is kept."""
+        self.enabled = False
+
+    def reset(self):
+        """Forgets everything recorded so far, including profiler samples."""
+        with self._lock:
+            self._operations = {}
+            self._profiles = {}
+
+    def start_profiling(self, every=100):
+        """
+        Profiles one call in every `every` calls of each operation with cProfile.
+
+        Parameters:
+        -----------
+        every : int, optional
+            The sampling interval (default is 100). 1 profiles every call.
+        """
+        self._profile_every = max(1, every)
+
+    def stop_profiling(self):
+        """Stops taking profiler samples. The samples taken so far are kept."""
+        self._profile_every = 0
+
+    @property
+    def profiling(self):
+        """bool: Whether profiler samples are being taken."""
+        return bool(self._profile_every)
+
+    def scanned(self, count):
+        """
+        Adds to the number of contacts examined by the instrumented call in progress.
+
+        Storage backends call this with the number of candidates or rows they check.
+        It does nothing while the registry is disabled or outside an instrumented call.
+
+        Parameters:
+        -----------
+        count : int
+            The number of contacts examined.
+        """
+        counter = getattr(self._local, 'counter', None)
+        if self.enabled and counter is not None:
+            self._add_scanned(counter, count)
+
+    def counting(self, items):
+        """
+        Returns an iterator over the items that counts each one as scanned.
+
+        The items are charged to the instrumented call in progress when counting() is
+        called, not when they are read, so a lazy result read after its call has returned
+        still counts towards that call's operation and no other.
+
+        Parameters:
+        -----------
+        items : iterable
+            The contacts or rows a backend examines.
+
+        Returns:
+        --------
+        iterator
+            The same items.
+        """
+        counter = getattr(self._local, 'counter', None) if self.enabled else None
+        if counter is None:
+            return iter(items)
+        return self._counting(counter, items)
+
+    def _counting(self, counter, items):
+        """Yields the items, adding each one to a call's scan count."""
+        late = 0  # Read after the call was recorded, added once the iteration ends
+        try:
+            for item in items:
+                if counter.recorded:
+                    late += 1
+                else:
+                    counter.count += 1
+                yield item
+        finally:
+            if late:
+                self._add_scanned(counter, late)
+
+    def _add_scanned(self, counter, count):
+        """Adds to a call's scan count, or to its operation's statistics once the call is recorded."""
+        if not counter.recorded:
+            counter.count += count
+            return
+        with self._lock:
+            stats = self._operations.get(counter.operation)
+            if stats is not None:
+                stats.scanned += count
+
+    def record(self, operation, seconds, results=None, scanned=None, error=False):
+        """
+        Records one call of an operation.
+
+        Parameters:
+        -----------
+        operation : str
+            The operation name, e.g. 'search_by_name'.
+        seconds : float
+            How long the call took.
+        results : int, optional
+            The size of its result, if it has one.
+        scanned : int, optional
+            The number of contacts it examined, if known.
+        error : bool, optional
+            Whether it raised an exception (default is False).
+        """
+        with self._lock:
+            stats = self._operations.get(operation)
+            if stats is None:
+                stats = self._operations[operation] = OperationStats()
+            stats.calls += 1
+            stats.errors += error
+            stats.latency.record(seconds)
+            if results is not None:
+                stats.results += results
+            if scanned is not None:
+                stats.scanned += scanned
+
+    def _sample(self, operation, calls):
+        """Returns the profiler to run this call under, or None if it is not sampled."""
+        if not self._profile_every or calls % self._profile_every:
+            return None
+        if not self._profiling.acquire(blocking=False):
+            return None  # Another call is being profiled
+        # The profiler modules are only loaded once profiling is used, to keep startup fast
+        import cProfile
+        with self._lock:
+            profile = self._profiles.get(operation)
+            if profile is None:
+                profile = self._profiles[operation] = cProfile.Profile()
+        return profile
+
+    def call(self, operation, function, args, kwargs, size):
+        """Calls an instrumented function, recording its duration, result size and contacts scanned."""
+        local = self._local
+        outer = getattr(local, 'counter', None)
+        counter = local.counter = _ScanCount(operation)
+        stats = self._operations.get(operation)
+        profile = self._sample(operation, stats.calls + 1 if stats is not None else 1)
+        if profile is not None:
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiler is already active, e.g. the whole program runs under cProfile
+                self._profiling.release()
+                profile = None
+        error = False
+        result = None
+        started = time.perf_counter()
+        try:
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                if profile is not None:
+                    profile.disable()
+                    self._profiling.release()
+            return result
+        except BaseException:
+            error = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            local.counter = outer
+            scanned = counter.count
+            if outer is not None:
+                outer.count += scanned
+            results = size(result) if size is not None and not error else None
+            self.record(operation, elapsed, results, scanned or None, error)
+            counter.recorded = True
+
+    def snapshot(self):
+        """
+        Returns the statistics of every operation called so far.
+
+        Returns:
+        --------
+        dict
+            Operation name -> OperationStats.summary(), sorted by name.
+        """
+        with self._lock:
+            return {name: self._operations[name].summary() for name in sorted(self._operations)}
+
+    def to_json(self):
+        """Returns the statistics of every operation as a JSON document."""
+        return json.dumps({'enabled': self.enabled, 'operations': self.snapshot()}, indent=2)
+
+    def to_prometheus(self, prefix='phonebook'):
+        """
+        Returns the statistics in the Prometheus text exposition format.
+
+        Parameters:
+        -----------
+        prefix : str, optional
+            The prefix of every metric name (default is 'phonebook').
+
+        Returns:
+        --------
+        str
+            A latency histogram and counters for calls, errors, results and contacts
+            scanned, labelled by operation.
+        """
+        with self._lock:
+            operations = [(name, self._operations[name]) for name in sorted(self._operations)]
+            metric = f'{prefix}_operation_duration_seconds'
+            lines = [f'# HELP {metric} Duration of phone book operations.', f'# TYPE {metric} histogram']
+            for name, stats in operations:
+                label = f'operation="{_escape(name)}"'
+                cumulative, seen = 0, 0
+                for index in PROMETHEUS_BUCKETS:
+                    cumulative += sum(stats.latency.buckets[seen:index + 1])
+                    seen = index + 1
+                    bound = f'{BUCKET_BOUNDS[index]:.6g}'
+                    lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {stats.latency.count}')
+                lines.append(f'{metric}_sum{{{label}}} {stats.latency.total:.9g}')
+                lines.append(f'{metric}_count{{{label}}} {stats.latency.count}')
+            for metric, attribute, description in (('calls', 'calls', 'Calls of phone book operations.'),
+                                                   ('errors', 'errors', 'Calls that raised an exception.'),
+                                                   ('results', 'results', 'Size of the operation results.'),
+                                                   ('scanned', 'scanned', 'Contacts examined by the operations.')):
+                lines.append(f'# HELP {prefix}_operation_{metric}_total {description}')
+                lines.append(f'# TYPE {prefix}_operation_{metric}_total counter')
+                for name, stats in operations:
+                    lines.append(f'{prefix}_operation_{metric}_total{{operation="{_escape(name)}"}} '
+                                 f'{getattr(stats, attribute)}')
+        return '\n'.join(lines) + '\n'
+
+    def profile_report(self, operation, limit=20):
+        """
+        Returns the accumulated profiler samples of an operation as text.
+
+        Parameters:
+        -----------
+        operation : str
+            The operation name.
+        limit : int, optional
+            The number of functions to list (default is 20).
+
+        Returns:
+        --------
+        str or None
+            The functions with the most cumulative time, or None if the operation has no samples.
+        """
+        with self._lock:
+            profile = self._profiles.get(operation)
+        if profile is None:
+            return None
+        import pstats
+        output = io.StringIO()
+        pstats.Stats(profile, stream=output).sort_stats('cumulative').print_stats(limit)
+        return output.getvalue()
+
+    def profiled_operations(self):
+        """Returns the names of the operations that have profiler samples, sorted."""
+        with self._lock:
+            return sorted(self._profiles)
+
+
+def _escape(value):
+    """Escapes a Prometheus label value."""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def result_size(result):
+    """Returns the length of a collection result, or None for anything else (such as a lazy iterator)."""
+    return len(result) if isinstance(result, (list, tuple, dict, set)) else None
+
+
+# The registry every instrumented function records into
+registry = MetricsRegistry()
+
+
+def instrumented(operation=None, size=result_size):
+    """
+    Decorates a function so that its calls are recorded in the registry while it is enabled.
+
+    Parameters:
+    -----------
+    operation : str, optional
+        The name to record calls under (default is the function's name).
+    size : callable, optional
+        Returns the size of a result (default is result_size, the length of a collection),
+        or None if the operation's results have no size worth recording.
+
+    Returns:
+    --------
+    callable
+        The decorator.
+    """
+    def decorate(function):
+        name = operation or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return function(*args, **kwargs)
+            return registry.call(name, function, args, kwargs, size)
+        return wrapper
+    return decorate
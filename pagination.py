@@ -0,0 +1,81 @@
+import heapq
+from itertools import islice
+
+
+def paginate(results, limit=None, offset=0):
+    """
+    Returns one page of a result, reading no further into it than the page needs.
+
+    Parameters:
+    -----------
+    results : iterable
+        The full result, e.g. a lazy backend query.
+    limit : int, optional
+        The most items to return (default is None, every item after offset).
+    offset : int, optional
+        The number of leading items to skip (default is 0).
+
+    Returns:
+    --------
+    list
+        The items from offset up to offset + limit.
+    """
+    if isinstance(results, list):
+        return results[offset:] if limit is None else results[offset:offset + limit]
+    return list(islice(results, offset, None if limit is None else offset + limit))
+
+
+def top_k(items, k, key):
+    """
+    Returns the k smallest items by a key, in order, without sorting all of them.
+
+    A heap of k items is kept while the input is scanned once, which takes O(n log k)
+    time and O(k) memory. Items with equal keys stay in input order, as with sorted().
+
+    Parameters:
+    -----------
+    items : iterable
+        The items to choose from.
+    k : int
+        The number of items to return.
+    key : callable
+        Returns the value to order an item by.
+
+    Returns:
+    --------
+    list
+        Up to k items, smallest key first.
+    """
+    return heapq.nsmallest(k, items, key=key)
+
+
+def pages(search, *args, page_size=20, **kwargs):
+    """
+    Lazily yields a query's results one page at a time.
+
+    The query is run once, search(*args, **kwargs), and each page is sliced off the
+    same iterator, so every page costs only its own page_size results rather than a new
+    search that skips all the earlier ones. A lazily produced result (such as
+    search_by_timeframe) is read no further than the pages consumed.
+
+    Parameters:
+    -----------
+    search : callable
+        A query method, e.g. PhoneBook.search_by_name or PhoneBook.sort.
+    *args, **kwargs
+        The query's own arguments.
+    page_size : int, optional
+        The number of results per page (default is 20).
+
+    Returns:
+    --------
+    generator
+        Non-empty lists of up to page_size results.
+    """
+    results = iter(search(*args, **kwargs))
+    while True:
+        page = list(islice(results, page_size))
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
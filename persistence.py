@@ -0,0 +1,390 @@
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+from contact import Contact
+from phoneBook import PhoneBook
+from storage import from_epoch_micros, to_epoch_micros
+from validation import format_phone
+
+# File header identifying a snapshot, followed by the number of contacts it holds
+SNAPSHOT_MAGIC = b'PBSNAP01'
+
+# Write-ahead log operation codes
+OP_ADD = b'A'  # A new contact
+OP_REPLACE = b'R'  # A stored contact changed; keyed by its phone number before the change
+OP_DELETE = b'D'  # A contact was deleted
+
+# Contacts loaded per add_many batch while restoring a phone book
+LOAD_BATCH_SIZE = 100_000
+
+_NONE_LENGTH = 0xFFFFFFFF  # String length marking a missing (None) value
+_LENGTH = struct.Struct('<I')
+_TIMESTAMP = struct.Struct('<q')
+_FRAME_HEADER = struct.Struct('<II')  # Payload length and CRC-32 of a log record
+_COUNT = struct.Struct('<Q')
+
+
+def _encode_string(value):
+    """Encodes an optional string as a length-prefixed UTF-8 field."""
+    if value is None:
+        return _LENGTH.pack(_NONE_LENGTH)
+    data = str(value).encode('utf-8')
+    return _LENGTH.pack(len(data)) + data
+
+
+def _decode_string(buffer, offset):
+    """Decodes a length-prefixed field, returning the value and the offset after it."""
+    (length,) = _LENGTH.unpack_from(buffer, offset)
+    offset += _LENGTH.size
+    if length == _NONE_LENGTH:
+        return None, offset
+    return str(buffer[offset:offset + length], 'utf-8'), offset + length
+
+
+def encode_contact(contact):
+    """
+    Encodes a contact as a compact binary record.
+
+    Parameters:
+    -----------
+    contact : Contact
+        The contact to encode.
+
+    Returns:
+    --------
+    bytes
+        The time_added in microseconds since the epoch, followed by the five text fields.
+    """
+    return _encode_fields(_fields(contact))
+
+
+def _fields(contact):
+    """Returns the stored field values of a contact, in record order."""
+    return contact.time_added, contact.first_name, contact.last_name, contact.phone, contact.email, contact.address
+
+
+def _encode_fields(fields):
+    """Encodes the field values returned by _fields as a contact record."""
+    time_added, first_name, last_name, phone, email, address = fields
+    return b''.join((
+        _TIMESTAMP.pack(to_epoch_micros(time_added)),
+        _encode_string(first_name),
+        _encode_string(last_name),
+        _encode_string(phone),
+        _encode_string(email),
+        _encode_string(address),
+    ))
+
+
+def decode_contact(buffer, offset=0):
+    """
+    Decodes a contact record written by encode_contact.
+
+    Parameters:
+    -----------
+    buffer : bytes-like
+        The buffer holding the record.
+    offset : int, optional
+        Where the record starts in the buffer (default is 0).
+
+    Returns:
+    --------
+    tuple
+        The decoded Contact and the offset just past the record.
+    """
+    (micros,) = _TIMESTAMP.unpack_from(buffer, offset)
+    offset += _TIMESTAMP.size
+    fields = []
+    for _ in range(5):
+        value, offset = _decode_string(buffer, offset)
+        fields.append(value)
+    first_name, last_name, phone, email, address = fields
+    contact = Contact(first_name, last_name, phone, email, address, from_epoch_micros(micros))
+    return contact, offset
+
+
+def _fsync_directory(path):
+    """Makes the renames and new files in a directory durable. Not needed, nor possible, on Windows."""
+    if os.name == 'nt':
+        return
+    descriptor = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+class PersistentPhoneBook(PhoneBook):
+    """
+    A phone book that keeps its contacts on disk across restarts.
+
+    The state is stored as a binary snapshot of all contacts plus an append-only
+    write-ahead log of the add, update and delete mutations made since. On startup
+    the latest snapshot is memory-mapped and loaded, then the log is replayed on top.
+    Compaction folds the log into a new snapshot in a background thread.
+
+    Files in the data directory are numbered by generation: snapshot.N holds the state
+    at the moment wal.N was started, so a crash at any point leaves a loadable pair.
+
+    Attributes:
+    -----------
+    directory : str
+        The directory holding the snapshot and log files.
+    """
+
+    def __init__(self, directory, sync=False, compact_bytes=64 * 1024 * 1024, audit_logger=None, cache_size=256):
+        """
+        Opens the phone book stored in a directory, creating it if needed.
+
+        Parameters:
+        -----------
+        directory : str
+            The directory holding the snapshot and log files.
+        sync : bool, optional
+            Whether to fsync the log after every mutation (default is False, which only
+            flushes to the operating system).
+        compact_bytes : int, optional
+            Start a background compaction once the log grows past this size
+            (default is 64 MiB). Use None to only compact when compact() is called.
+        audit_logger : AuditLogger, optional
+            Writes the audit log (default is an AuditLogger writing to phonebook.log).
+        cache_size : int, optional
+            The most search results to cache (default is 256). 0 disables the cache.
+        """
+        super().__init__(audit_logger=audit_logger, cache_size=cache_size)
+        self.directory = directory
+        self._sync = sync
+        self._compact_bytes = compact_bytes
+        # Held while a mutation is applied and logged, and while compact() rotates the log,
+        # so a snapshot never holds a change that is also in the new log. Reentrant, as an
+        # update calls back into _reindex_many.
+        self._lock = threading.RLock()
+        self._compaction = None
+        self._wal = None  # Mutations are not logged until the stored state is loaded
+
+        os.makedirs(directory, exist_ok=True)
+        self._generation = self._load()
+        self._wal = open(self._path('wal', self._generation), 'ab')
+
+    def _path(self, kind, generation):
+        """Returns the path of a snapshot or log file of the given generation."""
+        return os.path.join(self.directory, f'{kind}.{generation:08d}')
+
+    def _generations(self, kind):
+        """Returns the generation numbers of the existing files of one kind, in order."""
+        generations = []
+        for name in os.listdir(self.directory):
+            prefix, _, number = name.partition('.')
+            if prefix == kind and number.isdigit():
+                generations.append(int(number))
+        return sorted(generations)
+
+    def _load(self):
+        """Loads the latest snapshot and replays the logs after it, returning the current generation."""
+        snapshots = self._generations('snapshot')
+        generation = snapshots[-1] if snapshots else 0
+        if snapshots:
+            self._load_snapshot(self._path('snapshot', generation))
+
+        for wal_generation in self._generations('wal'):
+            if wal_generation >= generation:
+                self._replay(self._path('wal', wal_generation))
+                generation = wal_generation
+        return generation
+
+    def _load_snapshot(self, path):
+        """Adds every contact stored in a snapshot file."""
+        with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if buffer[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not a phone book snapshot.")
+            (count,) = _COUNT.unpack_from(buffer, len(SNAPSHOT_MAGIC))
+            offset = len(SNAPSHOT_MAGIC) + _COUNT.size
+
+            batch = []
+            for _ in range(count):
+                contact, offset = decode_contact(buffer, offset)
+                batch.append(contact)
+                if len(batch) == LOAD_BATCH_SIZE:
+                    self.add_many(batch)
+                    batch = []
+            self.add_many(batch)
+
+    def _replay(self, path):
+        """Applies the records of a log file, cutting off a torn record left by a crash."""
+        with open(path, 'rb') as file:
+            data = file.read()
+
+        offset = 0
+        while offset + _FRAME_HEADER.size <= len(data):
+            length, checksum = _FRAME_HEADER.unpack_from(data, offset)
+            start = offset + _FRAME_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break
+            self._apply(payload)
+            offset = start + length
+
+        if offset < len(data):
+            with open(path, 'r+b') as file:
+                file.truncate(offset)
+
+    def _apply(self, payload):
+        """Applies one log record to the in-memory state."""
+        op, body = payload[:1], memoryview(payload)[1:]
+        if op == OP_ADD:
+            contact, _ = decode_contact(body)
+            self.add(contact)
+        elif op == OP_REPLACE:
+            old_phone, offset = _decode_string(body, 0)
+            new, _ = decode_contact(body, offset)
+            contact = self.get_by_phone(old_phone)
+            if contact is None:
+                # Only a log written before updates made directly on a contact were locked
+                # can hold a change that its snapshot already has; the change is in place
+                return
+            old_key = contact.phone_key
+            contact.first_name, contact.last_name, contact.phone = new.first_name, new.last_name, new.phone
+            contact.phone_key, contact.email, contact.address = new.phone_key, new.email, new.address
+            self._reindex(contact, old_key)
+        elif op == OP_DELETE:
+            phone, _ = _decode_string(body, 0)
+            self.delete(phone)
+        else:
+            raise ValueError(f"Unknown log record type {op!r}.")
+
+    def _journal(self, payloads):
+        """
+        Appends records to the write-ahead log. Called with _lock held, together with the
+        change the records describe.
+
+        Returns:
+        --------
+        int or None
+            The size of the log after the append, or None if nothing was written.
+        """
+        if self._wal is None or not payloads:
+            return None
+
+        frames = b''.join(_FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+                          for payload in payloads)
+        self._wal.write(frames)
+        self._wal.flush()
+        if self._sync:
+            os.fsync(self._wal.fileno())
+        return self._wal.tell()
+
+    def _compact_if_large(self, size):
+        """Starts a compaction if the log grew past compact_bytes. Called without _lock held."""
+        if (size is not None and self._compact_bytes is not None and size >= self._compact_bytes
+                and not self.compacting()):
+            self.compact()
+
+    def _insert(self, contacts):
+        """Stores and indexes new contacts, then logs them."""
+        with self._lock:
+            super()._insert(contacts)
+            size = self._journal([OP_ADD + encode_contact(contact) for contact in contacts])
+        self._compact_if_large(size)
+
+    def _reindex_many(self, changes):
+        """Stores updated contacts, then logs their new field values."""
+        with self._lock:
+            super()._reindex_many(changes)
+            size = self._journal([OP_REPLACE + _encode_string(format_phone(old_key)) + encode_contact(contact)
+                                  for contact, old_key in changes])
+        self._compact_if_large(size)
+
+    def _remove(self, keys):
+        """Removes contacts, then logs the deletions."""
+        with self._lock:
+            removed = super()._remove(keys)
+            size = self._journal([OP_DELETE + _encode_string(format_phone(contact.phone_key))
+                                  for contact in removed if contact is not None])
+        self._compact_if_large(size)
+        return removed
+
+    def _changing(self):
+        """
+        Holds _lock while Contact.update changes a stored contact. Its fields change before
+        it is stored again and logged, so otherwise a concurrent compact() could capture the
+        new values and the update would be logged after the snapshot as well.
+        """
+        return self._lock
+
+    def update_many(self, changes):
+        """Applies several updates in order, holding _lock as Contact.update does. See PhoneBook.update_many."""
+        with self._lock:
+            return super().update_many(changes)
+
+    def compacting(self):
+        """
+        Checks whether a background compaction is running.
+
+        Returns:
+        --------
+        bool
+            True while a compaction started by compact() has not finished.
+        """
+        return self._compaction is not None and self._compaction.is_alive()
+
+    def compact(self, wait=False):
+        """
+        Folds the write-ahead log into a new snapshot.
+
+        A new log generation is started immediately and the current contacts are
+        captured; the snapshot is then written in a background thread while mutations
+        continue to go to the new log. Older snapshot and log files are removed once the
+        new snapshot is safely on disk.
+
+        Parameters:
+        -----------
+        wait : bool, optional
+            Whether to block until the snapshot has been written (default is False).
+        """
+        if self.compacting():
+            self._compaction.join()
+
+        with self._lock:
+            self._wal.close()
+            self._generation += 1
+            generation = self._generation
+            self._wal = open(self._path('wal', generation), 'ab')
+            # Only copy the field values here; encoding them is left to the background thread
+            records = [_fields(contact) for contact in self._backend]
+
+        self._compaction = threading.Thread(target=self._write_snapshot, args=(generation, records),
+                                            name='phonebook-compaction', daemon=True)
+        self._compaction.start()
+        if wait:
+            self._compaction.join()
+
+    def _write_snapshot(self, generation, records):
+        """Writes the captured contacts as a snapshot file, atomically, and removes the files it supersedes."""
+        path = self._path('snapshot', generation)
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(SNAPSHOT_MAGIC)
+            file.write(_COUNT.pack(len(records)))
+            file.write(b''.join(map(_encode_fields, records)))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+        _fsync_directory(self.directory)
+
+        for kind in ('snapshot', 'wal'):
+            for old_generation in self._generations(kind):
+                if old_generation < generation:
+                    os.remove(self._path(kind, old_generation))
+
+    def close(self):
+        """Waits for a running compaction and closes the write-ahead log."""
+        if self._compaction is not None:
+            self._compaction.join()
+        with self._lock:
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+        super().close()
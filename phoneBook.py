@@ -1,5 +1,12 @@
+from contextlib import nullcontext
 from datetime import datetime
-from contact import Contact
+from itertools import chain, islice
+from auditLog import AuditLogger
+from metrics import instrumented
+from pagination import paginate
+from queryCache import QueryCache, fuzzy_matcher, name_matcher, phone_matcher, timeframe_matcher
+from storage import MAX_FUZZY_DISTANCE, MemoryBackend
+from validation import format_phone, phone_key
 
 class PhoneBook:
     """
@@ -7,153 +14,534 @@ class PhoneBook:
 
     The PhoneBook class provides methods to add, search, update, delete, sort, and group contacts.
     It also supports logging operations with timestamps, and can retrieve a log history.
+    The contacts themselves are kept by a storage backend (in memory by default, or SQLite).
+
+    Phone numbers are identified by their normalized integer key (see validation.phone_key),
+    so every lookup accepts a number in any supported format, or the key itself.
 
     Attributes:
     -----------
     contacts : list
-        A list to store Contact objects.
+        The stored Contact objects, in the order they were added.
+    audit_logger : AuditLogger
+        Writes the audit log of operations in the background.
+    query_cache : QueryCache or None
+        Recent search results, or None if caching is disabled.
 
     Methods:
     --------
     add(contact):
         Adds a new contact to the phone book.
 
-    search_by_name(query):
+    add_many(contacts):
+        Adds a batch of new contacts to the phone book.
+
+    get_by_phone(phone):
+        Returns the contact with the exact phone number, or None.
+
+    has_phone(phone):
+        Checks whether a phone number is already in use.
+
+    phones_in_use(phones):
+        Returns the subset of the given phone numbers that are already in use.
+
+    search_by_name(query, limit=None, offset=0):
         Searches for contacts by first or last name using a case-insensitive wildcard search.
 
-    search_by_phone(query):
+    search_by_name_fuzzy(query, max_distance=1, limit=None, offset=0):
+        Searches for contacts by name, tolerating typos, closest matches first.
+
+    search_by_phone(query, limit=None, offset=0):
         Searches for contacts by phone number using a wildcard search.
 
-    search_by_timeframe(start_date=None, end_date=None):
+    search_by_timeframe(start_date=None, end_date=None, limit=None, offset=0):
         Searches for contacts added within a specified time frame.
 
     delete(phone):
         Deletes a contact by phone number.
 
+    delete_many(phones):
+        Deletes several contacts by phone number.
+
     update(phone, first_name=None, last_name=None, email=None, address=None):
         Updates a contact's information by phone number.
 
-    sort(by='last_name'):
+    update_many(changes):
+        Applies several updates, looking each contact up by phone number.
+
+    register_view(by):
+        Starts maintaining a sorted view and a group map for the specified attribute.
+
+    sort(by='last_name', limit=None, offset=0):
         Sorts the contacts based on the specified attribute (default is last name).
 
+    Every search and sort accepts limit and offset to return one page of the result;
+    pagination.pages() walks through a result page by page.
+
     group_by(by='last_name'):
         Groups contacts by the specified attribute (default is last name).
 
     log(operation, contact=None):
         Logs the operation performed with an optional contact and timestamp.
 
+    log_many(operation, contacts):
+        Logs the same operation for each of several contacts.
+
     get_history():
         Retrieves the log history of operations performed.
+
+    history(limit=None, operation=None, name=None, start=None, end=None, page_size=50, phone=None):
+        Lazily yields pages of the most recent log entries, optionally filtered.
+
+    cache_stats():
+        Returns the hit, miss and eviction counters of the query cache.
+
+    close():
+        Releases any resources held by the phone book.
     """
 
-    def __init__(self):
-        """Initializes an empty list to store contacts."""
-        self.contacts = []
+    def __init__(self, backend=None, audit_logger=None, cache_size=256):
+        """
+        Initializes an empty phone book.
+
+        Parameters:
+        -----------
+        backend : StorageBackend, optional
+            Where the contacts are stored and indexed (default is a new MemoryBackend).
+            Use SQLiteBackend for contact sets that do not fit comfortably in memory.
+        audit_logger : AuditLogger, optional
+            Writes the audit log (default is an AuditLogger writing to phonebook.log).
+        cache_size : int, optional
+            The most search results to cache (default is 256). 0 disables the cache.
+        """
+        self._backend = backend if backend is not None else MemoryBackend()
+        self._backend.attach(self)
+        self.audit_logger = audit_logger if audit_logger is not None else AuditLogger()
+        self.query_cache = QueryCache(cache_size) if cache_size else None
+
+    @property
+    def contacts(self):
+        """list: The stored contacts, in the order they were added."""
+        return list(self._backend)
+
+    def __len__(self):
+        """Returns the number of contacts in the phone book."""
+        return len(self._backend)
 
+    @instrumented()
     def add(self, contact):
-        """Adds a new contact to the phone book."""
-        self.contacts.append(contact)
+        """
+        Adds a new contact to the phone book.
+
+        Parameters:
+        -----------
+        contact : Contact
+            The contact to add.
+
+        Raises:
+        -------
+        ValueError
+            If another contact already uses the same phone number.
+        """
+        if self._backend.has_phone(contact.phone_key):
+            raise ValueError(f"Phone number {contact.phone} is already in use.")
+        self._insert([contact])
+
+    @instrumented()
+    def add_many(self, contacts):
+        """
+        Adds a batch of new contacts to the phone book.
+
+        The whole batch is checked before anything is added, so either every contact
+        is added or none is.
+
+        Parameters:
+        -----------
+        contacts : iterable of Contact
+            The contacts to add.
+
+        Raises:
+        -------
+        ValueError
+            If a phone number is already in use or appears twice in the batch.
+        """
+        contacts = list(contacts)
+        batch_keys = set()
+        for contact in contacts:
+            if contact.phone_key in batch_keys:
+                raise ValueError(f"Phone number {contact.phone} is already in use.")
+            batch_keys.add(contact.phone_key)
+        in_use = self._backend.phones_in_use(batch_keys)
+        if in_use:
+            raise ValueError(f"Phone number {format_phone(next(iter(in_use)))} is already in use.")
+
+        self._insert(contacts)
+
+    def _insert(self, contacts):
+        """Stores contacts whose phone numbers are known to be free."""
+        if contacts:
+            self._backend.add_many(contacts)
+            self._invalidate([(contact, None) for contact in contacts])
+
+    def _changing(self):
+        """
+        Returns the context held by Contact.update while it changes a stored contact and
+        calls _reindex. Nothing needs holding here; subclasses that log changes return a lock.
+        """
+        return nullcontext()
+
+    def _reindex(self, contact, old_key):
+        """
+        Stores a contact's new values after its fields changed.
+
+        Called by Contact.update, so renames made directly on a stored contact are
+        picked up as well as those made through PhoneBook.update.
+
+        Parameters:
+        -----------
+        contact : Contact
+            The stored contact that was just updated.
+        old_key : int
+            The contact's phone number key before the update.
+        """
+        self._reindex_many([(contact, old_key)])
+
+    def _reindex_many(self, changes):
+        """
+        Stores the new values of several contacts whose fields changed.
+
+        Parameters:
+        -----------
+        changes : list of tuple
+            (contact, old_key) pairs, where old_key is the phone key the contact was
+            stored under before the change.
+        """
+        self._backend.update_many(changes)
+        self._invalidate(changes)
+
+    def _remove(self, keys):
+        """Removes the contacts with the given phone keys, returning each removed contact or None."""
+        removed = self._backend.delete_many(keys)
+        self._invalidate([(contact, contact.phone_key) for contact in removed if contact is not None])
+        return removed
+
+    def _invalidate(self, changes):
+        """Drops the cached search results affected by changed (contact, old_key) pairs."""
+        if self.query_cache is not None:
+            self.query_cache.invalidate(changes)
+
+    @staticmethod
+    def _needed(limit, offset):
+        """Returns how many leading results a page needs, or None for all of them."""
+        return None if limit is None else offset + limit
+
+    def _cached(self, key, search, matches, limit=None, offset=0):
+        """
+        Returns a page of a search's results from the query cache, running the search on a miss.
+
+        A backend result that is already a list, or a search for the whole result, is
+        cached whole. A page of a lazily produced result is read without going past the
+        page and is not cached, so it costs the same however large the result would be.
+
+        Parameters:
+        -----------
+        key : tuple
+            The query type and its normalized arguments.
+        search : callable
+            Runs the search in the backend, returning an iterable of contacts.
+        matches : callable
+            Builds the predicate telling whether a contact matches the query; only
+            called when the result is cached.
+        limit : int, optional
+            The most contacts to return (default is None, all of them).
+        offset : int, optional
+            The number of leading contacts to skip (default is 0).
+
+        Returns:
+        --------
+        list
+            The matching contacts from offset up to offset + limit.
+        """
+        results = self.query_cache.get(key) if self.query_cache is not None else None
+        if results is None:
+            results = search()
+            if self.query_cache is None or (limit is not None and not isinstance(results, list)):
+                return paginate(results, limit, offset)
+            results = list(results)
+            self.query_cache.put(key, results, matches())
+        return paginate(results, limit, offset)
+
+    @staticmethod
+    def _key(phone):
+        """Returns the key of a phone number, or None if it cannot be normalized."""
+        try:
+            return phone_key(phone)
+        except (TypeError, ValueError):
+            return None
+
+    def register_view(self, by):
+        """
+        Starts maintaining a sorted view and a group map for the specified attribute.
+
+        With the in-memory backend the view is built once from the current contacts and
+        then kept up to date by add, update and delete, so sort(by) and group_by(by) no
+        longer need to sort or rebuild anything. Registering an attribute twice has no effect.
+
+        Parameters:
+        -----------
+        by : str
+            The Contact attribute to maintain the view for (e.g. 'first_name').
+        """
+        self._backend.register_view(by)
+
+    @instrumented(size=lambda contact: int(contact is not None))
+    def get_by_phone(self, phone):
+        """
+        Returns the contact with exactly the given phone number.
+
+        Parameters:
+        -----------
+        phone : str or int
+            The full phone number to look up, in any supported format, or its key.
+
+        Returns:
+        --------
+        Contact or None
+            The matching contact, or None if the number is not in use.
+        """
+        key = self._key(phone)
+        return self._backend.get(key) if key is not None else None
+
+    @instrumented()
+    def has_phone(self, phone):
+        """
+        Checks whether a phone number is already in use.
+
+        Parameters:
+        -----------
+        phone : str or int
+            The full phone number to check, in any supported format, or its key.
+
+        Returns:
+        --------
+        bool
+            True if a contact with this phone number exists, False otherwise.
+        """
+        key = self._key(phone)
+        return key is not None and self._backend.has_phone(key)
+
+    @instrumented()
+    def phones_in_use(self, phones):
+        """
+        Returns the subset of the given phone numbers that are already in use.
 
-    def search_by_name(self, query):
+        Parameters:
+        -----------
+        phones : iterable of str or int
+            The full phone numbers to check, in any supported format, or their keys.
+
+        Returns:
+        --------
+        set
+            The given phone numbers that belong to a stored contact.
+        """
+        keys = {}
+        for phone in phones:
+            key = self._key(phone)
+            if key is not None:
+                keys.setdefault(key, []).append(phone)
+        in_use = self._backend.phones_in_use(keys)
+        return {phone for key in in_use for phone in keys[key]}
+
+    @instrumented()
+    def search_by_name(self, query, limit=None, offset=0):
         """
         Searches contacts by first or last name using case-insensitive wildcard matching.
 
+        The backend answers from a trigram index over the case-folded names. Results are
+        served from the query cache when the same search was made since the last change to
+        a matching contact.
+
         Parameters:
         -----------
         query : str
             The name query to search for in the contact list.
+        limit : int, optional
+            The most contacts to return (default is None, all of them).
+        offset : int, optional
+            The number of leading matches to skip (default is 0).
 
         Returns:
         --------
         results : list
-            A list of contacts that match the query.
+            A list of contacts that match the query, in the order they were added.
         """
-        results = []
-        for contact in self.contacts:
-            if query.lower() in contact.first_name.lower() or query.lower() in contact.last_name.lower():
-                results.append(contact)
-        return results
+        needed = self._needed(limit, offset)
+        return self._cached(('name', query.casefold()), lambda: self._backend.search_by_name(query, needed),
+                            lambda: name_matcher(query), limit, offset)
+
+    @instrumented()
+    def search_by_name_fuzzy(self, query, max_distance=1, limit=None, offset=0):
+        """
+        Searches contacts by name, tolerating typos, and ranks them by how closely they match.
+
+        Each word of the query must be within max_distance edits (insertions, deletions,
+        substitutions or swaps of adjacent characters, ignoring case) of a word of the
+        contact's first or last name. The in-memory backend answers from a deletion index
+        over the distinct name words, which it keeps up to date on every change.
 
-    def search_by_phone(self, query):
+        Parameters:
+        -----------
+        query : str
+            The name, or part of the name, to search for, e.g. 'Jhon Smtih'.
+        max_distance : int, optional
+            The most edits allowed per query word, from 0 to MAX_FUZZY_DISTANCE (default is 1).
+        limit : int, optional
+            The most contacts to return (default is None, all of them).
+        offset : int, optional
+            The number of leading matches to skip (default is 0).
+
+        Returns:
+        --------
+        results : list
+            The matching contacts, with the smallest total edit distance first and ties in
+            the order the contacts were added.
+
+        Raises:
+        -------
+        ValueError
+            If max_distance is out of range.
+        """
+        if not 0 <= max_distance <= MAX_FUZZY_DISTANCE:
+            raise ValueError(f"The maximum edit distance must be between 0 and {MAX_FUZZY_DISTANCE}.")
+        return self._cached(('fuzzy', query.casefold(), max_distance),
+                            lambda: self._backend.search_by_name_fuzzy(query, max_distance),
+                            lambda: fuzzy_matcher(query, max_distance), limit, offset)
+
+    @instrumented()
+    def search_by_phone(self, query, limit=None, offset=0):
         """
         Searches contacts by phone number using wildcard matching.
 
+        The backend answers from an n-gram index over the digits of each phone number.
+        Results are served from the query cache like those of search_by_name.
+
         Parameters:
         -----------
         query : str
             The phone number (or part of it) to search for in the contact list.
+        limit : int, optional
+            The most contacts to return (default is None, all of them).
+        offset : int, optional
+            The number of leading matches to skip (default is 0).
 
         Returns:
         --------
         results : list
-            A list of contacts that match the phone number.
+            A list of contacts that match the phone number, in the order they were added.
         """
-        results = []
-        for contact in self.contacts:
-            if query in contact.phone:
-                results.append(contact)
-        return results
+        needed = self._needed(limit, offset)
+        return self._cached(('phone', query), lambda: self._backend.search_by_phone(query, needed),
+                            lambda: phone_matcher(query), limit, offset)
 
-    def search_by_timeframe(self, start_date=None, end_date=None):
+    @instrumented()
+    def search_by_timeframe(self, start_date=None, end_date=None, limit=None, offset=0):
         """
         Searches for contacts added within a specified time frame.
 
+        The range is located in the backend's time index, and the matching contacts are
+        produced lazily, oldest first. A range of up to the query cache's max_result
+        contacts is read up front and cached; a larger one stays lazy and is not cached.
+        With a limit, only the requested page is read.
+
         Parameters:
         -----------
-        start_date : str, optional
-            The start date in YYYY-MM-DD format.
-        end_date : str, optional
-            The end date in YYYY-MM-DD format.
+        start_date : str or datetime, optional
+            The start date, as a datetime or a string in YYYY-MM-DD format.
+        end_date : str or datetime, optional
+            The end date, as a datetime or a string in YYYY-MM-DD format.
+        limit : int, optional
+            The most contacts to produce (default is None, all of them).
+        offset : int, optional
+            The number of leading matches to skip (default is 0).
 
         Returns:
         --------
-        results : list
-            A list of contacts added within the specified date range.
+        results : generator
+            The contacts added within the specified date range, oldest first.
         """
-        results = []
-
         # Parse and validate date range if provided
-        def parse_date(date_string):
+        def parse_date(date_value):
+            if isinstance(date_value, datetime):
+                return date_value
             try:
-                return datetime.strptime(date_string, "%Y-%m-%d")
+                return datetime.strptime(date_value, "%Y-%m-%d")
             except ValueError:
-                print(f"Invalid date format: {date_string}. Use YYYY-MM-DD format.")
+                print(f"Invalid date format: {date_value}. Use YYYY-MM-DD format.")
                 return None
 
         start_date_parsed = parse_date(start_date) if start_date else None
         end_date_parsed = parse_date(end_date) if end_date else None
 
-        for contact in self.contacts:
-            # Filter by date range if provided
-            if start_date_parsed and contact.time_added < start_date_parsed:
-                continue
-            if end_date_parsed and contact.time_added > end_date_parsed:
-                continue
-
-            # If contact falls within the time range, add to results
-            results.append(contact)
-
-        return results
-
+        cache = self.query_cache
+        key = ('timeframe', start_date_parsed, end_date_parsed)
+        results = cache.get(key) if cache is not None else None
+        if results is not None:
+            return iter(paginate(results, limit, offset))
+
+        found = iter(self._backend.search_by_timeframe(start_date_parsed, end_date_parsed))
+        if limit is not None or offset:
+            return islice(found, offset, None if limit is None else offset + limit)
+        if cache is None:
+            return found
+        first = list(islice(found, cache.max_result + 1))
+        if len(first) > cache.max_result:
+            return chain(first, found)
+        cache.put(key, first, timeframe_matcher(start_date_parsed, end_date_parsed))
+        return iter(first)
+
+    @instrumented()
     def delete(self, phone):
         """
         Deletes a contact by phone number.
 
         Parameters:
         -----------
-        phone : str
-            The phone number of the contact to be deleted.
+        phone : str or int
+            The phone number of the contact to be deleted, in any supported format, or its key.
+        """
+        key = self._key(phone)
+        if key is not None:
+            self._remove([key])
+
+    @instrumented()
+    def delete_many(self, phones):
+        """
+        Deletes several contacts by phone number, as one batch in the storage backend.
+
+        Parameters:
+        -----------
+        phones : iterable of str or int
+            The phone numbers of the contacts to delete, in any supported format, or their keys.
+
+        Returns:
+        --------
+        list
+            For each phone number, the deleted Contact, or None if no contact had it.
         """
-        self.contacts = [c for c in self.contacts if c.phone != phone]
+        keys = [self._key(phone) for phone in phones]
+        removed = iter(self._remove([key for key in keys if key is not None]))
+        return [next(removed) if key is not None else None for key in keys]
 
+    @instrumented()
     def update(self, phone, first_name=None, last_name=None, email=None, address=None):
         """
         Updates a contact's information by phone number.
 
         Parameters:
         -----------
-        phone : str
-            The phone number of the contact to update.
+        phone : str or int
+            The phone number of the contact to update, in any supported format, or its key.
         first_name : str, optional
             The new first name of the contact.
         last_name : str, optional
@@ -163,26 +551,110 @@ class PhoneBook:
         address : str, optional
             The new address of the contact.
         """
-        for contact in self.contacts:
-            if contact.phone == phone:
-                contact.update(first_name, last_name, phone, email, address)
+        contact = self.get_by_phone(phone)
+        if contact is not None:
+            contact.update(first_name, last_name, None, email, address)
 
-    def sort(self, by='last_name'):
+    @instrumented()
+    def update_many(self, changes):
+        """
+        Applies several updates in order, storing them as one batch in the storage backend.
+
+        Each update sees the effect of the ones before it, as if update had been called for
+        each in turn. A change whose new phone number is invalid or already in use is skipped.
+
+        Parameters:
+        -----------
+        changes : iterable of tuple
+            (phone, fields) pairs, where phone identifies the contact (in any supported
+            format, or its key) and fields is a dict of the new values, with any of the keys
+            first_name, last_name, phone, email and address.
+
+        Returns:
+        --------
+        list
+            For each change, the updated Contact, None if no contact had the phone number,
+            or the ValueError explaining why the change was skipped.
+        """
+        results = []
+        pending = {}  # id(contact) -> (contact, key it is stored under in the backend)
+        current = {}  # Key of each pending contact after the changes so far -> contact
+        freed = set()  # Keys that pending contacts moved away from
+
+        def lookup(key):
+            if key in current:
+                return current[key]
+            if key in freed:
+                return None
+            return self._backend.get(key)
+
+        for phone, fields in changes:
+            key = self._key(phone)
+            contact = lookup(key) if key is not None else None
+            if contact is None:
+                results.append(None)
+                continue
+
+            new_phone = fields.get('phone')
+            try:
+                new_key = phone_key(new_phone) if new_phone else key
+            except ValueError as error:
+                results.append(error)
+                continue
+            if new_key != key:
+                if new_key in freed:
+                    # Another contact gave this number up earlier in the batch; store the
+                    # batch so far so the backend never holds the number twice
+                    self._reindex_many(list(pending.values()))
+                    pending, current, freed = {}, {}, set()
+                    contact = self._backend.get(key)
+                if lookup(new_key) is not None:
+                    results.append(ValueError(f"Phone number {new_phone} is already in use."))
+                    continue
+
+            pending.setdefault(id(contact), (contact, contact.phone_key))
+            current.pop(key, None)
+            contact._assign(fields.get('first_name'), fields.get('last_name'), new_phone, new_key,
+                            fields.get('email'), fields.get('address'))
+            current[new_key] = contact
+            if new_key != key:
+                freed.add(key)
+            results.append(contact)
+
+        self._reindex_many(list(pending.values()))
+        return results
+
+    @instrumented()
+    def sort(self, by='last_name', limit=None, offset=0):
         """
         Sorts the contacts by the specified attribute.
 
+        The contacts are read in order from the backend (the maintained sorted view of the
+        in-memory backend, or an indexed query). Contacts with equal values stay in the
+        order they were added. With a limit, only that page is read: the in-memory backend
+        slices its sorted view, SQLite adds LIMIT and OFFSET to the query, and the columnar
+        backend selects the top offset + limit rows with a heap instead of sorting them all.
+        Without a limit the contacts are produced lazily, so pagination.pages() only reads
+        the pages it shows; the phone book should not be changed until they are consumed.
+
         Parameters:
         -----------
         by : str
             The attribute to sort the contacts by (default is 'last_name').
+        limit : int, optional
+            The most contacts to return (default is None, all of them).
+        offset : int, optional
+            The number of leading contacts to skip (default is 0).
 
         Returns:
         --------
-        list
-            The sorted list of contacts.
+        list or iterator
+            The sorted contacts: a list with a limit, otherwise an iterator.
         """
-        return sorted(self.contacts, key=lambda x: getattr(x, by))
+        results = self._backend.sort(by, limit, offset)
+        return list(results) if limit is not None else iter(results)
 
+    @instrumented()
     def group_by(self, by='last_name'):
         """
         Groups contacts by the specified attribute.
@@ -197,19 +669,15 @@ class PhoneBook:
         dict
             A dictionary where keys are the group value and values are lists of contacts.
         """
-        groups = {}
-        for contact in self.contacts:
-            key = getattr(contact, by)
-            if key not in groups:
-                groups[key] = []
-            groups[key].append(contact)
-        return groups
+        return self._backend.group_by(by)
 
-    @staticmethod
-    def log(operation, contact=None):
+    def log(self, operation, contact=None):
         """
         Logs operations with an optional contact and timestamp.
 
+        The record is queued for the audit logger's background writer, so this does
+        not touch the disk.
+
         Parameters:
         -----------
         operation : str
@@ -217,24 +685,80 @@ class PhoneBook:
         contact : Contact, optional
             The contact the operation was performed on (default is None).
         """
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.audit_logger.log(operation, contact)
 
-        with open('phonebook.log', 'a') as log_file:
-            if contact is None:
-                log_file.write(f'[{timestamp}] {operation} performed\n')
-            else:
-                log_file.write(f'[{timestamp}] {operation} performed on {contact.first_name} {contact.last_name}\n')
+    def log_many(self, operation, contacts):
+        """
+        Logs the same operation for each of several contacts.
 
-    @staticmethod
-    def get_history():
+        Parameters:
+        -----------
+        operation : str
+            The operation being logged (e.g., 'Add').
+        contacts : iterable of Contact
+            The contacts the operation was performed on.
+        """
+        self.audit_logger.log_many(operation, contacts)
+
+    def get_history(self):
         """
         Retrieves the log history of operations performed on the phone book.
 
+        This reads the whole log into memory; use history() for large logs.
+
         Returns:
         --------
         list
             A list of log entries.
         """
-        with open('phonebook.log', 'r') as log_file:
-            return log_file.readlines()
+        return self.audit_logger.lines()
+
+    def history(self, limit=None, operation=None, name=None, start=None, end=None, page_size=50, phone=None):
+        """
+        Lazily yields pages of log entries, newest first, optionally filtered.
+
+        The audit logger reads its log backwards with the help of an index, so memory
+        use depends on the page size rather than the size of the log.
 
+        Parameters:
+        -----------
+        limit : int, optional
+            The most entries to return in total (default is None, no limit).
+        operation : str, optional
+            Only return entries of this operation, e.g. 'Add' (default is all operations).
+        name : str, optional
+            Only return entries whose contact name contains this text, ignoring case.
+        start : datetime, optional
+            Only return entries logged at or after this time.
+        end : datetime, optional
+            Only return entries logged at or before this time.
+        page_size : int, optional
+            The number of entries per page (default is 50).
+        phone : str, optional
+            Only return entries about the contact with this phone number. Requires a
+            BinaryAuditLogger, since text log lines do not record phone numbers.
+
+        Returns:
+        --------
+        generator
+            Lists of up to page_size AuditEntry tuples (time, operation, name, line, phone).
+        """
+        return self.audit_logger.history(limit, operation, name, start, end, page_size, phone)
+
+    def cache_stats(self):
+        """
+        Returns the query cache counters, for sizing the cache.
+
+        Returns:
+        --------
+        dict or None
+            See QueryCache.stats, or None if caching is disabled.
+        """
+        return self.query_cache.stats() if self.query_cache is not None else None
+
+    def close(self):
+        """Flushes the audit log and releases the storage backend."""
+        try:
+            self.audit_logger.close()
+        finally:
+            self._backend.close()
@@ -0,0 +1,651 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from batchMode import contact_record
+from concurrentPhoneBook import ConcurrentPhoneBook
+from contact import Contact
+from csvImport import import_file
+from metrics import registry
+from storage import MAX_FUZZY_DISTANCE
+from validation import phone_key, validate_email
+
+# Where the server listens unless told otherwise
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+
+# Limits that protect the server from oversized requests
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 4 * 1024 * 1024
+MAX_IMPORT_BYTES = 1024 * 1024 * 1024
+
+# Seconds an idle keep-alive connection is kept open
+KEEP_ALIVE_SECONDS = 30
+
+# Result sets with more contacts than this are streamed with chunked transfer encoding
+STREAM_THRESHOLD = 200
+
+# Contacts or log entries serialized per chunk of a streamed response
+STREAM_CHUNK = 500
+
+# Bytes copied at a time when spooling an import body to disk
+COPY_BYTES = 256 * 1024
+
+# Bytes of response data collected before they are handed to the socket
+FLUSH_BYTES = 64 * 1024
+
+_REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            409: 'Conflict', 411: 'Length Required', 413: 'Payload Too Large',
+            431: 'Request Header Fields Too Large', 500: 'Internal Server Error'}
+
+
+class HTTPError(Exception):
+    """
+    An error answered with an HTTP status code and a JSON {"error": message} body.
+
+    Attributes:
+    -----------
+    status : int
+        The HTTP status code.
+    message : str
+        The reason given to the client.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _parse_date(value, end_of_day=False):
+    """Parses a YYYY-MM-DD query parameter, raising HTTPError 400 if it is malformed."""
+    if not value:
+        return None
+    try:
+        moment = datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPError(400, f"Invalid date '{value}'; use YYYY-MM-DD") from None
+    # An end date includes the whole day
+    return moment.replace(hour=23, minute=59, second=59) if end_of_day else moment
+
+
+def _new_contact(record):
+    """Builds a Contact from a JSON object, raising HTTPError 400 if a field is missing or invalid."""
+    if not isinstance(record, dict):
+        raise HTTPError(400, "Each contact must be a JSON object")
+    missing = [field for field in ('first_name', 'last_name', 'phone') if not record.get(field)]
+    if missing:
+        raise HTTPError(400, f"Missing {', '.join(missing)}")
+    email = record.get('email') or None
+    if email is not None and not validate_email(email):
+        raise HTTPError(400, f"Invalid email format: {email}")
+    try:
+        return Contact(str(record['first_name']), str(record['last_name']), str(record['phone']),
+                       email, record.get('address') or None)
+    except ValueError as error:
+        raise HTTPError(400, str(error).rstrip('.')) from None
+
+
+def _entry_record(entry):
+    """Returns an audit log entry as a JSON-serializable dict."""
+    return {'time': entry.time.isoformat() if entry.time else None, 'operation': entry.operation,
+            'name': entry.name, 'phone': entry.phone, 'line': entry.line}
+
+
+class _Request:
+    """One parsed HTTP request; the body is read on demand from the connection."""
+
+    def __init__(self, reader, method, target, version, headers):
+        self.reader = reader
+        self.method = method
+        self.version = version
+        self.headers = headers
+        url = urlsplit(target)
+        self.path = [unquote(part) for part in url.path.split('/') if part]
+        self.query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise HTTPError(411, "Chunked request bodies are not supported; send Content-Length")
+        try:
+            self.remaining = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length") from None
+        if self.remaining < 0:
+            raise HTTPError(400, "Invalid Content-Length")
+
+    @property
+    def keep_alive(self):
+        """bool: Whether the client wants the connection kept open after this request."""
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+    async def read_json(self):
+        """Reads the whole body and decodes it as JSON."""
+        if self.remaining > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Request bodies are limited to {MAX_BODY_BYTES} bytes")
+        body = await self.reader.readexactly(self.remaining)
+        self.remaining = 0
+        try:
+            return json.loads(body)
+        except ValueError:
+            raise HTTPError(400, "The request body is not valid JSON") from None
+
+    async def copy_to(self, file):
+        """Copies the body into a binary file, a block at a time."""
+        if self.remaining > MAX_IMPORT_BYTES:
+            raise HTTPError(413, f"Imports are limited to {MAX_IMPORT_BYTES} bytes")
+        while self.remaining:
+            block = await self.reader.readexactly(min(self.remaining, COPY_BYTES))
+            self.remaining -= len(block)
+            file.write(block)
+
+    async def discard(self):
+        """Skips whatever part of the body the handler did not read."""
+        while self.remaining:
+            block = await self.reader.readexactly(min(self.remaining, COPY_BYTES))
+            self.remaining -= len(block)
+
+
+class _Output:
+    """
+    Collects the responses written to a connection and sends them with one socket write.
+
+    Responses are flushed once the connection's handler waits for the event loop, so
+    the answers to a burst of pipelined requests leave together. Large responses are
+    flushed every FLUSH_BYTES so that they are not held in memory.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self._parts = []
+        self._size = 0
+        self._scheduled = False
+
+    def write(self, data):
+        """Queues bytes for the next flush."""
+        self._parts.append(data)
+        self._size += len(data)
+        if not self._scheduled:
+            self._scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        """Hands the queued bytes to the transport."""
+        self._scheduled = False
+        if self._parts and not self.writer.is_closing():
+            self.writer.write(b''.join(self._parts))
+        self._parts.clear()
+        self._size = 0
+
+    async def drain(self):
+        """Flushes if enough bytes are queued, and waits while the client is slow to read."""
+        if self._size >= FLUSH_BYTES:
+            self.flush()
+        await self.writer.drain()
+
+
+class PhoneBookServer:
+    """
+    Serves a phone book over HTTP/1.1 with JSON bodies, using asyncio.
+
+    Endpoints:
+
+    - GET /contacts lists every contact sorted by last name; ?name=, ?phone= or
+      ?start=&end= (YYYY-MM-DD) search instead, and ?fuzzy=&distance= searches by name
+      allowing typos, closest matches first; ?limit= and ?offset= return one page
+    - GET /contacts/{phone} returns one contact
+    - POST /contacts adds a contact object, or a list of them all at once
+    - PATCH /contacts/{phone} updates any of first_name, last_name, phone, email, address
+    - DELETE /contacts/{phone} deletes a contact
+    - GET /history returns audit log entries, newest first, filtered by ?limit=,
+      ?operation=, ?name=, ?start=, ?end= and ?phone=
+    - POST /import imports a CSV file sent as the request body
+    - GET /metrics returns the operation statistics in the Prometheus text format, or as
+      JSON with ?format=json
+
+    Connections are kept alive between requests, and pipelined requests are read as they
+    arrive and answered in order, so each one sees the effect of those before it. Large
+    result sets and the history are streamed with chunked transfer encoding.
+
+    The phone book is shared through a ConcurrentPhoneBook. Lookups of one phone number
+    run on the event loop while no write is in progress; everything else (writes,
+    searches, listings, history scans and imports) runs on a pool of worker threads, so
+    slow work never stalls other clients. An import holds the write lock until the whole
+    file is in, so its report matches what was stored.
+    """
+
+    def __init__(self, phone_book, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None):
+        """
+        Initializes a server for a phone book.
+
+        Parameters:
+        -----------
+        phone_book : PhoneBook
+            The phone book to serve. It must not be used elsewhere while the server runs.
+        host : str, optional
+            The address to listen on (default is DEFAULT_HOST).
+        port : int, optional
+            The port to listen on, or 0 for any free port (default is DEFAULT_PORT).
+        workers : int, optional
+            The number of worker threads (default is the executor's own default).
+        """
+        self.phone_book = ConcurrentPhoneBook(phone_book)
+        self.phone_book.register_view('last_name')  # Listings are sorted by last name
+        self.host = host
+        self.port = port
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='phonebook')
+        self._server = None
+        self._connections = {}  # StreamWriter -> task handling the connection
+
+    async def start(self):
+        """Starts listening; port is updated to the actual port if 0 was given."""
+        self._server = await asyncio.start_server(self._serve_connection, self.host, self.port,
+                                                  limit=MAX_HEADER_BYTES, backlog=4096)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """Starts the server if needed and handles connections until cancelled."""
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """Stops accepting connections, closes the open ones and waits for running work."""
+        if self._server is not None:
+            self._server.close()
+            # Closing a connection ends its handler's wait for the next request
+            for writer in list(self._connections):
+                writer.close()
+            await asyncio.gather(*self._connections.values(), return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+        self._executor.shutdown(wait=True)
+
+    def _run(self, function, *args):
+        """Runs a blocking call on the worker threads."""
+        return asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def _read(self, function, *args):
+        """
+        Runs a quick phone book read inline if the read lock is free, otherwise on a worker thread.
+
+        Only reads whose cost does not grow with the phone book, such as a lookup by phone
+        number, may run here. Handing every lookup to a thread would cost two thread switches
+        per request, each waiting up to the interpreter's switch interval while the event
+        loop is busy.
+        """
+        called, result = self.phone_book.try_read(function, *args)
+        if called:
+            return result
+        return await self._run(function, *args)
+
+    async def _serve_connection(self, reader, stream_writer):
+        """Answers the requests on one connection until it is closed or idle for too long."""
+        self._connections[stream_writer] = asyncio.current_task()
+        writer = _Output(stream_writer)
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                # Closing an idle connection ends the wait below with IncompleteReadError
+                idle = loop.call_later(KEEP_ALIVE_SECONDS, stream_writer.transport.abort)
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._send_error(writer, HTTPError(431, "Request headers are too large"), False)
+                    break
+                finally:
+                    idle.cancel()
+
+                try:
+                    request = self._parse_head(reader, head)
+                except HTTPError as error:
+                    await self._send_error(writer, error, False)
+                    break
+
+                keep_alive = request.keep_alive
+                if request.remaining and request.headers.get('expect', '').lower() == '100-continue':
+                    writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+                try:
+                    await self._dispatch(request, writer, keep_alive)
+                    await request.discard()
+                except HTTPError as error:
+                    if request.remaining > MAX_BODY_BYTES:
+                        keep_alive = False  # Not worth reading an oversized body just to skip it
+                    else:
+                        await request.discard()
+                    await self._send_error(writer, error, keep_alive)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    raise
+                except Exception as error:
+                    print(f"Error handling {request.method} /{'/'.join(request.path)}: {error!r}", file=sys.stderr)
+                    await self._send_error(writer, HTTPError(500, "Internal server error"), False)
+                    break
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # The client went away
+        finally:
+            writer.flush()
+            self._connections.pop(stream_writer, None)
+            stream_writer.close()
+
+    @staticmethod
+    def _parse_head(reader, head):
+        """Parses the request line and headers."""
+        try:
+            lines = head.decode('latin-1').split('\r\n')
+            method, target, version = lines[0].split(' ')
+        except ValueError:
+            raise HTTPError(400, "Malformed request line") from None
+        if version not in ('HTTP/1.0', 'HTTP/1.1'):
+            raise HTTPError(400, f"Unsupported protocol {version}")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+        return _Request(reader, method, target, version, headers)
+
+    async def _dispatch(self, request, writer, keep_alive):
+        """Routes a request to its handler."""
+        path = request.path
+        if path[:1] == ['contacts'] and len(path) <= 2:
+            phone = path[1] if len(path) == 2 else None
+            allowed = ('GET', 'PATCH', 'DELETE') if phone else ('GET', 'POST')
+            if request.method not in allowed:
+                raise HTTPError(405, f"Use {', '.join(allowed)} on this resource")
+            if request.method == 'GET' and phone:
+                await self._get_contact(request, writer, keep_alive, phone)
+            elif request.method == 'GET':
+                await self._list_contacts(request, writer, keep_alive)
+            elif request.method == 'POST':
+                await self._add_contacts(request, writer, keep_alive)
+            elif request.method == 'PATCH':
+                await self._update_contact(request, writer, keep_alive, phone)
+            else:
+                await self._delete_contact(request, writer, keep_alive, phone)
+        elif path == ['history']:
+            if request.method != 'GET':
+                raise HTTPError(405, "Use GET on this resource")
+            await self._history(request, writer, keep_alive)
+        elif path == ['import']:
+            if request.method != 'POST':
+                raise HTTPError(405, "Use POST on this resource")
+            await self._import(request, writer, keep_alive)
+        elif path == ['metrics']:
+            if request.method != 'GET':
+                raise HTTPError(405, "Use GET on this resource")
+            await self._metrics(request, writer, keep_alive)
+        else:
+            raise HTTPError(404, f"No resource at /{'/'.join(path)}")
+
+    async def _send(self, writer, status, body, keep_alive, content_type='application/json'):
+        """Writes a complete response: body is serialized as JSON unless it is already a str."""
+        payload = (body if isinstance(body, str) else json.dumps(body)).encode('utf-8')
+        writer.write(f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(payload)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + payload)
+        await writer.drain()
+
+    async def _send_error(self, writer, error, keep_alive):
+        """Writes an error response."""
+        await self._send(writer, error.status, {'error': error.message}, keep_alive)
+
+    async def _send_stream(self, writer, chunks, keep_alive):
+        """
+        Writes a JSON array with chunked transfer encoding.
+
+        chunks is an async iterator of lists of JSON-serializable items; each list is
+        written as one chunk, and the next one is only produced once the client has
+        taken the previous one, so memory use is bounded by the chunk size.
+        """
+        writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nTransfer-Encoding: chunked\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1'))
+        separator = b'['
+        async for items in chunks:
+            if not items:
+                continue
+            data = separator + b','.join(json.dumps(item).encode('utf-8') for item in items)
+            separator = b','
+            writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+            await writer.drain()
+        data = b'[]' if separator == b'[' else b']'
+        writer.write(b'%x\r\n%s\r\n0\r\n\r\n' % (len(data), data))
+        await writer.drain()
+
+    async def _send_contacts(self, writer, contacts, keep_alive):
+        """Writes a list of contacts, streaming it if it is large."""
+        if len(contacts) <= STREAM_THRESHOLD:
+            await self._send(writer, 200, [contact_record(contact) for contact in contacts], keep_alive)
+            return
+
+        async def chunks():
+            for start in range(0, len(contacts), STREAM_CHUNK):
+                yield [contact_record(contact) for contact in contacts[start:start + STREAM_CHUNK]]
+
+        await self._send_stream(writer, chunks(), keep_alive)
+
+    async def _get_contact(self, request, writer, keep_alive, phone):
+        """GET /contacts/{phone}"""
+        def get():
+            contact = self.phone_book.get_by_phone(phone)
+            if contact is not None:
+                self.phone_book.log("Search", contact)
+            return contact
+
+        contact = await self._read(get)
+        if contact is None:
+            raise HTTPError(404, f"No contact has phone number {phone}")
+        await self._send(writer, 200, contact_record(contact), keep_alive)
+
+    async def _list_contacts(self, request, writer, keep_alive):
+        """GET /contacts, optionally searching by name, phone or time frame, and optionally one page."""
+        query = request.query
+        try:
+            limit = int(query['limit']) if 'limit' in query else None
+            offset = int(query.get('offset', 0))
+        except ValueError:
+            raise HTTPError(400, "limit and offset must be integers") from None
+        if (limit is not None and limit < 0) or offset < 0:
+            raise HTTPError(400, "limit and offset must not be negative")
+
+        if 'fuzzy' in query:
+            try:
+                distance = int(query.get('distance', 1))
+            except ValueError:
+                raise HTTPError(400, "distance must be an integer") from None
+            if not 0 <= distance <= MAX_FUZZY_DISTANCE:
+                raise HTTPError(400, f"distance must be between 0 and {MAX_FUZZY_DISTANCE}")
+            search, argument = self.phone_book.search_by_name_fuzzy, (query['fuzzy'], distance)
+        elif 'name' in query:
+            search, argument = self.phone_book.search_by_name, (query['name'],)
+        elif 'phone' in query:
+            search, argument = self.phone_book.search_by_phone, (query['phone'],)
+        elif 'start' in query or 'end' in query:
+            bounds = (_parse_date(query.get('start')), _parse_date(query.get('end'), end_of_day=True))
+            search, argument = (lambda start, end, limit, offset:
+                                list(self.phone_book.search_by_timeframe(start, end, limit, offset))), bounds
+        else:
+            search, argument = None, ()
+
+        def find():
+            if search is None:
+                contacts = self.phone_book.sort(limit=limit, offset=offset)
+                self.phone_book.log("View")
+            else:
+                contacts = search(*argument, limit=limit, offset=offset)
+                self.phone_book.log_many("Search", contacts)
+            return contacts
+
+        # Even a single page can take a scan of the whole phone book (a large offset, a fuzzy
+        # search, or a backend without search indexes), so keep every listing off the event loop
+        contacts = await self._run(find)
+        await self._send_contacts(writer, contacts, keep_alive)
+
+    async def _add_contacts(self, request, writer, keep_alive):
+        """POST /contacts with one contact object or a list of them."""
+        body = await request.read_json()
+        records = body if isinstance(body, list) else [body]
+        contacts = [_new_contact(record) for record in records]
+
+        def add():
+            try:
+                self.phone_book.add_many(contacts)
+            except ValueError as error:
+                raise HTTPError(409, str(error).rstrip('.')) from None
+            self.phone_book.log_many("Add", contacts)
+
+        await self._run(add)
+        if isinstance(body, list):
+            await self._send(writer, 201, {'added': len(contacts)}, keep_alive)
+        else:
+            await self._send(writer, 201, contact_record(contacts[0]), keep_alive)
+
+    async def _update_contact(self, request, writer, keep_alive, phone):
+        """PATCH /contacts/{phone}"""
+        body = await request.read_json()
+        if not isinstance(body, dict):
+            raise HTTPError(400, "The request body must be a JSON object")
+        fields = {field: str(body[field]) for field in ('first_name', 'last_name', 'phone', 'email', 'address')
+                  if body.get(field)}
+        if 'phone' in fields:
+            try:
+                phone_key(fields['phone'])
+            except ValueError as error:
+                raise HTTPError(400, str(error).rstrip('.')) from None
+        if 'email' in fields and not validate_email(fields['email']):
+            raise HTTPError(400, f"Invalid email format: {fields['email']}")
+
+        def update():
+            result, = self.phone_book.update_many([(phone, fields)])
+            if isinstance(result, Contact):
+                self.phone_book.log("Update", result)
+            return result
+
+        result = await self._run(update)
+        if result is None:
+            raise HTTPError(404, f"No contact has phone number {phone}")
+        if isinstance(result, ValueError):
+            raise HTTPError(409, str(result).rstrip('.'))  # The new phone number is in use
+        await self._send(writer, 200, contact_record(result), keep_alive)
+
+    async def _delete_contact(self, request, writer, keep_alive, phone):
+        """DELETE /contacts/{phone}"""
+        def delete():
+            contact, = self.phone_book.delete_many([phone])
+            if contact is not None:
+                self.phone_book.log("Delete", contact)
+            return contact
+
+        contact = await self._run(delete)
+        if contact is None:
+            raise HTTPError(404, f"No contact has phone number {phone}")
+        await self._send(writer, 200, contact_record(contact), keep_alive)
+
+    async def _history(self, request, writer, keep_alive):
+        """GET /history, streamed one page of log entries at a time."""
+        query = request.query
+        try:
+            limit = int(query['limit']) if 'limit' in query else None
+        except ValueError:
+            raise HTTPError(400, "limit must be an integer") from None
+        start, end = _parse_date(query.get('start')), _parse_date(query.get('end'), end_of_day=True)
+        if 'phone' in query:
+            try:
+                phone_key(query['phone'])
+            except ValueError as error:
+                raise HTTPError(400, str(error).rstrip('.')) from None
+
+        def open_pages():
+            return self.phone_book.history(limit, query.get('operation'), query.get('name'), start, end,
+                                           STREAM_CHUNK, query.get('phone'))
+
+        try:
+            pages = await self._run(open_pages)
+        except ValueError as error:
+            raise HTTPError(400, str(error).rstrip('.')) from None
+
+        async def chunks():
+            # Each page is read from the log on a worker thread
+            while True:
+                page = await self._run(next, pages, None)
+                if page is None:
+                    return
+                yield [_entry_record(entry) for entry in page]
+
+        try:
+            await self._send_stream(writer, chunks(), keep_alive)
+        finally:
+            await self._run(pages.close)
+
+    async def _import(self, request, writer, keep_alive):
+        """POST /import with a CSV file as the body."""
+        descriptor, path = tempfile.mkstemp(suffix='.csv')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                await request.copy_to(file)
+
+            def run_import():
+                # The import checks and adds its rows chunk by chunk; holding the write lock
+                # throughout keeps other clients from taking a number between the two
+                with self.phone_book.writing() as (phone_book, _):
+                    return import_file(phone_book, path)
+
+            try:
+                report = await self._run(run_import)
+            except ValueError as error:  # Missing columns or an empty file
+                raise HTTPError(400, str(error).rstrip('.')) from None
+        finally:
+            os.remove(path)
+        await self._send(writer, 200, {'added': report.added, 'rejects': report.rejects}, keep_alive)
+
+    async def _metrics(self, request, writer, keep_alive):
+        """GET /metrics, in the Prometheus text format or, with ?format=json, as JSON."""
+        output = request.query.get('format', 'prometheus')
+        if output == 'json':
+            await self._send(writer, 200, {'enabled': registry.enabled, 'operations': registry.snapshot()},
+                             keep_alive)
+        elif output == 'prometheus':
+            await self._send(writer, 200, registry.to_prometheus(), keep_alive,
+                             'text/plain; version=0.0.4; charset=utf-8')
+        else:
+            raise HTTPError(400, "format must be prometheus or json")
+
+
+def serve(phone_book, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None):
+    """
+    Serves a phone book over HTTP until interrupted with Ctrl+C.
+
+    Parameters:
+    -----------
+    phone_book : PhoneBook
+        The phone book to serve.
+    host : str, optional
+        The address to listen on (default is DEFAULT_HOST).
+    port : int, optional
+        The port to listen on, or 0 for any free port (default is DEFAULT_PORT).
+    workers : int, optional
+        The number of worker threads running phone book operations.
+    """
+    server = PhoneBookServer(phone_book, host, port, workers)
+
+    async def run():
+        await server.start()
+        print(f"Serving the phone book on http://{server.host}:{server.port}/", file=sys.stderr, flush=True)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
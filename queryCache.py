@@ -0,0 +1,179 @@
+import threading
+from collections import OrderedDict
+
+from contactIndex import digits_of, edit_distance
+
+
+class QueryCache:
+    """
+    A bounded cache of search results with least-recently-used eviction.
+
+    Each entry remembers the phone keys of the contacts in its result and a predicate
+    telling whether a contact matches its query. When contacts are added, updated or
+    deleted, only the entries that held one of them, or whose query one of them now
+    matches, are dropped; every other entry stays valid. A batch of changes too large
+    to check entry by entry flushes the whole cache instead.
+
+    The cache is safe to use from several threads.
+
+    Attributes:
+    -----------
+    max_entries : int
+        The most results kept at once.
+    max_result : int
+        The most contacts in a result that is kept; larger results are not cached.
+    hits, misses, evictions, invalidations, flushes : int
+        Counters: lookups answered from the cache, lookups that were not, entries
+        dropped to make room, entries dropped because of a change, and whole-cache
+        flushes.
+    """
+
+    # Largest number of (change, entry) checks a single batch is allowed before the
+    # cache is flushed rather than checked entry by entry
+    FLUSH_CHECKS = 50_000
+
+    def __init__(self, max_entries=256, max_result=10_000):
+        """
+        Initializes an empty cache.
+
+        Parameters:
+        -----------
+        max_entries : int, optional
+            The most results kept at once (default is 256).
+        max_result : int, optional
+            The most contacts in a cacheable result (default is 10,000).
+        """
+        self.max_entries = max_entries
+        self.max_result = max_result
+        self._entries = OrderedDict()  # key -> (results tuple, phone keys, predicate), oldest first
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = self.flushes = 0
+
+    def __len__(self):
+        """Returns the number of cached results."""
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Looks a query up, marking it as recently used.
+
+        Parameters:
+        -----------
+        key : tuple
+            The query type and its normalized arguments.
+
+        Returns:
+        --------
+        list or None
+            A new list of the cached contacts, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[0])
+
+    def put(self, key, results, matches):
+        """
+        Caches the result of a query, evicting the least recently used results if full.
+
+        Parameters:
+        -----------
+        key : tuple
+            The query type and its normalized arguments.
+        results : list of Contact
+            The query's result. Results longer than max_result are not cached.
+        matches : callable
+            Returns whether a contact, with its current field values, matches the query.
+        """
+        if len(results) > self.max_result or self.max_entries <= 0:
+            return
+        entry = (tuple(results), frozenset(contact.phone_key for contact in results), matches)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, changes):
+        """
+        Drops the cached results that a change to some contacts could affect.
+
+        Parameters:
+        -----------
+        changes : list of tuple
+            (contact, old_key) pairs: a contact as it is now, with the phone key it was
+            stored under before the change, or None if it was just added. Deleted
+            contacts are passed with their own key as old_key.
+        """
+        with self._lock:
+            if not self._entries or not changes:
+                return
+            if len(changes) * len(self._entries) > self.FLUSH_CHECKS:
+                self.invalidations += len(self._entries)
+                self.flushes += 1
+                self._entries.clear()
+                return
+            stale = [key for key, (_, keys, matches) in self._entries.items()
+                     if any(old_key in keys or contact.phone_key in keys or matches(contact)
+                            for contact, old_key in changes)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        """Drops every cached result."""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self.flushes += 1
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns the cache counters, for sizing the cache.
+
+        Returns:
+        --------
+        dict
+            entries, max_entries, hits, misses, evictions, invalidations, flushes, and
+            hit_rate, the fraction of lookups answered from the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'max_entries': self.max_entries, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions, 'invalidations': self.invalidations,
+                    'flushes': self.flushes, 'hit_rate': self.hits / lookups if lookups else 0.0}
+
+
+def name_matcher(query):
+    """Returns a predicate for contacts whose case-folded first or last name contains the case-folded query."""
+    query = query.casefold()
+    return lambda contact: query in contact.first_name.casefold() or query in contact.last_name.casefold()
+
+
+def fuzzy_matcher(query, max_distance):
+    """Returns a predicate for contacts having, for every query word, a name word within max_distance edits."""
+    tokens = query.casefold().split()
+
+    def matches(contact):
+        words = contact.first_name.casefold().split() + contact.last_name.casefold().split()
+        return bool(tokens) and all(any(edit_distance(token, word, max_distance) <= max_distance for word in words)
+                                    for token in tokens)
+    return matches
+
+
+def phone_matcher(query):
+    """Returns a predicate for contacts whose phone key digits, or displayed number if the query has no digits, contain the query."""
+    query_digits = digits_of(query)
+    if not query_digits:
+        return lambda contact: query in contact.phone
+    return lambda contact: query_digits in f'{contact.phone_key:010d}'
+
+
+def timeframe_matcher(start, end):
+    """Returns a predicate for contacts added from start to end, where None means unbounded."""
+    return lambda contact: (start is None or contact.time_added >= start) and (end is None or contact.time_added <= end)
@@ -0,0 +1,641 @@
+import heapq
+import os
+import signal
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from operator import itemgetter
+
+from auditLog import AuditLogger
+from contact import Contact
+from contactIndex import edit_distance, fuzzy_distance
+from metrics import instrumented
+from phoneBook import PhoneBook
+from storage import MAX_FUZZY_DISTANCE, from_epoch_micros, to_epoch_micros
+from validation import format_phone, phone_key
+
+# How contacts can be assigned to shards
+PARTITIONS = ('hash', 'area_code')
+
+# The fields of a packed contact, in order; time_added is sent as microseconds since 1970
+_FIELDS = ('first_name', 'last_name', 'phone', 'phone_key', 'email', 'address', 'time_added')
+# Merge key of packed contacts listed in the order they were added
+_ADDED = itemgetter(_FIELDS.index('time_added'))
+
+# Multiplier of the hash that scatters phone keys and area codes over the shards
+_HASH_MULTIPLIER = 2_654_435_761
+
+
+def _pack(contact):
+    """
+    Returns a contact's fields as a tuple (see _FIELDS), which crosses a process boundary
+    several times faster than a Contact or a datetime.
+    """
+    return (contact.first_name, contact.last_name, contact.phone, contact.phone_key, contact.email,
+            contact.address, to_epoch_micros(contact.time_added))
+
+
+def _unpack(fields):
+    """Rebuilds a detached contact from the tuple made by _pack, without validating the phone number again."""
+    contact = object.__new__(Contact)
+    (contact.first_name, contact.last_name, contact.phone, contact.phone_key, contact.email,
+     contact.address, time_added) = fields
+    contact.time_added = from_epoch_micros(time_added)
+    contact._owner = None
+    return contact
+
+
+def _get(phone_book, key):
+    """Looks a phone key up in a shard, returning the packed contact or None."""
+    contact = phone_book.get_by_phone(key)
+    return _pack(contact) if contact is not None else None
+
+
+def _fuzzy_ranked(phone_book, query, max_distance, needed):
+    """
+    Runs a fuzzy name search in a shard and returns each contact with its total edit
+    distance, so that the results of several shards can be merged in rank order.
+    """
+    contacts = phone_book.search_by_name_fuzzy(query, max_distance, needed)
+    tokens = query.casefold().split()
+    distances = [{} for _ in tokens]  # Per query word: name word -> edit distance, or None
+    ranked = []
+    for contact in contacts:
+        words = contact.first_name.casefold().split() + contact.last_name.casefold().split()
+        for token, seen in zip(tokens, distances):
+            for word in words:
+                if word not in seen:
+                    distance = edit_distance(token, word, max_distance)
+                    seen[word] = distance if distance <= max_distance else None
+        ranked.append((fuzzy_distance(distances, words), _pack(contact)))
+    return ranked
+
+
+class _DiscardingLogger:
+    """The audit logger of a shard's phone book: the sharded phone book keeps the audit log itself."""
+
+    def log(self, operation, contact=None):
+        pass
+
+    def log_many(self, operation, contacts):
+        pass
+
+    def close(self):
+        pass
+
+
+# What a shard worker can be asked to do: name -> function(phone_book, *args) returning
+# a picklable value, with contacts packed as tuples
+_OPERATIONS = {
+    'len': len,
+    'contacts': lambda phone_book: [_pack(contact) for contact in phone_book.contacts],
+    'get': _get,
+    'phones_in_use': lambda phone_book, keys: phone_book.phones_in_use(keys),
+    'add': lambda phone_book, fields: phone_book.add(_unpack(fields)),
+    'add_many': lambda phone_book, packed: phone_book.add_many(map(_unpack, packed)),
+    'update': lambda phone_book, key, *fields: phone_book.update(key, *fields),
+    'update_many': lambda phone_book, changes: [
+        _pack(result) if isinstance(result, Contact) else result for result in phone_book.update_many(changes)],
+    'delete_many': lambda phone_book, keys: [
+        _pack(contact) if contact is not None else None for contact in phone_book.delete_many(keys)],
+    'search_by_name': lambda phone_book, query, needed: [
+        _pack(contact) for contact in phone_book.search_by_name(query, needed)],
+    'search_by_name_fuzzy': _fuzzy_ranked,
+    'search_by_phone': lambda phone_book, query, needed: [
+        _pack(contact) for contact in phone_book.search_by_phone(query, needed)],
+    'search_by_timeframe': lambda phone_book, start, end, needed: [
+        _pack(contact) for contact in phone_book.search_by_timeframe(start, end, needed)],
+    'register_view': lambda phone_book, by: phone_book.register_view(by),
+    'sort': lambda phone_book, by, needed: [_pack(contact) for contact in phone_book.sort(by, needed)],
+    'group_by': lambda phone_book, by: {value: [_pack(contact) for contact in contacts]
+                                        for value, contacts in phone_book.group_by(by).items()},
+    'cache_stats': lambda phone_book: phone_book.cache_stats(),
+}
+
+
+def _serve_shard(connection, backend, cache_size):
+    """
+    Runs in a shard's worker process: owns one PhoneBook and answers requests from the
+    connection until it receives None or the other end is closed.
+
+    Each request is an (operation, args) tuple naming an entry of _OPERATIONS, and each
+    reply is (True, result) or (False, the exception raised).
+    """
+    # Ctrl+C is handled by the parent, which then closes the shards in order
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    phone_book = PhoneBook(backend() if backend is not None else None, _DiscardingLogger(), cache_size)
+    try:
+        while True:
+            try:
+                request = connection.recv()
+            except EOFError:
+                break
+            if request is None:
+                break
+            operation, args = request
+            try:
+                reply = (True, _OPERATIONS[operation](phone_book, *args))
+            except Exception as error:
+                reply = (False, error)
+            connection.send(reply)
+    finally:
+        phone_book.close()
+        connection.close()
+
+
+class _Shard:
+    """The parent's end of a shard: its worker process and the connection to it."""
+
+    def __init__(self, backend, cache_size):
+        # Imported here so that importing this module does not slow the application's startup
+        import multiprocessing
+
+        self.connection, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_serve_shard, args=(child, backend, cache_size),
+                                               daemon=True)
+        self.process.start()
+        child.close()
+        self.lock = threading.Lock()  # Held from sending a request until its reply is read
+
+    def close(self):
+        """Asks the worker to stop and waits for it."""
+        with self.lock:
+            try:
+                self.connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass  # The worker is already gone
+            self.connection.close()
+        self.process.join()
+
+
+class ShardedPhoneBook:
+    """
+    A phone book whose contacts are partitioned across several worker processes.
+
+    Each shard is a worker process owning a PhoneBook with its own backend, indexes and
+    query cache, so the shards use separate cores and separate memory. A contact belongs
+    to the shard chosen by a hash of its phone number, or of its area code.
+
+    Operations on one phone number (get_by_phone, has_phone, add, update, delete) go to
+    the owning shard only. Searches, sort and group_by are sent to every shard at once and
+    run in parallel; the partial results are then merged: searches, timeframe queries and
+    sort with a k-way merge of the sorted partial results, and group_by by joining the
+    groups. With a limit, each shard returns only offset + limit results.
+
+    The methods mirror PhoneBook's, with these differences:
+
+    - Contacts are returned as detached copies (see Contact.snapshot). Change them through
+      update and update_many; updating a returned copy has no effect on the phone book.
+    - Each shard lists its contacts in the order it received them, and the shards' lists
+      are merged by time_added (which also orders equal values in sort and group_by).
+      This is the order the contacts were added as long as they were added oldest first,
+      as they are when time_added is left to its default. A contact moved to another
+      shard by a change of phone number is listed by its new shard after the others.
+    - The audit log is kept by this object, not by the shards.
+
+    Each shard serves one request at a time, so several threads can share the phone book,
+    but like PhoneBook it does not make a sequence of calls atomic: wrap it in a
+    ConcurrentPhoneBook for that. Call close() to stop the worker processes.
+
+    Attributes:
+    -----------
+    shards : int
+        The number of shards.
+    partition : str
+        How contacts are assigned to shards: 'hash' or 'area_code'.
+    audit_logger : AuditLogger
+        Writes the audit log of operations in the background.
+    """
+
+    def __init__(self, shards=None, partition='hash', backend=None, audit_logger=None, cache_size=256):
+        """
+        Starts the worker processes of an empty sharded phone book.
+
+        Parameters:
+        -----------
+        shards : int, optional
+            The number of shards (default is the number of CPUs).
+        partition : str, optional
+            'hash' spreads contacts evenly by a hash of the phone number; 'area_code' keeps
+            the numbers of an area code together in one shard (default is 'hash').
+        backend : callable, optional
+            Creates the storage backend of each shard, e.g. ColumnarBackend (default is a
+            MemoryBackend). It must be picklable, like a class.
+        audit_logger : AuditLogger, optional
+            Writes the audit log (default is an AuditLogger writing to phonebook.log).
+        cache_size : int, optional
+            The most search results each shard caches (default is 256). 0 disables the cache.
+
+        Raises:
+        -------
+        ValueError
+            If shards is less than 1 or partition is unknown.
+        """
+        shards = shards if shards is not None else os.cpu_count() or 1
+        if shards < 1:
+            raise ValueError("A sharded phone book needs at least one shard.")
+        if partition not in PARTITIONS:
+            raise ValueError(f"Unknown partition '{partition}'; use {' or '.join(PARTITIONS)}.")
+        self.shards = shards
+        self.partition = partition
+        self.audit_logger = audit_logger if audit_logger is not None else AuditLogger()
+        self._shards = [_Shard(backend, cache_size) for _ in range(shards)]
+
+    def _shard_of(self, key):
+        """Returns the index of the shard owning a phone key."""
+        value = key // 10 ** 7 if self.partition == 'area_code' else key
+        return (value * _HASH_MULTIPLIER) % (1 << 32) % self.shards
+
+    def _scatter(self, requests):
+        """
+        Sends requests to several shards at once and waits for all the replies.
+
+        Parameters:
+        -----------
+        requests : dict
+            Shard index -> (operation, args).
+
+        Returns:
+        --------
+        dict
+            Shard index -> result.
+
+        Raises:
+        -------
+        Exception
+            The first exception raised by a shard, once every shard has replied.
+        """
+        shards = [(index, self._shards[index]) for index in sorted(requests)]
+        with self._holding(requests):
+            for index, shard in shards:
+                shard.connection.send(requests[index])
+            replies = {index: shard.connection.recv() for index, shard in shards}
+        for succeeded, result in replies.values():
+            if not succeeded:
+                raise result
+        return {index: result for index, (_, result) in replies.items()}
+
+    @contextmanager
+    def _holding(self, indexes):
+        """Holds the locks of several shards, so that no other request reaches them meanwhile."""
+        # Locks are taken in shard order, so that concurrent requests cannot deadlock
+        shards = [self._shards[index] for index in sorted(set(indexes))]
+        for shard in shards:
+            shard.lock.acquire()
+        try:
+            yield
+        finally:
+            for shard in shards:
+                shard.lock.release()
+
+    def _request(self, index, operation, *args):
+        """Runs an operation in one shard whose lock is already held, and returns its result."""
+        connection = self._shards[index].connection
+        connection.send((operation, args))
+        succeeded, result = connection.recv()
+        if not succeeded:
+            raise result
+        return result
+
+    def _call(self, index, operation, *args):
+        """Runs an operation in one shard and returns its result."""
+        return self._scatter({index: (operation, args)})[index]
+
+    def _broadcast(self, operation, *args):
+        """Runs an operation in every shard and returns the results in shard order."""
+        results = self._scatter({index: (operation, args) for index in range(self.shards)})
+        return [results[index] for index in range(self.shards)]
+
+    def _merged(self, operation, args, key, limit, offset):
+        """
+        Runs a query in every shard and k-way merges the sorted partial results.
+
+        Parameters:
+        -----------
+        operation : str
+            The shard operation; it takes args followed by the number of leading results needed.
+        args : tuple
+            The query's arguments.
+        key : callable
+            Returns the sort key of a packed contact; each shard's results are ordered by it.
+        limit : int, optional
+            The most contacts to return, or None for all of them.
+        offset : int
+            The number of leading contacts to skip.
+
+        Returns:
+        --------
+        list
+            The detached contacts from offset up to offset + limit.
+        """
+        needed = None if limit is None else offset + limit
+        partials = self._broadcast(operation, *args, needed)
+        # heapq.merge keeps equal keys in shard order, so the result does not depend on timing.
+        # Only the contacts on the page are unpacked.
+        return list(map(_unpack, islice(heapq.merge(*partials, key=key), offset, needed)))
+
+    @staticmethod
+    def _key(phone):
+        """Returns the key of a phone number, or None if it cannot be normalized."""
+        try:
+            return phone_key(phone)
+        except (TypeError, ValueError):
+            return None
+
+    @property
+    def contacts(self):
+        """list: Detached copies of the stored contacts, oldest first."""
+        return list(map(_unpack, heapq.merge(*self._broadcast('contacts'), key=_ADDED)))
+
+    def __len__(self):
+        """Returns the number of contacts in all the shards."""
+        return sum(self._broadcast('len'))
+
+    @instrumented()
+    def add(self, contact):
+        """
+        Adds a new contact to the shard owning its phone number. See PhoneBook.add.
+
+        Raises:
+        -------
+        ValueError
+            If another contact already uses the same phone number.
+        """
+        self._call(self._shard_of(contact.phone_key), 'add', _pack(contact))
+
+    @instrumented()
+    def add_many(self, contacts):
+        """
+        Adds a batch of new contacts, all or none, each to the shard owning its phone number.
+
+        Every shard checks its part of the batch before any shard adds anything, and the
+        shards are held from the check to the add, so no other write can take a number
+        in between.
+
+        Raises:
+        -------
+        ValueError
+            If a phone number is already in use or appears twice in the batch.
+        """
+        batches = {}
+        batch_keys = set()
+        for contact in contacts:
+            if contact.phone_key in batch_keys:
+                raise ValueError(f"Phone number {contact.phone} is already in use.")
+            batch_keys.add(contact.phone_key)
+            batches.setdefault(self._shard_of(contact.phone_key), []).append(contact)
+        if not batches:
+            return
+
+        with self._holding(batches):
+            for index, batch in sorted(batches.items()):
+                keys = self._request(index, 'phones_in_use', {contact.phone_key for contact in batch})
+                if keys:
+                    raise ValueError(f"Phone number {format_phone(next(iter(keys)))} is already in use.")
+            for index, batch in sorted(batches.items()):
+                self._request(index, 'add_many', [_pack(contact) for contact in batch])
+
+    @instrumented(size=lambda contact: int(contact is not None))
+    def get_by_phone(self, phone):
+        """Returns a detached copy of the contact with a phone number, or None. See PhoneBook.get_by_phone."""
+        key = self._key(phone)
+        if key is None:
+            return None
+        fields = self._call(self._shard_of(key), 'get', key)
+        return _unpack(fields) if fields is not None else None
+
+    @instrumented()
+    def has_phone(self, phone):
+        """Checks whether a phone number is already in use. See PhoneBook.has_phone."""
+        key = self._key(phone)
+        return key is not None and bool(self._call(self._shard_of(key), 'phones_in_use', {key}))
+
+    @instrumented()
+    def phones_in_use(self, phones):
+        """Returns the subset of the given phone numbers that are already in use. See PhoneBook.phones_in_use."""
+        keys = {}
+        for phone in phones:
+            key = self._key(phone)
+            if key is not None:
+                keys.setdefault(key, []).append(phone)
+        batches = {}
+        for key in keys:
+            batches.setdefault(self._shard_of(key), set()).add(key)
+        if not batches:
+            return set()
+        in_use = self._scatter({index: ('phones_in_use', (batch,)) for index, batch in batches.items()})
+        return {phone for found in in_use.values() for key in found for phone in keys[key]}
+
+    @instrumented()
+    def search_by_name(self, query, limit=None, offset=0):
+        """Searches every shard by name, merging by time_added. See PhoneBook.search_by_name."""
+        return self._merged('search_by_name', (query,), _ADDED, limit, offset)
+
+    @instrumented()
+    def search_by_name_fuzzy(self, query, max_distance=1, limit=None, offset=0):
+        """
+        Searches every shard by name, tolerating typos, and merges the matches closest first,
+        then by time_added. See PhoneBook.search_by_name_fuzzy.
+
+        Raises:
+        -------
+        ValueError
+            If max_distance is out of range.
+        """
+        if not 0 <= max_distance <= MAX_FUZZY_DISTANCE:
+            raise ValueError(f"The maximum edit distance must be between 0 and {MAX_FUZZY_DISTANCE}.")
+        needed = None if limit is None else offset + limit
+        partials = self._broadcast('search_by_name_fuzzy', query, max_distance, needed)
+        merged = heapq.merge(*partials, key=lambda result: (result[0], _ADDED(result[1])))
+        return [_unpack(fields) for _, fields in islice(merged, offset, needed)]
+
+    @instrumented()
+    def search_by_phone(self, query, limit=None, offset=0):
+        """Searches every shard by phone, merging by time_added. See PhoneBook.search_by_phone."""
+        return self._merged('search_by_phone', (query,), _ADDED, limit, offset)
+
+    @instrumented()
+    def search_by_timeframe(self, start_date=None, end_date=None, limit=None, offset=0):
+        """Iterates over the contacts added in a time frame, oldest first. See PhoneBook.search_by_timeframe."""
+        return iter(self._merged('search_by_timeframe', (start_date, end_date), _ADDED, limit, offset))
+
+    @instrumented()
+    def delete(self, phone):
+        """Deletes a contact from the shard owning its phone number. See PhoneBook.delete."""
+        key = self._key(phone)
+        if key is not None:
+            self._call(self._shard_of(key), 'delete_many', [key])
+
+    @instrumented()
+    def delete_many(self, phones):
+        """
+        Deletes several contacts, sending each shard its part of the batch at once.
+
+        Returns:
+        --------
+        list
+            For each phone number, a detached copy of the deleted Contact, or None if no
+            contact had it.
+        """
+        keys = [self._key(phone) for phone in phones]
+        batches = {}
+        for key in keys:
+            if key is not None:
+                batches.setdefault(self._shard_of(key), []).append(key)
+        removed = {index: iter(result) for index, result in
+                   self._scatter({index: ('delete_many', (batch,)) for index, batch in batches.items()}).items()}
+        results = []
+        for key in keys:
+            fields = next(removed[self._shard_of(key)]) if key is not None else None
+            results.append(_unpack(fields) if fields is not None else None)
+        return results
+
+    @instrumented()
+    def update(self, phone, first_name=None, last_name=None, email=None, address=None):
+        """Updates a contact's information in the shard owning its phone number. See PhoneBook.update."""
+        key = self._key(phone)
+        if key is not None:
+            self._call(self._shard_of(key), 'update', key, first_name, last_name, email, address)
+
+    @instrumented()
+    def update_many(self, changes):
+        """
+        Applies several updates in order. See PhoneBook.update_many.
+
+        Consecutive changes are sent to their shards as one batch per shard. A change of
+        phone number that moves a contact to another shard is applied on its own, after
+        the batches before it, by adding the contact to the other shard and then deleting
+        it from its own. Both shards are held meanwhile, so no other call sees the contact
+        in neither or both of them.
+
+        Returns:
+        --------
+        list
+            For each change, a detached copy of the updated Contact, None if no contact had
+            the phone number, or the ValueError explaining why the change was skipped.
+        """
+        results = []
+        batches = {}  # Shard index -> [(position in results, key, fields)]
+        for phone, fields in changes:
+            key = self._key(phone)
+            if key is None:
+                results.append(None)
+                continue
+            new_phone = fields.get('phone')
+            try:
+                new_key = phone_key(new_phone) if new_phone else key
+            except ValueError:
+                new_key = key  # The owning shard reports the invalid number, or that no contact has the old one
+
+            index, target = self._shard_of(key), self._shard_of(new_key)
+            if index == target:
+                batches.setdefault(index, []).append((len(results), key, fields))
+                results.append(None)  # Filled in once the batch is applied
+                continue
+            self._update_batches(batches, results)
+            batches = {}
+            results.append(self._move(index, target, key, new_key, fields))
+
+        self._update_batches(batches, results)
+        return results
+
+    def _update_batches(self, batches, results):
+        """Applies per-shard batches of updates and stores their results at their positions."""
+        if not batches:
+            return
+        replies = self._scatter({index: ('update_many', ([(key, fields) for _, key, fields in batch],))
+                                 for index, batch in batches.items()})
+        for index, batch in batches.items():
+            for (position, _, _), result in zip(batch, replies[index]):
+                results[position] = _unpack(result) if isinstance(result, tuple) else result
+
+    def _move(self, index, target, key, new_key, fields):
+        """
+        Applies a change whose new phone number belongs to another shard, moving the contact there.
+
+        The contact is deleted from its shard only once the other shard has added it, so a
+        rejected add leaves it where it was.
+        """
+        with self._holding((index, target)):
+            packed = self._request(index, 'get', key)
+            if packed is None:
+                return None
+            if self._request(target, 'phones_in_use', {new_key}):
+                return ValueError(f"Phone number {fields['phone']} is already in use.")
+            contact = _unpack(packed)
+            contact._assign(fields.get('first_name'), fields.get('last_name'), fields['phone'], new_key,
+                            fields.get('email'), fields.get('address'))
+            try:
+                self._request(target, 'add', _pack(contact))
+            except ValueError as error:
+                return error
+            self._request(index, 'delete_many', [key])
+        return contact
+
+    def register_view(self, by):
+        """Starts maintaining a sorted view and a group map in every shard. See PhoneBook.register_view."""
+        self._broadcast('register_view', by)
+
+    @instrumented()
+    def sort(self, by='last_name', limit=None, offset=0):
+        """
+        Sorts every shard by an attribute and k-way merges the sorted shards, missing values
+        last. With a limit, each shard returns only its first offset + limit contacts.
+        See PhoneBook.sort.
+        """
+        if by not in _FIELDS:
+            raise AttributeError(f"Contacts cannot be sorted by '{by}'.")
+        value = itemgetter(_FIELDS.index(by))
+
+        def key(fields):
+            return value(fields) is None, value(fields), _ADDED(fields)
+
+        return self._merged('sort', (by,), key, limit, offset)
+
+    @instrumented()
+    def group_by(self, by='last_name'):
+        """Groups every shard's contacts and joins the groups, oldest first. See PhoneBook.group_by."""
+        groups = {}
+        for shard_groups in self._broadcast('group_by', by):
+            for value, packed in shard_groups.items():
+                groups.setdefault(value, []).append(packed)
+        return {value: list(map(_unpack, heapq.merge(*parts, key=_ADDED))) for value, parts in groups.items()}
+
+    def log(self, operation, contact=None):
+        """Logs an operation. See PhoneBook.log."""
+        self.audit_logger.log(operation, contact)
+
+    def log_many(self, operation, contacts):
+        """Logs the same operation for several contacts. See PhoneBook.log_many."""
+        self.audit_logger.log_many(operation, contacts)
+
+    def get_history(self):
+        """Retrieves the log history. See PhoneBook.get_history."""
+        return self.audit_logger.lines()
+
+    def history(self, limit=None, operation=None, name=None, start=None, end=None, page_size=50, phone=None):
+        """Lazily yields pages of log entries, newest first. See PhoneBook.history."""
+        return self.audit_logger.history(limit, operation, name, start, end, page_size, phone)
+
+    def cache_stats(self):
+        """
+        Returns the query cache counters of all the shards added together.
+
+        Returns:
+        --------
+        dict or None
+            See QueryCache.stats, or None if caching is disabled.
+        """
+        stats = self._broadcast('cache_stats')
+        if stats[0] is None:
+            return None
+        total = {name: sum(shard[name] for shard in stats) for name in stats[0] if name != 'hit_rate'}
+        lookups = total['hits'] + total['misses']
+        total['hit_rate'] = total['hits'] / lookups if lookups else 0.0
+        return total
+
+    def close(self):
+        """Flushes the audit log and stops the worker processes."""
+        self.audit_logger.close()
+        for shard in self._shards:
+            shard.close()
@@ -0,0 +1,990 @@
+import sqlite3
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from contact import Contact
+from contactIndex import FuzzyIndex, GroupIndex, NGramIndex, SortedIndex, digits_of, edit_distance, fuzzy_distance
+from metrics import registry
+from pagination import top_k
+from validation import format_phone, phone_key
+
+# The largest edit distance a fuzzy name search accepts
+MAX_FUZZY_DISTANCE = 2
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_epoch_micros(moment):
+    """Converts a naive datetime to whole microseconds since 1970-01-01."""
+    return (moment - _EPOCH) // _MICROSECOND
+
+
+def from_epoch_micros(micros):
+    """Converts microseconds since 1970-01-01 back to a naive datetime."""
+    return _EPOCH + micros * _MICROSECOND
+
+
+class StorageBackend:
+    """
+    The interface a PhoneBook uses to store and query its contacts.
+
+    PhoneBook checks phone number uniqueness, parses user input and writes the audit
+    log; a backend only stores contacts and answers queries. Backends set each stored
+    contact's owner to the PhoneBook passed to attach(), so that Contact.update reports
+    changes back through PhoneBook to the backend's update().
+
+    Contacts are identified by their phone key (Contact.phone_key), the normalized integer
+    form of the phone number; Contact.phone is only the displayed text.
+
+    Query methods may return any iterable; results that could be large are best
+    produced lazily.
+    """
+
+    def attach(self, owner):
+        """
+        Records the PhoneBook that stored contacts report their updates to.
+
+        Parameters:
+        -----------
+        owner : PhoneBook
+            The phone book using this backend.
+        """
+        self._owner = owner
+
+    def __len__(self):
+        """Returns the number of stored contacts."""
+        raise NotImplementedError
+
+    def __iter__(self):
+        """Iterates over the stored contacts in the order they were added."""
+        raise NotImplementedError
+
+    def get(self, key):
+        """Returns the contact with the given phone key, or None."""
+        raise NotImplementedError
+
+    def has_phone(self, key):
+        """Returns True if a contact with the given phone key is stored."""
+        raise NotImplementedError
+
+    def phones_in_use(self, keys):
+        """Returns the set of the given phone keys that belong to stored contacts."""
+        raise NotImplementedError
+
+    def add_many(self, contacts):
+        """Stores a list of contacts whose phone keys are known to be free."""
+        raise NotImplementedError
+
+    def update(self, contact, old_key):
+        """Stores the new field values of a contact that was stored under old_key."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Removes the contact with the given phone key, returning it or None."""
+        raise NotImplementedError
+
+    def update_many(self, changes):
+        """Stores the new field values of several contacts, given as (contact, old_key) pairs."""
+        for contact, old_key in changes:
+            self.update(contact, old_key)
+
+    def delete_many(self, keys):
+        """Removes the contacts with the given phone keys, returning a list of each removed contact or None."""
+        return [self.delete(key) for key in keys]
+
+    def search_by_name(self, query, limit=None):
+        """
+        Returns the contacts whose case-folded first or last name contains the case-folded
+        query, in the order they were added. A limit tells the backend that only that many
+        leading results will be read, so it may produce them lazily and stop early.
+        """
+        raise NotImplementedError
+
+    def search_by_name_fuzzy(self, query, max_distance):
+        """
+        Returns the contacts whose names are within max_distance edits of the query, closest first.
+
+        Every whitespace-separated word of the case-folded query must be within
+        max_distance edits of some word of the contact's case-folded first or last name.
+        Contacts are ranked by the sum of those distances, ties in the order they were
+        added. This default scans every contact, comparing each distinct name word once.
+        """
+        tokens = query.casefold().split()
+        if not tokens:
+            return []
+        distances = [{} for _ in tokens]  # Per query word: name word -> edit distance, or None
+        results = []
+        for rank, contact in enumerate(registry.counting(self)):
+            words = contact.first_name.casefold().split() + contact.last_name.casefold().split()
+            for token, seen in zip(tokens, distances):
+                for word in words:
+                    if word not in seen:
+                        distance = edit_distance(token, word, max_distance)
+                        seen[word] = distance if distance <= max_distance else None
+            total = fuzzy_distance(distances, words)
+            if total is not None:
+                results.append((total, rank, contact))
+        results.sort(key=lambda result: result[:2])
+        return [contact for _, _, contact in results]
+
+    def search_by_phone(self, query, limit=None):
+        """
+        Returns the contacts whose ten key digits contain the digits of the query, or whose
+        displayed phone number contains the query if it has no digits, in the order they
+        were added. A limit is a hint as in search_by_name.
+        """
+        raise NotImplementedError
+
+    def search_by_timeframe(self, start, end):
+        """Returns the contacts with start <= time_added <= end (None means unbounded), oldest first."""
+        raise NotImplementedError
+
+    def register_view(self, by):
+        """Prepares the backend to sort and group by an attribute efficiently."""
+
+    def sort(self, by, limit=None, offset=0):
+        """
+        Returns the contacts ordered by an attribute, ties in the order they were added,
+        skipping the first offset and returning at most limit (None means all).
+        """
+        raise NotImplementedError
+
+    def group_by(self, by):
+        """Returns a dictionary mapping each attribute value to the list of contacts having it."""
+        raise NotImplementedError
+
+    def close(self):
+        """Releases any resources held by the backend."""
+
+
+class MemoryBackend(StorageBackend):
+    """
+    Stores contacts as Python objects with in-memory indexes.
+
+    A dict keyed by phone key holds the contacts. Phone and name
+    searches use n-gram indexes, date range searches use a sorted time index, and
+    sort and group_by read maintained views.
+    """
+
+    def __init__(self):
+        """Initializes an empty in-memory store."""
+        self._owner = None
+        # Primary-key index: phone key -> contact
+        self._contacts_by_phone = {}
+        # Insertion rank of every contact. Dicts keep insertion order, so this also
+        # serves as the ordered contact list, and the ranks put indexed search results
+        # in that same order.
+        self._ranks = {}
+        self._next_rank = 0
+        # Keys each contact is currently indexed under: contact -> (phone key, first, last),
+        # with names case-folded once here instead of on every search
+        self._keys = {}
+        # Digit n-gram index over the phone keys for partial phone number searches
+        self._phone_index = NGramIndex()
+        # Case-folded name trigram index for name searches
+        self._name_index = NGramIndex()
+        # Deletion index over the distinct case-folded name words for fuzzy name searches,
+        # and the contacts having each word
+        self._fuzzy_index = FuzzyIndex(MAX_FUZZY_DISTANCE)
+        self._name_words = GroupIndex()
+        # Contacts ordered by time_added for date range searches
+        self._time_index = SortedIndex()
+        # Maintained sorted views and group maps: attribute -> (SortedIndex, GroupIndex),
+        # plus the attribute values each contact is currently filed under
+        self._views = {}
+        self._view_keys = {}
+        self.register_view('last_name')
+
+    def __len__(self):
+        """Returns the number of stored contacts."""
+        return len(self._contacts_by_phone)
+
+    def __iter__(self):
+        """Iterates over the stored contacts in the order they were added."""
+        return iter(self._ranks)
+
+    def get(self, key):
+        """Returns the contact with the given phone key, or None."""
+        return self._contacts_by_phone.get(key)
+
+    def has_phone(self, key):
+        """Returns True if a contact with the given phone key is stored."""
+        return key in self._contacts_by_phone
+
+    def phones_in_use(self, keys):
+        """Returns the set of the given phone keys that belong to stored contacts."""
+        contacts_by_phone = self._contacts_by_phone
+        return {key for key in keys if key in contacts_by_phone}
+
+    def add_many(self, contacts):
+        """Stores contacts whose phone keys are known to be free and indexes them."""
+        time_entries = []
+        for contact in contacts:
+            rank = self._ranks[contact] = self._next_rank
+            self._next_rank += 1
+            self._contacts_by_phone[contact.phone_key] = contact
+            time_entries.append((contact.time_added, rank, contact))
+            self._index(contact)
+            contact._owner = self._owner
+
+        # Sorted structures are updated once per batch, not once per contact
+        self._time_index.add_many(time_entries)
+        self._add_to_views(contacts)
+
+    def _index(self, contact):
+        """Adds a contact to the secondary indexes and records the keys it was indexed under."""
+        first_key = contact.first_name.casefold()
+        last_key = contact.last_name.casefold()
+        self._keys[contact] = (contact.phone_key, first_key, last_key)
+        self._phone_index.add(contact, f'{contact.phone_key:010d}')
+        self._name_index.add(contact, first_key, last_key)
+        words = {*first_key.split(), *last_key.split()}
+        self._fuzzy_index.add(*words)
+        for word in words:
+            self._name_words.add(word, contact)
+
+    def _unindex(self, contact):
+        """Removes a contact from the secondary indexes using the keys it was indexed under."""
+        key, first_key, last_key = self._keys.pop(contact)
+        self._phone_index.remove(contact, f'{key:010d}')
+        self._name_index.remove(contact, first_key, last_key)
+        words = {*first_key.split(), *last_key.split()}
+        self._fuzzy_index.remove(*words)
+        for word in words:
+            self._name_words.remove(word, contact)
+
+    def update(self, contact, old_key):
+        """Brings the indexes up to date after a stored contact's fields changed."""
+        if contact.phone_key != old_key:
+            del self._contacts_by_phone[old_key]
+            self._contacts_by_phone[contact.phone_key] = contact
+        # Re-index only if the phone or a name changed, not for email or address updates
+        if self._keys[contact] != (contact.phone_key, contact.first_name.casefold(), contact.last_name.casefold()):
+            self._unindex(contact)
+            self._index(contact)
+
+        # Only move the contact within the views whose attribute actually changed
+        rank = self._ranks[contact]
+        old_values = self._view_keys[contact]
+        for by, old_value in old_values.items():
+            new_value = getattr(contact, by)
+            if new_value != old_value:
+                view, groups = self._views[by]
+                view.remove(self._view_key(old_value), rank)
+                groups.remove(old_value, contact)
+                view.add(self._view_key(new_value), rank, contact)
+                groups.add(new_value, contact)
+                old_values[by] = new_value
+
+    def delete(self, key):
+        """Removes the contact with the given phone key from every index, returning it or None."""
+        contact = self._contacts_by_phone.pop(key, None)
+        if contact is None:
+            return None
+        self._remove_from_views(contact)
+        self._time_index.remove(contact.time_added, self._ranks.pop(contact))
+        self._unindex(contact)
+        contact._owner = None
+        return contact
+
+    @staticmethod
+    def _view_key(value):
+        """Returns the sort key for an attribute value, ordering missing (None) values last."""
+        return value is None, value
+
+    def _add_to_views(self, contacts):
+        """Files contacts into every registered sorted view and group map."""
+        for contact in contacts:
+            self._view_keys[contact] = {}
+
+        for by, (view, groups) in self._views.items():
+            entries = []
+            for contact in contacts:
+                value = self._view_keys[contact][by] = getattr(contact, by)
+                entries.append((self._view_key(value), self._ranks[contact], contact))
+                groups.add(value, contact)
+            view.add_many(entries)
+
+    def _remove_from_views(self, contact):
+        """Removes a contact from every registered sorted view and group map."""
+        rank = self._ranks[contact]
+        for by, value in self._view_keys.pop(contact).items():
+            view, groups = self._views[by]
+            view.remove(self._view_key(value), rank)
+            groups.remove(value, contact)
+
+    def register_view(self, by):
+        """Builds a sorted view and group map for an attribute, kept up to date from then on."""
+        if by in self._views:
+            return
+
+        view, groups = SortedIndex(), GroupIndex()
+        entries = []
+        for contact, rank in self._ranks.items():
+            value = self._view_keys[contact][by] = getattr(contact, by)
+            entries.append((self._view_key(value), rank, contact))
+            groups.add(value, contact)
+        view.add_many(entries)
+        self._views[by] = (view, groups)
+
+    def _scan_first(self, limit, estimate):
+        """
+        Returns True if scanning the contacts in order should find limit matches sooner than
+        collecting and ordering all of about estimate candidates from an index.
+        """
+        return limit is not None and limit * len(self._ranks) < estimate * estimate
+
+    def search_by_name(self, query, limit=None):
+        """
+        Looks the query up in the name trigram index and checks the candidates' folded names.
+        When only the first few of many matches are needed, scans in order instead.
+        """
+        query = query.casefold()
+        if not query:
+            return iter(self._ranks)
+        if self._scan_first(limit, self._name_index.estimate(query)):
+            keys = self._keys
+            return (contact for contact in registry.counting(self._ranks)
+                    if query in keys[contact][1] or query in keys[contact][2])
+
+        results = []
+        for contact in registry.counting(self._name_index.candidates(query)):
+            _, first_key, last_key = self._keys[contact]
+            if query in first_key or query in last_key:
+                results.append(contact)
+        results.sort(key=self._ranks.__getitem__)
+        return results
+
+    def search_by_name_fuzzy(self, query, max_distance):
+        """
+        Finds the name words close to each query word in the fuzzy index, then checks the
+        contacts having the words matched by the most selective query word.
+        """
+        tokens = query.casefold().split()
+        if not tokens:
+            return []
+        matches = [self._fuzzy_index.search(token, max_distance) for token in tokens]
+        if not all(matches):
+            return []
+
+        name_words = self._name_words
+        ranks = self._ranks
+        if len(matches) == 1:
+            # Every contact having a matched word matches; its distance is that of its closest word
+            distances = {}
+            for word, distance in sorted(matches[0].items(), key=lambda item: item[1], reverse=True):
+                distances.update(dict.fromkeys(name_words.get(word), distance))
+            registry.scanned(len(distances))
+            return sorted(distances, key=lambda contact: (distances[contact], ranks[contact]))
+
+        rarest = min(matches, key=lambda match: sum(map(name_words.size, match)))
+        candidates = set()
+        for word in rarest:
+            candidates.update(name_words.get(word))
+        registry.scanned(len(candidates))
+
+        results = []
+        for contact in candidates:
+            _, first_key, last_key = self._keys[contact]
+            total = fuzzy_distance(matches, first_key.split() + last_key.split())
+            if total is not None:
+                results.append((total, ranks[contact], contact))
+        results.sort(key=lambda result: result[:2])
+        return [contact for _, _, contact in results]
+
+    def search_by_phone(self, query, limit=None):
+        """
+        Looks the query's digits up in the phone key n-gram index and checks the candidates.
+        When only the first few of many matches are needed, scans in order instead.
+        """
+        query_digits = digits_of(query)
+        if not query_digits:
+            # Nothing to look up in the index (e.g. an empty query or only punctuation)
+            return (contact for contact in registry.counting(self._ranks) if query in contact.phone)
+        if self._scan_first(limit, self._phone_index.estimate(query_digits)):
+            return (contact for contact in registry.counting(self._ranks)
+                    if query_digits in f'{contact.phone_key:010d}')
+
+        candidates = registry.counting(self._phone_index.candidates(query_digits))
+        results = [contact for contact in candidates if query_digits in f'{contact.phone_key:010d}']
+        results.sort(key=self._ranks.__getitem__)
+        return results
+
+    def search_by_timeframe(self, start, end):
+        """Lazily yields the contacts in a time range found by binary search in the time index."""
+        return self._time_index.range(start, end)
+
+    def sort(self, by, limit=None, offset=0):
+        """Iterates over a range of positions of the maintained sorted view for an attribute."""
+        self.register_view(by)
+        return self._views[by][0].slice(offset, None if limit is None else offset + limit)
+
+    def group_by(self, by):
+        """Returns a copy of the maintained group map for an attribute."""
+        self.register_view(by)
+        return self._views[by][1].groups()
+
+
+class _StringColumn:
+    """
+    A column of optional strings stored as UTF-8 in one shared bytearray.
+
+    Each value costs its encoded bytes plus a 12-byte (start, length) entry instead of
+    a full Python string object. Overwritten values leave their old bytes behind until
+    the column is rebuilt with compacted().
+    """
+
+    def __init__(self):
+        """Initializes an empty column."""
+        self._data = bytearray()
+        self._starts = array('q')
+        self._lengths = array('i')  # -1 marks a missing (None) value
+
+    def _store(self, value):
+        """Appends a value's bytes to the data buffer, returning its (start, length)."""
+        if value is None:
+            return 0, -1
+        encoded = str(value).encode('utf-8')
+        start = len(self._data)
+        self._data += encoded
+        return start, len(encoded)
+
+    def append(self, value):
+        """Adds a value as a new row."""
+        start, length = self._store(value)
+        self._starts.append(start)
+        self._lengths.append(length)
+
+    def __getitem__(self, row):
+        """Returns the value stored in a row."""
+        length = self._lengths[row]
+        if length < 0:
+            return None
+        start = self._starts[row]
+        return self._data[start:start + length].decode('utf-8')
+
+    def __setitem__(self, row, value):
+        """Replaces the value stored in a row."""
+        self._starts[row], self._lengths[row] = self._store(value)
+
+    def compacted(self, rows):
+        """Returns a new column holding only the given rows, without unused bytes."""
+        column = _StringColumn()
+        for row in rows:
+            column.append(self[row])
+        return column
+
+
+class _PhoneTable:
+    """
+    An open-addressing hash table from phone keys to row numbers.
+
+    Slots are an int64 array holding row + 1 (0 for an empty slot, -1 for a removed
+    entry), and the key of an entry is read back from the phone column. This costs
+    16 bytes per contact at the maximum load factor of one half, against roughly
+    100 bytes for a dict with int keys.
+    """
+
+    _EMPTY = 0
+    _REMOVED = -1
+
+    def __init__(self, phones, capacity=8):
+        """
+        Initializes an empty table over a phone column.
+
+        Parameters:
+        -----------
+        phones : array
+            The int64 phone column the stored rows refer to.
+        capacity : int, optional
+            The initial number of slots, a power of two (default is 8).
+        """
+        self._phones = phones
+        self._slots = array('q', bytes(8 * capacity))
+        self._count = 0  # Stored entries
+        self._used = 0  # Stored and removed entries, which both lengthen probe sequences
+
+    def __len__(self):
+        """Returns the number of stored entries."""
+        return self._count
+
+    def _position(self, phone):
+        """Returns the first slot to probe for a phone number."""
+        # Fibonacci hashing spreads consecutive numbers across the table
+        return ((phone * 0x9E3779B97F4A7C15) >> 20) & (len(self._slots) - 1)
+
+    def get(self, phone):
+        """Returns the row stored for a phone number, or None."""
+        slots, mask = self._slots, len(self._slots) - 1
+        position = self._position(phone)
+        while True:
+            slot = slots[position]
+            if slot == self._EMPTY:
+                return None
+            if slot > 0 and self._phones[slot - 1] == phone:
+                return slot - 1
+            position = (position + 1) & mask
+
+    def set(self, phone, row):
+        """Stores the row for a phone number that is not in the table yet."""
+        if (self._used + 1) * 2 > len(self._slots):
+            self._resize()
+        slots, mask = self._slots, len(self._slots) - 1
+        position = self._position(phone)
+        while slots[position] > 0:
+            position = (position + 1) & mask
+        if slots[position] == self._EMPTY:
+            self._used += 1
+        slots[position] = row + 1
+        self._count += 1
+
+    def remove(self, phone):
+        """Removes the entry for a phone number if present."""
+        slots, mask = self._slots, len(self._slots) - 1
+        position = self._position(phone)
+        while slots[position] != self._EMPTY:
+            slot = slots[position]
+            if slot > 0 and self._phones[slot - 1] == phone:
+                slots[position] = self._REMOVED
+                self._count -= 1
+                return
+            position = (position + 1) & mask
+
+    def _resize(self):
+        """Rehashes the stored entries into a table sized for twice as many."""
+        rows = [slot - 1 for slot in self._slots if slot > 0]
+        capacity = 8
+        while capacity < 4 * (len(rows) + 1):
+            capacity *= 2
+        self._slots = array('q', bytes(8 * capacity))
+        self._count = self._used = 0
+        for row in rows:
+            self.set(self._phones[row], row)
+
+
+class ColumnarBackend(StorageBackend):
+    """
+    Stores contacts column by column to minimize memory per contact.
+
+    Names are interned so repeated names share one string object, emails and addresses
+    are packed as UTF-8 into shared buffers, phone keys are stored in an int64
+    array with an open-addressing hash table on top, and time_added is kept as an int64
+    array of microseconds since the epoch. Contact objects are only built when a query
+    returns them, and updating one with Contact.update writes the change back.
+
+    There are no secondary indexes: searches, sort and group_by scan the columns. Date
+    range searches use a binary search while contacts are added in time order, which
+    is the usual case. Only the phone key is stored, so contacts read back show their
+    phone number in the format (###) ###-####.
+    """
+
+    def __init__(self):
+        """Initializes an empty columnar store."""
+        self._owner = None
+        self._first_names = []
+        self._last_names = []
+        self._phones = array('q')
+        self._emails = _StringColumn()
+        self._addresses = _StringColumn()
+        self._times = array('q')
+        self._live = bytearray()  # 1 for stored rows, 0 for deleted rows awaiting compaction
+        self._rows_by_phone = _PhoneTable(self._phones)
+        self._deleted = 0
+        self._time_ordered = True  # Whether _times is non-decreasing over all rows
+
+    def _contact(self, row):
+        """Builds a Contact view of a row, linked to the owning phone book."""
+        contact = Contact(self._first_names[row], self._last_names[row], format_phone(self._phones[row]),
+                          self._emails[row], self._addresses[row], from_epoch_micros(self._times[row]))
+        contact._owner = self._owner
+        return contact
+
+    def _rows(self):
+        """Yields the numbers of the stored rows in the order they were added."""
+        live = self._live
+        return (row for row in range(len(live)) if live[row])
+
+    def __len__(self):
+        """Returns the number of stored contacts."""
+        return len(self._rows_by_phone)
+
+    def __iter__(self):
+        """Iterates over views of the stored contacts in the order they were added."""
+        return (self._contact(row) for row in self._rows())
+
+    def get(self, key):
+        """Returns a view of the contact with the given phone key, or None."""
+        row = self._rows_by_phone.get(key)
+        return self._contact(row) if row is not None else None
+
+    def has_phone(self, key):
+        """Returns True if a contact with the given phone key is stored."""
+        return self._rows_by_phone.get(key) is not None
+
+    def phones_in_use(self, keys):
+        """Returns the set of the given phone keys that belong to stored contacts."""
+        return {key for key in keys if self._rows_by_phone.get(key) is not None}
+
+    def add_many(self, contacts):
+        """Appends contacts as new rows."""
+        for contact in contacts:
+            phone = contact.phone_key
+            time_added = to_epoch_micros(contact.time_added)
+            if self._times and time_added < self._times[-1]:
+                self._time_ordered = False
+            row = len(self._live)
+            self._first_names.append(sys.intern(contact.first_name))
+            self._last_names.append(sys.intern(contact.last_name))
+            self._phones.append(phone)
+            self._emails.append(contact.email)
+            self._addresses.append(contact.address)
+            self._times.append(time_added)
+            self._live.append(1)
+            self._rows_by_phone.set(phone, row)
+            contact._owner = self._owner
+
+    def update(self, contact, old_key):
+        """Writes a contact view's new field values back to its row."""
+        row = self._rows_by_phone.get(old_key)
+        phone = contact.phone_key
+        if phone != old_key:
+            self._rows_by_phone.remove(old_key)
+            self._phones[row] = phone
+            self._rows_by_phone.set(phone, row)
+        self._first_names[row] = sys.intern(contact.first_name)
+        self._last_names[row] = sys.intern(contact.last_name)
+        self._emails[row] = contact.email
+        self._addresses[row] = contact.address
+
+    def delete(self, key):
+        """Marks a row as deleted, returning a view of the deleted contact or None."""
+        row = self._rows_by_phone.get(key)
+        if row is None:
+            return None
+        contact = self._contact(row)
+        contact._owner = None
+        self._rows_by_phone.remove(self._phones[row])
+        self._live[row] = 0
+        self._first_names[row] = self._last_names[row] = None
+        self._deleted += 1
+        if self._deleted > len(self._rows_by_phone):
+            self._compact()
+        return contact
+
+    def _compact(self):
+        """Rewrites the columns without the deleted rows once they outnumber the stored ones."""
+        rows = list(self._rows())
+        self._first_names = [self._first_names[row] for row in rows]
+        self._last_names = [self._last_names[row] for row in rows]
+        self._phones = array('q', (self._phones[row] for row in rows))
+        self._emails = self._emails.compacted(rows)
+        self._addresses = self._addresses.compacted(rows)
+        self._times = array('q', (self._times[row] for row in rows))
+        self._live = bytearray(b'\x01' * len(rows))
+        self._rows_by_phone = _PhoneTable(self._phones)
+        for row, phone in enumerate(self._phones):
+            self._rows_by_phone.set(phone, row)
+        self._deleted = 0
+
+    def search_by_name(self, query, limit=None):
+        """Lazily scans the name columns for the case-folded query."""
+        query = query.casefold()
+        return (self._contact(row) for row in registry.counting(self._rows())
+                if query in self._first_names[row].casefold() or query in self._last_names[row].casefold())
+
+    def search_by_phone(self, query, limit=None):
+        """Lazily scans the phone key column, building contacts only for the rows whose digits match."""
+        query_digits = digits_of(query)
+        rows = registry.counting(self._rows())
+        if not query_digits:
+            return (contact for contact in map(self._contact, rows) if query in contact.phone)
+        return (self._contact(row) for row in rows if query_digits in f'{self._phones[row]:010d}')
+
+    def search_by_timeframe(self, start, end):
+        """Lazily yields the contacts in a time range, oldest first."""
+        low = to_epoch_micros(start) if start is not None else None
+        high = to_epoch_micros(end) if end is not None else None
+        times, live = self._times, self._live
+
+        if self._time_ordered:
+            first = bisect_left(times, low) if low is not None else 0
+            last = bisect_right(times, high) if high is not None else len(times)
+            rows = (row for row in range(first, last) if live[row])
+        else:
+            rows = sorted((row for row in registry.counting(self._rows())
+                           if (low is None or times[row] >= low) and (high is None or times[row] <= high)),
+                          key=times.__getitem__)
+        return (self._contact(row) for row in rows)
+
+    def _values(self, by):
+        """Returns a function giving an attribute's value for a row."""
+        if by == 'phone':
+            return lambda row: format_phone(self._phones[row])
+        if by == 'time_added':
+            return lambda row: self._times[row]
+        columns = {'first_name': self._first_names, 'last_name': self._last_names,
+                   'email': self._emails, 'address': self._addresses}
+        if by not in columns:
+            raise AttributeError(f"Contacts cannot be sorted or grouped by '{by}'.")
+        return columns[by].__getitem__
+
+    def sort(self, by, limit=None, offset=0):
+        """
+        Sorts the row numbers by a column and yields contact views in that order, missing
+        values last. With a limit only the first offset + limit rows are selected, with a heap.
+        """
+        value = self._values(by)
+        key = lambda row: (value(row) is None, value(row))
+        if limit is None:
+            rows = sorted(registry.counting(self._rows()), key=key)[offset:]
+        else:
+            rows = top_k(registry.counting(self._rows()), offset + limit, key)[offset:]
+        return (self._contact(row) for row in rows)
+
+    def group_by(self, by):
+        """Groups contact views by a column value in a single scan."""
+        groups = {}
+        for row in registry.counting(self._rows()):
+            contact = self._contact(row)
+            groups.setdefault(getattr(contact, by), []).append(contact)
+        return groups
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Stores contacts in an SQLite database.
+
+    Contacts are looked up by their phone key through a unique index. Names and the
+    phone key digits are indexed by an FTS5 trigram table, time_added and the sortable
+    columns by B-tree indexes. Bulk adds run in a single transaction, and
+    queries stream their rows back as Contact objects.
+
+    Each query returns new Contact objects. Updating one of them with Contact.update
+    writes the change back to the database.
+    """
+
+    # Contact attributes stored as columns, in table order
+    COLUMNS = ('first_name', 'last_name', 'phone', 'email', 'address', 'time_added')
+
+    # Columns that can hold NULL, which sort() orders last
+    NULLABLE_COLUMNS = ('email', 'address')
+
+    _SELECT = 'SELECT first_name, last_name, phone, email, address, time_added FROM contacts'
+
+    _SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS contacts (
+            id INTEGER PRIMARY KEY,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            email TEXT,
+            address TEXT,
+            time_added INTEGER NOT NULL,
+            first_key TEXT NOT NULL,
+            last_key TEXT NOT NULL,
+            phone_digits TEXT NOT NULL,
+            phone_key INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS contacts_time_added ON contacts (time_added, id);
+        CREATE INDEX IF NOT EXISTS contacts_last_name ON contacts (last_name, id);
+        CREATE VIRTUAL TABLE IF NOT EXISTS contacts_search USING fts5 (
+            first_key, last_key, phone_digits,
+            content='contacts', content_rowid='id', tokenize='trigram'
+        );
+        CREATE TRIGGER IF NOT EXISTS contacts_search_insert AFTER INSERT ON contacts BEGIN
+            INSERT INTO contacts_search (rowid, first_key, last_key, phone_digits)
+            VALUES (new.id, new.first_key, new.last_key, new.phone_digits);
+        END;
+        CREATE TRIGGER IF NOT EXISTS contacts_search_delete AFTER DELETE ON contacts BEGIN
+            INSERT INTO contacts_search (contacts_search, rowid, first_key, last_key, phone_digits)
+            VALUES ('delete', old.id, old.first_key, old.last_key, old.phone_digits);
+        END;
+        CREATE TRIGGER IF NOT EXISTS contacts_search_update AFTER UPDATE ON contacts BEGIN
+            INSERT INTO contacts_search (contacts_search, rowid, first_key, last_key, phone_digits)
+            VALUES ('delete', old.id, old.first_key, old.last_key, old.phone_digits);
+            INSERT INTO contacts_search (rowid, first_key, last_key, phone_digits)
+            VALUES (new.id, new.first_key, new.last_key, new.phone_digits);
+        END;
+    '''
+
+    def __init__(self, path=':memory:'):
+        """
+        Opens (and if needed creates) a contact database.
+
+        Parameters:
+        -----------
+        path : str, optional
+            The database file (default is ':memory:', a private in-memory database).
+        """
+        self._owner = None
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(self._SCHEMA)
+        self._add_phone_keys()
+
+    def _add_phone_keys(self):
+        """Adds the phone_key column and its unique index to a database created before phone keys."""
+        columns = [row[1] for row in self._connection.execute('PRAGMA table_info(contacts)')]
+        with self._connection:
+            if 'phone_key' not in columns:
+                self._connection.execute('ALTER TABLE contacts ADD COLUMN phone_key INTEGER')
+                rows = self._connection.execute('SELECT id, phone FROM contacts').fetchall()
+                self._connection.executemany(
+                    'UPDATE contacts SET phone_key = ?, phone_digits = ? WHERE id = ?',
+                    ((phone_key(phone), f'{phone_key(phone):010d}', row_id) for row_id, phone in rows))
+            self._connection.execute('CREATE UNIQUE INDEX IF NOT EXISTS contacts_phone_key ON contacts (phone_key)')
+
+    def _contact(self, row):
+        """Builds a Contact from a selected row and links it to the owning phone book."""
+        first_name, last_name, phone, email, address, time_added = row
+        contact = Contact(first_name, last_name, phone, email, address, from_epoch_micros(time_added))
+        contact._owner = self._owner
+        return contact
+
+    def _query(self, sql, parameters=()):
+        """Runs a SELECT and lazily yields the rows as contacts."""
+        for row in self._connection.execute(sql, parameters):
+            yield self._contact(row)
+
+    @staticmethod
+    def _row(contact):
+        """Returns the column values stored for a contact, without the id."""
+        return (contact.first_name, contact.last_name, contact.phone, contact.email, contact.address,
+                to_epoch_micros(contact.time_added), contact.first_name.casefold(),
+                contact.last_name.casefold(), f'{contact.phone_key:010d}', contact.phone_key)
+
+    @staticmethod
+    def _match(columns, text):
+        """Builds an FTS5 query matching text as a substring of any of the given columns."""
+        return '{%s} : "%s"' % (' '.join(columns), text.replace('"', '""'))
+
+    def _column(self, by):
+        """Checks that an attribute is a stored column before it is used in SQL."""
+        if by not in self.COLUMNS:
+            raise AttributeError(f"Contacts cannot be sorted or grouped by '{by}'.")
+        return by
+
+    def __len__(self):
+        """Returns the number of stored contacts."""
+        return self._connection.execute('SELECT COUNT(*) FROM contacts').fetchone()[0]
+
+    def __iter__(self):
+        """Iterates over the stored contacts in the order they were added."""
+        return self._query(self._SELECT + ' ORDER BY id')
+
+    def get(self, key):
+        """Returns the contact with the given phone key, or None."""
+        row = self._connection.execute(self._SELECT + ' WHERE phone_key = ?', (key,)).fetchone()
+        return self._contact(row) if row else None
+
+    def has_phone(self, key):
+        """Returns True if a contact with the given phone key is stored."""
+        return self._connection.execute('SELECT 1 FROM contacts WHERE phone_key = ?', (key,)).fetchone() is not None
+
+    def phones_in_use(self, keys):
+        """Returns the set of the given phone keys that belong to stored contacts."""
+        keys = list(keys)
+        in_use = set()
+        # Stay well below SQLite's limit on the number of bound parameters
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ', '.join('?' * len(batch))
+            sql = f'SELECT phone_key FROM contacts WHERE phone_key IN ({placeholders})'
+            in_use.update(key for (key,) in self._connection.execute(sql, batch))
+        return in_use
+
+    def add_many(self, contacts):
+        """Inserts contacts in a single transaction."""
+        with self._connection:
+            self._connection.executemany(
+                'INSERT INTO contacts (first_name, last_name, phone, email, address, time_added, '
+                'first_key, last_key, phone_digits, phone_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (self._row(contact) for contact in contacts))
+        for contact in contacts:
+            contact._owner = self._owner
+
+    def update(self, contact, old_key):
+        """Writes a contact's new field values to the row stored under old_key."""
+        self.update_many([(contact, old_key)])
+
+    def delete(self, key):
+        """Deletes the row with the given phone key, returning the deleted contact or None."""
+        return self.delete_many([key])[0]
+
+    def update_many(self, changes):
+        """Writes the new field values of several contacts in a single transaction."""
+        with self._connection:
+            self._connection.executemany(
+                'UPDATE contacts SET first_name = ?, last_name = ?, phone = ?, email = ?, address = ?, '
+                'time_added = ?, first_key = ?, last_key = ?, phone_digits = ?, phone_key = ? WHERE phone_key = ?',
+                (self._row(contact) + (old_key,) for contact, old_key in changes))
+
+    def delete_many(self, keys):
+        """Deletes the rows with the given phone keys in a single transaction, returning the deleted contacts."""
+        results = []
+        with self._connection:
+            for key in keys:
+                contact = self.get(key)
+                if contact is not None:
+                    self._connection.execute('DELETE FROM contacts WHERE phone_key = ?', (key,))
+                    contact._owner = None
+                results.append(contact)
+        return results
+
+    def search_by_name(self, query, limit=None):
+        """Finds name substrings with the trigram table, or a scan for queries under three characters."""
+        query = query.casefold()
+        if len(query) >= 3:
+            return self._query(
+                self._SELECT + ' WHERE id IN (SELECT rowid FROM contacts_search WHERE contacts_search MATCH ?)'
+                ' AND (instr(first_key, ?) > 0 OR instr(last_key, ?) > 0) ORDER BY id',
+                (self._match(('first_key', 'last_key'), query), query, query))
+        return self._query(self._SELECT + ' WHERE instr(first_key, ?) > 0 OR instr(last_key, ?) > 0 ORDER BY id',
+                           (query, query))
+
+    def search_by_phone(self, query, limit=None):
+        """Finds digit substrings of the phone keys with the trigram table, or a scan for short queries."""
+        query_digits = digits_of(query)
+        if len(query_digits) >= 3:
+            return self._query(
+                self._SELECT + ' WHERE id IN (SELECT rowid FROM contacts_search WHERE contacts_search MATCH ?)'
+                ' AND instr(phone_digits, ?) > 0 ORDER BY id',
+                (self._match(('phone_digits',), query_digits), query_digits))
+        if query_digits:
+            return self._query(self._SELECT + ' WHERE instr(phone_digits, ?) > 0 ORDER BY id', (query_digits,))
+        return self._query(self._SELECT + ' WHERE instr(phone, ?) > 0 ORDER BY id', (query,))
+
+    def search_by_timeframe(self, start, end):
+        """Streams the contacts in a time range using the time_added index."""
+        low = to_epoch_micros(start) if start is not None else -2 ** 63
+        high = to_epoch_micros(end) if end is not None else 2 ** 63 - 1
+        return self._query(self._SELECT + ' WHERE time_added BETWEEN ? AND ? ORDER BY time_added, id', (low, high))
+
+    def register_view(self, by):
+        """Creates a B-tree index for sorting and grouping by a column."""
+        column = self._column(by)
+        self._connection.execute(f'CREATE INDEX IF NOT EXISTS contacts_{column} ON contacts ({column}, id)')
+
+    def sort(self, by, limit=None, offset=0):
+        """Streams a range of the contacts ordered by a column, missing values last."""
+        self.register_view(by)
+        column = self._column(by)
+        order = f'{column} IS NULL, {column}, id' if column in self.NULLABLE_COLUMNS else f'{column}, id'
+        # A negative LIMIT means no limit in SQLite
+        return self._query(self._SELECT + f' ORDER BY {order} LIMIT ? OFFSET ?',
+                           (-1 if limit is None else limit, offset))
+
+    def group_by(self, by):
+        """Groups the contacts by a column, reading them in index order."""
+        column = self._column(by)
+        groups = {}
+        for key, contacts in groupby(self.sort(by), key=lambda contact: getattr(contact, column)):
+            groups[key] = list(contacts)
+        return groups
+
+    def close(self):
+        """Closes the database connection."""
+        self._connection.close()
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from auditLog import AuditLogger
+from contact import Contact
+from phoneBook import PhoneBook
+from storage import ColumnarBackend, MemoryBackend, SQLiteBackend
+
+FIRST_NAMES = ['John', 'Jane', 'Mary Ann', 'Jon', 'Joan', 'Émile', 'Zoë', 'Ann']
+LAST_NAMES = ['Doe', 'Smith', 'Smyth', 'Van der Berg', "O'Connor", 'DOE', 'Brown']
+
+
+def sample_contacts(count, start=0):
+    """Returns count contacts with repeating names, distinct phone numbers and increasing times."""
+    origin = datetime(2024, 1, 1)
+    contacts = []
+    for number in range(start, start + count):
+        email = f'user{number}@example.com' if number % 3 else None
+        address = f'{number} Main St' if number % 4 else None
+        contacts.append(Contact(FIRST_NAMES[number % len(FIRST_NAMES)], LAST_NAMES[number % len(LAST_NAMES)],
+                                f'(555) {number // 10000:03d}-{number % 10000:04d}', email, address,
+                                origin + timedelta(hours=number)))
+    return contacts
+
+
+@pytest.fixture
+def audit_logger(tmp_path):
+    """An audit logger writing to a temporary file."""
+    logger = AuditLogger(str(tmp_path / 'phonebook.log'))
+    yield logger
+    logger.close()
+
+
+@pytest.fixture(params=[MemoryBackend, ColumnarBackend, SQLiteBackend], ids=lambda backend: backend.__name__)
+def phone_book(request, audit_logger):
+    """An empty phone book on each storage backend."""
+    book = PhoneBook(request.param(), audit_logger=audit_logger)
+    yield book
+    book.close()
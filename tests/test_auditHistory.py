@@ -0,0 +1,73 @@
+import importlib.util
+import sys
+import threading
+import types
+
+import auditHistory
+from auditHistory import BLOCK_LINES, AuditHistory, _BLOCK, _HEADER
+
+
+def write_log(path, count):
+    """Writes count log lines in the layout of AuditLogger."""
+    with open(path, 'w') as log_file:
+        for number in range(count):
+            minute, second = divmod(number % 3600, 60)
+            log_file.write(f'[2024-01-01 12:{minute:02d}:{second:02d}] Add performed on A{number} B\n')
+
+
+def test_concurrent_readers_index_each_block_once(tmp_path):
+    """Readers extending the sidecar index at the same time must not append the same blocks twice."""
+    path = str(tmp_path / 'audit.log')
+    count = 40 * BLOCK_LINES + 7
+    write_log(path, count)
+    totals = []
+    barrier = threading.Barrier(4)
+
+    def read():
+        barrier.wait()
+        totals.append(sum(len(page) for page in AuditHistory(path).pages(page_size=1000)))
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert totals == [count] * 4
+    with open(path + '.idx', 'rb') as index_file:
+        assert len(index_file.read()) == _HEADER.size + 40 * _BLOCK.size
+    assert sum(len(page) for page in AuditHistory(path).pages(page_size=1000)) == count
+
+
+def test_index_is_extended_and_rebuilt(tmp_path):
+    """Lines appended after a read are indexed, and a replaced log gets a new index."""
+    path = str(tmp_path / 'audit.log')
+    write_log(path, 3 * BLOCK_LINES)
+    history = AuditHistory(path)
+    assert sum(map(len, history.pages())) == 3 * BLOCK_LINES
+    with open(path, 'a') as log_file:
+        log_file.write('[2024-01-02 00:00:00] Search performed\n' * BLOCK_LINES)
+    assert sum(map(len, history.pages(operation='Search'))) == BLOCK_LINES
+    assert sum(map(len, AuditHistory(path).pages())) == 4 * BLOCK_LINES
+
+    with open(path, 'w') as log_file:
+        log_file.write('[2024-01-03 00:00:00] Delete performed on C D\n')
+    assert [entry.name for page in history.pages() for entry in page] == ['C D']
+
+
+def test_index_is_locked_with_msvcrt_without_fcntl(tmp_path, monkeypatch):
+    """Where fcntl does not exist, as on Windows, the index is locked and unlocked through msvcrt."""
+    calls = []
+    msvcrt = types.ModuleType('msvcrt')
+    msvcrt.LK_LOCK, msvcrt.LK_UNLCK = 1, 0
+    msvcrt.locking = lambda fileno, mode, length: calls.append(mode)
+    monkeypatch.setitem(sys.modules, 'fcntl', None)
+    monkeypatch.setitem(sys.modules, 'msvcrt', msvcrt)
+    spec = importlib.util.spec_from_file_location('auditHistory_windows', auditHistory.__file__)
+    windows = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(windows)
+
+    path = str(tmp_path / 'audit.log')
+    write_log(path, 3 * BLOCK_LINES)
+    assert sum(map(len, windows.AuditHistory(path).pages())) == 3 * BLOCK_LINES
+    assert calls and calls == [msvcrt.LK_LOCK, msvcrt.LK_UNLCK] * (len(calls) // 2)
@@ -0,0 +1,154 @@
+import gc
+import weakref
+import zlib
+
+import pytest
+
+from auditFormat import (FILE_MAGIC, LEGACY_BLOCK_MAGIC, _LEGACY_BLOCK_HEADER, BinaryAuditHistory, BinaryAuditLogger,
+                         _legacy_filter_bits, _may_contain, encode_block, encode_record)
+from auditLog import AuditLogger
+from contact import Contact
+from storage import from_epoch_micros
+
+
+@pytest.mark.parametrize('logger_class', [AuditLogger, BinaryAuditLogger])
+def test_unencodable_name_is_logged(tmp_path, logger_class):
+    """A name with a lone surrogate, as JSON input can produce, must not stop the writer thread."""
+    logger = logger_class(str(tmp_path / 'audit.log'))
+    logger.log('Add', Contact('\ud800', 'Doe', '(555) 100-0001'))
+    logger.flush()
+    logger.log('Add', Contact('Jane', 'Doe', '(555) 100-0002'))
+    logger.close()
+    lines = logger_class(logger.path).lines()
+    assert len(lines) == 2
+    assert '\\ud800 Doe' in lines[0] and 'Jane Doe' in lines[1]
+
+
+def test_write_error_is_raised_and_writer_keeps_running(tmp_path):
+    """A batch that cannot be written is reported by flush(), and later batches are written."""
+    path = tmp_path / 'audit.log'
+    path.mkdir()  # Opening a directory for writing fails
+    logger = AuditLogger(str(path))
+    logger.log('Add')
+    with pytest.raises(OSError):
+        logger.flush()
+    path.rmdir()
+    logger.log('Search')
+    logger.close()
+    assert len(AuditLogger(str(path)).lines()) == 1
+
+
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_logging_raises_once_the_writer_thread_stopped(tmp_path):
+    """Records are not queued silently when no writer thread would ever write them."""
+    logger = AuditLogger(str(tmp_path / 'audit.log'))
+
+    def stop(record):
+        raise SystemExit  # Not an Exception, so it ends the writer thread
+    logger._format = stop
+    logger.log('Add')
+    logger._thread.join()
+    with pytest.raises(SystemExit):
+        logger.flush()
+    with pytest.raises(RuntimeError):
+        logger.log('Search')
+    logger.close()
+
+
+def test_logging_after_close_raises(tmp_path):
+    """A closed logger refuses records instead of dropping them."""
+    logger = AuditLogger(str(tmp_path / 'audit.log'))
+    logger.log('Add')
+    logger.close()
+    with pytest.raises(ValueError):
+        logger.log('Search')
+
+
+@pytest.mark.parametrize('logger_class', [AuditLogger, BinaryAuditLogger])
+def test_closed_loggers_are_released(tmp_path, logger_class):
+    """Closing a logger drops its exit hook, so nothing keeps the logger alive afterwards."""
+    logger = logger_class(str(tmp_path / 'audit.log'))
+    logger.log('Add')
+    logger.close()
+    released = weakref.ref(logger)
+    del logger
+    gc.collect()
+    assert released() is None
+
+
+def test_binary_log_recovers_from_a_torn_block(tmp_path):
+    """Records logged after a crash tore the last block are readable, and the torn block is dropped."""
+    path = str(tmp_path / 'audit.alog')
+    logger = BinaryAuditLogger(path)
+    logger.log('Add', Contact('Jane', 'Doe', '(555) 100-0001'))
+    logger.flush()
+    logger.log('Add', Contact('John', 'Doe', '(555) 100-0002'))
+    logger.close()
+    with open(path, 'r+b') as log_file:
+        log_file.truncate(log_file.seek(0, 2) - 5)
+
+    logger = BinaryAuditLogger(path)
+    logger.log('Delete', Contact('Jane', 'Doe', '(555) 100-0001'))
+    logger.close()
+    assert [line.split('] ')[1] for line in logger.lines()] == ['Add performed on Jane Doe\n',
+                                                                 'Delete performed on Jane Doe\n']
+    assert [entry.operation for page in logger.history(phone='(555) 100-0001') for entry in page] == \
+        ['Delete', 'Add']
+
+
+def test_binary_log_recovers_from_a_torn_header(tmp_path):
+    """A file torn inside its header is started over."""
+    path = tmp_path / 'audit.alog'
+    path.write_bytes(b'PBAU')
+    logger = BinaryAuditLogger(str(path))
+    logger.log('Search')
+    logger.close()
+    assert len(logger.lines()) == 1
+
+
+def write_blocks(path, blocks, records_per_block):
+    """Writes a binary log of full blocks where record n is about phone key 5550000000 + 7n."""
+    with open(path, 'wb') as log_file:
+        log_file.write(FILE_MAGIC)
+        for block in range(blocks):
+            numbers = range(block * records_per_block, (block + 1) * records_per_block)
+            log_file.write(encode_block([encode_record('Add', number * 1000, 5550000000 + 7 * number, 'A', 'B')
+                                         for number in numbers]))
+
+
+def test_phone_filter_skips_blocks_without_the_phone(tmp_path):
+    """Full blocks are skipped for a phone they do not hold, and never for one they do."""
+    path = str(tmp_path / 'audit.alog')
+    write_blocks(path, 20, 1000)
+    history = BinaryAuditHistory(path)
+    with open(path, 'rb') as log_file:
+        buffer = log_file.read()
+    blocks = history._blocks(buffer)
+    assert len(blocks) == 20
+
+    absent = [5550000000 + 7 * number + offset for number in range(0, 20000, 100) for offset in (1, 3)]
+    passed = sum(_may_contain(buffer, block[5], key) for key in absent for block in blocks)
+    assert passed < 0.02 * len(absent) * len(blocks)
+    for number in range(0, 20000, 37):
+        assert _may_contain(buffer, blocks[number // 1000][5], 5550000000 + 7 * number)
+
+    assert [entry.time for page in history.pages(phone=5550000000 + 7 * 12345) for entry in page] == \
+        [from_epoch_micros(12345000)]
+    assert list(history.pages(phone=5550000001)) == []
+
+
+def test_legacy_blocks_are_read(tmp_path):
+    """Blocks written with the fixed-size phone filter are read and filtered alongside new ones."""
+    path = str(tmp_path / 'audit.alog')
+    record = encode_record('Delete', 1000, 5551000001, 'Jane', 'Doe')
+    legacy = _LEGACY_BLOCK_HEADER.pack(LEGACY_BLOCK_MAGIC, len(record), 1, 1000, 1000,
+                                       _legacy_filter_bits(5551000001).to_bytes(32, 'little'), zlib.crc32(record))
+    with open(path, 'wb') as log_file:
+        log_file.write(FILE_MAGIC + legacy + record)
+        log_file.write(encode_block([encode_record('Add', 2000, 5551000001, 'Jane', 'Doe')]))
+
+    logger = BinaryAuditLogger(path)
+    logger.log('Search')
+    logger.close()
+    assert [entry.operation for page in logger.history(phone='(555) 100-0001') for entry in page] == ['Add', 'Delete']
+    assert len(logger.lines()) == 3
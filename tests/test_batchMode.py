@@ -0,0 +1,62 @@
+import io
+import json
+
+import pytest
+
+from batchMode import run_batch
+
+OPERATIONS = [
+    {'op': 'add', 'first_name': 'Jane', 'last_name': 'Doe', 'phone': '(555) 100-0001', 'email': 'jane@example.com'},
+    {'op': 'add', 'first_name': 'John', 'last_name': 'Doe', 'phone': '555.100.0002'},
+    {'op': 'add', 'first_name': 'Dup', 'last_name': 'Licate', 'phone': '5551000001'},
+    {'op': 'add', 'first_name': 'Bad', 'last_name': 'Email', 'phone': '(555) 100-0003', 'email': 'nope'},
+    {'op': 'add', 'first_name': 'No', 'phone': '(555) 100-0004'},
+    {'op': 'update', 'phone': '(555) 100-0001', 'new_phone': '(555) 100-0009'},
+    {'op': 'update', 'phone': '(555) 100-0002', 'new_phone': '(555) 100-0001', 'last_name': 'Roe'},
+    {'op': 'update', 'phone': '(555) 100-0009', 'new_phone': '(555) 100-0001'},
+    {'op': 'update', 'phone': '(555) 100-0042', 'first_name': 'Nobody'},
+    {'op': 'search', 'by': 'name', 'query': 'roe'},
+    {'op': 'delete', 'phone': '555-100-0009'},
+    {'op': 'delete', 'phone': '555-100-0009'},
+    {'op': 'frobnicate'},
+    {'op': 'search', 'by': 'timeframe', 'start': 'yesterday'},
+]
+
+# (ok, error starts with) for each operation above
+EXPECTED = [(True, None), (True, None), (False, 'Phone number'), (False, 'Invalid email'), (False, 'Missing last_name'),
+            (True, None), (True, None), (False, 'Phone number'), (False, 'No contact'), (True, None),
+            (True, None), (False, 'No contact'), (False, 'Unknown operation'), (False, 'Invalid date')]
+
+
+@pytest.mark.parametrize('run_size', [1, 2, 100])
+def test_batch_results_follow_stream_order(phone_book, run_size):
+    """Each operation sees the ones before it, whichever runs they were grouped into."""
+    source = io.StringIO(''.join(json.dumps(operation) + '\n\n' for operation in OPERATIONS) + '{not json\n')
+    output = io.StringIO()
+    report = run_batch(phone_book, source, output=output, run_size=run_size)
+
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [result['line'] for result in results] == list(range(1, 2 * len(OPERATIONS), 2)) + [2 * len(OPERATIONS) + 1]
+    assert [(result['ok'], result.get('error', '')[:len(error or '')] or None) for result, (_, error)
+            in zip(results, EXPECTED)] == EXPECTED
+    assert results[-1]['error'].startswith('Invalid JSON')
+    assert [contact['phone'] for contact in results[9]['results']] == ['(555) 100-0001']
+    assert (report.applied, report.failed) == (6, 9)
+    assert [(contact.first_name, contact.last_name, contact.phone_key) for contact in phone_book.contacts] == \
+        [('John', 'Roe', 5551000001)]
+
+
+def test_batch_from_csv(phone_book, tmp_path):
+    """CSV batches name the fields in their header and treat empty cells as missing."""
+    path = tmp_path / 'batch.csv'
+    path.write_text('op,first_name,last_name,phone,email,by,query\n'
+                    'add,Jane,Doe,(555) 100-0001,,,\n'
+                    'add,John,Doe,(555) 100-0002,john@example.com,,\n'
+                    'search,,,,,phone,100-0002\n')
+    output = io.StringIO()
+    report = run_batch(phone_book, str(path), output=output)
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [result['line'] for result in results] == [2, 3, 4]
+    assert [contact['email'] for contact in results[2]['results']] == ['john@example.com']
+    assert (report.applied, report.failed) == (3, 0)
+    assert phone_book.get_by_phone('(555) 100-0001').email is None
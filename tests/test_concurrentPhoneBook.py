@@ -0,0 +1,25 @@
+import pytest
+
+from benchmarks.stress_concurrency import linearizability, torn_reads
+from storage import ColumnarBackend, MemoryBackend, SQLiteBackend
+
+# A short version of the stress benchmark: a few threads for a fraction of a second per backend
+READERS, WRITERS, SECONDS = 3, 2, 0.15
+
+
+@pytest.mark.parametrize('make_backend', [MemoryBackend, ColumnarBackend, SQLiteBackend],
+                         ids=lambda backend: backend.__name__)
+def test_reads_match_a_serial_replay(make_backend):
+    """Every read returns what a serial run would have at its version, including reads after the last write."""
+    writes, reads, final_reads, mismatches = linearizability(make_backend, READERS, WRITERS, SECONDS)
+    assert writes > 0 and final_reads > 0
+    assert mismatches == 0
+
+
+@pytest.mark.parametrize('make_backend', [MemoryBackend, ColumnarBackend, SQLiteBackend],
+                         ids=lambda backend: backend.__name__)
+def test_reads_are_never_torn(make_backend):
+    """No snapshot read mixes the fields of an update with those from before it."""
+    reads, checked, torn = torn_reads(make_backend, READERS, WRITERS, SECONDS)
+    assert reads > 0 and checked > 0
+    assert torn == 0
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from contactIndex import FuzzyIndex, edit_distance
+from tests.conftest import sample_contacts
+
+
+def osa_distance(first, second):
+    """The optimal string alignment distance, computed with the full dynamic programming table."""
+    table = [[0] * (len(second) + 1) for _ in range(len(first) + 1)]
+    for row in range(len(first) + 1):
+        for column in range(len(second) + 1):
+            if not row or not column:
+                table[row][column] = row + column
+                continue
+            table[row][column] = min(table[row - 1][column] + 1, table[row][column - 1] + 1,
+                                     table[row - 1][column - 1] + (first[row - 1] != second[column - 1]))
+            if (row > 1 and column > 1 and first[row - 1] == second[column - 2]
+                    and first[row - 2] == second[column - 1]):
+                table[row][column] = min(table[row][column], table[row - 2][column - 2] + 1)
+    return table[-1][-1]
+
+
+def random_words(chooser, count):
+    """Returns count short words over a small alphabet, so that many are close to each other."""
+    return [''.join(chooser.choice('abcde') for _ in range(chooser.randint(0, 9))) for _ in range(count)]
+
+
+def test_edit_distance_matches_the_full_table():
+    """The two-row distance, with and without a limit, agrees with the full table."""
+    chooser = random.Random(18)
+    words = random_words(chooser, 120)
+    for first in words:
+        for second in chooser.sample(words, 20):
+            distance = osa_distance(first, second)
+            assert edit_distance(first, second) == distance
+            for limit in range(4):
+                assert edit_distance(first, second, limit) == min(distance, limit + 1)
+
+
+def test_fuzzy_index_matches_brute_force():
+    """The deletion index finds exactly the words within the distance, also after words are removed."""
+    chooser = random.Random(180)
+    words = random_words(chooser, 400) + ['abcdefghij', 'abcdefghji', 'bacdefghijk']
+    index = FuzzyIndex(max_distance=2, prefix_length=4)
+    index.add(*words)
+    removed = chooser.sample(words, 100)
+    index.remove(*removed)
+    present = set(words)
+    for word in removed:
+        if words.count(word) == removed.count(word):
+            present.discard(word)
+    assert len(index) == len(present)
+
+    for query in random_words(chooser, 80) + ['abcdefhgij', 'acbdefghij']:
+        for max_distance in range(3):
+            expected = {word: osa_distance(query, word) for word in present
+                        if osa_distance(query, word) <= max_distance}
+            assert index.search(query, max_distance) == expected
+    with pytest.raises(ValueError):
+        index.search('abc', 3)
+
+
+@pytest.mark.parametrize('query', ['jhon', 'jon smtih', 'mary an', 'smiht', 'van dre berg', 'zoe', 'emile doe', ''])
+@pytest.mark.parametrize('max_distance', [0, 1, 2])
+def test_fuzzy_name_search_matches_brute_force(phone_book, query, max_distance):
+    """Contacts are found when every query word is close to a name word, ranked by total distance."""
+    phone_book.add_many(sample_contacts(60))
+    phone_book.update(5550000005, first_name='Jhon')
+    phone_book.delete(5550000006)
+
+    ranked = []
+    for rank, contact in enumerate(phone_book.contacts):
+        words = contact.first_name.casefold().split() + contact.last_name.casefold().split()
+        distances = [min(osa_distance(token, word) for word in words) for token in query.casefold().split()]
+        if distances and max(distances) <= max_distance:
+            ranked.append((sum(distances), rank, contact.phone_key))
+    expected = [key for _, _, key in sorted(ranked)]
+    assert [contact.phone_key for contact in phone_book.search_by_name_fuzzy(query, max_distance)] == expected
@@ -0,0 +1,174 @@
+import importlib.util
+import os
+import subprocess
+import sys
+
+import pytest
+
+import csvImport
+from contact import Contact
+from csvImport import (INVALID_EMAIL, INVALID_PHONE, SCAN_BLOCK_BYTES, EmptyCSVError, duplicate_phone, import_csv,
+                       import_csv_parallel, import_csv_stream)
+from phoneBook import PhoneBook
+
+# Every kind of row an import handles. The address on line 7 spans two lines.
+SAMPLE_CSV = '''First Name,Last Name,Phone,Email,Address
+John,Doe,(123) 456-7890,john@example.com,1 Elm St
+Jane,Smith,bad,jane@example.com,2 Oak St
+
+Mike,Brown,123-456-7890,mike@example.com,
+Ann,Lee,(555) 100-0001,not-an-email,
+Bob,Ray,(555) 100-0002,,"10 Main St
+Apt 2"
+Zed,Quinn,(555) 100-0003,,
+Amy,Stone,+1 555 100 0004,,
+'''
+
+SAMPLE_REJECTS = [(3, INVALID_PHONE), (5, duplicate_phone('123-456-7890')), (6, INVALID_EMAIL),
+                  (9, duplicate_phone('(555) 100-0003'))]
+
+needs_pandas = pytest.mark.skipif(importlib.util.find_spec('pandas') is None, reason='pandas is not installed')
+
+importers = [pytest.param(import_csv, marks=needs_pandas)]
+
+
+@pytest.fixture
+def sample_file(tmp_path):
+    """The path of a CSV file with SAMPLE_CSV as its contents."""
+    path = tmp_path / 'contacts.csv'
+    path.write_text(SAMPLE_CSV)
+    return str(path)
+
+
+@pytest.mark.parametrize('importer', importers)
+@pytest.mark.parametrize('chunksize', [1, 2, 100])
+def test_import_reports_rejects_by_line(phone_book, sample_file, importer, chunksize):
+    """Valid rows are added and every other row is reported once, under the line it starts on."""
+    phone_book.add(Contact('Stored', 'Contact', '555-100-0003'))
+    report = importer(phone_book, sample_file, chunksize=chunksize)
+
+    assert report.added == 3
+    assert report.rejects == SAMPLE_REJECTS
+    assert [(contact.first_name, contact.email, contact.address) for contact in phone_book.contacts[1:]] == \
+        [('John', 'john@example.com', '1 Elm St'), ('Bob', None, '10 Main St\nApt 2'), ('Amy', None, None)]
+
+
+@pytest.mark.parametrize('importer', importers)
+def test_import_checks_the_header(phone_book, tmp_path, importer):
+    """An empty file and a file without a required column are refused before anything is added."""
+    empty = tmp_path / 'empty.csv'
+    empty.write_text('')
+    with pytest.raises(EmptyCSVError):
+        importer(phone_book, str(empty))
+
+    no_phone = tmp_path / 'no_phone.csv'
+    no_phone.write_text('First Name,Last Name\nJohn,Doe\n')
+    with pytest.raises(ValueError, match='Phone'):
+        importer(phone_book, str(no_phone))
+    assert len(phone_book) == 0
+
+
+def multiline_csv(count):
+    """Returns CSV text whose quoted fields often contain line breaks, commas and escaped quotes."""
+    lines = ['First Name,Last Name,Phone,Email,Address']
+    for number in range(count):
+        phone = f'(555) 200-{number:04d}'
+        if number % 17 == 0:
+            phone = 'bad'
+        elif number % 23 == 0:
+            phone = f'555-200-{number - 1:04d}'  # Same key as the row before
+        email = f'user{number}@example.com' if number % 13 else 'not-an-email'
+        if number % 3 == 0:
+            address = f'"{number} Main\nSt"'
+        elif number % 5 == 0:
+            address = f'"Suite ""{number}"", Floor 2\n\nBack door"'
+        else:
+            address = f'{number} Oak Ave'
+        first_name = '"Mary\nAnn"' if number % 7 == 0 else 'John'
+        lines.append(f'{first_name},Doe,{phone},{email},{address}')
+        if number % 31 == 0:
+            lines.append('')
+    return '\n'.join(lines) + '\n'
+
+
+def imported(phone_book, report):
+    """Returns what an import did: the added contacts' fields and the rejects."""
+    return [(contact.first_name, contact.phone_key, contact.email, contact.address)
+            for contact in phone_book.contacts], report.rejects
+
+
+@pytest.mark.parametrize('scan_block', [7, 64, SCAN_BLOCK_BYTES])
+def test_parallel_ranges_start_on_records(tmp_path, monkeypatch, scan_block):
+    """No range starts inside a quoted field, however the file is read while it is split."""
+    monkeypatch.setattr(csvImport, 'SCAN_BLOCK_BYTES', scan_block)
+    path = tmp_path / 'contacts.csv'
+    path.write_text(multiline_csv(300))
+    data = path.read_bytes()
+    data_start = data.index(b'\n') + 1
+    ranges = csvImport._split_ranges(str(path), data_start, 40)
+
+    assert len(ranges) > 20
+    assert ranges[0][0] == data_start and ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+        assert data[start - 1:start] == b'\n' and data.count(b'"', data_start, start) % 2 == 0
+
+
+@pytest.mark.parametrize('importer', [pytest.param(import_csv, marks=needs_pandas), import_csv_stream,
+                                      lambda phone_book, path: import_csv_parallel(phone_book, path, workers=2)],
+                         ids=['vectorized', 'stream', 'parallel'])
+def test_importers_agree_on_multiline_fields(audit_logger, tmp_path, importer):
+    """Every importer adds the same contacts and reports the same rejects for fields spanning lines."""
+    path = tmp_path / 'contacts.csv'
+    path.write_text(multiline_csv(300))
+    expected_book = PhoneBook(audit_logger=audit_logger)
+    expected = imported(expected_book, import_csv_stream(expected_book, str(path), chunksize=1))
+
+    phone_book = PhoneBook(audit_logger=audit_logger)
+    assert imported(phone_book, importer(phone_book, str(path))) == expected
+    contacts, rejects = expected
+    assert len(contacts) > 200 and any('\n' in address for _, _, _, address in contacts if address)
+    assert {reason for _, reason in rejects} >= {INVALID_PHONE, INVALID_EMAIL}
+
+
+@pytest.mark.parametrize('importer', [pytest.param(import_csv, marks=needs_pandas), import_csv_stream,
+                                      lambda phone_book, path: import_csv_parallel(phone_book, path, workers=2)],
+                         ids=['vectorized', 'stream', 'parallel'])
+@pytest.mark.parametrize('first_row', ['Ann,Lee,(555) 300-0000,extra', 'Ann,Lee,(555) 300-0000'])
+def test_importers_drop_extra_fields(audit_logger, tmp_path, importer, first_row):
+    """Fields past the header's columns are dropped by every importer, on the first row as on any other."""
+    path = tmp_path / 'contacts.csv'
+    path.write_text(f'First Name,Last Name,Phone\n{first_row}\nBob,Ray,(555) 300-0001,extra,more\n'
+                    ',,,only extra\nCal,Fox,bad,extra\nDee,Oak,(555) 300-0002\n')
+    phone_book = PhoneBook(audit_logger=audit_logger)
+    report = importer(phone_book, str(path))
+
+    assert [(contact.first_name, contact.last_name, contact.phone_key) for contact in phone_book.contacts] == \
+        [('Ann', 'Lee', 5553000000), ('Bob', 'Ray', 5553000001), ('Dee', 'Oak', 5553000002)]
+    assert report.rejects == [(5, INVALID_PHONE)]
+
+
+@pytest.mark.parametrize('size, expected', [(100, 'stream'), (1000, 'vectorized'), (5000, 'parallel')])
+def test_import_file_chooses_by_size(monkeypatch, sample_file, phone_book, size, expected):
+    """Small files are streamed, larger ones read with pandas, and the largest split across processes."""
+    chosen = []
+    for name, label in [('import_csv_stream', 'stream'), ('import_csv', 'vectorized'),
+                        ('import_csv_parallel', 'parallel')]:
+        monkeypatch.setattr(csvImport, name, lambda *args, label=label: chosen.append(label))
+    monkeypatch.setattr(csvImport, 'VECTORIZED_IMPORT_BYTES', 1000)
+    monkeypatch.setattr(csvImport, 'PARALLEL_IMPORT_BYTES', 5000)
+    monkeypatch.setattr(csvImport.os.path, 'getsize', lambda path: size)
+    csvImport.import_file(phone_book, sample_file)
+    assert chosen == [expected]
+
+
+def test_streaming_import_does_not_load_pandas(sample_file):
+    """Starting the application and streaming a file leave pandas unloaded."""
+    code = ('import sys, main, csvImport, phoneBook, auditLog; '
+            'book = phoneBook.PhoneBook(audit_logger=auditLog.AuditLogger(sys.argv[2])); '
+            'assert csvImport.import_file(book, sys.argv[1]).added == 4; book.close(); '
+            "print('pandas' in sys.modules)")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.run([sys.executable, '-c', code, sample_file, sample_file + '.log'], cwd=root,
+                             capture_output=True, text=True, check=True)
+    assert process.stdout.strip() == 'False'
@@ -0,0 +1,98 @@
+import random
+from datetime import timedelta
+from itertools import combinations
+
+from contact import Contact
+from dedup import (SUGGEST_THRESHOLD, DuplicatePair, blocking_keys, find_duplicates, fold, group_duplicates,
+                   merge_duplicates, score)
+from tests.conftest import sample_contacts
+
+
+def variants(count, seed=25):
+    """Returns sample contacts followed by altered copies of some of them: typos, tags, abbreviations, swaps."""
+    chooser = random.Random(seed)
+    originals = sample_contacts(count)
+    copies = []
+    for number, contact in enumerate(chooser.sample(originals, count // 2)):
+        first_name, last_name = contact.first_name, contact.last_name
+        email, address = contact.email, contact.address
+        change = number % 5
+        if change == 0 and len(first_name) > 3:
+            position = chooser.randrange(1, len(first_name) - 1)
+            first_name = first_name[:position] + first_name[position + 1:]
+        elif change == 1 and email:
+            email = email.replace('@', '+shop@').upper()
+        elif change == 2 and address:
+            address = address.replace('St', 'Street')
+        elif change == 3:
+            first_name, last_name = last_name, first_name
+        else:
+            email = address = None
+        copies.append(Contact(first_name, last_name, f'(555) 300-{number:04d}', email, address,
+                              contact.time_added + timedelta(days=30)))
+    return originals + copies
+
+
+def brute_force(contacts, threshold=SUGGEST_THRESHOLD):
+    """Scores every pair sharing a blocking key, returning {(earlier, later phone key): score}."""
+    found = {}
+    keys = [set(blocking_keys(contact).items()) for contact in contacts]
+    for (first, first_keys), (second, second_keys) in combinations(zip(contacts, keys), 2):
+        if first_keys & second_keys:
+            pair_score = score(first, second)
+            if pair_score >= threshold:
+                if (second.time_added, second.phone_key) < (first.time_added, first.phone_key):
+                    first, second = second, first
+                found[first.phone_key, second.phone_key] = pair_score
+    return found
+
+
+def test_fold_and_score():
+    """Names are compared without case, accents or punctuation, and a shared name alone is no duplicate."""
+    assert fold("O'Connor") == 'oconnor' and fold('Émile Zoë') == 'emilezoe'
+    jane = Contact('Jane', 'Doe', '(555) 100-0001', 'jane@example.com', '1 Main Street')
+    assert score(jane, Contact('JANE', 'doe', '(555) 100-0002', 'Jane+work@Example.com', '1 main st')) == 1.0
+    assert score(jane, Contact('Doe', 'Jane', '(555) 100-0003', 'jane@example.com', '1 Main St')) == 1.0
+    assert score(jane, Contact('Jnae', 'Doe', '(555) 100-0004', 'jane@example.com')) >= SUGGEST_THRESHOLD
+    assert score(jane, Contact('Jane', 'Doe', '(555) 100-0005')) < SUGGEST_THRESHOLD
+    assert score(jane, Contact('Jane', 'Doe', '(555) 100-0006', 'other@example.com', '9 Elm Rd')) < SUGGEST_THRESHOLD
+
+
+def test_blocking_finds_every_pair_a_full_comparison_does():
+    """With blocks small enough to compare whole, the blocked search returns exactly the brute-force pairs."""
+    contacts = variants(80)
+    pairs = find_duplicates(reversed(contacts), max_block=len(contacts))
+    assert {(pair.first.phone_key, pair.second.phone_key): pair.score for pair in pairs} == brute_force(contacts)
+    assert len(pairs) > 15
+    assert [(-pair.score, pair.first.time_added) for pair in pairs] == \
+        sorted((-pair.score, pair.first.time_added) for pair in pairs)
+    assert all(pair.first.time_added <= pair.second.time_added for pair in pairs)
+
+    windowed = find_duplicates(contacts, max_block=3, window=2)
+    assert {(pair.first.phone_key, pair.second.phone_key) for pair in windowed} <= \
+        {(pair.first.phone_key, pair.second.phone_key) for pair in pairs}
+
+
+def test_groups_join_pairs_transitively():
+    """Pairs above the threshold that share a contact form one group, earliest contact first."""
+    first, second, third, other, lone = sample_contacts(5)
+    pairs = [DuplicatePair(0.96, second, third), DuplicatePair(0.97, first, second),
+             DuplicatePair(0.99, other, lone), DuplicatePair(0.5, third, lone)]
+    assert group_duplicates(pairs) == [[first, second, third], [other, lone]]
+    assert group_duplicates(pairs, threshold=0.98) == [[other, lone]]
+
+
+def test_merge_keeps_the_earliest_contact(phone_book):
+    """The earliest contact of a group keeps its fields, gains the ones it lacks, and the others are deleted."""
+    phone_book.add_many([Contact('Jane', 'Doe', '(555) 100-0001'),
+                         Contact('Jane', 'Doe', '(555) 100-0002', 'jane@example.com'),
+                         Contact('JANE', 'DOE', '(555) 100-0003', 'other@example.com', '1 Main St'),
+                         Contact('John', 'Smith', '(555) 100-0004')])
+    contacts = phone_book.contacts
+    removed = merge_duplicates(phone_book, [contacts[:3]])
+    assert [contact.phone_key for contact in removed] == [5551000002, 5551000003]
+    assert [(contact.first_name, contact.phone_key, contact.email, contact.address)
+            for contact in phone_book.contacts] == [('Jane', 5551000001, 'jane@example.com', '1 Main St'),
+                                                     ('John', 5551000004, None, None)]
+    phone_book.audit_logger.flush()
+    assert sum('Merge' in line for line in phone_book.get_history()) == 2
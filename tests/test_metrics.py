@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from auditFormat import BinaryAuditLogger
+from auditLog import AuditLogger
+from metrics import instrumented, registry
+
+
+@pytest.fixture
+def recording():
+    """Records into an emptied registry, disabling it again afterwards."""
+    registry.reset()
+    registry.enable()
+    yield registry
+    registry.disable()
+    registry.reset()
+
+
+@instrumented('lazy')
+def lazy(count):
+    """Returns an unread iterator that scans count items."""
+    return registry.counting(range(count))
+
+
+@instrumented('eager')
+def eager(count):
+    """Scans count items before returning."""
+    registry.scanned(count // 2)
+    return list(registry.counting(range(count - count // 2)))
+
+
+@instrumented('consume')
+def consume(items, count=0):
+    """Reads an iterator made elsewhere, after scanning count items of its own."""
+    return eager(count) + list(items) if count else list(items)
+
+
+def scanned(operation):
+    """Returns the number of contacts an operation has scanned so far."""
+    return registry.snapshot()[operation]['scanned']
+
+
+def test_scans_are_charged_to_the_calls_making_them(recording):
+    """Nested calls add their scans to the enclosing call, and scans outside any call are not counted."""
+    assert consume(range(3), 7) == [0, 1, 2, 3, 0, 1, 2]
+    assert scanned('eager') == 7 and scanned('consume') == 7
+    assert list(registry.counting(range(5))) == list(range(5))
+    registry.scanned(5)
+    assert scanned('eager') == 7 and scanned('consume') == 7
+
+
+def test_lazy_results_are_charged_to_the_call_that_made_them(recording):
+    """A result read after its call returned counts towards that call, even when read inside another one."""
+    results = lazy(10)
+    assert consume(results) == list(range(10))
+    assert scanned('lazy') == 10 and scanned('consume') == 0
+
+    partly = lazy(10)
+    assert next(partly) == 0
+    assert consume(partly, 4) == [0, 1] + list(range(1, 10))
+    assert scanned('lazy') == 20 and scanned('consume') == 4
+
+    thread = threading.Thread(target=list, args=(lazy(6),))
+    thread.start()
+    thread.join()
+    assert scanned('lazy') == 26
+
+
+def test_nothing_is_counted_while_disabled(recording):
+    """Iterators made while the registry is off stay uncounted after it is turned on."""
+    registry.disable()
+    results = lazy(10)
+    registry.enable()
+    assert consume(results) == list(range(10))
+    assert 'lazy' not in registry.snapshot() and scanned('consume') == 0
+
+
+@pytest.mark.parametrize('logger_class', [AuditLogger, BinaryAuditLogger])
+def test_audit_log_calls_are_recorded_once(recording, tmp_path, logger_class):
+    """Every audit logger records one call per log and log_many, whichever class it is."""
+    logger = logger_class(str(tmp_path / 'audit.log'))
+    logger.log('Add')
+    logger.log_many('Search', [])
+    logger.close()
+    operations = registry.snapshot()
+    assert operations['audit.log']['calls'] == operations['audit.log_many']['calls'] == 1
@@ -0,0 +1,78 @@
+import random
+import pytest
+
+from pagination import pages, paginate, top_k
+from tests.conftest import sample_contacts
+
+
+def test_paginate_lists_and_iterators_alike():
+    """A page is the same whether the result is a list or a lazy iterator, which is read no further than needed."""
+    items = list(range(10))
+    for limit, offset in [(None, 0), (3, 0), (3, 8), (None, 4), (5, 20), (0, 2)]:
+        expected = items[offset:] if limit is None else items[offset:offset + limit]
+        read = []
+        lazy = (read.append(item) or item for item in items)
+        assert paginate(items, limit, offset) == paginate(lazy, limit, offset) == expected
+        if limit is not None:
+            assert len(read) <= offset + limit
+
+def test_top_k_matches_sorted():
+    """The k smallest items come back in sorted() order, ties in input order."""
+    chooser = random.Random(20)
+    items = [(chooser.randrange(8), number) for number in range(200)]
+    for k in [0, 1, 7, 200, 300]:
+        assert top_k(items, k, key=lambda item: item[0]) == sorted(items, key=lambda item: item[0])[:k]
+
+
+def test_pages_run_the_query_once():
+    """Every page is sliced off one run of the query, and a lazy result is read only as far as the pages taken."""
+    calls, produced = [], []
+
+    def search(query, flag=False):
+        calls.append((query, flag))
+        for number in range(45):
+            produced.append(number)
+            yield number
+
+    results = pages(search, 'query', page_size=10, flag=True)
+    assert next(results) == list(range(10)) and next(results) == list(range(10, 20))
+    assert calls == [('query', True)] and len(produced) <= 21
+    assert list(results) == [list(range(20, 30)), list(range(30, 40)), list(range(40, 45))]
+    assert calls == [('query', True)]
+    assert list(pages(lambda: [1, 2], page_size=2)) == [[1, 2]]
+    assert list(pages(lambda: [], page_size=2)) == []
+
+
+@pytest.mark.parametrize('page_size', [1, 7, 50])
+def test_pages_of_every_query_add_up_to_its_result(phone_book, page_size):
+    """Walking a query's pages gives its whole result, in order, for sort and every search."""
+    phone_book.add_many(sample_contacts(120))
+    for search, args in [(phone_book.sort, ('last_name',)), (phone_book.sort, ('email',)),
+                         (phone_book.search_by_name, ('jo',)), (phone_book.search_by_phone, ('00-00',)),
+                         (phone_book.search_by_name_fuzzy, ('smyth', 1)),
+                         (phone_book.search_by_timeframe, ('2024-01-02', '2024-01-04'))]:
+        expected = [contact.phone_key for contact in search(*args)]
+        walked = list(pages(search, *args, page_size=page_size))
+        assert [contact.phone_key for page in walked for contact in page] == expected
+        assert all(len(page) == page_size for page in walked[:-1])
+
+
+def test_first_page_of_a_sort_reads_only_that_page(phone_book):
+    """Paging the full sort builds contacts only for the pages taken, however large the phone book."""
+    phone_book.add_many(sample_contacts(500))
+    backend = phone_book._backend
+    built = []
+    if hasattr(backend, '_contact'):
+        make = backend._contact
+        backend._contact = lambda row: built.append(row) or make(row)
+    assert not isinstance(phone_book.sort('last_name'), list)
+    assert isinstance(phone_book.sort('last_name', limit=5), list)
+
+    built.clear()
+    walked = pages(phone_book.sort, 'last_name', page_size=10)
+    first = next(walked)
+    walked.close()
+    if hasattr(backend, '_contact'):
+        assert len(built) <= 11  # The page, and at most one contact read ahead
+    assert [contact.phone_key for contact in first] == \
+        [contact.phone_key for contact in phone_book.sort('last_name', limit=10)]
@@ -0,0 +1,111 @@
+import os
+import threading
+import zlib
+
+import pytest
+
+from contact import Contact
+from persistence import _FRAME_HEADER, OP_REPLACE, PersistentPhoneBook, _encode_string, encode_contact
+from tests.conftest import sample_contacts
+
+
+def state(phone_book):
+    """Returns every stored contact's fields, in the order the contacts were added."""
+    return [(contact.first_name, contact.last_name, contact.phone, contact.email, contact.address,
+             contact.time_added) for contact in phone_book.contacts]
+
+
+@pytest.fixture
+def open_book(tmp_path, audit_logger):
+    """Opens the persistent phone book in a temporary directory; every opened book is closed afterwards."""
+    books = []
+
+    def open_book(**options):
+        books.append(PersistentPhoneBook(str(tmp_path / 'data'), audit_logger=audit_logger, **options))
+        return books[-1]
+    yield open_book
+    for book in books:
+        book.close()
+
+
+def mutate(phone_book):
+    """Adds, updates, renumbers and deletes contacts."""
+    phone_book.add_many(sample_contacts(40))
+    phone_book.add(Contact('Jane', 'Doe', '555-100-0001', 'jane@example.com'))
+    phone_book.update('(555) 000-0003', first_name='Changed', address='1 New St')
+    phone_book.get_by_phone('(555) 000-0004').update(phone='(555) 900-0004')
+    phone_book.update_many([('(555) 000-0005', {'last_name': 'Batch'}), ('(555) 000-0006', {'phone': '555-900-0006'})])
+    phone_book.delete('(555) 000-0007')
+    phone_book.delete_many(['(555) 000-0008', '(555) 999-9999'])
+
+
+def test_reopening_replays_the_log(open_book):
+    """Every kind of mutation survives a restart, with its field values and time added."""
+    phone_book = open_book(compact_bytes=None)
+    mutate(phone_book)
+    expected = state(phone_book)
+    phone_book.close()
+    assert state(open_book()) == expected
+
+
+def test_reopening_after_compaction(open_book, tmp_path):
+    """A snapshot plus the mutations logged after it restore the same state, and older files are removed."""
+    phone_book = open_book(compact_bytes=None)
+    mutate(phone_book)
+    phone_book.compact(wait=True)
+    phone_book.add(Contact('After', 'Snapshot', '(555) 300-0001'))
+    phone_book.delete('(555) 000-0010')
+    expected = state(phone_book)
+    phone_book.close()
+
+    assert sorted(os.listdir(tmp_path / 'data')) == ['snapshot.00000001', 'wal.00000001']
+    assert state(open_book()) == expected
+
+
+@pytest.mark.parametrize('damage', ['truncate', 'corrupt'])
+def test_a_torn_log_tail_is_cut_off(open_book, tmp_path, damage):
+    """A record torn or garbled by a crash is dropped, and mutations logged after restarting are kept."""
+    phone_book = open_book(compact_bytes=None)
+    mutate(phone_book)
+    expected = state(phone_book)
+    phone_book.add(Contact('Torn', 'Record', '(555) 400-0001'))
+    phone_book.close()
+
+    path = tmp_path / 'data' / 'wal.00000000'
+    data = path.read_bytes()
+    path.write_bytes(data[:-3] if damage == 'truncate' else data[:-20] + bytes([data[-20] ^ 0xFF]) + data[-19:])
+
+    phone_book = open_book()
+    assert state(phone_book) == expected
+    phone_book.add(Contact('After', 'Crash', '(555) 400-0002'))
+    expected = state(phone_book)
+    phone_book.close()
+    assert state(open_book()) == expected
+
+
+def test_direct_contact_updates_hold_the_lock(open_book):
+    """Changing a stored contact waits for the lock compact() captures the contacts under."""
+    phone_book = open_book(compact_bytes=None)
+    phone_book.add_many(sample_contacts(5))
+    contact = phone_book.get_by_phone('(555) 000-0001')
+    with phone_book._lock:
+        thread = threading.Thread(target=contact.update, kwargs={'first_name': 'Changed'})
+        thread.start()
+        thread.join(0.1)
+        assert contact.first_name != 'Changed'
+    thread.join()
+    assert phone_book.get_by_phone('(555) 000-0001').first_name == 'Changed'
+
+
+def test_a_logged_change_already_in_the_snapshot_is_skipped(open_book, tmp_path):
+    """A replayed change to a number the snapshot no longer has leaves the state as it is."""
+    phone_book = open_book(compact_bytes=None)
+    mutate(phone_book)
+    phone_book.compact(wait=True)
+    expected = state(phone_book)
+    phone_book.close()
+
+    payload = OP_REPLACE + _encode_string('(555) 000-0004') + encode_contact(Contact('Old', 'Change', '555-900-0004'))
+    with open(tmp_path / 'data' / 'wal.00000001', 'ab') as wal:
+        wal.write(_FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+    assert state(open_book()) == expected
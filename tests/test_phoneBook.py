@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from contact import Contact
+from tests.conftest import sample_contacts
+
+
+def test_lookup_by_phone_in_any_format(phone_book):
+    """A contact is found by its phone number typed in any supported format, or by its key."""
+    phone_book.add_many(sample_contacts(50))
+    for phone in ['(555) 000-0042', '555-000-0042', '555.000.0042', '5550000042', '+1 555 000 0042', 5550000042]:
+        contact = phone_book.get_by_phone(phone)
+        assert contact is not None and contact.phone_key == 5550000042
+        assert phone_book.has_phone(phone)
+    assert phone_book.get_by_phone('(555) 000-0099') is None
+    assert phone_book.get_by_phone('not a phone') is None
+    assert not phone_book.has_phone('(555) 000-0099')
+    assert phone_book.phones_in_use(['555-000-0001', '(555) 000-0099', 'junk']) == {'555-000-0001'}
+
+
+def test_phone_numbers_are_unique(phone_book):
+    """Adding a number already in use, in the same or another format, fails and changes nothing."""
+    phone_book.add(Contact('Jane', 'Doe', '(555) 100-0001'))
+    with pytest.raises(ValueError):
+        phone_book.add(Contact('John', 'Doe', '555.100.0001'))
+    with pytest.raises(ValueError):
+        phone_book.add_many([Contact('A', 'B', '(555) 100-0002'), Contact('C', 'D', '5551000001')])
+    with pytest.raises(ValueError):
+        phone_book.add_many([Contact('A', 'B', '(555) 100-0003'), Contact('C', 'D', '555-100-0003')])
+    assert [contact.first_name for contact in phone_book.contacts] == ['Jane']
+
+
+def test_update_and_delete_keep_the_phone_index_in_sync(phone_book):
+    """A changed number frees the old one, and a deleted contact's number can be reused."""
+    phone_book.add_many(sample_contacts(10))
+    phone_book.update('(555) 000-0003', first_name='Changed')
+    assert phone_book.get_by_phone('5550000003').first_name == 'Changed'
+
+    phone_book.get_by_phone('(555) 000-0004').update(phone='(555) 999-0004')
+    assert not phone_book.has_phone('(555) 000-0004')
+    assert phone_book.get_by_phone('(555) 999-0004').phone_key == 5559990004
+    with pytest.raises(ValueError):
+        phone_book.get_by_phone('(555) 000-0005').update(phone='555-999-0004')
+
+    phone_book.delete('555-000-0006')
+    assert phone_book.get_by_phone('(555) 000-0006') is None
+    assert len(phone_book) == 9
+    phone_book.add(Contact('New', 'Contact', '(555) 000-0006'))
+    assert phone_book.get_by_phone('(555) 000-0006').first_name == 'New'
+
+
+def keys(contacts):
+    """Returns the phone keys of contacts, in order."""
+    return [contact.phone_key for contact in contacts]
+
+
+def changed_book(phone_book, count=300):
+    """Fills a phone book and then renames, renumbers and deletes some of its contacts."""
+    phone_book.add_many(sample_contacts(count))
+    for number in range(0, count, 7):
+        phone_book.get_by_phone(5550000000 + number).update(first_name='Renamed', phone=f'(555) 777-{number:04d}')
+    phone_book.delete_many([5550000000 + number for number in range(1, count, 11)])
+    return list(phone_book.contacts)
+
+
+@pytest.mark.parametrize('query', ['555', '0004', '7', '77', '(555) 777', '5-0', '99999', '', '-', '()'])
+def test_phone_search_matches_a_linear_scan(phone_book, query):
+    """The n-gram index finds exactly the contacts a scan of every number would, in the order they were added."""
+    contacts = changed_book(phone_book)
+    digits = ''.join(char for char in query if char.isdigit())
+    expected = [contact for contact in contacts
+                if (digits in f'{contact.phone_key:010d}' if digits else query in contact.phone)]
+    assert keys(phone_book.search_by_phone(query, limit=5)) == keys(expected[:5])
+    assert keys(phone_book.search_by_phone(query)) == keys(expected)
+
+
+@pytest.mark.parametrize('query', ['jo', 'J', 'DOE', 'smy', 'van der', "o'c", 'ÉMILE', 'zoë', 'renamed', 'xyz', ''])
+def test_name_search_matches_a_linear_scan(phone_book, query):
+    """The trigram index finds exactly the contacts whose folded names contain the folded query."""
+    contacts = changed_book(phone_book)
+    folded = query.casefold()
+    expected = [contact for contact in contacts
+                if folded in contact.first_name.casefold() or folded in contact.last_name.casefold()]
+    assert keys(phone_book.search_by_name(query, limit=5)) == keys(expected[:5])
+    assert keys(phone_book.search_by_name(query)) == keys(expected)
+
+
+@pytest.mark.parametrize('start, end', [('2024-01-03', '2024-01-05'), (None, '2024-01-02'), ('2024-01-10', None),
+                                        (None, None), ('2024-02-01', None), ('2024-01-05', '2024-01-03'),
+                                        (datetime(2024, 1, 4, 5), datetime(2024, 1, 4, 9))])
+def test_timeframe_search_matches_a_linear_scan(phone_book, start, end):
+    """The time index returns the contacts within the inclusive range, oldest first, including late additions."""
+    contacts = changed_book(phone_book)
+    late = sample_contacts(20, start=1000)
+    for contact in late:
+        contact.time_added -= timedelta(days=40)  # Added after the others but with earlier times
+    phone_book.add_many(late)
+    contacts += late
+
+    low = datetime.strptime(start, '%Y-%m-%d') if isinstance(start, str) else start
+    high = datetime.strptime(end, '%Y-%m-%d') if isinstance(end, str) else end
+    expected = sorted((contact for contact in contacts
+                       if (low is None or contact.time_added >= low) and (high is None or contact.time_added <= high)),
+                      key=lambda contact: contact.time_added)
+    assert keys(phone_book.search_by_timeframe(start, end, limit=5, offset=2)) == keys(expected[2:7])
+    assert keys(phone_book.search_by_timeframe(start, end)) == keys(expected)
+
+
+@pytest.mark.parametrize('by', ['last_name', 'first_name', 'email', 'address', 'phone'])
+def test_sort_and_group_match_sorted(phone_book, by):
+    """Maintained views sort like a stable sorted() with missing values last, and group like a scan."""
+    phone_book.register_view('first_name')
+    contacts = changed_book(phone_book)
+    phone_book.update(5550000010, last_name='Aaronson', email='first@example.com')
+
+    contacts = list(phone_book.contacts)
+    expected = sorted(contacts, key=lambda contact: (getattr(contact, by) is None, getattr(contact, by) or ''))
+    assert keys(phone_book.sort(by)) == keys(expected)
+    assert keys(phone_book.sort(by, limit=10, offset=20)) == keys(expected[20:30])
+
+    groups = {}
+    for contact in contacts:
+        groups.setdefault(getattr(contact, by), []).append(contact.phone_key)
+    assert {value: keys(group) for value, group in phone_book.group_by(by).items()} == groups
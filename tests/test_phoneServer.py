@@ -0,0 +1,126 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import phoneServer
+from contact import Contact
+from csvImport import import_csv_stream
+from main import parse_arguments
+from phoneServer import PhoneBookServer
+from tests.conftest import sample_contacts
+
+
+async def get(port, path):
+    """Sends a GET request on a new connection and returns (status, decoded JSON body)."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode())
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+
+def test_contact_queries_run_off_the_event_loop(phone_book):
+    """Searches and listings run on worker threads with or without a limit; a lookup by phone may run inline."""
+    phone_book.add_many(sample_contacts(50))
+    server = PhoneBookServer(phone_book, port=0)
+    shared = server.phone_book
+    threads = {}
+
+    def recorded(name, method):
+        def call(*args, **kwargs):
+            threads.setdefault(name, set()).add(threading.current_thread().name)
+            return method(*args, **kwargs)
+        return call
+    for name in ('sort', 'search_by_name', 'search_by_name_fuzzy', 'search_by_phone', 'search_by_timeframe'):
+        setattr(shared, name, recorded(name, getattr(shared, name)))
+
+    async def run():
+        await server.start()
+        try:
+            results = {}
+            for path in ['/contacts', '/contacts?limit=5&offset=40', '/contacts?name=jo&limit=2',
+                         '/contacts?fuzzy=jon&limit=2', '/contacts?phone=000-004&limit=3',
+                         '/contacts?start=2024-01-01&limit=1', '/contacts/5550000007']:
+                results[path] = await get(server.port, path)
+            return results
+        finally:
+            await server.close()
+
+    results = asyncio.run(run())
+    assert {status for status, _ in results.values()} == {200}
+    assert len(results['/contacts']) == 2 and len(results['/contacts'][1]) == 50
+    assert [contact['phone'] for contact in results['/contacts?phone=000-004&limit=3'][1]] == \
+        ['(555) 000-0004', '(555) 000-0040', '(555) 000-0041']
+    assert results['/contacts/5550000007'][1]['phone'] == '(555) 000-0007'
+    assert set(threads) == {'sort', 'search_by_name', 'search_by_name_fuzzy', 'search_by_phone', 'search_by_timeframe'}
+    assert all(name.startswith('phonebook') for names in threads.values() for name in names)
+
+
+async def post(port, path, body):
+    """Sends a POST request on a new connection and returns (status, decoded JSON body)."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'POST {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n'
+                 f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+
+def test_import_is_not_interleaved_with_other_writes(phone_book, monkeypatch):
+    """A contact added while a CSV file is imported waits for the import, so the response matches what was stored."""
+    server = PhoneBookServer(phone_book, port=0)
+    shared = server.phone_book
+    racing, conflicts = [], []
+
+    def add():
+        try:
+            shared.add(Contact('Racing', 'Add', '(555) 000-0003'))
+        except ValueError as error:
+            conflicts.append(error)
+
+    def import_racing_an_add(target, path):
+        # Another client adds one of the file's numbers right after the import checked them
+        checked = target.phones_in_use
+
+        def phones_in_use(phones):
+            in_use = checked(phones)
+            if not racing and 5550000003 in phones:
+                racing.append(threading.Thread(target=add))
+                racing[0].start()
+                racing[0].join(0.2)  # Lets the add in, unless the import holds it back
+            return in_use
+
+        target.phones_in_use = phones_in_use
+        try:
+            return import_csv_stream(target, path, chunksize=2)
+        finally:
+            del target.phones_in_use
+
+    monkeypatch.setattr(phoneServer, 'import_file', import_racing_an_add)
+    rows = ''.join(f'First{number},Last,(555) 000-{number:04d}\n' for number in range(6))
+
+    async def run():
+        await server.start()
+        try:
+            return await post(server.port, '/import', f'First Name,Last Name,Phone\n{rows}'.encode())
+        finally:
+            await server.close()
+
+    assert asyncio.run(run()) == (200, {'added': 6, 'rejects': []})
+    racing[0].join()
+    assert len(conflicts) == 1 and phone_book.get_by_phone('(555) 000-0003').first_name == 'First3'
+
+
+def test_serve_option_needs_a_port(capsys):
+    """--serve takes [HOST:]PORT, and anything without a valid port is refused with a usage error."""
+    assert parse_arguments(['--serve', '8080']).serve == ('', 8080)
+    assert parse_arguments(['--serve', '0.0.0.0:0']).serve == ('0.0.0.0', 0)
+    assert parse_arguments(['--serve', '[::1]:9000']).serve == ('::1', 9000)
+    for value in ['localhost', 'localhost:', 'localhost:http', '70000', '-1']:
+        with pytest.raises(SystemExit) as exit_info:
+            parse_arguments([f'--serve={value}'])
+        assert exit_info.value.code == 2 and '--serve needs a port number' in capsys.readouterr().err
@@ -0,0 +1,93 @@
+import random
+
+from contact import Contact
+from phoneBook import PhoneBook
+from queryCache import QueryCache, name_matcher
+from tests.conftest import sample_contacts
+
+
+def entry(cache, key, phone_keys, matches=lambda contact: False):
+    """Caches a result made of stand-in contacts with the given phone keys."""
+    cache.put(key, [Contact('First', 'Last', str(5550000000 + number)) for number in phone_keys], matches)
+
+
+def test_least_recently_used_results_are_evicted():
+    """A full cache drops the result looked up longest ago, and large results are not kept."""
+    cache = QueryCache(max_entries=2, max_result=3)
+    entry(cache, 'a', [1])
+    entry(cache, 'b', [2])
+    assert cache.get('a') is not None
+    entry(cache, 'c', [3])
+    entry(cache, 'd', [1, 2, 3, 4])
+    assert cache.get('b') is None and cache.get('d') is None
+    assert [contact.phone_key for contact in cache.get('a')] == [5550000001]
+    assert cache.stats() == {'entries': 2, 'max_entries': 2, 'hits': 2, 'misses': 2, 'evictions': 1,
+                             'invalidations': 0, 'flushes': 0, 'hit_rate': 0.5}
+
+
+def test_only_affected_results_are_invalidated():
+    """A change drops the results holding the contact under its old or new key, or matching it now."""
+    cache = QueryCache()
+    entry(cache, 'old key', [1])
+    entry(cache, 'new key', [2])
+    entry(cache, 'matching', [], name_matcher('jan'))
+    entry(cache, 'unaffected', [3], name_matcher('bob'))
+    changed = Contact('Jane', 'Doe', '555-000-0002')
+    cache.invalidate([(changed, 5550000001)])
+    assert [key for key in ('old key', 'new key', 'matching', 'unaffected') if cache.get(key) is not None] == \
+        ['unaffected']
+    assert cache.invalidations == 3
+
+    cache.FLUSH_CHECKS = 1
+    entry(cache, 'other', [4])
+    cache.invalidate([(changed, None)])
+    assert len(cache) == 0 and cache.flushes == 1
+
+
+def search_all(phone_book):
+    """Runs one of each kind of search and returns the phone keys each found."""
+    return [[contact.phone_key for contact in results] for results in (
+        phone_book.search_by_name('jo'), phone_book.search_by_name('SMI'), phone_book.search_by_name('zz'),
+        phone_book.search_by_phone('000-00'), phone_book.search_by_phone('777'),
+        phone_book.search_by_name_fuzzy('jhon', 1), phone_book.search_by_name_fuzzy('brwn', 2),
+        phone_book.search_by_timeframe('2024-01-02', '2024-01-03'))]
+
+
+def test_cached_results_follow_every_change(phone_book, audit_logger):
+    """After any mix of adds, updates and deletes, cached searches return what uncached ones do."""
+    uncached = PhoneBook(type(phone_book._backend)(), audit_logger=audit_logger, cache_size=0)
+    chooser = random.Random(19)
+    for book in (phone_book, uncached):
+        book.add_many(sample_contacts(80))
+    names = ['Zzyzx', 'John', 'Smith', 'Jhon', 'Brown', 'Bob']
+
+    for step in range(60):
+        number = chooser.randrange(120)
+        operation = chooser.choice(['add', 'update', 'renumber', 'delete'])
+        for book in (phone_book, uncached):
+            if operation == 'add' and not book.has_phone(5550000000 + number):
+                book.add(sample_contacts(1, start=number)[0])
+            elif operation == 'update' and book.has_phone(5550000000 + number):
+                book.update(5550000000 + number, first_name=names[step % 6], last_name=names[(step + 1) % 6])
+            elif operation == 'renumber' and book.has_phone(5550000000 + number):
+                book.update_many([(5550000000 + number, {'phone': f'(555) 777-{step:04d}'})])
+            elif operation == 'delete':
+                book.delete_many([5550000000 + number])
+        assert search_all(phone_book) == search_all(uncached)
+
+    stats = phone_book.cache_stats()
+    assert stats['hits'] and stats['invalidations'] and stats['entries'] <= stats['max_entries']
+    assert uncached.cache_stats() is None
+    uncached.close()
+
+
+def test_unaffected_results_stay_cached(phone_book):
+    """Changing a contact no cached result involves leaves every result cached."""
+    phone_book.add_many(sample_contacts(40))
+    search_all(phone_book)
+    entries = len(phone_book.query_cache)
+    phone_book.add(Contact('Quincy', 'Adams', '(555) 999-8888'))
+    phone_book.update('(555) 999-8888', address='1 Other St')
+    hits = phone_book.query_cache.hits
+    search_all(phone_book)
+    assert len(phone_book.query_cache) == entries and phone_book.query_cache.hits == hits + entries
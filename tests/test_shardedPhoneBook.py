@@ -0,0 +1,170 @@
+import threading
+
+import pytest
+
+import shardedPhoneBook
+from contact import Contact
+from phoneBook import PhoneBook
+from shardedPhoneBook import ShardedPhoneBook
+from storage import ColumnarBackend, MemoryBackend
+from tests.conftest import sample_contacts
+
+
+@pytest.fixture(params=[('hash', MemoryBackend), ('area_code', ColumnarBackend)], ids=['hash', 'area_code'])
+def sharded(request, audit_logger):
+    """A sharded phone book of three shards, and a single PhoneBook to compare it with."""
+    partition, backend = request.param
+    phone_book = ShardedPhoneBook(3, partition, backend, audit_logger)
+    single = PhoneBook(backend(), audit_logger=audit_logger)
+    yield phone_book, single
+    single.close()
+    phone_book.close()
+
+
+def contacts(count):
+    """Returns sample contacts spread over several area codes."""
+    made = sample_contacts(count)
+    for contact in made[::3]:
+        contact._assign(None, None, f'(6{contact.phone_key % 100:02d}) 000-{contact.phone_key % 10000:04d}',
+                        6000000000 + contact.phone_key % 100 * 10 ** 7 + contact.phone_key % 10000, None, None)
+    return made
+
+
+def keys(found):
+    """Returns the phone keys of some contacts, in order."""
+    return [contact.phone_key for contact in found]
+
+
+def test_merged_results_match_a_single_phone_book(sharded):
+    """Every query merges the shards' results into the order a single phone book gives."""
+    phone_book, single = sharded
+    for book in (phone_book, single):
+        book.add_many(contacts(150))
+    assert len({phone_book._shard_of(key) for key in keys(single.contacts)}) == 3
+    assert keys(phone_book.contacts) == keys(single.contacts)
+    for limit, offset in [(None, 0), (10, 0), (25, 40), (10, 145)]:
+        for by in ['last_name', 'first_name', 'email', 'address', 'phone']:
+            assert keys(phone_book.sort(by, limit, offset)) == keys(single.sort(by, limit, offset))
+        for query in ['jo', 'smy', '000-00', '55']:
+            assert keys(phone_book.search_by_name(query, limit, offset)) == \
+                keys(single.search_by_name(query, limit, offset))
+            assert keys(phone_book.search_by_phone(query, limit, offset)) == \
+                keys(single.search_by_phone(query, limit, offset))
+        assert keys(phone_book.search_by_name_fuzzy('jhon smth', 2, limit, offset)) == \
+            keys(single.search_by_name_fuzzy('jhon smth', 2, limit, offset))
+        assert keys(phone_book.search_by_timeframe('2024-01-02', '2024-01-05', limit, offset)) == \
+            keys(single.search_by_timeframe('2024-01-02', '2024-01-05', limit, offset))
+    assert {value: keys(group) for value, group in phone_book.group_by('last_name').items()} == \
+        {value: keys(group) for value, group in single.group_by('last_name').items()}
+
+
+def test_add_many_is_all_or_none_across_shards(sharded):
+    """A batch with a number in use in one shard, or twice in the batch, adds nothing to any shard."""
+    phone_book, _ = sharded
+    phone_book.add_many(contacts(30))
+    batch = contacts(60)[30:]
+    assert len({phone_book._shard_of(contact.phone_key) for contact in batch}) == 3
+
+    in_use = batch + [Contact('Taken', 'Number', '555.000.0007')]
+    with pytest.raises(ValueError, match='already in use'):
+        phone_book.add_many(in_use)
+    with pytest.raises(ValueError, match='already in use'):
+        phone_book.add_many(batch + [Contact('Twice', 'Added', batch[0].phone)])
+    assert len(phone_book) == 30 and not phone_book.phones_in_use([contact.phone for contact in batch])
+    phone_book.add_many(batch)
+    assert keys(phone_book.contacts) == keys(contacts(60))
+
+
+def test_add_many_holds_the_shards_from_check_to_add(sharded, monkeypatch):
+    """A number added by another thread after a batch was checked waits for the batch, which is added whole."""
+    phone_book, _ = sharded
+    batch = contacts(30)
+    racing, conflicts = [], []
+
+    def add():
+        try:
+            phone_book.add(Contact('Racing', 'Add', batch[-1].phone))
+        except ValueError as error:
+            conflicts.append(error)
+
+    def pack(contact, packed=shardedPhoneBook._pack):
+        # The batch is packed once every shard has checked its part of it
+        if not racing:
+            racing.append(threading.Thread(target=add))
+            racing[0].start()
+            racing[0].join(0.2)  # Lets the add in, unless the batch holds its shard
+        return packed(contact)
+
+    monkeypatch.setattr(shardedPhoneBook, '_pack', pack)
+    phone_book.add_many(batch)
+    racing[0].join()
+    assert len(conflicts) == 1 and len(phone_book) == 30
+    assert phone_book.get_by_phone(batch[-1].phone).first_name == batch[-1].first_name
+
+
+def state(phone_book):
+    """Returns every stored contact's fields."""
+    return [(contact.first_name, contact.last_name, contact.phone_key, contact.email, contact.address,
+             contact.time_added) for contact in phone_book.contacts]
+
+
+def elsewhere(phone_book, key, *candidates, suffix=0):
+    """Returns the first phone number, of the candidates or else a made up one, owned by a shard other than key's."""
+    numbers = list(candidates) + [area * 10 ** 7 + 9000000 + suffix * 1000 + area for area in range(200, 1000)]
+    return next(f'{number:010d}' for number in numbers if phone_book._shard_of(number) != phone_book._shard_of(key))
+
+
+def test_update_many_moves_contacts_between_shards(sharded):
+    """Changes within and across shards apply in order, as they do in a single phone book."""
+    phone_book, single = sharded
+    for book in (phone_book, single):
+        book.add_many(contacts(40))
+    moved, away = elsewhere(phone_book, 5550000001), elsewhere(phone_book, 5550000004, suffix=1)
+    moves = [(5550000001, {'phone': moved, 'first_name': 'Moved'}),
+             (moved, {'last_name': 'Again'}),
+             (5550000002, {'phone': elsewhere(phone_book, 5550000002, *keys(single.contacts))}),  # In use
+             (5550000002, {'phone': 'bad'}),
+             (5559999999, {'phone': elsewhere(phone_book, 5559999999, suffix=2)}),  # No such contact
+             (5559999999, {'phone': 'bad'}),
+             (5550000004, {'phone': away, 'email': 'moved@example.com'}),
+             (away, {'phone': '555-000-0004'}),
+             (5550000005, {'address': 'Same shard'})]
+    results = phone_book.update_many(moves)
+    expected = single.update_many(moves)
+    assert [type(result) for result in results] == [type(result) for result in expected] == \
+        [Contact, Contact, ValueError, ValueError, type(None), type(None), Contact, Contact, Contact]
+    assert [result.first_name for result in results if isinstance(result, Contact)] == \
+        ['Moved', 'Moved', 'Joan', 'Joan', 'Émile']
+    assert sorted(state(phone_book)) == sorted(state(single))
+    assert phone_book.get_by_phone(moved).last_name == 'Again'
+    assert phone_book.get_by_phone(5550000002).first_name == single.get_by_phone(5550000002).first_name
+    assert len(phone_book) == len(single) == 40
+
+
+def test_moves_are_never_seen_half_done(audit_logger):
+    """While contacts move between shards, other calls always find each one in exactly one shard."""
+    phone_book = ShardedPhoneBook(2, audit_logger=audit_logger)
+    phone_book.add_many(sample_contacts(20))
+    # Renumber between two numbers owned by different shards
+    here, there = 5550000000, int(elsewhere(phone_book, 5550000000))
+    stop = threading.Event()
+    seen = []
+
+    def move():
+        current, other = here, there
+        for _ in range(60):
+            phone_book.update_many([(current, {'phone': str(other)})])
+            current, other = other, current
+        stop.set()
+
+    def count():
+        while not stop.is_set():
+            seen.append((len(phone_book), len(phone_book.phones_in_use([here, there]))))
+
+    threads = [threading.Thread(target=move), threading.Thread(target=count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    phone_book.close()
+    assert seen and set(seen) == {(20, 1)}
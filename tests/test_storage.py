@@ -0,0 +1,71 @@
+import sqlite3
+
+from contact import Contact
+from phoneBook import PhoneBook
+from storage import ColumnarBackend, SQLiteBackend
+from tests.conftest import sample_contacts
+
+
+def test_sqlite_database_is_reopened(tmp_path, audit_logger):
+    """Contacts and changes written through one connection are read back by the next."""
+    path = str(tmp_path / 'contacts.db')
+    phone_book = PhoneBook(SQLiteBackend(path), audit_logger=audit_logger)
+    phone_book.add_many(sample_contacts(20))
+    phone_book.get_by_phone('(555) 000-0002').update(first_name='Changed', phone='555-900-0002')
+    phone_book.delete('(555) 000-0003')
+    expected = [(contact.first_name, contact.phone_key, contact.email, contact.time_added)
+                for contact in phone_book.contacts]
+
+    phone_book = PhoneBook(SQLiteBackend(path), audit_logger=audit_logger)
+    assert [(contact.first_name, contact.phone_key, contact.email, contact.time_added)
+            for contact in phone_book.contacts] == expected
+    assert phone_book.search_by_name('chan')[0].phone_key == 5559000002
+    phone_book.close()
+
+
+
+def test_columnar_rows_survive_compaction(audit_logger):
+    """Deleting most rows compacts the columns without losing or mixing up the remaining contacts."""
+    phone_book = PhoneBook(ColumnarBackend(), audit_logger=audit_logger)
+    contacts = sample_contacts(100)
+    phone_book.add_many(contacts)
+    phone_book.update('(555) 000-0001', email='changed@example.com', address='Somewhere else')
+    phone_book.delete_many([contact.phone_key for contact in contacts[2:62]])
+    assert len(phone_book._backend._live) < 100  # The deleted rows were dropped
+
+    kept = [contacts[0], contacts[1]] + contacts[62:]
+    assert [(contact.first_name, contact.last_name, contact.phone_key, contact.time_added)
+            for contact in phone_book.contacts] == \
+        [(contact.first_name, contact.last_name, contact.phone_key, contact.time_added) for contact in kept]
+    assert [(contact.email, contact.address) for contact in phone_book.contacts[:3]] == \
+        [(None, None), ('changed@example.com', 'Somewhere else'), ('user62@example.com', '62 Main St')]
+
+    phone_book.get_by_phone('(555) 000-0070').update(phone='(555) 900-0070')
+    assert phone_book.get_by_phone('(555) 900-0070').time_added == contacts[70].time_added
+    assert not phone_book.has_phone('(555) 000-0070') and not phone_book.has_phone('(555) 000-0030')
+
+
+def test_contacts_have_no_instance_dict():
+    """Contacts store their fields in slots rather than a per-instance dict."""
+    assert not hasattr(Contact('Jane', 'Doe', '(555) 100-0001'), '__dict__')
+
+
+def test_sqlite_database_without_phone_keys_is_upgraded(tmp_path, audit_logger):
+    """A database written before phone keys gets them, so its numbers are found in any format."""
+    path = str(tmp_path / 'contacts.db')
+    connection = sqlite3.connect(path)
+    schema = SQLiteBackend._SCHEMA.replace(',\n            phone_key INTEGER NOT NULL', '')
+    connection.executescript(schema)
+    with connection:
+        connection.execute(
+            'INSERT INTO contacts (first_name, last_name, phone, email, address, time_added, first_key, last_key, '
+            "phone_digits) VALUES ('Jane', 'Doe', '555-100-0001', NULL, NULL, 0, 'jane', 'doe', '5551000001')")
+    connection.close()
+
+    phone_book = PhoneBook(SQLiteBackend(path), audit_logger=audit_logger)
+    assert phone_book.get_by_phone('(555) 100-0001').first_name == 'Jane'
+    assert phone_book.has_phone(5551000001)
+    assert not phone_book.phones_in_use([]) and phone_book.phones_in_use(['5551000001']) == {'5551000001'}
+    phone_book.add(Contact('John', 'Doe', '(555) 100-0002'))
+    assert [contact.phone_key for contact in phone_book.search_by_phone('100-000')] == [5551000001, 5551000002]
+    phone_book.close()
@@ -0,0 +1,33 @@
+from benchmarks.synthetic import generate, records, write_csv
+from csvImport import import_csv_stream
+from phoneBook import PhoneBook
+from validation import phone_key
+
+
+def test_records_are_deterministic():
+    """The same count and seed give the same contacts, and a longer run extends a shorter one's numbers."""
+    assert list(records(300)) == list(records(300))
+    assert list(records(300, seed=1)) != list(records(300))
+    assert [record[2] for record in records(100)] == [record[2] for record in records(300)][:100]
+
+
+def test_records_are_valid_and_distinct():
+    """Every phone number is valid and distinct, and contacts are added in roughly increasing order."""
+    contacts = list(generate(2000))
+    assert len({phone_key(contact.phone) for contact in contacts}) == 2000
+    times = [contact.time_added for contact in contacts]
+    assert times[0] < times[len(times) // 2] < times[-1]
+    assert sum(later < earlier for earlier, later in zip(times, times[1:])) < len(times) // 2
+    assert 0.7 < sum(contact.email is not None for contact in contacts) / 2000 < 0.95
+    assert len({contact.last_name for contact in contacts}) > 200
+
+
+def test_csv_is_imported_without_rejects(tmp_path, audit_logger):
+    """A written CSV file imports every contact, with the generated fields."""
+    path = tmp_path / 'contacts.csv'
+    write_csv(str(path), 500, seed=3)
+    phone_book = PhoneBook(audit_logger=audit_logger)
+    report = import_csv_stream(phone_book, str(path))
+    assert report.added == 500 and not report.rejects
+    assert [(contact.first_name, contact.last_name, contact.phone, contact.email, contact.address)
+            for contact in phone_book.contacts] == [record[:5] for record in records(500, seed=3)]
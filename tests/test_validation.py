@@ -0,0 +1,33 @@
+import pytest
+
+from validation import format_phone, phone_key, validate_email, validate_phone
+
+
+@pytest.mark.parametrize('phone', ['(123) 456-7890', '123-456-7890', '123.456.7890', '1234567890', '123 456 7890',
+                                   '+1 123 456 7890', '1-123-456-7890', '+1 (123) 456-7890', 1234567890])
+def test_formats_of_one_number_share_a_key(phone):
+    """Every accepted way of writing a number normalizes to the same integer key."""
+    assert phone_key(phone) == 1234567890
+    assert validate_phone(phone)
+
+
+@pytest.mark.parametrize('phone', ['', '123-456-789', '223-456-78901', '2 123 456 7890', '+2 123 456 7890',
+                                   '123-456-789O', '123/456/7890', 'phone', 10 ** 10, -1, True, False])
+def test_invalid_numbers_are_rejected(phone):
+    """Numbers without exactly ten digits after an optional leading 1, or with other characters, have no key."""
+    with pytest.raises(ValueError):
+        phone_key(phone)
+    assert not validate_phone(phone)
+
+
+def test_keys_format_back_to_the_display_form():
+    """format_phone inverts phone_key, keeping leading zeros."""
+    assert format_phone(phone_key('+1 012 345 6789')) == '(012) 345-6789'
+    assert format_phone(0) == '(000) 000-0000'
+
+
+@pytest.mark.parametrize('email, valid', [('jane@example.com', True), ('jane.doe+tag@mail.example.org', True),
+                                          ('jane@', False), ('@example.com', False), ('jane example.com', False)])
+def test_validate_email(email, valid):
+    """Emails are checked against a basic pattern."""
+    assert validate_email(email) is valid
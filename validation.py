@@ -0,0 +1,115 @@
+# Regular expression library for validating
+import re
+
+# Phone numbers in the format (###) ###-####
+PHONE_PATTERN = r'^\(\d{3}\) \d{3}-\d{4}$'
+
+# Phone numbers in any accepted format: digits with optional spaces, dots, dashes and
+# parentheses, and an optional leading +
+PHONE_INPUT_PATTERN = r'^\+?[\d\s().-]+$'
+
+# A basic email address pattern
+EMAIL_PATTERN = r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$'
+
+_CANONICAL_PHONE = re.compile(PHONE_PATTERN)
+_PHONE_INPUT = re.compile(PHONE_INPUT_PATTERN)
+_NON_DIGITS = re.compile(r'\D')
+
+
+def validate_phone(phone):
+    """
+    Validates a phone number in any format accepted by phone_key, such as (###) ###-####,
+    ###-###-####, ###.###.####, ########## or +1 ### ### ####.
+
+    Parameters:
+    -----------
+    phone : str
+        The phone number to be validated.
+
+    Returns:
+    --------
+    bool
+        True if the phone number can be normalized, False otherwise.
+    """
+    try:
+        phone_key(phone)
+    except ValueError:
+        return False
+    return True
+
+def validate_email(email):
+    """
+    Validates an email address using a basic regex pattern.
+
+    Parameters:
+    -----------
+    email : str
+        The email to be validated.
+
+    Returns:
+    --------
+    bool
+        True if the email matches the pattern, False otherwise.
+    """
+    return re.match(EMAIL_PATTERN, email) is not None
+
+def phone_key(phone):
+    """
+    Normalizes a phone number to its canonical integer key.
+
+    The digits may be grouped with spaces, dots, dashes and parentheses in any way, and
+    may be preceded by the country code 1 or +1. The key is the remaining ten digits as an
+    integer, so the same number typed in different formats always gets the same key.
+
+    Parameters:
+    -----------
+    phone : str or int
+        The phone number to normalize, or a key that was already normalized.
+
+    Returns:
+    --------
+    int
+        The ten digits of the phone number as an integer (e.g. 1234567890).
+
+    Raises:
+    -------
+    ValueError
+        If the phone number is a bool or does not have exactly ten digits after the optional
+        country code.
+    """
+    if isinstance(phone, bool):
+        raise ValueError(f"Phone number {phone} is not a number.")  # bool is a subclass of int
+    if isinstance(phone, int):
+        if 0 <= phone < 10 ** 10:
+            return phone
+        raise ValueError(f"Phone number {phone} does not have ten digits.")
+
+    # Fast path for the format the application itself uses
+    if _CANONICAL_PHONE.match(phone):
+        return int(phone[1:4] + phone[6:9] + phone[10:14])
+
+    if not _PHONE_INPUT.match(phone):
+        raise ValueError(f"Phone number {phone} contains characters other than digits and separators.")
+    digits = _NON_DIGITS.sub('', phone)
+    if len(digits) == 11 and digits[0] == '1':
+        digits = digits[1:]  # Drop the country code
+    if len(digits) != 10:
+        raise ValueError(f"Phone number {phone} does not have ten digits.")
+    return int(digits)
+
+def format_phone(key):
+    """
+    Formats a key produced by phone_key as (###) ###-####.
+
+    Parameters:
+    -----------
+    key : int
+        The phone number key.
+
+    Returns:
+    --------
+    str
+        The phone number in the format (###) ###-####.
+    """
+    digits = f'{key:010d}'
+    return f'({digits[:3]}) {digits[3:6]}-{digits[6:]}'